@@ -1,6 +1,7 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
-from .models import User, Role, UserActionLog
+from core.pagination import EstimatedCountPaginator
+from .models import User, Role, UserActionLog, UserActionLogArchive
 
 
 @admin.register(Role)
@@ -39,6 +40,24 @@ class UserActionLogAdmin(admin.ModelAdmin):
     list_filter = ['action', 'created_at']
     search_fields = ['user__username', 'details', 'ip_address']
     readonly_fields = ['user', 'action', 'target_model', 'target_id', 'details', 'ip_address', 'user_agent', 'created_at']
+    # Pas de COUNT(*) sur tout le journal
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(UserActionLogArchive)
+class UserActionLogArchiveAdmin(admin.ModelAdmin):
+    list_display = ['username', 'action', 'target_model', 'target_id', 'created_at', 'month']
+    list_filter = ['action', 'month']
+    search_fields = ['username', 'details', 'ip_address']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
     def has_add_permission(self, request):
         return False
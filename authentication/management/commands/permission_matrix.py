@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+import csv
+
+from django.core.management.base import BaseCommand
+
+from authentication.permissions import get_route_registry
+
+
+class Command(BaseCommand):
+    help = "Affiche la matrice des permissions: routes du portail et de l'administration x rôles"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=['text', 'csv'], default='text', help="Format de sortie")
+
+    def handle(self, *args, **options):
+        roles, rows = get_route_registry().permission_matrix()
+
+        if options['format'] == 'csv':
+            writer = csv.writer(self.stdout)
+            writer.writerow(['route', 'url', 'permission', 'staff'] + [role.name for role in roles])
+            for row in rows:
+                writer.writerow(
+                    [row['view_name'], row['route'], row['permission'] or '', 'oui' if row['staff_required'] else 'non']
+                    + ['X' if role.name in row['roles'] else '' for role in roles]
+                )
+            return
+
+        for row in rows:
+            permission = row['permission'] or ('(staff uniquement)' if row['staff_required'] else '-')
+            self.stdout.write(f"{row['view_name']:<55} {permission:<45} {', '.join(row['roles']) or '-'}")
+
+        unknown = sorted({row['permission'] for row in rows if not row['permission_exists']})
+        if unknown:
+            self.stdout.write(self.style.WARNING(
+                "Permissions inexistantes (accès réservé aux superutilisateurs): " + ', '.join(unknown)
+            ))
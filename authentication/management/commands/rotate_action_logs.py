@@ -0,0 +1,35 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from authentication.retention import rotate_action_logs
+
+
+class Command(BaseCommand):
+    help = "Déplace les logs d'actions anciens vers l'archive mensuelle et purge les mois expirés"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.ACTION_LOG_RETENTION_DAYS,
+                            help="Logs conservés dans le journal courant, en jours (par défaut ACTION_LOG_RETENTION_DAYS)")
+        parser.add_argument('--keep-months', type=int, default=settings.ACTION_LOG_ARCHIVE_MONTHS,
+                            help="Mois d'archive conservés, 0 pour tout garder (par défaut ACTION_LOG_ARCHIVE_MONTHS)")
+        parser.add_argument('--batch', type=int, default=settings.ACTION_LOG_BATCH_SIZE,
+                            help="Lignes déplacées par transaction (par défaut ACTION_LOG_BATCH_SIZE)")
+        parser.add_argument('--limit', type=int, help="Nombre maximal de logs à archiver")
+
+    def handle(self, *args, **options):
+        if options['days'] < 0 or options['keep_months'] < 0 or options['batch'] < 1:
+            raise CommandError("--days et --keep-months doivent être positifs, --batch supérieur ou égal à 1")
+        summary = rotate_action_logs(
+            before=timezone.now() - timedelta(days=options['days']),
+            batch_size=options['batch'],
+            keep_months=options['keep_months'],
+            limit=options['limit'],
+        )
+        months = ', '.join(summary['months']) or '-'
+        self.stdout.write(self.style.SUCCESS(
+            f"{summary['archived']} log(s) archivé(s) en {summary['batches']} transaction(s) (mois: {months}), "
+            f"{summary['purged']} log(s) d'archive purgé(s)"
+        ))
@@ -0,0 +1,63 @@
+# Generated by Django 5.2.7 on 2026-10-18 14:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserActionLogArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('original_id', models.BigIntegerField(unique=True, verbose_name="ID d'origine")),
+                ('month', models.DateField(verbose_name='Mois')),
+                ('user_id', models.BigIntegerField(blank=True, null=True, verbose_name="ID de l'utilisateur")),
+                ('username', models.CharField(blank=True, max_length=150, verbose_name='Utilisateur')),
+                ('action', models.CharField(choices=[('create', 'Création'), ('update', 'Mise à jour'), ('delete', 'Suppression'), ('login', 'Connexion'), ('logout', 'Déconnexion'), ('password_change', 'Changement de mot de passe'), ('status_change', 'Changement de statut'), ('permission_change', 'Changement de permissions')], max_length=50, verbose_name='Action')),
+                ('target_model', models.CharField(blank=True, max_length=100, verbose_name='Modèle cible')),
+                ('target_id', models.IntegerField(blank=True, null=True, verbose_name='ID de la cible')),
+                ('details', models.TextField(blank=True, verbose_name='Détails')),
+                ('ip_address', models.GenericIPAddressField(blank=True, null=True, verbose_name='Adresse IP')),
+                ('user_agent', models.TextField(blank=True, verbose_name='User Agent')),
+                ('created_at', models.DateTimeField(verbose_name='Date')),
+            ],
+            options={
+                'verbose_name': "Log d'action archivé",
+                'verbose_name_plural': "Logs d'actions archivés",
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='useractionlog',
+            index=models.Index(fields=['created_at'], name='authenticat_created_99d571_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='useractionlog',
+            index=models.Index(fields=['user', 'created_at'], name='authenticat_user_id_129198_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='useractionlog',
+            index=models.Index(fields=['action', 'created_at'], name='authenticat_action_86ed7c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='useractionlog',
+            index=models.Index(fields=['target_model', 'target_id'], name='authenticat_target__2e9abe_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='useractionlogarchive',
+            index=models.Index(fields=['month', 'created_at'], name='authenticat_month_109692_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='useractionlogarchive',
+            index=models.Index(fields=['user_id', 'created_at'], name='authenticat_user_id_ee7c26_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='useractionlogarchive',
+            index=models.Index(fields=['target_model', 'target_id'], name='authenticat_target__5c6e20_idx'),
+        ),
+    ]
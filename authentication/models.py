@@ -1,6 +1,6 @@
 from django.db import models
-from django.contrib.auth.models import AbstractUser, Permission
-from django.db.models.signals import pre_save, post_delete
+from django.contrib.auth.models import AbstractUser, Group, Permission
+from django.db.models.signals import m2m_changed, pre_save, post_delete
 from django.dispatch import receiver
 import os
 from django.utils.text import slugify
@@ -74,26 +74,30 @@ class User(AbstractUser):
             return self.role.permissions.all()
         return Permission.objects.none()
 
+    def get_role_permission_set(self):
+        """
+        Retourne l'ensemble des permissions du rôle au format 'app_label.codename'.
+        Chargé en une requête puis mis en cache sur l'instance (durée de la requête).
+        """
+        if not hasattr(self, '_role_perm_cache'):
+            if self.role_id and self.is_active:
+                self._role_perm_cache = {
+                    f"{app_label}.{codename}"
+                    for app_label, codename in Permission.objects.filter(roles=self.role_id).values_list('content_type__app_label', 'codename')
+                }
+            else:
+                self._role_perm_cache = set()
+        return self._role_perm_cache
+
     def has_perm(self, perm, obj=None):
         """Vérifie si l'utilisateur a une permission spécifique"""
         # Les superusers ont toutes les permissions
         if self.is_active and self.is_superuser:
             return True
 
-        # Vérifier les permissions du rôle
-        if self.role and self.is_active:
-            # perm est au format 'app_label.codename' (ex: 'authentication.view_user')
-            try:
-                app_label, codename = perm.split('.')
-                # Vérifier si cette permission existe dans le rôle
-                if self.role.permissions.filter(
-                    content_type__app_label=app_label,
-                    codename=codename
-                ).exists():
-                    return True
-            except ValueError:
-                # Si le format de perm n'est pas valide, passer à la vérification par défaut
-                pass
+        # Vérifier les permissions du rôle (perm au format 'app_label.codename')
+        if perm in self.get_role_permission_set():
+            return True
 
         # Vérifier les permissions directes de l'utilisateur
         return super().has_perm(perm, obj)
@@ -103,12 +107,9 @@ class User(AbstractUser):
         if self.is_active and self.is_superuser:
             return True
 
-        if self.role:
-            role_perms = self.role.permissions.filter(
-                content_type__app_label=app_label
-            )
-            if role_perms.exists():
-                return True
+        prefix = f"{app_label}."
+        if any(perm.startswith(prefix) for perm in self.get_role_permission_set()):
+            return True
 
         return super().has_module_perms(app_label)
 
@@ -145,11 +146,51 @@ class UserActionLog(models.Model):
         verbose_name = "Log d'action utilisateur"
         verbose_name_plural = "Logs d'actions utilisateurs"
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at']),
+            models.Index(fields=['user', 'created_at']),
+            models.Index(fields=['action', 'created_at']),
+            models.Index(fields=['target_model', 'target_id']),
+        ]
 
     def __str__(self):
         return f"{self.user} - {self.action} - {self.created_at}"
 
 
+class UserActionLogArchive(models.Model):
+    """
+    Logs d'actions sortis du journal courant par la rotation (voir
+    authentication.retention), regroupés par mois. Stocké dans la base
+    ARCHIVE_DATABASE si elle est configurée.
+    """
+    archive_database = True
+
+    original_id = models.BigIntegerField(unique=True, verbose_name="ID d'origine")
+    month = models.DateField(verbose_name="Mois")
+    user_id = models.BigIntegerField(null=True, blank=True, verbose_name="ID de l'utilisateur")
+    username = models.CharField(max_length=150, blank=True, verbose_name="Utilisateur")
+    action = models.CharField(max_length=50, choices=UserActionLog.ACTION_CHOICES, verbose_name="Action")
+    target_model = models.CharField(max_length=100, blank=True, verbose_name="Modèle cible")
+    target_id = models.IntegerField(null=True, blank=True, verbose_name="ID de la cible")
+    details = models.TextField(blank=True, verbose_name="Détails")
+    ip_address = models.GenericIPAddressField(null=True, blank=True, verbose_name="Adresse IP")
+    user_agent = models.TextField(blank=True, verbose_name="User Agent")
+    created_at = models.DateTimeField(verbose_name="Date")
+
+    class Meta:
+        verbose_name = "Log d'action archivé"
+        verbose_name_plural = "Logs d'actions archivés"
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['month', 'created_at']),
+            models.Index(fields=['user_id', 'created_at']),
+            models.Index(fields=['target_model', 'target_id']),
+        ]
+
+    def __str__(self):
+        return f"{self.username} - {self.action} - {self.created_at}"
+
+
 # ============================================
 # SIGNAL POUR LA SUPPRESSION DES AVATARS
 # ============================================
@@ -163,3 +204,48 @@ def delete_avatar_on_user_delete(sender, instance, **kwargs):
                 os.remove(instance.avatar.path)
         except Exception:
             pass
+
+
+# ============================================
+# SIGNAL POUR LES PERMISSIONS DIRECTES ET DES GROUPES
+# ============================================
+
+def permission_change_users(sender, instance, reverse, pk_set):
+    """Utilisateurs concernés par un changement de permissions directes, de groupes ou de permissions d'un groupe"""
+    if sender is Group.permissions.through:
+        if not reverse:
+            return User.objects.filter(groups=instance)
+        if pk_set is None:
+            return User.objects.filter(groups__permissions=instance)
+        return User.objects.filter(groups__in=pk_set)
+    if not reverse:
+        return User.objects.filter(pk=instance.pk)
+    if pk_set is None:
+        relation = 'groups' if sender is User.groups.through else 'user_permissions'
+        return User.objects.filter(**{relation: instance})
+    return User.objects.filter(pk__in=pk_set)
+
+
+@receiver(m2m_changed, sender=User.user_permissions.through)
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(m2m_changed, sender=Group.permissions.through)
+def touch_user_on_permission_change(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Met à jour la date de modification des utilisateurs dont les permissions directes,
+    les groupes ou les permissions de leurs groupes changent: elle entre dans l'ETag
+    des pages (core.conditional). Un clear ne donne pas les lignes retirées: les
+    utilisateurs concernés sont relevés avant (pre_clear).
+    """
+    from django.utils import timezone
+
+    if action in ('pre_clear', 'post_add', 'post_remove'):
+        users = set(permission_change_users(sender, instance, reverse, pk_set).values_list('pk', flat=True))
+        if action == 'pre_clear':
+            instance._permission_change_users = users
+            return
+    elif action == 'post_clear':
+        users = getattr(instance, '_permission_change_users', set())
+    else:
+        return
+    if users:
+        User.objects.filter(pk__in=users).update(updated_at=timezone.now())
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+from functools import wraps
+
+from django.conf import settings
+from django.contrib import messages
+from django.contrib.auth.views import redirect_to_login
+from django.core.exceptions import PermissionDenied
+from django.shortcuts import redirect
+from django.urls import URLPattern, URLResolver, get_resolver
+
+
+class RouteRule:
+    """Règle d'accès d'une route: permission requise et accès staff"""
+
+    def __init__(self, permission=None, staff_required=True, raise_exception=True):
+        self.permission = permission
+        self.staff_required = staff_required
+        self.raise_exception = raise_exception
+
+    def check(self, request):
+        """
+        Vérifie l'accès de la requête. Retourne None si l'accès est autorisé, sinon
+        la réponse à renvoyer (ou lève PermissionDenied).
+        """
+        request._route_permission_checked = True
+        user = request.user
+        if not user.is_authenticated or (self.staff_required and not (user.is_active and user.is_staff)):
+            return redirect_to_login(request.get_full_path(), settings.LOGIN_URL)
+
+        if self.permission and not user.has_perm(self.permission):
+            if self.raise_exception:
+                raise PermissionDenied
+            messages.error(request, "Vous n'avez pas les permissions nécessaires pour accéder à cette page.")
+            return redirect('portal_admin:index')
+        return None
+
+
+def route_permission(permission=None, staff_required=True, raise_exception=True):
+    """
+    Déclare la permission requise par une vue. La vérification est faite une seule
+    fois par requête par RolePermissionMiddleware via le registre des routes; le
+    décorateur ne revérifie que si le middleware n'est pas passé par là.
+    """
+    rule = RouteRule(permission, staff_required, raise_exception)
+
+    def decorator(view_func):
+        @wraps(view_func)
+        def _wrapped_view(request, *args, **kwargs):
+            if not getattr(request, '_route_permission_checked', False):
+                response = rule.check(request)
+                if response is not None:
+                    return response
+            return view_func(request, *args, **kwargs)
+
+        _wrapped_view.route_rule = rule
+        return _wrapped_view
+
+    return decorator
+
+
+class RoutePermissionRegistry:
+    """
+    Registre compilé des routes du portail et de l'administration:
+    'namespace:url_name' -> RouteRule, construit une seule fois au démarrage.
+    """
+
+    def __init__(self, urlconf=None):
+        self.rules = {}
+        self.routes = []
+        self._walk(get_resolver(urlconf).url_patterns, namespace='', prefix='')
+
+    def _walk(self, patterns, namespace, prefix):
+        for pattern in patterns:
+            if isinstance(pattern, URLResolver):
+                nested = namespace
+                if pattern.namespace:
+                    nested = f"{namespace}:{pattern.namespace}" if namespace else pattern.namespace
+                self._walk(pattern.url_patterns, nested, prefix + str(pattern.pattern))
+            elif isinstance(pattern, URLPattern) and pattern.name:
+                view_name = f"{namespace}:{pattern.name}" if namespace else pattern.name
+                rule = getattr(pattern.callback, 'route_rule', None)
+                if view_name in self.rules:
+                    continue
+                self.routes.append((view_name, prefix + str(pattern.pattern), rule))
+                if rule is not None:
+                    self.rules[view_name] = rule
+
+    def get(self, view_name):
+        return self.rules.get(view_name)
+
+    def permission_matrix(self):
+        """
+        Matrice des permissions: pour chaque route déclarée, la permission requise,
+        les rôles qui y donnent accès et si la permission existe en base.
+        """
+        from django.contrib.auth.models import Permission
+        from .models import Role
+
+        existing = {
+            f"{app_label}.{codename}"
+            for app_label, codename in Permission.objects.values_list('content_type__app_label', 'codename')
+        }
+        roles = list(Role.objects.prefetch_related('permissions__content_type').order_by('name'))
+        role_permissions = {
+            role.pk: {f"{perm.content_type.app_label}.{perm.codename}" for perm in role.permissions.all()}
+            for role in roles
+        }
+
+        rows = []
+        for view_name, route, rule in self.routes:
+            if rule is None:
+                continue
+            rows.append({
+                'view_name': view_name,
+                'route': route,
+                'permission': rule.permission,
+                'staff_required': rule.staff_required,
+                'permission_exists': rule.permission is None or rule.permission in existing,
+                'roles': [
+                    role.name for role in roles
+                    if rule.permission is None or rule.permission in role_permissions[role.pk]
+                ],
+            })
+        return roles, rows
+
+
+_registry = None
+
+
+def get_route_registry():
+    """Retourne le registre des routes (compilé une seule fois par processus)"""
+    global _registry
+    if _registry is None:
+        _registry = RoutePermissionRegistry()
+    return _registry
@@ -0,0 +1,93 @@
+"""
+Rotation du journal des actions utilisateurs.
+
+Les logs plus anciens que ACTION_LOG_RETENTION_DAYS jours sont déplacés, par
+lots de ACTION_LOG_BATCH_SIZE lignes dans l'ordre des identifiants, vers
+UserActionLogArchive où ils sont rangés par mois (colonne month indexée). Les
+mois d'archive plus anciens que ACTION_LOG_ARCHIVE_MONTHS sont purgés. Le
+journal courant reste ainsi borné par l'activité récente.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.utils import timezone
+
+from core.db_router import archive_alias
+
+from .models import UserActionLog, UserActionLogArchive
+
+ARCHIVE_FIELDS = (
+    'id', 'user_id', 'user__username', 'action', 'target_model', 'target_id', 'details', 'ip_address',
+    'user_agent', 'created_at',
+)
+
+
+def month_start(value):
+    """Premier jour du mois (heure locale) d'une date/heure"""
+    return timezone.localtime(value).date().replace(day=1) if timezone.is_aware(value) else value.date().replace(day=1)
+
+
+def subtract_months(day, months):
+    index = day.year * 12 + day.month - 1 - months
+    return day.replace(year=index // 12, month=index % 12 + 1, day=1)
+
+
+def rotate_action_logs(before=None, batch_size=None, keep_months=None, limit=None):
+    """
+    Archive les logs créés avant before (par défaut il y a
+    ACTION_LOG_RETENTION_DAYS jours) puis purge les mois d'archive antérieurs
+    aux keep_months derniers mois. Retourne un résumé sérialisable en JSON.
+    """
+    before = before or timezone.now() - timedelta(days=settings.ACTION_LOG_RETENTION_DAYS)
+    batch_size = batch_size or settings.ACTION_LOG_BATCH_SIZE
+    keep_months = settings.ACTION_LOG_ARCHIVE_MONTHS if keep_months is None else keep_months
+    alias = archive_alias() or DEFAULT_DB_ALIAS
+
+    archived = batches = 0
+    months = set()
+    old_logs = UserActionLog.objects.filter(created_at__lt=before)
+    while limit is None or archived < limit:
+        size = batch_size if limit is None else min(batch_size, limit - archived)
+        with transaction.atomic():
+            rows = list(old_logs.order_by('pk').values(*ARCHIVE_FIELDS)[:size])
+            if not rows:
+                break
+            with transaction.atomic(using=alias):
+                UserActionLogArchive.objects.bulk_create([
+                    UserActionLogArchive(
+                        original_id=row['id'],
+                        month=month_start(row['created_at']),
+                        user_id=row['user_id'],
+                        username=row['user__username'] or '',
+                        action=row['action'],
+                        target_model=row['target_model'] or '',
+                        target_id=row['target_id'],
+                        details=row['details'],
+                        ip_address=row['ip_address'],
+                        user_agent=row['user_agent'],
+                        created_at=row['created_at'],
+                    )
+                    for row in rows
+                ], batch_size=1000, ignore_conflicts=True)
+            UserActionLog.objects.filter(pk__in=[row['id'] for row in rows]).delete()
+        months.update(month_start(row['created_at']).isoformat()[:7] for row in rows)
+        archived += len(rows)
+        batches += 1
+
+    purged = 0
+    if keep_months:
+        oldest_kept = subtract_months(timezone.localdate().replace(day=1), keep_months - 1)
+        expired = UserActionLogArchive.objects.filter(month__lt=oldest_kept)
+        while True:
+            ids = list(expired.order_by('pk').values_list('pk', flat=True)[:batch_size])
+            if not ids:
+                break
+            purged += UserActionLogArchive.objects.filter(pk__in=ids).delete()[0]
+
+    return {'archived': archived, 'batches': batches, 'months': sorted(months), 'purged': purged}
+
+
+def archived_months():
+    """Mois présents dans l'archive, du plus récent au plus ancien"""
+    return list(UserActionLogArchive.objects.dates('month', 'month', order='DESC'))
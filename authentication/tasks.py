@@ -0,0 +1,12 @@
+"""
+Tâches en arrière-plan de l'application authentication (voir seafood.jobs)
+"""
+from seafood.jobs import PRIORITY_LOW, task
+
+
+@task('authentication.rotate_action_logs', label="Rotation du journal des actions", priority=PRIORITY_LOW,
+      launchable=True, permission='authentication.delete_useractionlog')
+def rotate_action_logs(job, limit=None):
+    from .retention import rotate_action_logs as rotate
+
+    return rotate(limit=limit)
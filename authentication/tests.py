@@ -1,3 +1,177 @@
+from datetime import timedelta
+
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from core.testing import QueryCountTestCase, make_role, make_user
+from .models import UserActionLog, UserActionLogArchive
+
+
+class AuthenticationViewsQueryCountTest(QueryCountTestCase):
+    """Nombre de requêtes constant des vues d'administration des utilisateurs et rôles"""
+
+    def seed_users(self, n):
+        for i in range(n):
+            make_user(role=self.role)
+
+    def seed_roles(self, n):
+        for i in range(n):
+            role = make_role()
+            make_user(role=role)
+
+    def seed_logs(self, n):
+        UserActionLog.objects.bulk_create([
+            UserActionLog(user=self.user, action='update', target_model='User', target_id=self.user.pk, details='Mise à jour')
+            for i in range(n)
+        ])
+
+    def test_users_list(self):
+        self.assertConstantQueries(reverse('authentication:users_list'), self.seed_users)
+
+    def test_user_detail(self):
+        self.assertConstantQueries(reverse('authentication:user_detail', args=[self.user.pk]), self.seed_logs)
+
+    def test_user_create(self):
+        self.assertConstantQueries(reverse('authentication:user_create'), self.seed_roles)
+
+    def test_user_update(self):
+        self.assertConstantQueries(reverse('authentication:user_update', args=[self.user.pk]), self.seed_roles)
+
+    def test_admin_reset_password(self):
+        self.assertConstantQueries(reverse('authentication:admin_reset_password', args=[self.user.pk]), self.seed_logs)
+
+    def test_roles_list(self):
+        self.assertConstantQueries(reverse('authentication:roles_list'), self.seed_roles)
+
+    def test_role_create(self):
+        self.assertConstantQueries(reverse('authentication:role_create'), self.seed_roles)
+
+    def test_role_detail(self):
+        self.assertConstantQueries(reverse('authentication:role_detail', args=[self.role.pk]), self.seed_users)
+
+    def test_role_update(self):
+        self.assertConstantQueries(reverse('authentication:role_update', args=[self.role.pk]), self.seed_users)
+
+    def test_role_delete(self):
+        self.assertConstantQueries(reverse('authentication:role_delete', args=[self.role.pk]), self.seed_users)
+
+    def test_role_permissions(self):
+        self.assertConstantQueries(reverse('authentication:role_permissions', args=[self.role.pk]), self.seed_users)
+
+    def test_user_action_logs(self):
+        self.assertConstantQueries(reverse('authentication:user_action_logs'), self.seed_logs)
+
+    def test_debug_role_permissions(self):
+        self.assertConstantQueries(reverse('authentication:debug_role_permissions'), self.seed_roles)
+
+
+class UserActionLogExplorerTest(TestCase):
+    """Pagination par clé et rotation du journal des actions"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = make_user(role=make_role('Administrateur'))
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def seed(self, n, days_ago=0):
+        created_at = timezone.now() - timedelta(days=days_ago)
+        logs = UserActionLog.objects.bulk_create([
+            UserActionLog(user=self.user, action='update', details=f"Log {i}") for i in range(n)
+        ])
+        # Dates identiques: l'identifiant départage l'ordre des pages
+        UserActionLog.objects.filter(pk__in=[log.pk for log in logs]).update(created_at=created_at)
+
+    def test_keyset_pages_cover_the_log_once(self):
+        from core.pagination import keyset_page
+
+        self.seed(7)
+        self.seed(5, days_ago=1)
+        seen, after, pages = [], None, []
+        while True:
+            page = keyset_page(UserActionLog.objects.all(), after=after, per_page=5)
+            pages.append(page)
+            seen += [log.pk for log in page]
+            if not page.has_next:
+                break
+            after = page.next_cursor
+
+        self.assertEqual(seen, list(UserActionLog.objects.order_by('-created_at', '-pk').values_list('pk', flat=True)))
+        self.assertFalse(pages[0].has_previous)
+        previous = keyset_page(UserActionLog.objects.all(), before=pages[2].previous_cursor, per_page=5)
+        self.assertEqual([log.pk for log in previous], [log.pk for log in pages[1]])
+
+    def test_estimated_count_is_capped(self):
+        from core.pagination import estimated_count
+
+        self.seed(12)
+        self.assertEqual(estimated_count(UserActionLog.objects.all(), cap=20), (12, 'exact'))
+        self.assertEqual(estimated_count(UserActionLog.objects.filter(action='update'), cap=10), (10, 'capped'))
+
+    def test_rotation_moves_old_logs_to_monthly_archive(self):
+        from .retention import rotate_action_logs
+
+        self.seed(4)
+        self.seed(6, days_ago=400)
+
+        summary = rotate_action_logs(batch_size=4, keep_months=0)
+
+        self.assertEqual(summary['archived'], 6)
+        self.assertEqual(summary['batches'], 2)
+        self.assertEqual(UserActionLog.objects.count(), 4)
+        self.assertEqual(UserActionLogArchive.objects.filter(username=self.user.username).count(), 6)
+        self.assertEqual(rotate_action_logs(keep_months=1)['purged'], 6)
+
+    def test_explorer_pages_and_archived_months(self):
+        from .retention import rotate_action_logs
+
+        self.seed(60, days_ago=400)
+        rotate_action_logs(keep_months=0)
+        self.seed(55)
+
+        response = self.client.get(reverse('authentication:user_action_logs'), {'action': 'update'})
+        self.assertEqual(len(response.context['logs']), 50)
+        self.assertEqual(response.context['total'], 55)
+        response = self.client.get(reverse('authentication:user_action_logs'), {
+            'action': 'update', 'after': response.context['logs'].next_cursor
+        })
+        self.assertEqual(len(response.context['logs']), 5)
+
+        month = response.context['archived_months'][0].strftime('%Y-%m')
+        response = self.client.get(reverse('authentication:user_action_logs'), {'month': month})
+        self.assertEqual(response.context['total'], 60)
+
+
+class PermissionChangeTouchTest(TestCase):
+    """Les changements de permissions et de groupes mettent à jour les utilisateurs (ETag des pages)"""
+
+    def setUp(self):
+        from django.contrib.auth.models import Group, Permission
+
+        self.group = Group.objects.create(name='Commerciaux')
+        self.permission = Permission.objects.get(codename='view_prospect')
+        self.member = make_user()
+        self.other = make_user()
+        self.member.groups.add(self.group)
+
+    def assertTouched(self, change):
+        from .models import User
+
+        past = timezone.now() - timedelta(days=1)
+        User.objects.update(updated_at=past)
+        change()
+        touched = set(User.objects.filter(updated_at__gt=past).values_list('pk', flat=True))
+        self.assertEqual(touched, {self.member.pk})
+
+    def test_group_permissions(self):
+        self.assertTouched(lambda: self.group.permissions.add(self.permission))
+        self.assertTouched(lambda: self.group.permissions.clear())
+        self.group.permissions.add(self.permission)
+        self.assertTouched(lambda: self.permission.group_set.clear())
 
-# Create your tests here.
+    def test_reverse_clears(self):
+        self.member.user_permissions.add(self.permission)
+        self.assertTouched(lambda: self.permission.user_set.clear())
+        self.assertTouched(lambda: self.group.user_set.clear())
@@ -1,19 +1,20 @@
 from django.shortcuts import render, redirect, get_object_or_404
-from django.contrib.auth.decorators import login_required, permission_required
 from django.contrib import messages
-from django.db.models import Q
+from django.db.models import Q, Count, Prefetch
 from django.core.paginator import Paginator
 from .models import User, Role, UserActionLog
 from .forms import UserCreateForm, UserUpdateForm, AdminPasswordResetForm, RoleForm, RolePermissionsForm
 from .utils import log_user_action
+from .permissions import route_permission
+from core.db_router import replica_read
 
 
 # ============================================
 # VUES POUR LA GESTION DES UTILISATEURS
 # ============================================
 
-@login_required
-@permission_required('authentication.view_user', raise_exception=True)
+@route_permission('authentication.view_user', staff_required=False, raise_exception=False)
+@replica_read
 def users_list(request):
     """Liste tous les utilisateurs avec recherche et pagination"""
     query = request.GET.get('q', '')
@@ -57,8 +58,7 @@ def users_list(request):
     return render(request, 'authentication/users_list.html', context)
 
 
-@login_required
-@permission_required('authentication.add_user', raise_exception=True)
+@route_permission('authentication.add_user', staff_required=False, raise_exception=False)
 def user_create(request):
     """Créer un nouvel utilisateur"""
     if request.method == 'POST':
@@ -85,8 +85,7 @@ def user_create(request):
     return render(request, 'authentication/user_create.html', context)
 
 
-@login_required
-@permission_required('authentication.view_user', raise_exception=True)
+@route_permission('authentication.view_user', staff_required=False, raise_exception=False)
 def user_detail(request, user_id):
     """Afficher les détails d'un utilisateur"""
     user_obj = get_object_or_404(User.objects.select_related('role'), id=user_id)
@@ -102,8 +101,7 @@ def user_detail(request, user_id):
     return render(request, 'authentication/user_detail.html', context)
 
 
-@login_required
-@permission_required('authentication.change_user', raise_exception=True)
+@route_permission('authentication.change_user', staff_required=False, raise_exception=False)
 def user_update(request, user_id):
     """Mettre à jour un utilisateur"""
     import os
@@ -186,8 +184,7 @@ def user_update(request, user_id):
     return render(request, 'authentication/user_update.html', context)
 
 
-@login_required
-@permission_required('authentication.change_user', raise_exception=True)
+@route_permission('authentication.change_user', staff_required=False, raise_exception=False)
 def toggle_user_status(request, user_id):
     """Activer/Désactiver un utilisateur"""
     user = get_object_or_404(User, id=user_id)
@@ -211,8 +208,7 @@ def toggle_user_status(request, user_id):
     return redirect('authentication:user_detail', user_id=user.id)
 
 
-@login_required
-@permission_required('authentication.change_user', raise_exception=True)
+@route_permission('authentication.change_user', staff_required=False, raise_exception=False)
 def admin_reset_password(request, user_id):
     """Réinitialiser le mot de passe d'un utilisateur (admin)"""
     user = get_object_or_404(User, id=user_id)
@@ -250,13 +246,16 @@ def admin_reset_password(request, user_id):
 # VUES POUR LA GESTION DES RÔLES
 # ============================================
 
-@login_required
-@permission_required('authentication.view_role', raise_exception=True)
+@route_permission('authentication.view_role', staff_required=False, raise_exception=False)
 def roles_list(request):
     """Liste tous les rôles"""
     query = request.GET.get('q', '')
 
-    roles = Role.objects.prefetch_related('permissions').all()
+    # Nombre d'utilisateurs et 3 premiers utilisateurs de chaque rôle en une requête chacun
+    roles = Role.objects.annotate(users_count=Count('users', distinct=True)).prefetch_related(
+        'permissions',
+        Prefetch('users', queryset=User.objects.order_by('-created_at')[:3], to_attr='preview_users'),
+    )
 
     if query:
         roles = roles.filter(
@@ -264,10 +263,6 @@ def roles_list(request):
             Q(description__icontains=query)
         )
 
-    # Ajouter le nombre d'utilisateurs pour chaque rôle
-    for role in roles:
-        role.users_count = role.users.count()
-
     context = {
         'roles': roles,
         'query': query,
@@ -276,8 +271,7 @@ def roles_list(request):
     return render(request, 'authentication/roles_list.html', context)
 
 
-@login_required
-@permission_required('authentication.add_role', raise_exception=True)
+@route_permission('authentication.add_role', staff_required=False, raise_exception=False)
 def role_create(request):
     """Créer un nouveau rôle"""
     if request.method == 'POST':
@@ -301,8 +295,7 @@ def role_create(request):
     return render(request, 'authentication/role_create.html', context)
 
 
-@login_required
-@permission_required('authentication.view_role', raise_exception=True)
+@route_permission('authentication.view_role', staff_required=False, raise_exception=False)
 def role_detail(request, role_id):
     """Afficher les détails d'un rôle"""
     role = get_object_or_404(Role.objects.prefetch_related('permissions', 'users'), id=role_id)
@@ -331,8 +324,7 @@ def role_detail(request, role_id):
     return render(request, 'authentication/role_detail.html', context)
 
 
-@login_required
-@permission_required('authentication.change_role', raise_exception=True)
+@route_permission('authentication.change_role', staff_required=False, raise_exception=False)
 def role_update(request, role_id):
     """Mettre à jour un rôle"""
     role = get_object_or_404(Role, id=role_id)
@@ -362,8 +354,7 @@ def role_update(request, role_id):
     return render(request, 'authentication/role_update.html', context)
 
 
-@login_required
-@permission_required('authentication.delete_role', raise_exception=True)
+@route_permission('authentication.delete_role', staff_required=False, raise_exception=False)
 def role_delete(request, role_id):
     """Supprimer un rôle"""
     role = get_object_or_404(Role, id=role_id)
@@ -386,11 +377,10 @@ def role_delete(request, role_id):
     return render(request, 'authentication/role_confirm_delete.html', context)
 
 
-@login_required
-@permission_required('authentication.change_role', raise_exception=True)
+@route_permission('authentication.change_role', staff_required=False, raise_exception=False)
 def role_permissions(request, role_id):
     """Gérer les permissions d'un rôle"""
-    role = get_object_or_404(Role, id=role_id)
+    role = get_object_or_404(Role.objects.prefetch_related('permissions'), id=role_id)
 
     if request.method == 'POST':
         form = RolePermissionsForm(request.POST, role=role)
@@ -427,41 +417,83 @@ def role_permissions(request, role_id):
 # VUES POUR LES LOGS D'ACTIONS
 # ============================================
 
-@login_required
-@permission_required('authentication.view_useractionlog', raise_exception=True)
+@route_permission('authentication.view_useractionlog', staff_required=False, raise_exception=False)
+@replica_read
 def user_action_logs(request):
-    """Afficher les logs d'actions des utilisateurs"""
+    """
+    Afficher les logs d'actions des utilisateurs: pagination par clé (pas de
+    COUNT(*) sur tout le journal) et consultation des mois archivés
+    """
+    from datetime import date, datetime, time
+    from django.utils import timezone
+    from core.pagination import estimated_count, keyset_page
+    from .models import UserActionLogArchive
+    from .retention import archived_months
+
     query = request.GET.get('q', '')
     action_filter = request.GET.get('action', '')
     user_filter = request.GET.get('user', '')
-
-    logs = UserActionLog.objects.select_related('user').all()
+    date_from = request.GET.get('date_from', '')
+    date_to = request.GET.get('date_to', '')
+    month_filter = request.GET.get('month', '')
+
+    archive_month = None
+    if month_filter:
+        try:
+            archive_month = date.fromisoformat(f"{month_filter}-01")
+        except ValueError:
+            messages.error(request, f"Mois invalide: {month_filter}")
+
+    if archive_month:
+        logs = UserActionLogArchive.objects.filter(month=archive_month)
+        username_field = 'username'
+    else:
+        logs = UserActionLog.objects.select_related('user')
+        username_field = 'user__username'
 
     if query:
         logs = logs.filter(
             Q(details__icontains=query) |
-            Q(user__username__icontains=query)
+            Q(**{f'{username_field}__icontains': query})
         )
 
     if action_filter:
         logs = logs.filter(action=action_filter)
 
-    if user_filter:
+    if user_filter.isdigit():
         logs = logs.filter(user_id=user_filter)
 
-    # Pagination
-    paginator = Paginator(logs, 50)
-    page_number = request.GET.get('page')
-    logs_page = paginator.get_page(page_number)
+    for value, lookup, bound in ((date_from, 'created_at__gte', time.min), (date_to, 'created_at__lte', time.max)):
+        try:
+            day = date.fromisoformat(value) if value else None
+        except ValueError:
+            day = None
+        if day:
+            logs = logs.filter(**{lookup: timezone.make_aware(datetime.combine(day, bound))})
+
+    # Pagination par clé (created_at, id) et nombre estimé
+    logs_page = keyset_page(logs, after=request.GET.get('after'), before=request.GET.get('before'), per_page=50)
+    total, total_kind = estimated_count(logs)
 
     # Pour le filtre par utilisateur
-    users = User.objects.all().order_by('username')
+    users = User.objects.only('id', 'username', 'email').order_by('username')
+
+    filters = request.GET.copy()
+    for key in ('after', 'before', 'page'):
+        filters.pop(key, None)
 
     context = {
         'logs': logs_page,
+        'total': total,
+        'total_kind': total_kind,
         'query': query,
         'action_filter': action_filter,
         'user_filter': user_filter,
+        'date_from': date_from,
+        'date_to': date_to,
+        'month_filter': month_filter if archive_month else '',
+        'archived_months': archived_months(),
+        'filters': filters.urlencode(),
         'action_choices': UserActionLog.ACTION_CHOICES,
         'users': users,
     }
@@ -473,8 +505,7 @@ def user_action_logs(request):
 # VUE DE DEBUG (à supprimer en production)
 # ============================================
 
-@login_required
-@permission_required('authentication.view_role', raise_exception=True)
+@route_permission('authentication.view_role', staff_required=False, raise_exception=False)
 def debug_role_permissions(request):
     """Vue de debug pour afficher toutes les permissions disponibles"""
     from django.contrib.auth.models import Permission
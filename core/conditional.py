@@ -0,0 +1,133 @@
+"""
+GET conditionnels (ETag) des pages de liste et de détail.
+
+Une page déjà affichée n'est recalculée que si son contenu a pu changer. La
+vue déclare un validateur, calculé par une requête d'agrégat avant le rendu:
+
+    @route_permission('operations.view_reception')
+    @replica_read
+    @conditional_page(lambda request, pk: object_version(
+        Reception.objects.filter(pk=pk), 'updated_at', 'client__updated_at'))
+    def arrivalnote_detail(request, pk):
+        ...
+
+queryset_version() (object_version() pour un détail) retourne en une requête le nombre de lignes du queryset
+(filtres de la page compris) et la date de modification la plus récente de
+chaque chemin donné: les lignes affichées et les lignes liées (client, service,
+lignes du document). Un chemin terminé par "pk" est compté (lignes liées
+ajoutées ou supprimées). Une modification, un ajout ou une suppression change
+donc le validateur; une écriture par QuerySet.update() qui ne renseigne pas
+updated_at n'est pas vue.
+
+L'ETag combine le validateur avec ce qui change la page pour un même contenu:
+chemin et paramètres, utilisateur (date de modification, statut, ensemble des
+permissions de son rôle, déjà chargé par RolePermissionMiddleware), cookie CSRF
+(jeton des formulaires de la page) et PAGE_ETAG_RELEASE (version déployée des
+gabarits). Si If-None-Match correspond, la réponse est un 304 sans exécuter la
+vue ni rendre le gabarit. Pas de 304 si des messages attendent d'être affichés.
+"""
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.db.models import Count, Max
+from django.http import HttpResponseNotModified
+from django.middleware.csrf import get_token
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags, quote_etag
+
+
+def queryset_version(queryset, *paths):
+    """
+    Validateur d'un queryset (une requête): nombre de lignes et date maximale de
+    chaque chemin (comptage distinct pour un chemin terminé par "pk")
+    """
+    aggregates = {'rows': Count('pk', distinct=True)}
+    for index, path in enumerate(paths):
+        if path == 'pk' or path.endswith('__pk'):
+            aggregates[f'v{index}'] = Count(path, distinct=True)
+        else:
+            aggregates[f'v{index}'] = Max(path)
+    values = queryset.order_by().aggregate(**aggregates)
+    return '|'.join(str(values[key]) for key in aggregates)
+
+
+def object_version(queryset, *paths):
+    """Validateur d'une page de détail: None si l'objet n'existe pas (la vue décide: 404, archive)"""
+    version = queryset_version(queryset, *paths)
+    return None if version.startswith('0|') else version
+
+
+def permission_version(user):
+    """Ce qui change l'affichage d'une page pour un même contenu: utilisateur et permissions"""
+    if not user.is_authenticated:
+        return 'anonymous'
+    permissions = ''
+    if hasattr(user, 'get_role_permission_set'):
+        permissions = ','.join(sorted(user.get_role_permission_set()))
+    return '|'.join(str(value) for value in (
+        user.pk, getattr(user, 'updated_at', ''), user.is_active, user.is_staff, user.is_superuser,
+        getattr(user, 'role_id', ''), hashlib.md5(permissions.encode(), usedforsecurity=False).hexdigest(),
+    ))
+
+
+def _csrf_secret(request):
+    # get_token() crée le secret d'une première visite: la page rendue et ses
+    # revalidations portent alors le même cookie
+    get_token(request)
+    return request.META.get('CSRF_COOKIE', '')
+
+
+def page_etag(request, validator):
+    parts = (
+        getattr(settings, 'PAGE_ETAG_RELEASE', ''),
+        request.path,
+        request.META.get('QUERY_STRING', ''),
+        permission_version(request.user),
+        _csrf_secret(request),
+        validator,
+    )
+    digest = hashlib.sha1('\n'.join(str(part) for part in parts).encode(), usedforsecurity=False).hexdigest()
+    return quote_etag(f'p-{digest}')
+
+
+def _has_pending_messages(request):
+    # len() ne marque pas les messages comme lus (contrairement à l'itération)
+    return bool(len(get_messages(request)))
+
+
+def conditional_page(version):
+    """
+    Rend une vue GET conditionnelle. version(request, *args, **kwargs) retourne le
+    validateur du contenu (queryset_version, object_version) ou None pour rendre
+    la page sans ETag.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def _wrapped_view(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD') or _has_pending_messages(request):
+                return view_func(request, *args, **kwargs)
+            validator = version(request, *args, **kwargs)
+            if validator is None:
+                return view_func(request, *args, **kwargs)
+
+            etag = page_etag(request, validator)
+            if etag in parse_etags(request.headers.get('If-None-Match', '')):
+                response = HttpResponseNotModified()
+                response['ETag'] = etag
+                patch_cache_control(response, private=True, no_cache=True)
+                return response
+
+            response = view_func(request, *args, **kwargs)
+            # Une page qui affiche des messages n'est pas réutilisable
+            if response.status_code == 200 and not response.has_header('ETag') and not len(get_messages(request)):
+                response['ETag'] = etag
+                # Le navigateur garde la page mais la revalide à chaque affichage
+                patch_cache_control(response, private=True, no_cache=True)
+            return response
+
+        _wrapped_view.conditional_page = True
+        return _wrapped_view
+
+    return decorator
@@ -0,0 +1,224 @@
+"""
+Routage des lectures vers la base réplique (alias REPLICA_DATABASE).
+
+- Les vues en lecture seule (listes, rapports, exports) sont marquées avec
+  @replica_read; leurs requêtes GET lisent la réplique. Tout le reste, et toutes
+  les écritures, vont sur la base principale.
+- Après une écriture, le navigateur de l'utilisateur est épinglé sur la base
+  principale pendant REPLICA_PIN_SECONDS (cookie posé par
+  ReplicaPinningMiddleware) pour qu'il relise ses propres modifications.
+- Si la réplique est injoignable ou en retard de plus de REPLICA_MAX_LAG
+  secondes, les lectures retombent sur la base principale.
+
+Sans alias de réplique configuré dans DATABASES, le routeur ne change rien.
+
+ArchiveRouter envoie les modèles d'archive (attribut archive_database = True,
+voir operations.archive) vers l'alias ARCHIVE_DATABASE lorsqu'il est configuré.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+_replica_reads = ContextVar('replica_reads', default=False)
+_wrote_primary = ContextVar('wrote_primary', default=False)
+
+_health = {}
+_health_lock = threading.Lock()
+
+
+def replica_alias():
+    """Alias de la réplique, ou None si aucune réplique n'est configurée"""
+    alias = getattr(settings, 'REPLICA_DATABASE', None)
+    if alias and alias in settings.DATABASES:
+        return alias
+    return None
+
+
+def replica_lag(alias):
+    """
+    Retard de réplication en secondes (0 si la base n'est pas une réplique MySQL,
+    par exemple une copie SQLite locale), None si la réplication est arrêtée ou
+    si l'état ne peut pas être lu.
+    """
+    connection = connections[alias]
+    if connection.vendor != 'mysql':
+        return 0
+    with connection.cursor() as cursor:
+        for statement, column in (('SHOW REPLICA STATUS', 'Seconds_Behind_Source'),
+                                  ('SHOW SLAVE STATUS', 'Seconds_Behind_Master')):
+            try:
+                cursor.execute(statement)
+            except DatabaseError:
+                continue
+            row = cursor.fetchone()
+            if row is None:
+                return 0
+            status = dict(zip([col[0] for col in cursor.description], row))
+            return status.get(column)
+    return None
+
+
+def replica_is_healthy(alias):
+    """
+    Vérifie (au plus une fois toutes les REPLICA_LAG_CHECK_INTERVAL secondes par
+    processus) que la réplique répond et que son retard est acceptable.
+    """
+    now = time.monotonic()
+    checked_at, healthy = _health.get(alias, (None, False))
+    if checked_at is not None and now - checked_at < settings.REPLICA_LAG_CHECK_INTERVAL:
+        return healthy
+
+    with _health_lock:
+        checked_at, healthy = _health.get(alias, (None, False))
+        if checked_at is None or now - checked_at >= settings.REPLICA_LAG_CHECK_INTERVAL:
+            try:
+                lag = replica_lag(alias)
+            except DatabaseError:
+                lag = None
+            healthy = lag is not None and lag <= settings.REPLICA_MAX_LAG
+            _health[alias] = (now, healthy)
+    return healthy
+
+
+@contextmanager
+def replica_reads():
+    """Contexte dans lequel les lectures peuvent être servies par la réplique"""
+    token = _replica_reads.set(True)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def is_pinned(request):
+    """L'utilisateur a écrit récemment: ses lectures restent sur la base principale"""
+    return settings.REPLICA_PIN_COOKIE in request.COOKIES
+
+
+def replica_read(view_func):
+    """
+    Marque une vue en lecture seule: ses requêtes GET/HEAD lisent la réplique,
+    sauf si l'utilisateur est épinglé sur la base principale.
+    """
+    @wraps(view_func)
+    def _wrapped_view(request, *args, **kwargs):
+        if request.method in ('GET', 'HEAD') and not is_pinned(request):
+            with replica_reads():
+                return view_func(request, *args, **kwargs)
+        return view_func(request, *args, **kwargs)
+
+    _wrapped_view.replica_read = True
+    return _wrapped_view
+
+
+def current_read_alias():
+    """
+    Alias de la réplique si les lectures courantes peuvent y être servies (contexte
+    replica_reads, pas d'écriture dans la requête, réplique saine), sinon None
+    """
+    alias = replica_alias()
+    if alias is None or not _replica_reads.get() or _wrote_primary.get():
+        return None
+    return alias if replica_is_healthy(alias) else None
+
+
+class ReplicaRouter:
+    """Routeur: lectures marquées vers la réplique, tout le reste vers la base principale"""
+
+    def db_for_read(self, model, **hints):
+        if replica_alias() is None:
+            return None
+        if model._meta.app_label == 'sessions':
+            return DEFAULT_DB_ALIAS
+        # Base principale explicite: sinon un objet lu sur la réplique y enverrait ses relations
+        return current_read_alias() or DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        if model._meta.app_label != 'sessions':
+            _wrote_primary.set(True)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, replica_alias()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # La réplique reçoit le schéma par réplication
+        if db == replica_alias() and db != DEFAULT_DB_ALIAS:
+            return False
+        return None
+
+
+class ReplicaPinningMiddleware:
+    """
+    Épingle le navigateur sur la base principale pendant REPLICA_PIN_SECONDS
+    après une requête qui a écrit en base (lecture de ses propres écritures).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = _wrote_primary.set(False)
+        try:
+            response = self.get_response(request)
+            if _wrote_primary.get() and replica_alias() is not None:
+                response.set_cookie(
+                    settings.REPLICA_PIN_COOKIE, '1',
+                    max_age=settings.REPLICA_PIN_SECONDS,
+                    httponly=True,
+                    samesite='Lax',
+                )
+        finally:
+            _wrote_primary.reset(token)
+        return response
+
+
+def archive_alias():
+    """Alias de la base d'archive, ou None si les archives restent dans la base principale"""
+    alias = getattr(settings, 'ARCHIVE_DATABASE', None)
+    if alias and alias in settings.DATABASES and alias != DEFAULT_DB_ALIAS:
+        return alias
+    return None
+
+
+class ArchiveRouter:
+    """Routeur: modèles d'archive vers la base d'archive, si elle est configurée"""
+
+    def _is_archive(self, model):
+        return getattr(model, 'archive_database', False)
+
+    def db_for_read(self, model, **hints):
+        if self._is_archive(model):
+            return archive_alias()
+        return None
+
+    def db_for_write(self, model, **hints):
+        if self._is_archive(model):
+            return archive_alias()
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if self._is_archive(obj1) and self._is_archive(obj2):
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        alias = archive_alias()
+        if alias is None or model_name is None:
+            return None
+        from django.apps import apps
+
+        model = apps.get_model(app_label, model_name)
+        if self._is_archive(model):
+            return db == alias
+        if db == alias:
+            return False
+        return None
@@ -0,0 +1,146 @@
+"""
+Pagination des grandes tables (journaux, historiques) sans COUNT(*) complet.
+
+- keyset_page(): pagination par clé sur (created_at, id) décroissants. Chaque
+  page est une lecture d'index bornée, quelle que soit sa position.
+- estimated_count(): nombre de lignes exact jusqu'à un plafond, au-delà
+  estimation des statistiques de la base (MySQL, PostgreSQL) pour une table
+  entière.
+- EstimatedCountPaginator: Paginator Django (admin) basé sur estimated_count().
+"""
+import base64
+import binascii
+
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+COUNT_CAP = 10000
+
+
+def table_row_estimate(model, using):
+    """Nombre de lignes estimé par les statistiques de la base, ou None"""
+    connection = connections[using]
+    table = model._meta.db_table
+    if connection.vendor == 'mysql':
+        sql = "SELECT TABLE_ROWS FROM information_schema.TABLES WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s"
+    elif connection.vendor == 'postgresql':
+        sql = "SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(%s)"
+    else:
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [table])
+        row = cursor.fetchone()
+    if row is None or row[0] is None or row[0] < 0:
+        return None
+    return int(row[0])
+
+
+def estimated_count(queryset, cap=COUNT_CAP):
+    """
+    Retourne (nombre, nature) avec nature 'exact', 'estimate' (statistiques de
+    la table, requête sans filtre) ou 'capped' (au moins cap lignes).
+    Au plus cap + 1 lignes sont comptées.
+    """
+    counted = queryset.order_by()[:cap + 1].count()
+    if counted <= cap:
+        return counted, 'exact'
+    if not queryset.query.has_filters():
+        estimate = table_row_estimate(queryset.model, queryset.db)
+        if estimate is not None:
+            return max(estimate, counted), 'estimate'
+    return cap, 'capped'
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator dont le total est estimé au-delà de COUNT_CAP lignes"""
+
+    @cached_property
+    def count(self):
+        return estimated_count(self.object_list)[0]
+
+
+def encode_cursor(created_at, pk):
+    raw = f"{created_at.isoformat()}|{pk}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """(created_at, pk) du curseur, ou None s'il est absent ou invalide"""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        value, pk = raw.rsplit('|', 1)
+        created_at = parse_datetime(value)
+        pk = int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    if created_at is None:
+        return None
+    return created_at, pk
+
+
+class KeysetPage:
+    """Page de résultats et curseurs des pages voisines"""
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    @property
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+def keyset_page(queryset, after=None, before=None, per_page=50, field='created_at'):
+    """
+    Page de queryset triée par (field, pk) décroissants. after: curseur de la
+    page suivante (lignes plus anciennes), before: curseur de la page
+    précédente (lignes plus récentes). Une seule requête de per_page + 1 lignes.
+    """
+    after, before = decode_cursor(after), decode_cursor(before)
+
+    if before is not None:
+        value, pk = before
+        rows = list(
+            queryset.filter(Q(**{f'{field}__gt': value}) | Q(**{field: value, 'pk__gt': pk}))
+            .order_by(field, 'pk')[:per_page + 1]
+        )
+        has_more = len(rows) > per_page
+        rows = rows[:per_page][::-1]
+        has_older = True
+    else:
+        if after is not None:
+            value, pk = after
+            queryset = queryset.filter(Q(**{f'{field}__lt': value}) | Q(**{field: value, 'pk__lt': pk}))
+        rows = list(queryset.order_by(f'-{field}', '-pk')[:per_page + 1])
+        has_older = len(rows) > per_page
+        rows = rows[:per_page]
+        has_more = after is not None
+
+    if not rows:
+        return KeysetPage(rows)
+    first, last = rows[0], rows[-1]
+    return KeysetPage(
+        rows,
+        next_cursor=encode_cursor(getattr(last, field), last.pk) if has_older else None,
+        previous_cursor=encode_cursor(getattr(first, field), first.pk) if has_more else None,
+    )
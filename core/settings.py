@@ -32,7 +32,9 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.staticfiles.StaticFilesMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'core.db_router.ReplicaPinningMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -81,6 +83,48 @@ DATABASES = {
     }
 }
 
+# Read replica (optional): DB_REPLICA_HOST for a MySQL replica, or DB_REPLICA_ENGINE +
+# DB_REPLICA_NAME for a local copy (e.g. two SQLite files). Read-only views marked
+# with @replica_read are served from it (see core/db_router.py).
+if os.environ.get('DB_REPLICA_HOST') or os.environ.get('DB_REPLICA_NAME'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'ENGINE': os.environ.get('DB_REPLICA_ENGINE', DATABASES['default']['ENGINE']),
+        'NAME': os.environ.get('DB_REPLICA_NAME', DATABASES['default']['NAME']),
+        'HOST': os.environ.get('DB_REPLICA_HOST', DATABASES['default']['HOST']),
+        'TEST': {'MIRROR': 'default'},
+    }
+    if DATABASES['replica']['ENGINE'] != DATABASES['default']['ENGINE']:
+        DATABASES['replica']['OPTIONS'] = {}
+
+# Archive database (optional): closed lots moved out of the working tables by
+# `manage.py archive_lots` (see operations/archive.py). Without DB_ARCHIVE_NAME the
+# archive tables live in the default database.
+if os.environ.get('DB_ARCHIVE_NAME'):
+    DATABASES['archive'] = {
+        **DATABASES['default'],
+        'ENGINE': os.environ.get('DB_ARCHIVE_ENGINE', DATABASES['default']['ENGINE']),
+        'NAME': os.environ['DB_ARCHIVE_NAME'],
+        'HOST': os.environ.get('DB_ARCHIVE_HOST', DATABASES['default']['HOST']),
+    }
+    if DATABASES['archive']['ENGINE'] != DATABASES['default']['ENGINE']:
+        DATABASES['archive']['OPTIONS'] = {}
+
+DATABASE_ROUTERS = ['core.db_router.ArchiveRouter', 'core.db_router.ReplicaRouter']
+REPLICA_DATABASE = 'replica'
+REPLICA_PIN_SECONDS = 5             # reads stay on the primary this long after a write
+REPLICA_PIN_COOKIE = 'db_pin'
+REPLICA_MAX_LAG = 10                # seconds; above this the primary is used
+REPLICA_LAG_CHECK_INTERVAL = 5      # seconds between two lag checks (per process)
+ARCHIVE_DATABASE = 'archive'
+ARCHIVE_AFTER_DAYS = 365            # closed lots untouched for this long are archived
+ARCHIVE_BATCH_SIZE = 200            # lots moved per transaction
+
+# User action log rotation (`manage.py rotate_action_logs`, see authentication/retention.py)
+ACTION_LOG_RETENTION_DAYS = 180     # older entries move to the monthly archive
+ACTION_LOG_ARCHIVE_MONTHS = 24      # archive months kept (0 = keep everything)
+ACTION_LOG_BATCH_SIZE = 5000        # rows moved per transaction
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -124,6 +168,18 @@ STATIC_URL = '/static/'
 STATICFILES_DIRS = [
     os.path.join(BASE_DIR, "static"),
 ]
+# Build: `manage.py collectstatic` copies the referenced theme files (see `manage.py prune_static`)
+# to STATIC_ROOT with content hashes and gzip/brotli copies; served by core.staticfiles.StaticFilesMiddleware
+STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
+STATICFILES_FINDERS = [
+    'core.staticfiles.PruningFileSystemFinder',
+    'django.contrib.staticfiles.finders.AppDirectoriesFinder',
+]
+STATIC_PRUNE = True
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'core.staticfiles.CompressedManifestStaticFilesStorage'},
+}
 
 # Define the base URL for accessing media files
 MEDIA_URL = '/media/'
@@ -133,6 +189,46 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 
 
+# Exchange rates files (CSV: currency,date,rate) loaded by `manage.py load_exchange_rates`
+EXCHANGE_RATES_DIR = os.path.join(BASE_DIR, 'data', 'exchange_rates')
+
+# Background jobs (seafood.jobs) executed by `manage.py runworkers`
+JOBS_WORKERS = int(os.environ.get('JOBS_WORKERS', 2))
+JOBS_POLL_INTERVAL = 2          # seconds between polls when the queue is empty
+JOBS_RETRY_BACKOFF = 30         # first retry delay in seconds, doubled on each attempt
+JOBS_RETRY_MAX_DELAY = 3600
+JOBS_STALE_TIMEOUT = 3600       # running jobs older than this are requeued, or failed once out of attempts
+JOBS_STALE_SWEEP_INTERVAL = 300 # seconds between stale-job sweeps in each worker
+
+# PDF documents (seafood.documents) cached on disk, rendered by the workers with WeasyPrint
+DOCUMENTS_CACHE_DIR = os.path.join(BASE_DIR, 'data', 'documents')
+DOCUMENTS_TEMPLATE_VERSION = 1  # bump when templates/documents/ change to re-render drafts
+DOCUMENTS_RENDER_INLINE = False # render in the request instead of the worker pool
+
+# Files uploaded to the prospect import (seafood.prospect_import), kept until the import job runs, and the
+# rejected-row reports downloaded from the import page. They hold personal data: files older than
+# IMPORT_REPORTS_MAX_AGE_DAYS are deleted on the next import.
+IMPORT_REPORTS_DIR = os.path.join(BASE_DIR, 'data', 'imports')
+IMPORT_REPORTS_MAX_AGE_DAYS = 7
+
+# Worker warm-up (core.warmup): URLs, templates, deferred view imports and reference caches
+# loaded when a WSGI worker starts. `manage.py warmup --benchmark` appends the cold
+# and warm first-request latencies of WARMUP_BENCHMARK_URLS to WARMUP_BENCHMARK_FILE.
+WARMUP_ON_START = os.environ.get('WARMUP_ON_START', '0') == '1'
+WARMUP_BENCHMARK_URLS = [
+    'portal_admin:index',
+    'portal_admin:arrivalnote_list',
+    'portal_admin:classification_list',
+    'portal_admin:packaging_list',
+    'portal_admin:purchaseorder_list',
+    'portal_admin:client_list',
+]
+WARMUP_BENCHMARK_FILE = os.path.join(BASE_DIR, 'data', 'benchmarks', 'warmup.jsonl')
+
+# Conditional list/detail pages (core.conditional): part of every page ETag, set it to the
+# release identifier so that a deploy with changed templates invalidates the browser copies
+PAGE_ETAG_RELEASE = os.environ.get('RELEASE_ID', '')
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -155,3 +251,4 @@ MESSAGE_TAGS = {
     messages.WARNING: 'warning',
     messages.ERROR: 'danger',
 }
+
@@ -0,0 +1,23 @@
+"""
+Settings for the test suite:
+
+    python manage.py test --settings=core.settings_test
+    DJANGO_SETTINGS_MODULE=core.settings_test python -m pytest
+"""
+from .settings import *  # noqa: F401,F403
+from .settings import STORAGES
+
+# In-memory SQLite; the authentication and seafood migrations run as usual.
+# The early operations migrations were written against MySQL and do not apply on
+# SQLite, so that app's schema is created directly from its models.
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': ':memory:',
+    }
+}
+MIGRATION_MODULES = {'operations': None}
+
+# Unhashed static files (no collectstatic manifest needed) and a fast password hasher
+STORAGES = {**STORAGES, 'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'}}
+PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
@@ -0,0 +1,255 @@
+"""
+Fichiers statiques: empreintes, précompression, élagage et service.
+
+La construction est un collectstatic (dans STATIC_ROOT):
+
+- PruningFileSystemFinder ne collecte pas les fichiers du thème que rien ne
+  référence (dossiers de vendors/, images, vidéos et données de assets/ hors
+  CSS et JS). Les références sont lues dans les gabarits et le code des
+  applications ({% static %}, chemins "assets/..." ou "vendors/..." et
+  "/static/..."), puis, de proche en proche, dans les CSS, JS et JSON
+  conservés (url(...) et chemins relatifs). Un chemin terminé par "/" conserve
+  tout le dossier. La commande prune_static détaille ce qui est écarté;
+- CompressedManifestStaticFilesStorage ajoute l'empreinte du contenu aux noms
+  (ManifestStaticFilesStorage) et écrit à côté de chaque fichier texte une
+  version gzip et, si le module brotli est installé, brotli.
+
+Hors DEBUG, StaticFilesMiddleware sert STATIC_URL depuis STATIC_ROOT sans
+passer par les vues: version précompressée selon Accept-Encoding, cache
+"immutable" d'un an pour les noms à empreinte, ETag et 304 pour les autres.
+En DEBUG, les sources sont servies par la vue static() (core.urls).
+"""
+import gzip
+import mimetypes
+import os
+import posixpath
+import re
+
+from django.conf import settings
+from django.contrib.staticfiles.finders import FileSystemFinder
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import FileResponse, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.http import http_date
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Dossiers du thème élagués: un dossier de vendors/ est gardé en entier s'il est référencé
+PRUNED_PREFIXES = ('vendors/', 'assets/img/', 'assets/video/', 'assets/data/')
+SCANNED_EXTENSIONS = ('.css', '.js', '.json', '.svg', '.html')
+COMPRESSED_EXTENSIONS = ('.css', '.js', '.json', '.svg', '.html', '.txt', '.xml', '.map', '.ttf', '.eot', '.ico')
+COMPRESS_MIN_SIZE = 1024
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+MAX_AGE = 60 * 60
+
+STATIC_TAG_RE = re.compile(r"""{%\s*static\s+['"]([^'"]+)['"]""")
+PATH_RE = re.compile(r"""(?:/static/)?((?:assets|vendors)/[\w./@-]*)""")
+CSS_URL_RE = re.compile(r"""url\(\s*['"]?([^'")]+?)['"]?\s*\)""")
+RELATIVE_RE = re.compile(r"""['"(]((?:\.\.?/)+[\w./@-]+\.\w+)""")
+HASHED_RE = re.compile(r"\.[0-9a-f]{12}\.")
+
+
+def _read(path):
+    try:
+        with open(path, encoding='utf-8', errors='ignore') as f:
+            return f.read()
+    except OSError:
+        return ''
+
+
+def _source_files():
+    """Gabarits et code Python des applications du projet (hors tests)"""
+    from django.apps import apps
+
+    directories = [str(directory) for engine in settings.TEMPLATES for directory in engine.get('DIRS', [])]
+    directories += [config.path for config in apps.get_app_configs() if config.path.startswith(str(settings.BASE_DIR))]
+    for directory in dict.fromkeys(directories):
+        for root, dirs, files in os.walk(directory):
+            dirs[:] = [d for d in dirs if d not in ('migrations', '__pycache__', 'static', 'tests')]
+            for filename in files:
+                if filename.endswith(('.html', '.txt', '.py')) and filename != 'tests.py':
+                    yield os.path.join(root, filename)
+
+
+def _references(text, base=''):
+    """Chemins statiques cités dans un texte (les chemins relatifs sont résolus depuis base)"""
+    found = set(STATIC_TAG_RE.findall(text)) | set(PATH_RE.findall(text))
+    if base is not None:
+        for raw in CSS_URL_RE.findall(text) + RELATIVE_RE.findall(text):
+            if raw.startswith(('data:', 'http:', 'https:', '//', '#')):
+                continue
+            path = raw.split('?')[0].split('#')[0]
+            if path.startswith('/static/'):
+                found.add(path[len('/static/'):])
+            elif not path.startswith('/'):
+                found.add(posixpath.normpath(posixpath.join(base, path)))
+    return {path.lstrip('/') for path in found if path and not path.startswith('..')}
+
+
+def prunable(path):
+    return path.startswith(PRUNED_PREFIXES)
+
+
+def _vendor_dir(path):
+    parts = path.split('/')
+    return '/'.join(parts[:2]) + '/' if parts[0] == 'vendors' and len(parts) > 2 else None
+
+
+def kept_paths(files):
+    """
+    Chemins conservés parmi files ({chemin relatif: chemin absolu}): tout ce qui
+    n'est pas élagable, plus les fichiers élagables référencés, de proche en proche
+    """
+    references = set()
+    for source in _source_files():
+        references |= _references(_read(source), base=None)
+
+    kept_vendors = set()
+    kept = {path for path in files if not prunable(path)}
+    pending = list(kept)
+    while True:
+        for path in pending:
+            if path.endswith(SCANNED_EXTENSIONS):
+                references |= _references(_read(files[path]), base=posixpath.dirname(path))
+        # Dossiers cités ("assets/img/country/"), plus précis que les dossiers élagués eux-mêmes
+        prefixes = tuple(
+            path for path in references if path.endswith('/') and prunable(path) and path not in PRUNED_PREFIXES
+        )
+        kept_vendors |= {_vendor_dir(path) for path in references if _vendor_dir(path)}
+        kept_vendors |= {prefix for prefix in prefixes if prefix.count('/') == 2 and prefix.startswith('vendors/')}
+        new = {
+            path for path in files if path not in kept and (
+                path in references or _vendor_dir(path) in kept_vendors or (prefixes and path.startswith(prefixes))
+            )
+        }
+        if not new:
+            return kept
+        kept |= new
+        pending = list(new)
+
+
+class PruningFileSystemFinder(FileSystemFinder):
+    """
+    FileSystemFinder dont list() (collectstatic) écarte les fichiers élagables non
+    référencés si STATIC_PRUNE; find() (serveur de développement, findstatic) trouve tout
+    """
+
+    def list(self, ignore_patterns):
+        found = list(super().list(ignore_patterns))
+        if not getattr(settings, 'STATIC_PRUNE', False):
+            yield from found
+            return
+        files = {path.replace(os.sep, '/'): storage.path(path) for path, storage in found}
+        kept = kept_paths(files)
+        for path, storage in found:
+            if path.replace(os.sep, '/') in kept:
+                yield path, storage
+
+
+def compress_file(path):
+    """Écrit path.gz (et path.br si brotli est installé) à côté du fichier; retourne les chemins écrits"""
+    with open(path, 'rb') as f:
+        content = f.read()
+    written = []
+    if len(content) < COMPRESS_MIN_SIZE:
+        return written
+    compressed = gzip.compress(content, compresslevel=9, mtime=0)
+    if len(compressed) < len(content):
+        with open(path + '.gz', 'wb') as f:
+            f.write(compressed)
+        written.append(path + '.gz')
+    if brotli is not None:
+        compressed = brotli.compress(content, quality=11)
+        if len(compressed) < len(content):
+            with open(path + '.br', 'wb') as f:
+                f.write(compressed)
+            written.append(path + '.br')
+    return written
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Noms à empreinte (manifeste) et versions gzip/brotli des fichiers texte"""
+
+    # Un chemin absent du manifeste est servi sous son nom d'origine au lieu de faire échouer la page
+    manifest_strict = False
+
+    def hashed_name(self, name, content=None, filename=None):
+        try:
+            return super().hashed_name(name, content, filename)
+        except ValueError:
+            if content is not None:
+                raise
+            # Référence d'une feuille du thème vers un fichier absent (url("generic/59.png") de
+            # theme.css): laissée telle quelle au lieu d'interrompre la construction
+            return name
+
+    def post_process(self, paths, dry_run=False, **options):
+        processed = {}
+        for name, hashed_name, done in super().post_process(paths, dry_run, **options):
+            processed[hashed_name] = name
+            yield name, hashed_name, done
+        if dry_run:
+            return
+        for hashed_name, name in processed.items():
+            if isinstance(hashed_name, str) and hashed_name.endswith(COMPRESSED_EXTENSIONS):
+                for compressed in compress_file(self.path(hashed_name)):
+                    yield name, os.path.relpath(compressed, self.location), True
+
+
+class StaticFilesMiddleware:
+    """Sert les fichiers de STATIC_ROOT (versions précompressées, en-têtes de cache)"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.root = settings.STATIC_ROOT
+        self.prefix = settings.STATIC_URL if settings.STATIC_URL.startswith('/') else '/' + settings.STATIC_URL
+        # En développement (DEBUG), les sources sont servies par la vue static() (core.urls)
+        if not self.root or settings.DEBUG:
+            raise MiddlewareNotUsed
+
+    def __call__(self, request):
+        if request.method in ('GET', 'HEAD') and request.path_info.startswith(self.prefix):
+            response = self.serve(request, request.path_info[len(self.prefix):])
+            if response is not None:
+                return response
+        return self.get_response(request)
+
+    def serve(self, request, name):
+        try:
+            path = safe_join(self.root, name)
+        except Exception:
+            return None
+        if not os.path.isfile(path):
+            return None
+
+        stat = os.stat(path)
+        etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+        immutable = bool(HASHED_RE.search(posixpath.basename(name)))
+        if not immutable and request.headers.get('If-None-Match') == etag:
+            response = HttpResponseNotModified()
+            response['ETag'] = etag
+            return response
+
+        content_type = mimetypes.guess_type(path)[0]
+        served, content_encoding = path, None
+        accepted = request.headers.get('Accept-Encoding', '')
+        for candidate, token in (('.br', 'br'), ('.gz', 'gzip')):
+            if token in accepted and os.path.isfile(path + candidate):
+                served, content_encoding = path + candidate, token
+                break
+
+        response = FileResponse(open(served, 'rb'), content_type=content_type or 'application/octet-stream')
+        if content_encoding:
+            response['Content-Encoding'] = content_encoding
+        response['Vary'] = 'Accept-Encoding'
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(stat.st_mtime)
+        if immutable:
+            response['Cache-Control'] = f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+        else:
+            response['Cache-Control'] = f'public, max-age={MAX_AGE}'
+        return response
@@ -0,0 +1,324 @@
+"""
+Outils de test partagés: fabriques de données et vérification du nombre de
+requêtes SQL des vues du portail.
+"""
+import re
+from collections import Counter
+from datetime import date, timedelta
+from decimal import Decimal
+from itertools import count
+
+from django.contrib.auth.models import Permission
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+_sequence = count(1)
+
+
+def next_id():
+    return next(_sequence)
+
+
+# ============ FABRIQUES ============
+
+def make_role(name=None, permissions=None):
+    from authentication.models import Role
+
+    role = Role.objects.create(name=name or f"Rôle {next_id()}")
+    role.permissions.set(permissions if permissions is not None else Permission.objects.all())
+    return role
+
+
+def make_user(role=None, **kwargs):
+    from authentication.models import User
+
+    n = next_id()
+    kwargs.setdefault('username', f"user{n}")
+    kwargs.setdefault('email', f"user{n}@example.com")
+    kwargs.setdefault('is_staff', True)
+    return User.objects.create_user(password='password', role=role, **kwargs)
+
+
+def fixture_user():
+    """Auteur des données de test (premier utilisateur existant)"""
+    from authentication.models import User
+
+    return User.objects.order_by('pk').first() or make_user()
+
+
+def make_client(**kwargs):
+    from seafood.models import Client
+
+    kwargs.setdefault('name', f"Client {next_id()}")
+    return Client.objects.create(**kwargs)
+
+
+def make_supplier(**kwargs):
+    from seafood.models import Supplier
+
+    kwargs.setdefault('name', f"Fournisseur {next_id()}")
+    return Supplier.objects.create(**kwargs)
+
+
+def make_cashbox(**kwargs):
+    from seafood.models import Cashbox
+
+    n = next_id()
+    kwargs.setdefault('folder_code', f"Caisse {n}")
+    kwargs.setdefault('prefix', f"C{n}"[:6])
+    kwargs.setdefault('current_balance', Decimal('1000000.00'))
+    return Cashbox.objects.create(**kwargs)
+
+
+def make_cashbox_transaction(cashbox, **kwargs):
+    from seafood.models import CashboxTransaction
+
+    kwargs.setdefault('transaction_type', 'in')
+    kwargs.setdefault('source', 'cash')
+    kwargs.setdefault('amount', Decimal('100.00'))
+    kwargs.setdefault('transaction_date', date.today())
+    return CashboxTransaction.objects.create(cashbox=cashbox, **kwargs)
+
+
+def make_bankaccount(**kwargs):
+    from seafood.models import BankAccount
+
+    n = next_id()
+    kwargs.setdefault('bank_name', f"Banque {n}")
+    kwargs.setdefault('account_number', f"{n:010d}")
+    kwargs.setdefault('account_holder', 'Seafood')
+    kwargs.setdefault('current_balance', Decimal('1000000.00'))
+    kwargs.setdefault('account_opening_date', date(2024, 1, 1))
+    return BankAccount.objects.create(**kwargs)
+
+
+def make_purchaserequest(items=1, **kwargs):
+    from seafood.models import PurchaseRequest
+
+    kwargs.setdefault('pr_date', date.today())
+    kwargs.setdefault('requester_first_name', 'Amadou')
+    kwargs.setdefault('requester_last_name', 'Ba')
+    kwargs.setdefault('position', 'Magasinier')
+    kwargs.setdefault('requester_phone', '+22212345678')
+    kwargs.setdefault('deadline', date.today() + timedelta(days=7))
+    purchase_request = PurchaseRequest.objects.create(**kwargs)
+    add_purchaserequest_items(purchase_request, items)
+    return purchase_request
+
+
+def add_purchaserequest_items(purchase_request, n):
+    from seafood.models import PurchaseRequestItem
+
+    PurchaseRequestItem.objects.bulk_create([
+        PurchaseRequestItem(purchase_request=purchase_request, designation=f"Article {next_id()}", quantity=Decimal('2'))
+        for i in range(n)
+    ])
+
+
+def make_purchaseorder(supplier=None, items=1, **kwargs):
+    from seafood.models import PurchaseOrder
+
+    kwargs.setdefault('po_date', date.today())
+    purchase_order = PurchaseOrder.objects.create(supplier=supplier or make_supplier(), **kwargs)
+    add_purchaseorder_items(purchase_order, items)
+    return purchase_order
+
+
+def add_purchaseorder_items(purchase_order, n):
+    from seafood.models import PurchaseOrderItem
+
+    PurchaseOrderItem.objects.bulk_create([
+        PurchaseOrderItem(
+            purchase_order=purchase_order,
+            designation=f"Article {next_id()}",
+            quantity=Decimal('2'),
+            unit_price=Decimal('50.00'),
+        )
+        for i in range(n)
+    ])
+    purchase_order.calculate_totals()
+
+
+def make_prospect(**kwargs):
+    from seafood.models import Prospect
+
+    n = next_id()
+    kwargs.setdefault('first_name', f"Prénom {n}")
+    kwargs.setdefault('last_name', 'Nom')
+    kwargs.setdefault('email', f"prospect{n}@example.com")
+    kwargs.setdefault('mobile', '+22212345678')
+    kwargs.setdefault('position', 'Directeur')
+    kwargs.setdefault('company_name', f"Entreprise {n}")
+    kwargs.setdefault('next_followup', timezone.localdate())
+    return Prospect.objects.create(**kwargs)
+
+
+def make_servicecategory(**kwargs):
+    from operations.models import ServiceCategory
+
+    kwargs.setdefault('name', f"Catégorie {next_id()}")
+    return ServiceCategory.objects.create(**kwargs)
+
+
+def make_subcategory(category=None, **kwargs):
+    from operations.models import ServiceSubCategory
+
+    kwargs.setdefault('name', f"Espèce {next_id()}")
+    kwargs.setdefault('price', Decimal('10.00'))
+    kwargs.setdefault('weight', Decimal('20.00'))
+    return ServiceSubCategory.objects.create(category=category or make_servicecategory(), **kwargs)
+
+
+def make_service(category=None, **kwargs):
+    from operations.models import Service
+
+    kwargs.setdefault('code', str(2000 + next_id()))
+    kwargs.setdefault('name', f"Service {kwargs['code']}")
+    kwargs.setdefault('amount', Decimal('500.00'))
+    kwargs.setdefault('created_by', fixture_user())
+    return Service.objects.create(category=category or make_servicecategory(), **kwargs)
+
+
+def make_reception(client=None, service=None, **kwargs):
+    from operations.models import Reception
+
+    kwargs.setdefault('reception_date', timezone.now())
+    kwargs.setdefault('weight', Decimal('1000.00'))
+    kwargs.setdefault('created_by', fixture_user())
+    kwargs.setdefault('status', 'accepted')
+    return Reception.objects.create(
+        client=client or make_client(),
+        service_type=service or make_service(),
+        **kwargs
+    )
+
+
+def make_report(reception=None, items=1, **kwargs):
+    from operations.models import Report
+
+    kwargs.setdefault('created_by', fixture_user())
+    kwargs.setdefault('report_date', timezone.now())
+    kwargs.setdefault('status', 'validated')
+    report = Report.objects.create(arrival_note=reception or make_reception(), **kwargs)
+    add_report_items(report, items)
+    return report
+
+
+def add_report_items(report, n):
+    from operations.models import ReportItem
+
+    ReportItem.objects.bulk_create([
+        ReportItem(report=report, species='sardine', weight=Decimal('10.00'))
+        for i in range(n)
+    ])
+
+
+def make_classification(reception=None, items=1, **kwargs):
+    from operations.models import Classification
+
+    kwargs.setdefault('created_by', fixture_user())
+    kwargs.setdefault('pointer_full_name', 'Pointeur')
+    kwargs.setdefault('start_datetime', timezone.now())
+    kwargs.setdefault('status', 'completed')
+    if reception is None:
+        reception = make_report().arrival_note
+    classification = Classification.objects.create(reception=reception, **kwargs)
+    add_classification_items(classification, items)
+    return classification
+
+
+def add_classification_items(classification, n, category=None):
+    from operations.models import ClassificationItem
+
+    ClassificationItem.objects.bulk_create([
+        ClassificationItem(
+            classification=classification,
+            species=make_subcategory(category),
+            plate_count=5,
+            weight=Decimal('25.00'),
+        )
+        for i in range(n)
+    ])
+
+
+def make_packaging(classification=None, items=1, **kwargs):
+    from operations.models import Packaging
+
+    kwargs.setdefault('created_by', fixture_user())
+    kwargs.setdefault('start_datetime', timezone.now())
+    kwargs.setdefault('status', 'completed')
+    packaging = Packaging.objects.create(classification=classification or make_classification(), **kwargs)
+    add_packaging_items(packaging, items)
+    return packaging
+
+
+def add_packaging_items(packaging, n, category=None):
+    from operations.models import PackagingItem
+
+    PackagingItem.objects.bulk_create([
+        PackagingItem(packaging=packaging, species=make_subcategory(category), carton_count=3)
+        for i in range(n)
+    ])
+
+
+# ============ NOMBRE DE REQUÊTES ============
+
+_literal_re = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_in_list_re = re.compile(r"IN \((?:\?(?:, )?)+\)")
+
+
+def sql_fingerprint(sql):
+    """Normalise une requête SQL (littéraux et listes IN remplacés) pour la regrouper"""
+    fingerprint = _literal_re.sub('?', sql)
+    fingerprint = _in_list_re.sub('IN (...)', fingerprint)
+    return fingerprint
+
+
+class QueryCountTestCase(TestCase):
+    """
+    Vérifie qu'une vue exécute un nombre de requêtes indépendant du volume de
+    données: la page est chargée après un jeu de N lignes puis de 10N lignes, le
+    nombre de requêtes doit être identique et rester sous un plafond.
+    """
+    scale = 3
+    max_queries = 20
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.role = make_role('Administrateur')
+        cls.user = make_user(role=cls.role)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def capture(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, f"GET {url} -> {response.status_code}")
+        return [query['sql'] for query in context.captured_queries]
+
+    def assertConstantQueries(self, url, seed, max_queries=None):
+        """
+        seed(n) ajoute n lignes au jeu de données; url est une chaîne ou une
+        fonction appelée après le premier seed.
+        """
+        max_queries = max_queries or self.max_queries
+        seed(self.scale)
+        target = url() if callable(url) else url
+        small = self.capture(target)
+        seed(self.scale * 9)
+        large = self.capture(target)
+
+        if len(large) != len(small):
+            growth = Counter(map(sql_fingerprint, large)) - Counter(map(sql_fingerprint, small))
+            details = '\n'.join(f"  +{n} x {fingerprint}" for fingerprint, n in growth.most_common())
+            self.fail(
+                f"GET {target}: {len(small)} requêtes pour N={self.scale}, "
+                f"{len(large)} pour 10N. Requêtes en plus:\n{details}"
+            )
+        if len(large) > max_queries:
+            counts = Counter(map(sql_fingerprint, large))
+            details = '\n'.join(f"  {n} x {fingerprint}" for fingerprint, n in counts.most_common())
+            self.fail(f"GET {target}: {len(large)} requêtes (plafond {max_queries}):\n{details}")
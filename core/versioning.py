@@ -0,0 +1,84 @@
+"""
+Contrôle de concurrence optimiste des documents modifiables.
+
+Les modèles VersionedModel portent une colonne version. Chaque mise à jour
+par save() est un UPDATE conditionnel:
+
+    UPDATE ... SET ..., version = n + 1 WHERE id = ... AND version = n
+
+Si la ligne a été modifiée entre-temps (version différente), aucune ligne
+n'est mise à jour et ConcurrentEditError est levée: aucun verrou n'est tenu
+pendant la saisie et aucune lecture supplémentaire n'est faite. Dans une
+transaction, l'écriture est isolée par un point de sauvegarde: le conflit peut
+être intercepté sans invalider la transaction.
+
+Les formulaires de modification renvoient la version affichée dans un champ
+caché <input type="hidden" name="version">; la vue l'applique à l'objet avec
+apply_posted_version() avant de le sauvegarder:
+
+    apply_posted_version(client, request.POST)
+    client.save(update_fields=[...])
+"""
+from django.db import connections, models, router, transaction
+
+
+class ConcurrentEditError(Exception):
+    """Le document a été modifié (ou supprimé) depuis son chargement"""
+
+    def __init__(self, obj):
+        self.obj = obj
+        super().__init__(
+            f"{obj._meta.verbose_name.capitalize()} : le document a été modifié par un autre utilisateur "
+            "depuis son ouverture. Rechargez la page pour reprendre la dernière version."
+        )
+
+
+class VersionedModel(models.Model):
+    """Modèle abstrait: mises à jour conditionnées par le numéro de version"""
+
+    version = models.PositiveIntegerField(default=1, editable=False, verbose_name='Version')
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        if self._state.adding:
+            return super().save(*args, **kwargs)
+
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            update_fields = set(update_fields) | {'version'}
+            # Comme un save() complet, une écriture ciblée met à jour la date de modification
+            update_fields |= {f.name for f in self._meta.concrete_fields if getattr(f, 'auto_now', False)}
+            kwargs['update_fields'] = update_fields
+
+        self._expected_version = self.version
+        self.version = self._expected_version + 1
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        try:
+            if connections[using].in_atomic_block:
+                # Un conflit n'interrompt que ce point de sauvegarde, pas la transaction de l'appelant
+                with transaction.atomic(using=using):
+                    return super().save(*args, **kwargs)
+            return super().save(*args, **kwargs)
+        except BaseException:
+            self.version = self._expected_version
+            raise
+        finally:
+            del self._expected_version
+
+    def _do_update(self, base_qs, using, pk_val, values, update_fields, forced_update):
+        expected = getattr(self, '_expected_version', None)
+        if expected is None:
+            return super()._do_update(base_qs, using, pk_val, values, update_fields, forced_update)
+        if not super()._do_update(base_qs.filter(version=expected), using, pk_val, values, update_fields, True):
+            raise ConcurrentEditError(self)
+        return True
+
+
+def apply_posted_version(obj, data):
+    """Reprend la version renvoyée par le formulaire (champ caché version), si elle est valide"""
+    posted = data.get('version', '')
+    if isinstance(posted, str) and posted.isdigit():
+        obj.version = int(posted)
+    return obj
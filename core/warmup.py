@@ -0,0 +1,239 @@
+"""
+Préchauffage des processus web (workers WSGI).
+
+Sans préchauffage, les premières requêtes de chaque processus paient la
+construction des URL du portail, la compilation des gabarits, les imports
+différés des vues et le chargement des caches de référence. warm_up() fait ce
+travail d'avance, étape par étape:
+
+- urls: résolveur et expressions régulières de toutes les routes, registre
+  des permissions des routes (authentication.permissions);
+- imports: modules importés dans le corps des fonctions des modules de vues;
+- templates: compilation de tous les gabarits dans le chargeur en cache;
+- contenttypes: cache des ContentType de tous les modèles, workflows déclarés;
+- reference: premières pages des sources d'autocomplete en cache, taux de
+  change du jour.
+
+Chaque étape est isolée: une erreur (base indisponible, gabarit invalide) est
+rapportée sans interrompre les suivantes. Le préchauffage est lancé au
+démarrage des workers si WARMUP_ON_START est actif (core.wsgi), ou
+par la commande warmup, dont l'option --benchmark mesure la latence des
+premières requêtes d'un processus neuf, avec et sans préchauffage.
+"""
+import ast
+import importlib
+import inspect
+import logging
+import os
+import time
+
+from django.apps import apps
+from django.template import engines
+from django.template.backends.django import DjangoTemplates
+from django.template.utils import get_app_template_dirs
+from django.urls import URLPattern, URLResolver, get_resolver
+
+logger = logging.getLogger(__name__)
+
+
+class StepResult:
+    """Résultat d'une étape: nombre d'éléments préchauffés, durée et erreurs"""
+
+    def __init__(self, name):
+        self.name = name
+        self.count = 0
+        self.seconds = 0.0
+        self.errors = []
+
+    def as_dict(self):
+        return {'name': self.name, 'count': self.count, 'seconds': round(self.seconds, 4), 'errors': self.errors}
+
+
+def _walk_patterns(patterns):
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            yield pattern
+            yield from _walk_patterns(pattern.url_patterns)
+        elif isinstance(pattern, URLPattern):
+            yield pattern
+
+
+def warm_urls(result):
+    """Construit le résolveur et compile les expressions de toutes les routes"""
+    from authentication.permissions import get_route_registry
+
+    resolver = get_resolver()
+    for pattern in _walk_patterns(resolver.url_patterns):
+        pattern.pattern.regex  # compilée à la première lecture
+        result.count += 1
+    resolver.reverse_dict  # tables de reverse() de chaque espace de noms
+    for namespace, (prefix, sub_resolver) in resolver.namespace_dict.items():
+        sub_resolver.reverse_dict
+    get_route_registry()
+
+
+def _view_modules():
+    modules = {}
+    for pattern in _walk_patterns(get_resolver().url_patterns):
+        if isinstance(pattern, URLPattern):
+            module = inspect.getmodule(inspect.unwrap(pattern.callback))
+            if module is not None and module.__name__.split('.')[0] in _project_apps():
+                modules[module.__name__] = module
+    return list(modules.values())
+
+
+def _project_apps():
+    return {config.name for config in apps.get_app_configs() if not config.name.startswith('django.')}
+
+
+def deferred_imports(module):
+    """Modules importés dans le corps des fonctions d'un module (imports différés)"""
+    with open(module.__file__, encoding='utf-8') as f:
+        tree = ast.parse(f.read())
+    package = module.__name__.rpartition('.')[0]
+    names = set()
+    for function in ast.walk(tree):
+        if not isinstance(function, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            continue
+        for node in ast.walk(function):
+            if isinstance(node, ast.Import):
+                names.update(alias.name for alias in node.names)
+            elif isinstance(node, ast.ImportFrom):
+                base = node.module or ''
+                if node.level:
+                    parent = package.rsplit('.', node.level - 1)[0] if node.level > 1 else package
+                    base = f"{parent}.{base}" if base else parent
+                names.add(base)
+                # from package import module
+                names.update(f"{base}.{alias.name}" for alias in node.names)
+    return names
+
+
+def warm_imports(result):
+    """Importe les modules des imports différés des vues"""
+    for module in _view_modules():
+        for name in sorted(deferred_imports(module)):
+            try:
+                importlib.import_module(name)
+                result.count += 1
+            except ImportError:
+                # from module import fonction: seul le module est importable
+                continue
+
+
+def template_names(engine):
+    """Noms de tous les gabarits des répertoires du moteur et des applications"""
+    directories = list(engine.dirs)
+    if engine.app_dirs:
+        directories += list(get_app_template_dirs('templates'))
+    names = []
+    for directory in directories:
+        for root, dirs, files in os.walk(directory):
+            for filename in files:
+                if filename.endswith(('.html', '.txt', '.xml')):
+                    names.append(os.path.relpath(os.path.join(root, filename), directory).replace(os.sep, '/'))
+    return sorted(set(names))
+
+
+def warm_templates(result):
+    """Compile tous les gabarits dans le chargeur en cache de chaque moteur Django"""
+    for backend in engines.all():
+        if not isinstance(backend, DjangoTemplates):
+            continue
+        for name in template_names(backend.engine):
+            try:
+                backend.engine.get_template(name)
+                result.count += 1
+            except Exception as e:
+                result.errors.append(f"{name}: {e}")
+
+
+def warm_contenttypes(result):
+    """Cache des ContentType de tous les modèles et workflows déclarés"""
+    from django.contrib.contenttypes.models import ContentType
+
+    from core.workflow import get_workflows
+
+    result.count += len(ContentType.objects.get_for_models(*apps.get_models()))
+    result.count += len(get_workflows())
+
+
+def warm_reference(result):
+    """Premières pages des sources d'autocomplete en cache et taux de change du jour"""
+    from seafood import autocomplete
+    from seafood.currency import _rates_version, get_rate
+    from seafood.models import ExchangeRate
+
+    for source in autocomplete._sources.values():
+        if source.cached:
+            source.page('')
+            result.count += 1
+    version = _rates_version()
+    for currency in ExchangeRate.objects.order_by().values_list('currency', flat=True).distinct():
+        get_rate(currency, version=version)
+        result.count += 1
+
+
+STEPS = [
+    ('urls', warm_urls),
+    ('imports', warm_imports),
+    ('templates', warm_templates),
+    ('contenttypes', warm_contenttypes),
+    ('reference', warm_reference),
+]
+
+
+def warm_up(steps=None):
+    """Lance les étapes de préchauffage (toutes par défaut); retourne la liste des StepResult"""
+    results = []
+    for name, function in STEPS:
+        if steps is not None and name not in steps:
+            continue
+        result = StepResult(name)
+        started = time.perf_counter()
+        try:
+            function(result)
+        except Exception as e:
+            logger.exception("Préchauffage: échec de l'étape %s", name)
+            result.errors.append(str(e))
+        result.seconds = time.perf_counter() - started
+        results.append(result)
+    return results
+
+
+def warm_up_on_start():
+    """Hook du point d'entrée WSGI: préchauffe le processus si WARMUP_ON_START"""
+    from django.conf import settings
+    from django.db import connections
+
+    if not settings.WARMUP_ON_START:
+        return []
+    results = warm_up()
+    for result in results:
+        logger.info("Préchauffage %s: %s élément(s) en %.3f s", result.name, result.count, result.seconds)
+        for error in result.errors:
+            logger.warning("Préchauffage %s: %s", result.name, error)
+    # Connexions fermées: un serveur qui charge l'application avant de forker ses workers
+    # (gunicorn --preload) ne les partage pas entre processus
+    connections.close_all()
+    return results
+
+
+def first_request_timings(paths, user=None):
+    """
+    Durée (ms) de la première requête GET de chaque chemin dans ce processus,
+    avec l'utilisateur donné connecté. Retourne {chemin: (statut, ms)}.
+    """
+    from django.conf import settings
+    from django.test import Client, override_settings
+
+    client = Client()
+    if user is not None:
+        client.force_login(user)
+    timings = {}
+    with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+        for path in paths:
+            started = time.perf_counter()
+            response = client.get(path)
+            timings[path] = (response.status_code, round((time.perf_counter() - started) * 1000, 2))
+    return timings
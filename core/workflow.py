@@ -0,0 +1,271 @@
+"""
+Machines à états déclaratives des statuts.
+
+Chaque application déclare dans son module workflows.py les transitions de ses
+modèles (statuts d'origine, statut cible, champs requis, garde):
+
+    from core.workflow import Requirement, Transition, Workflow, register
+
+    register(Workflow(Packaging, [
+        Transition('draft', 'completed', requires=[Requirement('end_datetime', 'La date et heure de fin')],
+                   guard=all_species_packaged),
+        Transition('draft', 'cancelled'),
+    ]))
+
+Une transition n'est jamais appliquée par save(): les objets sont verrouillés,
+les règles vérifiées de façon ensembliste (statuts d'origine, champs requis,
+garde évaluée sur le queryset des objets) puis le statut est écrit par un
+UPDATE conditionnel sur le statut d'origine. bulk_transition() applique une
+transition à un ensemble d'objets en une transaction (un UPDATE par transition
+et par tranche de BULK_CHUNK objets); transition() en est le cas d'un objet.
+Les signaux post_save ne sont pas émis: le hook after(pks) du workflow reprend
+les traitements dérivés (étape de traitement des lots, ...). Une transition
+déclarée avec bulk=False a des effets propres à sa vue (création de documents,
+...): elle n'est pas proposée par le changement de statut groupé générique.
+"""
+from collections import defaultdict
+from datetime import datetime
+
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import autodiscover_modules
+
+BULK_CHUNK = 1000
+DATETIME_INPUT_FORMATS = ('%Y-%m-%dT%H:%M', '%Y-%m-%dT%H:%M:%S', '%Y-%m-%d %H:%M', '%Y-%m-%d %H:%M:%S')
+
+
+class TransitionError(Exception):
+    """Transition refusée (statut, champ requis manquant ou garde)"""
+
+
+class Requirement:
+    """
+    Champ à renseigner lors d'une transition, lu dans les valeurs transmises
+    (request.POST par exemple). Les dates/heures ne peuvent pas être dans le futur.
+    """
+
+    def __init__(self, field, label, message=None, future_message=None):
+        self.field = field
+        self.label = label
+        self.message = message
+        self.future_message = future_message
+
+    def resolve(self, model, values):
+        raw = values.get(self.field)
+        if isinstance(raw, str):
+            raw = raw.strip()
+        if raw in (None, ''):
+            raise TransitionError(self.message or f"{self.label} est obligatoire")
+        if isinstance(model._meta.get_field(self.field), models.DateTimeField):
+            return self.parse_datetime(raw)
+        return raw
+
+    def parse_datetime(self, raw):
+        value = raw
+        if isinstance(raw, str):
+            for input_format in DATETIME_INPUT_FORMATS:
+                try:
+                    value = datetime.strptime(raw, input_format)
+                    break
+                except ValueError:
+                    continue
+            else:
+                raise TransitionError('Format de date invalide')
+        if settings.USE_TZ and timezone.is_naive(value):
+            value = timezone.make_aware(value)
+        if value > timezone.now():
+            raise TransitionError(self.future_message or f"{self.label} ne peut pas être dans le futur")
+        return value
+
+
+class Transition:
+    """
+    Passage de l'un des statuts sources au statut cible. name distingue deux
+    transitions vers le même statut (rejet et annulation d'un bon de commande);
+    par défaut c'est le statut cible. bulk=False réserve la transition à la vue
+    qui en applique les effets.
+    """
+
+    def __init__(self, sources, target, name=None, requires=(), guard=None, assign=None, bulk=True):
+        self.sources = (sources,) if isinstance(sources, str) else tuple(sources)
+        self.target = target
+        self.name = name or target
+        self.requires = tuple(requires)
+        # guard(queryset) -> {pk: message} des objets refusés
+        self.guard = guard
+        # assign(user, now) -> valeurs écrites en plus du statut
+        self.assign = assign
+        self.bulk = bulk
+
+    def resolve(self, model, values, user, now):
+        assigned = {requirement.field: requirement.resolve(model, values) for requirement in self.requires}
+        if self.assign:
+            assigned.update(self.assign(user, now))
+        return assigned
+
+
+class TransitionResult:
+    """Objets passés au nouveau statut et objets refusés avec leur motif"""
+
+    def __init__(self, name):
+        self.name = name
+        self.applied = []
+        self.rejected = {}
+        self.values = {}
+
+
+class Workflow:
+    """Machine à états du champ de statut d'un modèle"""
+
+    def __init__(self, model, transitions, field='status', after=None, permission=None, label_field='pk'):
+        self.model = model
+        self.transitions = list(transitions)
+        self.field = field
+        # after(pks): traitements dérivés, dans la transaction, après l'UPDATE
+        self.after = after
+        self.permission = permission or f"{model._meta.app_label}.change_{model._meta.model_name}"
+        self.label_field = label_field
+        self.has_updated_at = any(
+            getattr(f, 'auto_now', False) and f.name == 'updated_at' for f in model._meta.concrete_fields
+        )
+        # Documents versionnés (core.versioning): un changement de statut invalide les saisies en cours
+        self.has_version = any(f.name == 'version' for f in model._meta.concrete_fields)
+
+    @property
+    def name(self):
+        return self.model._meta.label_lower
+
+    def status_label(self, value):
+        return dict(self.model._meta.get_field(self.field).flatchoices).get(value, value)
+
+    def get_transition(self, source, name):
+        for candidate in self.transitions:
+            if candidate.name == name and source in candidate.sources:
+                return candidate
+        return None
+
+    def allowed_targets(self, source):
+        """Statuts accessibles depuis source, dans l'ordre des choix du modèle"""
+        targets = {candidate.target for candidate in self.transitions if source in candidate.sources}
+        return [value for value, label in self.model._meta.get_field(self.field).flatchoices if value in targets]
+
+    def allowed_choices(self, source):
+        return [(value, self.status_label(value)) for value in self.allowed_targets(source)]
+
+    def transition_choices(self):
+        """(nom, libellé) de toutes les transitions"""
+        seen = {}
+        for candidate in self.transitions:
+            seen.setdefault(candidate.name, self.status_label(candidate.target))
+        return list(seen.items())
+
+    def bulk_choices(self):
+        """(nom, libellé) des transitions proposées aux actions groupées (aucune variante bulk=False)"""
+        reserved = {candidate.name for candidate in self.transitions if not candidate.bulk}
+        return [(name, label) for name, label in self.transition_choices() if name not in reserved]
+
+    def can_transition(self, obj, name):
+        return self.get_transition(getattr(obj, self.field), name) is not None
+
+    def refusal(self, source, name):
+        if not any(candidate.name == name for candidate in self.transitions):
+            return 'Statut invalide!'
+        if not any(source in candidate.sources for candidate in self.transitions):
+            return f'Le statut "{self.status_label(source)}" est définitif.'
+        return f'Transition non autorisée de "{self.status_label(source)}" vers "{self.status_label(name)}".'
+
+    def transition(self, obj, name, values=None, user=None):
+        """Applique la transition à un objet (lève TransitionError si elle est refusée)"""
+        result = self.bulk_transition([obj.pk], name, values, user)
+        if obj.pk in result.rejected:
+            raise TransitionError(result.rejected[obj.pk])
+        for field, value in result.values[obj.pk].items():
+            setattr(obj, field, value)
+        if self.has_version:
+            obj.version += 1
+        return obj
+
+    def bulk_transition(self, ids, name, values=None, user=None):
+        """
+        Applique la transition name aux objets ids en une transaction; les objets
+        refusés sont laissés inchangés. Retourne un TransitionResult.
+        """
+        values = values if values is not None else {}
+        ids = list(dict.fromkeys(int(pk) for pk in ids))
+        result = TransitionResult(name)
+        now = timezone.now()
+
+        with transaction.atomic():
+            current = dict(
+                self.model.objects.select_for_update().filter(pk__in=ids).order_by().values_list('pk', self.field)
+            )
+            groups = defaultdict(list)
+            for pk in ids:
+                if pk not in current:
+                    result.rejected[pk] = 'Introuvable.'
+                    continue
+                candidate = self.get_transition(current[pk], name)
+                if candidate is None:
+                    result.rejected[pk] = self.refusal(current[pk], name)
+                else:
+                    groups[candidate].append(pk)
+
+            for candidate, pks in groups.items():
+                try:
+                    assigned = candidate.resolve(self.model, values, user, now)
+                except TransitionError as error:
+                    result.rejected.update(dict.fromkeys(pks, str(error)))
+                    continue
+                if candidate.guard:
+                    refused = candidate.guard(self.model.objects.filter(pk__in=pks))
+                    result.rejected.update(refused)
+                    pks = [pk for pk in pks if pk not in refused]
+                if not pks:
+                    continue
+
+                assigned[self.field] = candidate.target
+                if self.has_updated_at:
+                    assigned['updated_at'] = now
+                updates = dict(assigned, version=F('version') + 1) if self.has_version else assigned
+                for start in range(0, len(pks), BULK_CHUNK):
+                    self.model.objects.filter(
+                        pk__in=pks[start:start + BULK_CHUNK], **{f'{self.field}__in': candidate.sources}
+                    ).update(**updates)
+                result.applied.extend(pks)
+                result.values.update(dict.fromkeys(pks, assigned))
+
+            if result.applied and self.after:
+                self.after(result.applied)
+        return result
+
+    def labels(self, ids):
+        """Libellés des objets pour les messages: {pk: libellé}"""
+        if self.label_field == 'pk':
+            return {pk: f"#{pk}" for pk in ids}
+        return dict(self.model.objects.filter(pk__in=ids).order_by().values_list('pk', self.label_field))
+
+
+_workflows = {}
+_discovered = False
+
+
+def register(workflow):
+    _workflows[workflow.name] = workflow
+    return workflow
+
+
+def get_workflows():
+    """Retourne les workflows déclarés (importe les modules workflows.py des applications)"""
+    global _discovered
+    if not _discovered:
+        autodiscover_modules('workflows')
+        _discovered = True
+    return _workflows
+
+
+def get_workflow(model):
+    """Workflow d'un modèle (classe ou libellé 'app.modele'), ou None"""
+    name = model if isinstance(model, str) else model._meta.label_lower
+    return get_workflows().get(name.lower())
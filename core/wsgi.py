@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
 
 application = get_wsgi_application()
+
+# URL, gabarits et caches chargés avant la première requête (WARMUP_ON_START, voir core/warmup.py)
+from core.warmup import warm_up_on_start  # noqa: E402
+
+warm_up_on_start()
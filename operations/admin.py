@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Service, ServiceCategory, ServiceSubCategory, FishCategory, Reception, Report, ReportItem, Classification, ClassificationItem, Packaging, PackagingItem
+from .models import Service, ServiceCategory, ServiceSubCategory, FishCategory, Reception, Report, ReportItem, Classification, ClassificationItem, Packaging, PackagingItem, Invoice, InvoiceLine, ArchivedLot, SpeciesMapping
 
 # Register your models here.
 
@@ -124,6 +124,12 @@ class ReportAdmin(admin.ModelAdmin):
             obj.created_by = request.user
         super().save_model(request, obj, form, change)
 
+    def save_related(self, request, form, formsets, change):
+        from .species import apply_species_mapping
+
+        super().save_related(request, form, formsets, change)
+        apply_species_mapping(form.instance.items.all())
+
     def get_queryset(self, request):
         """Optimise les requêtes en préchargeant les relations"""
         qs = super().get_queryset(request)
@@ -151,12 +157,42 @@ class ReportItemAdmin(admin.ModelAdmin):
         return obj.species_name
     get_species_name.short_description = 'Espèce'
 
+    def save_model(self, request, obj, form, change):
+        from .species import apply_species_mapping
+
+        super().save_model(request, obj, form, change)
+        apply_species_mapping(ReportItem.objects.filter(pk=obj.pk))
+
     def get_queryset(self, request):
         """Optimise les requêtes en préchargeant les relations"""
         qs = super().get_queryset(request)
         return qs.select_related('report', 'report__arrival_note')
 
 
+@admin.register(SpeciesMapping)
+class SpeciesMappingAdmin(admin.ModelAdmin):
+    list_display = ['report_species', 'custom_name', 'species', 'updated_at']
+    list_filter = ['report_species']
+    search_fields = ['custom_name', 'species__name']
+    autocomplete_fields = ['species']
+    readonly_fields = ['created_at', 'updated_at']
+
+    fieldsets = (
+        ('Espèce du rapport', {
+            'fields': ('report_species', 'custom_name')
+        }),
+        ('Dimension espèces', {
+            'fields': ('species',)
+        }),
+        ('Dates', {
+            'fields': ('created_at', 'updated_at')
+        }),
+    )
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('species')
+
+
 @admin.register(ServiceSubCategory)
 class ServiceSubCategoryAdmin(admin.ModelAdmin):
     list_display = ['name', 'category', 'weight', 'price', 'status', 'created_at']
@@ -350,3 +386,35 @@ class PackagingItemAdmin(admin.ModelAdmin):
         """Optimise les requêtes en préchargeant les relations"""
         qs = super().get_queryset(request)
         return qs.select_related('packaging', 'packaging__classification', 'packaging__classification__reception', 'species', 'species__category')
+
+
+class InvoiceLineInline(admin.TabularInline):
+    model = InvoiceLine
+    extra = 0
+    fields = ['service_date', 'lot_id', 'source', 'source_id', 'description', 'quantity', 'unit', 'unit_price', 'amount']
+    readonly_fields = fields
+    can_delete = False
+
+
+@admin.register(Invoice)
+class InvoiceAdmin(admin.ModelAdmin):
+    list_display = ['number', 'client', 'period_start', 'period_end', 'lots_count', 'lines_count', 'total', 'status']
+    list_filter = ['status', 'period_start']
+    search_fields = ['number', 'client__name']
+    readonly_fields = ['number', 'client', 'period_start', 'period_end', 'lines_count', 'lots_count', 'total', 'created_at', 'updated_at']
+    inlines = [InvoiceLineInline]
+
+    def get_queryset(self, request):
+        """Optimise les requêtes en préchargeant les relations"""
+        qs = super().get_queryset(request)
+        return qs.select_related('client')
+
+
+@admin.register(ArchivedLot)
+class ArchivedLotAdmin(admin.ModelAdmin):
+    list_display = ['lot_id', 'client_name', 'reception_date', 'status', 'closed_at', 'archived_at']
+    search_fields = ['lot_id', 'client_name']
+    readonly_fields = ['reception_id', 'lot_id', 'client_id', 'client_name', 'reception_date', 'status', 'closed_at', 'archived_at', 'snapshot']
+
+    def has_add_permission(self, request):
+        return False
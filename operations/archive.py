@@ -0,0 +1,256 @@
+"""
+Archivage des lots clôturés (séparation données chaudes / froides).
+
+Un lot est archivable lorsque toute sa chaîne est dans un état final et n'a pas
+été modifiée depuis ARCHIVE_AFTER_DAYS jours: réception terminée ou annulée,
+rapports validés ou annulés, classifications terminées ou annulées, cartonages
+terminés ou annulés. Les lots sont déplacés par lots de ARCHIVE_BATCH_SIZE: un
+instantané JSON de la chaîne est écrit dans ArchivedLot (une requête par table
+source pour tout le lot de réceptions), les enregistrements sont indexés dans
+ArchivedRecord puis supprimés des tables de travail.
+
+Les vues de détail retrouvent un enregistrement archivé par find_archived_lot()
+à partir de son identifiant d'origine.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from core.db_router import archive_alias
+
+from .models import (
+    ArchivedLot, ArchivedRecord, Classification, ClassificationItem, Packaging, PackagingItem, Reception, Report,
+    ReportItem,
+)
+from .pipeline import deferred_stage_refresh
+from .throughput import frozen_throughput
+
+RECEPTION_FIELDS = (
+    'id', 'lot_id', 'client_id', 'client__name', 'reception_date', 'weight', 'service_type__code',
+    'service_type__name', 'status', 'observations', 'created_at', 'updated_at', 'created_by__username',
+)
+REPORT_FIELDS = (
+    'id', 'arrival_note_id', 'report_date', 'general_observation', 'status', 'created_at', 'updated_at',
+    'created_by__username',
+)
+REPORT_ITEM_FIELDS = ('id', 'report_id', 'species', 'custom_species_name', 'weight', 'comment')
+CLASSIFICATION_FIELDS = (
+    'id', 'reception_id', 'pointer_full_name', 'reference_chambre', 'start_datetime', 'end_datetime', 'tunnel_in',
+    'tunnel_out', 'status', 'created_at', 'updated_at', 'created_by__username',
+)
+CLASSIFICATION_ITEM_FIELDS = (
+    'id', 'classification_id', 'species_id', 'species__name', 'species__category__name', 'plate_count', 'weight',
+)
+PACKAGING_FIELDS = (
+    'id', 'classification_id', 'classification__reception_id', 'start_datetime', 'end_datetime', 'status',
+    'created_at', 'updated_at', 'created_by__username',
+)
+PACKAGING_ITEM_FIELDS = (
+    'id', 'packaging_id', 'species_id', 'species__name', 'species__category__name', 'carton_count',
+)
+
+# Champs date/heure de l'instantané, sérialisés en ISO 8601 dans le JSON
+DATETIME_FIELDS = {
+    'reception_date', 'report_date', 'start_datetime', 'end_datetime', 'tunnel_in', 'tunnel_out',
+    'created_at', 'updated_at',
+}
+
+
+def archive_horizon(days=None):
+    """Date limite: les lots modifiés avant cette date peuvent être archivés"""
+    days = settings.ARCHIVE_AFTER_DAYS if days is None else days
+    return timezone.now() - timedelta(days=days)
+
+
+def archivable_receptions(before):
+    """Réceptions dont toute la chaîne est close et inchangée depuis before"""
+    return (
+        Reception.objects
+        .filter(status__in=('completed', 'cancelled'), updated_at__lt=before)
+        .exclude(reports__status='draft')
+        .exclude(reports__updated_at__gte=before)
+        .exclude(classifications__status__in=('draft', 'validated', 'in_tunnel'))
+        .exclude(classifications__updated_at__gte=before)
+        .exclude(classifications__packagings__status='draft')
+        .exclude(classifications__packagings__updated_at__gte=before)
+    )
+
+
+def _group(rows, key):
+    grouped = defaultdict(list)
+    for row in rows:
+        grouped[row[key]].append(row)
+    return grouped
+
+
+def build_snapshots(reception_ids):
+    """
+    Instantanés des chaînes des réceptions données: {reception_id: dict}.
+    Une requête par table source, quel que soit le nombre de lots.
+    """
+    receptions = Reception.objects.filter(pk__in=reception_ids).order_by()
+    reports = Report.objects.filter(arrival_note_id__in=reception_ids).order_by('report_date', 'pk')
+    classifications = Classification.objects.filter(reception_id__in=reception_ids).order_by('start_datetime', 'pk')
+    packagings = Packaging.objects.filter(classification__reception_id__in=reception_ids).order_by('start_datetime', 'pk')
+
+    report_items = _group(
+        ReportItem.objects.filter(report__arrival_note_id__in=reception_ids).order_by('pk').values(*REPORT_ITEM_FIELDS),
+        'report_id',
+    )
+    classification_items = _group(
+        ClassificationItem.objects.filter(classification__reception_id__in=reception_ids)
+        .order_by('pk').values(*CLASSIFICATION_ITEM_FIELDS),
+        'classification_id',
+    )
+    packaging_items = _group(
+        PackagingItem.objects.filter(packaging__classification__reception_id__in=reception_ids)
+        .order_by('pk').values(*PACKAGING_ITEM_FIELDS),
+        'packaging_id',
+    )
+
+    packagings_by_classification = defaultdict(list)
+    for packaging in packagings.values(*PACKAGING_FIELDS):
+        packaging['items'] = packaging_items.get(packaging['id'], [])
+        packagings_by_classification[packaging['classification_id']].append(packaging)
+
+    classifications_by_reception = defaultdict(list)
+    for classification in classifications.values(*CLASSIFICATION_FIELDS):
+        classification['items'] = classification_items.get(classification['id'], [])
+        classification['packagings'] = packagings_by_classification.get(classification['id'], [])
+        classifications_by_reception[classification['reception_id']].append(classification)
+
+    reports_by_reception = defaultdict(list)
+    for report in reports.values(*REPORT_FIELDS):
+        report['items'] = report_items.get(report['id'], [])
+        reports_by_reception[report['arrival_note_id']].append(report)
+
+    snapshots = {}
+    for reception in receptions.values(*RECEPTION_FIELDS):
+        snapshots[reception['id']] = {
+            'reception': reception,
+            'reports': reports_by_reception.get(reception['id'], []),
+            'classifications': classifications_by_reception.get(reception['id'], []),
+        }
+    return snapshots
+
+
+def _records(snapshot):
+    """Enregistrements (type, identifiant d'origine) contenus dans un instantané"""
+    yield 'reception', snapshot['reception']['id']
+    for report in snapshot['reports']:
+        yield 'report', report['id']
+    for classification in snapshot['classifications']:
+        yield 'classification', classification['id']
+        for packaging in classification['packagings']:
+            yield 'packaging', packaging['id']
+
+
+def _closed_at(snapshot):
+    dates = [snapshot['reception']['updated_at']]
+    dates += [report['updated_at'] for report in snapshot['reports']]
+    for classification in snapshot['classifications']:
+        dates.append(classification['updated_at'])
+        dates += [packaging['updated_at'] for packaging in classification['packagings']]
+    return max(dates)
+
+
+def _write_archive(snapshots):
+    """Écrit les lots archivés et leur index (ré-exécutable: les lots déjà archivés sont conservés)"""
+    ArchivedLot.objects.bulk_create([
+        ArchivedLot(
+            reception_id=reception_id,
+            lot_id=snapshot['reception']['lot_id'],
+            client_id=snapshot['reception']['client_id'],
+            client_name=snapshot['reception']['client__name'],
+            reception_date=snapshot['reception']['reception_date'],
+            status=snapshot['reception']['status'],
+            closed_at=_closed_at(snapshot),
+            snapshot=snapshot,
+        )
+        for reception_id, snapshot in snapshots.items()
+    ], batch_size=500, ignore_conflicts=True)
+
+    lot_ids = dict(
+        ArchivedLot.objects.filter(reception_id__in=list(snapshots)).values_list('reception_id', 'pk')
+    )
+    ArchivedRecord.objects.bulk_create([
+        ArchivedRecord(lot_id=lot_ids[reception_id], kind=kind, source_id=source_id)
+        for reception_id, snapshot in snapshots.items()
+        for kind, source_id in _records(snapshot)
+    ], batch_size=1000, ignore_conflicts=True)
+
+
+def _delete_hot(reception_ids):
+    """
+    Supprime les chaînes archivées des tables de travail (les lignes suivent en
+    cascade); le débit horaire garde leurs heures
+    """
+    with deferred_stage_refresh(), frozen_throughput():
+        Packaging.objects.filter(classification__reception_id__in=reception_ids).delete()
+        Classification.objects.filter(reception_id__in=reception_ids).delete()
+        Report.objects.filter(arrival_note_id__in=reception_ids).delete()
+        Reception.objects.filter(pk__in=reception_ids).delete()
+
+
+def archive_lots(before=None, batch_size=None, limit=None, dry_run=False):
+    """
+    Archive les lots clos avant before (par défaut l'horizon ARCHIVE_AFTER_DAYS),
+    par lots de batch_size réceptions, au plus limit lots. Retourne un résumé
+    sérialisable en JSON.
+    """
+    before = before or archive_horizon()
+    batch_size = batch_size or settings.ARCHIVE_BATCH_SIZE
+    candidates = archivable_receptions(before).order_by('pk')
+
+    if dry_run:
+        total = candidates.count()
+        return {'lots': min(total, limit) if limit else total, 'records': 0, 'batches': 0, 'dry_run': True}
+
+    alias = archive_alias() or DEFAULT_DB_ALIAS
+    lots = records = batches = 0
+    last_pk = 0
+    while limit is None or lots < limit:
+        size = batch_size if limit is None else min(batch_size, limit - lots)
+        with transaction.atomic():
+            ids = list(candidates.filter(pk__gt=last_pk).values_list('pk', flat=True)[:size])
+            if not ids:
+                break
+            last_pk = ids[-1]
+            # Verrouille les réceptions, puis relit la chaîne: elle ne peut plus changer d'ici la suppression
+            ids = list(Reception.objects.select_for_update().filter(pk__in=ids).values_list('pk', flat=True))
+            ids = list(archivable_receptions(before).filter(pk__in=ids).values_list('pk', flat=True))
+            snapshots = build_snapshots(ids)
+            # Même base: une seule transaction. Base d'archive séparée: l'archive est
+            # validée avant la suppression, une reprise après incident est sans effet de bord
+            with transaction.atomic(using=alias):
+                _write_archive(snapshots)
+            _delete_hot(ids)
+        lots += len(snapshots)
+        records += sum(len(list(_records(snapshot))) for snapshot in snapshots.values())
+        batches += 1
+    return {'lots': lots, 'records': records, 'batches': batches, 'dry_run': False}
+
+
+def find_archived_lot(kind, pk):
+    """Lot archivé contenant l'enregistrement d'origine (kind, pk), ou None"""
+    record = ArchivedRecord.objects.select_related('lot').filter(kind=kind, source_id=pk).first()
+    return record.lot if record else None
+
+
+def load_snapshot(lot):
+    """Instantané du lot avec les dates/heures reconverties pour l'affichage"""
+    def convert(value):
+        if isinstance(value, dict):
+            return {
+                key: parse_datetime(item) if key in DATETIME_FIELDS and isinstance(item, str) else convert(item)
+                for key, item in value.items()
+            }
+        if isinstance(value, list):
+            return [convert(item) for item in value]
+        return value
+
+    return convert(lot.snapshot)
@@ -0,0 +1,205 @@
+"""
+Facturation mensuelle des prestations par client.
+
+Le calcul est ensembliste: une requête par table source (réceptions, lignes de
+classification, lignes de cartonage) sur la période, regroupement en mémoire par
+client, puis écriture des factures et de leurs lignes par bulk_create. Il n'y a
+aucune requête par lot ni par client.
+
+Tarifs appliqués:
+- réception: un forfait par lot, au montant du service (Service.amount);
+- classification: au kilo classé, prix de l'espèce rapporté à son poids de
+  référence (ServiceSubCategory.price / weight, ou price si weight est vide);
+- cartonage: au carton, au prix de l'espèce.
+
+Une facturation est ré-exécutable: les factures brouillon de la période sont
+recalculées, les factures émises ou annulées ne sont jamais modifiées.
+"""
+from calendar import monthrange
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import ClassificationItem, Invoice, InvoiceLine, PackagingItem, Reception
+
+RECEPTION_STATUSES = ('accepted', 'completed')
+CLASSIFICATION_STATUSES = ('validated', 'in_tunnel', 'completed')
+PACKAGING_STATUSES = ('completed',)
+
+CENT = Decimal('0.01')
+QUANTITY = Decimal('0.001')
+UNIT_PRICE = Decimal('0.0001')
+
+
+class BillingError(Exception):
+    """Période de facturation invalide"""
+
+
+def month_period(value=None):
+    """
+    Période (premier jour, dernier jour) du mois AAAA-MM, ou du mois précédent
+    si aucune valeur n'est donnée
+    """
+    if value:
+        try:
+            year, month = (int(part) for part in value.split('-'))
+            start = date(year, month, 1)
+        except ValueError:
+            raise BillingError(f"Mois invalide: {value} (format attendu AAAA-MM)")
+    else:
+        start = (timezone.localdate().replace(day=1) - timedelta(days=1)).replace(day=1)
+    return start, start.replace(day=monthrange(start.year, start.month)[1])
+
+
+def _datetime_range(period_start, period_end):
+    """Bornes [début, fin[ de la période en dates/heures locales, pour utiliser les index"""
+    start = datetime.combine(period_start, time.min)
+    end = datetime.combine(period_end + timedelta(days=1), time.min)
+    if settings.USE_TZ:
+        start, end = timezone.make_aware(start), timezone.make_aware(end)
+    return start, end
+
+
+def _line(source, source_id, lot_id, moment, description, quantity, unit, unit_price):
+    quantity = Decimal(quantity).quantize(QUANTITY)
+    unit_price = Decimal(unit_price).quantize(UNIT_PRICE)
+    return InvoiceLine(
+        source=source,
+        source_id=source_id,
+        lot_id=lot_id,
+        service_date=timezone.localdate(moment) if timezone.is_aware(moment) else moment.date(),
+        description=description[:255],
+        quantity=quantity,
+        unit=unit,
+        unit_price=unit_price,
+        amount=(quantity * unit_price).quantize(CENT, rounding=ROUND_HALF_UP),
+    )
+
+
+def collect_lines(period_start, period_end, client_ids=None):
+    """
+    Calcule les lignes facturables de la période, regroupées par client:
+    {client_id: [InvoiceLine non enregistrées]}. Trois requêtes au total.
+    Les prestations sans tarif (espèce sans prix) sont ignorées.
+    """
+    start, end = _datetime_range(period_start, period_end)
+    lines = defaultdict(list)
+
+    receptions = Reception.objects.filter(
+        status__in=RECEPTION_STATUSES, reception_date__gte=start, reception_date__lt=end
+    )
+    classification_items = ClassificationItem.objects.filter(
+        classification__status__in=CLASSIFICATION_STATUSES,
+        classification__start_datetime__gte=start,
+        classification__start_datetime__lt=end,
+    )
+    packaging_items = PackagingItem.objects.filter(
+        packaging__status__in=PACKAGING_STATUSES,
+        packaging__start_datetime__gte=start,
+        packaging__start_datetime__lt=end,
+    )
+    if client_ids is not None:
+        receptions = receptions.filter(client_id__in=client_ids)
+        classification_items = classification_items.filter(classification__reception__client_id__in=client_ids)
+        packaging_items = packaging_items.filter(packaging__classification__reception__client_id__in=client_ids)
+
+    rows = receptions.order_by().values_list(
+        'pk', 'client_id', 'lot_id', 'reception_date', 'service_type__code', 'service_type__name',
+        'service_type__amount',
+    )
+    for pk, client_id, lot_id, moment, code, name, amount in rows.iterator(chunk_size=5000):
+        lines[client_id].append(_line(
+            'reception', pk, lot_id, moment, f"Réception LOT {lot_id} - {code} {name}", 1, 'lot', amount
+        ))
+
+    rows = classification_items.order_by().values_list(
+        'classification_id', 'classification__reception__client_id', 'classification__reception__lot_id',
+        'classification__start_datetime', 'species__name', 'species__price', 'species__weight', 'weight',
+    )
+    for pk, client_id, lot_id, moment, species, price, reference_weight, weight in rows.iterator(chunk_size=5000):
+        if price is None:
+            continue
+        unit_price = price / reference_weight if reference_weight else price
+        lines[client_id].append(_line(
+            'classification', pk, lot_id, moment, f"Classification LOT {lot_id} - {species}", weight, 'kg',
+            unit_price
+        ))
+
+    rows = packaging_items.order_by().values_list(
+        'packaging_id', 'packaging__classification__reception__client_id',
+        'packaging__classification__reception__lot_id', 'packaging__start_datetime', 'species__name',
+        'species__price', 'carton_count',
+    )
+    for pk, client_id, lot_id, moment, species, price, cartons in rows.iterator(chunk_size=5000):
+        if price is None:
+            continue
+        lines[client_id].append(_line(
+            'packaging', pk, lot_id, moment, f"Cartonage LOT {lot_id} - {species}", cartons, 'carton', price
+        ))
+
+    return lines
+
+
+def run_billing(period_start, period_end, client_ids=None):
+    """
+    Génère les factures brouillon de la période pour tous les clients ayant des
+    prestations (ou ceux de client_ids). Les brouillons existants de la période
+    sont remplacés; les clients déjà facturés (facture émise ou annulée) sont
+    ignorés. Retourne un résumé sérialisable en JSON.
+    """
+    if period_end < period_start:
+        raise BillingError("La fin de période précède son début")
+
+    lines_by_client = collect_lines(period_start, period_end, client_ids)
+
+    with transaction.atomic():
+        period = Invoice.objects.filter(period_start=period_start, period_end=period_end)
+        if client_ids is not None:
+            period = period.filter(client_id__in=client_ids)
+        frozen = set(period.exclude(status='draft').values_list('client_id', flat=True))
+        replaced = period.filter(status='draft').delete()[1].get(Invoice._meta.label, 0)
+
+        invoices = []
+        for client_id, client_lines in lines_by_client.items():
+            if client_id in frozen:
+                continue
+            invoices.append(Invoice(
+                number=Invoice.build_number(period_start, client_id),
+                client_id=client_id,
+                period_start=period_start,
+                period_end=period_end,
+                lines_count=len(client_lines),
+                lots_count=len({line.lot_id for line in client_lines}),
+                total=sum((line.amount for line in client_lines), Decimal('0.00')),
+            ))
+        Invoice.objects.bulk_create(invoices, batch_size=1000)
+
+        if invoices and invoices[0].pk is None:
+            # Bases sans RETURNING sur les insertions groupées (MySQL): une requête pour les identifiants
+            ids = dict(
+                Invoice.objects.filter(number__in=[invoice.number for invoice in invoices])
+                .values_list('number', 'pk')
+            )
+            for invoice in invoices:
+                invoice.pk = ids[invoice.number]
+
+        new_lines = []
+        for invoice in invoices:
+            for line in lines_by_client[invoice.client_id]:
+                line.invoice_id = invoice.pk
+                new_lines.append(line)
+        InvoiceLine.objects.bulk_create(new_lines, batch_size=1000)
+
+    return {
+        'period_start': period_start.isoformat(),
+        'period_end': period_end.isoformat(),
+        'invoices': len(invoices),
+        'lines': len(new_lines),
+        'replaced': replaced,
+        'skipped': len(frozen & set(lines_by_client)),
+        'total': str(sum((invoice.total for invoice in invoices), Decimal('0.00'))),
+    }
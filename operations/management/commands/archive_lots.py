@@ -0,0 +1,31 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from operations.archive import archive_horizon, archive_lots
+
+
+class Command(BaseCommand):
+    help = "Déplace les lots clôturés et inchangés depuis ARCHIVE_AFTER_DAYS jours vers les tables d'archive"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.ARCHIVE_AFTER_DAYS,
+                            help="Ancienneté minimale en jours (par défaut ARCHIVE_AFTER_DAYS)")
+        parser.add_argument('--batch', type=int, default=settings.ARCHIVE_BATCH_SIZE,
+                            help="Lots déplacés par transaction (par défaut ARCHIVE_BATCH_SIZE)")
+        parser.add_argument('--limit', type=int, help="Nombre maximal de lots à archiver")
+        parser.add_argument('--dry-run', action='store_true', help="Compte les lots archivables sans les déplacer")
+
+    def handle(self, *args, **options):
+        if options['days'] < 0 or options['batch'] < 1:
+            raise CommandError("--days doit être positif et --batch supérieur ou égal à 1")
+        before = archive_horizon(options['days'])
+        summary = archive_lots(
+            before=before, batch_size=options['batch'], limit=options['limit'], dry_run=options['dry_run']
+        )
+        if summary['dry_run']:
+            self.stdout.write(f"{summary['lots']} lot(s) archivable(s) clos avant le {before.strftime('%d/%m/%Y')}")
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"{summary['lots']} lot(s) archivé(s) ({summary['records']} enregistrement(s), "
+            f"{summary['batches']} transaction(s))"
+        ))
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from operations.models import ReportItem
+from operations.species import map_report_species
+
+
+class Command(BaseCommand):
+    help = "Associe les espèces des rapports de réception à la dimension espèces (correspondances SpeciesMapping)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch', type=int, default=5000, help="Lignes de rapport traitées par requête")
+        parser.add_argument('--no-create', action='store_true',
+                            help="N'ajoute pas de correspondance; applique seulement les correspondances existantes")
+        parser.add_argument('--check', action='store_true',
+                            help="Échoue s'il reste des espèces sans correspondance")
+
+    def handle(self, *args, **options):
+        if options['batch'] < 1:
+            raise CommandError("--batch doit être supérieur ou égal à 1")
+        result = map_report_species(batch_size=options['batch'], create=not options['no_create'])
+
+        labels = dict(ReportItem.SPECIES_CHOICES)
+        self.stdout.write(f"  Correspondances créées: {result['created']}")
+        self.stdout.write(f"  Lignes associées: {result['mapped']}")
+        for code, name in result['unresolved']:
+            self.stdout.write(self.style.WARNING(f"  Sans correspondance: {name or labels.get(code, code)}"))
+        if result['unmapped']:
+            message = f"{result['unmapped']} ligne(s) de rapport sans correspondance d'espèce"
+            if options['check']:
+                raise CommandError(message)
+            self.stdout.write(self.style.WARNING(message))
+            return
+        self.stdout.write(self.style.SUCCESS("Toutes les espèces des rapports sont associées"))
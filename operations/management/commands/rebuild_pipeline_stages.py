@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from operations.pipeline import STAGE_CHOICES, rebuild_pipeline_stages
+
+
+class Command(BaseCommand):
+    help = "Vérifie et reconstruit l'étape de traitement (pipeline_stage) de toutes les réceptions"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true',
+                            help="Vérifie sans corriger; échoue si des étapes sont incorrectes")
+        parser.add_argument('--batch', type=int, default=5000, help="Réceptions vérifiées par requête")
+
+    def handle(self, *args, **options):
+        if options['batch'] < 1:
+            raise CommandError("--batch doit être supérieur ou égal à 1")
+        fixed = rebuild_pipeline_stages(batch_size=options['batch'], apply=not options['check'])
+        total = sum(fixed.values())
+        labels = dict(STAGE_CHOICES)
+        for stage, count in sorted(fixed.items()):
+            self.stdout.write(f"  {labels.get(stage, stage)}: {count}")
+        if options['check']:
+            if total:
+                raise CommandError(f"{total} réception(s) avec une étape de traitement incorrecte")
+            self.stdout.write(self.style.SUCCESS("Toutes les étapes de traitement sont à jour"))
+            return
+        self.stdout.write(self.style.SUCCESS(f"{total} étape(s) de traitement corrigée(s)"))
@@ -0,0 +1,29 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from operations.throughput import STAGE_CHOICES, rebuild_throughput
+
+
+class Command(BaseCommand):
+    help = "Reconstruit le débit horaire des étapes de traitement depuis les tables de travail"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help="Première date reconstruite (AAAA-MM-JJ); par défaut la première activité")
+        parser.add_argument('--days', type=int, default=31, help="Jours recalculés par tranche")
+
+    def handle(self, *args, **options):
+        if options['days'] < 1:
+            raise CommandError("--days doit être supérieur ou égal à 1")
+        since = None
+        if options['since']:
+            try:
+                since = timezone.make_aware(datetime.strptime(options['since'], '%Y-%m-%d'))
+            except ValueError:
+                raise CommandError("Date invalide (format attendu: AAAA-MM-JJ)")
+        counts = rebuild_throughput(since=since, days=options['days'])
+        labels = dict(STAGE_CHOICES)
+        for stage, count in counts.items():
+            self.stdout.write(f"  {labels.get(stage, stage)}: {count} heure(s)")
+        self.stdout.write(self.style.SUCCESS("Débit horaire reconstruit"))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from operations.billing import BillingError, month_period, run_billing
+
+
+class Command(BaseCommand):
+    help = "Génère les factures brouillon des prestations d'un mois, pour tous les clients"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--month', help="Mois facturé (AAAA-MM, par défaut le mois précédent)")
+        parser.add_argument('--client', type=int, action='append', dest='clients',
+                            help="Limiter au client (identifiant, répétable)")
+
+    def handle(self, *args, **options):
+        try:
+            period_start, period_end = month_period(options['month'])
+            summary = run_billing(period_start, period_end, client_ids=options['clients'])
+        except BillingError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(
+            f"Période du {period_start.strftime('%d/%m/%Y')} au {period_end.strftime('%d/%m/%Y')}: "
+            f"{summary['replaced']} brouillon(s) remplacé(s), {summary['skipped']} client(s) déjà facturé(s)"
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"{summary['invoices']} facture(s), {summary['lines']} ligne(s), total {summary['total']}"
+        ))
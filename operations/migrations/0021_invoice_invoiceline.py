@@ -0,0 +1,63 @@
+# Generated by Django 5.2.7 on 2026-10-18 10:12
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('operations', '0020_change_reception_date_to_datetime'),
+        ('seafood', '0009_backgroundjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Invoice',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number', models.CharField(max_length=30, unique=True, verbose_name='Numéro de facture')),
+                ('period_start', models.DateField(verbose_name='Début de période')),
+                ('period_end', models.DateField(verbose_name='Fin de période')),
+                ('status', models.CharField(choices=[('draft', 'Brouillon'), ('issued', 'Émise'), ('cancelled', 'Annulée')], default='draft', max_length=20, verbose_name='Statut')),
+                ('lines_count', models.PositiveIntegerField(default=0, verbose_name='Nombre de lignes')),
+                ('lots_count', models.PositiveIntegerField(default=0, verbose_name='Nombre de lots')),
+                ('total', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=15, verbose_name='Total')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Date de création')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Date de modification')),
+                ('client', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='invoices', to='seafood.client', verbose_name='Client')),
+            ],
+            options={
+                'verbose_name': 'Facture',
+                'verbose_name_plural': 'Factures',
+                'db_table': 'operations_invoice',
+                'ordering': ['-period_start', 'number'],
+                'indexes': [models.Index(fields=['period_start', 'period_end', 'status'], name='operations__period__c8f684_idx')],
+                'unique_together': {('client', 'period_start', 'period_end')},
+            },
+        ),
+        migrations.CreateModel(
+            name='InvoiceLine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(choices=[('reception', 'Réception'), ('classification', 'Classification'), ('packaging', 'Cartonage')], max_length=20, verbose_name='Source')),
+                ('source_id', models.PositiveBigIntegerField(verbose_name='Identifiant de la source')),
+                ('lot_id', models.CharField(max_length=20, verbose_name='ID du LOT')),
+                ('service_date', models.DateField(verbose_name='Date de la prestation')),
+                ('description', models.CharField(max_length=255, verbose_name='Désignation')),
+                ('quantity', models.DecimalField(decimal_places=3, max_digits=14, verbose_name='Quantité')),
+                ('unit', models.CharField(choices=[('lot', 'Lot'), ('kg', 'Kg'), ('carton', 'Carton')], max_length=10, verbose_name='Unité')),
+                ('unit_price', models.DecimalField(decimal_places=4, max_digits=14, verbose_name='Prix unitaire')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=15, verbose_name='Montant')),
+                ('invoice', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lines', to='operations.invoice', verbose_name='Facture')),
+            ],
+            options={
+                'verbose_name': 'Ligne de facture',
+                'verbose_name_plural': 'Lignes de facture',
+                'db_table': 'operations_invoiceline',
+                'ordering': ['invoice', 'service_date', 'lot_id', 'source', 'id'],
+                'indexes': [models.Index(fields=['source', 'source_id'], name='operations__source_a5c10d_idx'), models.Index(fields=['lot_id'], name='operations__lot_id_233ad7_idx')],
+            },
+        ),
+    ]
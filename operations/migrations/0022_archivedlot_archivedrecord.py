@@ -0,0 +1,52 @@
+# Generated by Django 5.2.7 on 2026-10-18 11:40
+
+import django.core.serializers.json
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('operations', '0021_invoice_invoiceline'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedLot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('reception_id', models.PositiveBigIntegerField(unique=True, verbose_name='Identifiant de la réception')),
+                ('lot_id', models.CharField(max_length=20, unique=True, verbose_name='ID du LOT')),
+                ('client_id', models.PositiveBigIntegerField(db_index=True, verbose_name='Identifiant du client')),
+                ('client_name', models.CharField(max_length=200, verbose_name='Client')),
+                ('reception_date', models.DateTimeField(verbose_name='Date et heure de réception')),
+                ('status', models.CharField(max_length=50, verbose_name='Statut')),
+                ('closed_at', models.DateTimeField(verbose_name='Dernière modification')),
+                ('archived_at', models.DateTimeField(auto_now_add=True, verbose_name="Date d'archivage")),
+                ('snapshot', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder, verbose_name='Instantané')),
+            ],
+            options={
+                'verbose_name': 'Lot archivé',
+                'verbose_name_plural': 'Lots archivés',
+                'db_table': 'operations_archivedlot',
+                'ordering': ['-reception_date'],
+                'indexes': [models.Index(fields=['reception_date'], name='operations__recepti_4eebd6_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedRecord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('reception', 'Réception'), ('report', 'Rapport de réception'), ('classification', 'Classification'), ('packaging', 'Cartonage')], max_length=20, verbose_name='Type')),
+                ('source_id', models.PositiveBigIntegerField(verbose_name="Identifiant d'origine")),
+                ('lot', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='records', to='operations.archivedlot', verbose_name='Lot archivé')),
+            ],
+            options={
+                'verbose_name': 'Enregistrement archivé',
+                'verbose_name_plural': 'Enregistrements archivés',
+                'db_table': 'operations_archivedrecord',
+                'unique_together': {('kind', 'source_id')},
+            },
+        ),
+    ]
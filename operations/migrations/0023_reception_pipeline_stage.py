@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2026-10-19 09:12
+
+from django.db import migrations, models
+
+
+def fill_pipeline_stage(apps, schema_editor):
+    """Calculer l'étape de traitement des réceptions existantes"""
+    from operations.pipeline import rebuild_pipeline_stages
+    rebuild_pipeline_stages(apps=apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('operations', '0022_archivedlot_archivedrecord'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reception',
+            name='pipeline_stage',
+            field=models.CharField(choices=[('idle', 'Aucune saisie en attente'), ('awaiting_report', 'Rapport de réception à saisir'), ('awaiting_classification', 'Classification à saisir'), ('awaiting_packaging', 'Cartonage à saisir')], default='idle', editable=False, max_length=30, verbose_name='Étape de traitement'),
+        ),
+        migrations.AddIndex(
+            model_name='reception',
+            index=models.Index(fields=['pipeline_stage', 'reception_date'], name='operations__pipelin_de2a34_idx'),
+        ),
+        migrations.RunPython(fill_pipeline_stage, reverse_code=migrations.RunPython.noop),
+    ]
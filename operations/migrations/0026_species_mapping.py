@@ -0,0 +1,37 @@
+# Generated by Django 5.2.7 on 2026-10-19 12:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('operations', '0025_document_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SpeciesMapping',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('report_species', models.CharField(choices=[('sardine', 'Sardine'), ('maquereau', 'Maquereau'), ('anchois', 'Anchois'), ('thon', 'Thon'), ('espadon', 'Espadon'), ('dorade', 'Dorade'), ('loup', 'Loup (Bar)'), ('crevette', 'Crevette'), ('calmar', 'Calmar'), ('poulpe', 'Poulpe'), ('rejete', 'Poisson rejeté'), ('perdu', 'Poids perdu'), ('autre', 'Autre espèce')], max_length=100, verbose_name='Espèce du rapport')),
+                ('custom_name', models.CharField(blank=True, help_text='Pour "Autre espèce" uniquement; comparé sans tenir compte de la casse', max_length=200, verbose_name='Nom personnalisé')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Date de création')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Date de modification')),
+                ('species', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='species_mappings', to='operations.servicesubcategory', verbose_name='Espèce')),
+            ],
+            options={
+                'verbose_name': "Correspondance d'espèce",
+                'verbose_name_plural': "Correspondances d'espèces",
+                'db_table': 'operations_speciesmapping',
+                'ordering': ['report_species', 'custom_name'],
+                'constraints': [models.UniqueConstraint(fields=('report_species', 'custom_name'), name='operations_speciesmapping_unique')],
+            },
+        ),
+        migrations.AddField(
+            model_name='reportitem',
+            name='mapped_species',
+            field=models.ForeignKey(blank=True, editable=False, help_text='Renseignée par la correspondance des espèces (voir operations.species)', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='report_items', to='operations.servicesubcategory', verbose_name='Espèce (dimension)'),
+        ),
+    ]
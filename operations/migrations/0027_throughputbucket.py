@@ -0,0 +1,33 @@
+# Generated by Django 5.2.7 on 2026-10-19 13:10
+
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('operations', '0026_species_mapping'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ThroughputBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stage', models.CharField(choices=[('reception', 'Réception'), ('classification', 'Classification'), ('tunnel', 'Tunnel'), ('packaging', 'Cartonage')], max_length=20, verbose_name='Étape')),
+                ('hour', models.DateTimeField(verbose_name='Heure')),
+                ('weight', models.DecimalField(decimal_places=3, default=Decimal('0'), max_digits=14, verbose_name='Poids (kg)')),
+                ('cartons', models.DecimalField(decimal_places=3, default=Decimal('0'), max_digits=14, verbose_name='Cartons')),
+                ('lots', models.PositiveIntegerField(default=0, verbose_name='Lots terminés')),
+            ],
+            options={
+                'verbose_name': 'Débit horaire',
+                'verbose_name_plural': 'Débits horaires',
+                'db_table': 'operations_throughputbucket',
+                'ordering': ['hour', 'stage'],
+                'indexes': [models.Index(fields=['hour'], name='operations__hour_6fe77f_idx')],
+                'constraints': [models.UniqueConstraint(fields=('stage', 'hour'), name='operations_throughputbucket_unique')],
+            },
+        ),
+    ]
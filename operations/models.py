@@ -1,9 +1,17 @@
 from django.db import models
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from django.conf import settings
 from django.core.validators import MinValueValidator, MinLengthValidator, MaxLengthValidator
 from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
 from decimal import Decimal
 
+from core.versioning import VersionedModel
+
+from .pipeline import STAGE_CHOICES, STAGE_IDLE, refresh_pipeline_stages
+from .throughput import STAGE_CHOICES as THROUGHPUT_STAGE_CHOICES, ThroughputSource, refresh_document
+
 # Create your models here.
 
 
@@ -255,6 +263,7 @@ class Service(models.Model):
             models.Index(fields=['code']),
             models.Index(fields=['status']),
             models.Index(fields=['category']),
+            models.Index(fields=['status', 'name']),
         ]
 
     def __str__(self):
@@ -347,7 +356,7 @@ class FishCategory(models.Model):
         return self.name
 
 
-class Reception(models.Model):
+class Reception(ThroughputSource):
     """
     Modèle pour la Note d'Arrivée (réception des lots de poissons)
     """
@@ -411,6 +420,15 @@ class Reception(models.Model):
         help_text='Notes ou remarques sur la réception'
     )
 
+    # Étape de traitement (liste de travail), maintenue par les signaux ci-dessous
+    pipeline_stage = models.CharField(
+        max_length=30,
+        choices=STAGE_CHOICES,
+        default=STAGE_IDLE,
+        editable=False,
+        verbose_name='Étape de traitement'
+    )
+
     # Métadonnées
     created_at = models.DateTimeField(
         auto_now_add=True,
@@ -438,6 +456,7 @@ class Reception(models.Model):
             models.Index(fields=['status']),
             models.Index(fields=['reception_date']),
             models.Index(fields=['client']),
+            models.Index(fields=['pipeline_stage', 'reception_date']),
         ]
 
     def __str__(self):
@@ -452,12 +471,16 @@ class Reception(models.Model):
     @staticmethod
     def generate_lot_id():
         """Génère un ID de lot unique au format XXXXXX (6+ chiffres)"""
-        last_note = Reception.objects.order_by('-lot_id').first()
+        last_lot_id = Reception.objects.order_by('-lot_id').values_list('lot_id', flat=True).first()
+        # Les lots archivés gardent leur numéro: ne jamais le réattribuer
+        last_archived = ArchivedLot.objects.order_by('-lot_id').values_list('lot_id', flat=True).first()
+        if last_archived and (not last_lot_id or last_archived > last_lot_id):
+            last_lot_id = last_archived
 
-        if last_note and last_note.lot_id:
+        if last_lot_id:
             try:
                 # Extraire le numéro et l'incrémenter
-                last_number = int(last_note.lot_id)
+                last_number = int(last_lot_id)
                 new_number = last_number + 1
             except ValueError:
                 # Si le format n'est pas un nombre, recommencer à 1
@@ -486,7 +509,7 @@ class Reception(models.Model):
         return self.status in ['accepted', 'completed']
 
 
-class Report(models.Model):
+class Report(VersionedModel):
     """
     Modèle pour le rapport de réception des poissons reçus
     Contient les détails par espèce avec les poids,
@@ -631,6 +654,18 @@ class ReportItem(models.Model):
         help_text='Remarques spécifiques sur cette espèce'
     )
 
+    # Espèce de la dimension espèces (classification, cartonage), déduite de SpeciesMapping
+    mapped_species = models.ForeignKey(
+        ServiceSubCategory,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        editable=False,
+        related_name='report_items',
+        verbose_name='Espèce (dimension)',
+        help_text='Renseignée par la correspondance des espèces (voir operations.species)'
+    )
+
     # Métadonnées
     created_at = models.DateTimeField(
         auto_now_add=True,
@@ -665,7 +700,75 @@ class ReportItem(models.Model):
         return self.get_species_display()
 
 
-class Classification(models.Model):
+class SpeciesMapping(models.Model):
+    """
+    Correspondance d'une espèce des rapports de réception (code, ou nom
+    personnalisé pour "Autre espèce") vers la dimension espèces
+    (ServiceSubCategory) utilisée par la classification et le cartonage
+    """
+    report_species = models.CharField(
+        max_length=100,
+        choices=ReportItem.SPECIES_CHOICES,
+        verbose_name='Espèce du rapport'
+    )
+
+    # Nom personnalisé normalisé (minuscules, espaces réduits), seulement pour "Autre espèce"
+    custom_name = models.CharField(
+        max_length=200,
+        blank=True,
+        verbose_name='Nom personnalisé',
+        help_text='Pour "Autre espèce" uniquement; comparé sans tenir compte de la casse'
+    )
+
+    species = models.ForeignKey(
+        ServiceSubCategory,
+        on_delete=models.PROTECT,
+        related_name='species_mappings',
+        verbose_name='Espèce'
+    )
+
+    # Métadonnées
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Date de création'
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Date de modification'
+    )
+
+    class Meta:
+        db_table = 'operations_speciesmapping'
+        verbose_name = 'Correspondance d\'espèce'
+        verbose_name_plural = 'Correspondances d\'espèces'
+        ordering = ['report_species', 'custom_name']
+        constraints = [
+            models.UniqueConstraint(fields=['report_species', 'custom_name'], name='operations_speciesmapping_unique'),
+        ]
+
+    # Espèce du rapport lue en base: les lignes de l'ancienne espèce sont remappées si elle change
+    _species_loaded = None
+
+    def __str__(self):
+        source = self.custom_name if self.report_species == 'autre' else self.get_report_species_display()
+        return f"{source} → {self.species.name}"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        loaded = dict(zip(field_names, values))
+        if 'report_species' in loaded:
+            instance._species_loaded = loaded['report_species']
+        return instance
+
+    def save(self, *args, **kwargs):
+        from .species import normalize_custom_name
+
+        self.custom_name = normalize_custom_name(self.custom_name) if self.report_species == 'autre' else ''
+        super().save(*args, **kwargs)
+
+
+class Classification(ThroughputSource, VersionedModel):
     """
     Modèle pour la classification d'un rapport de réception
     Permet de classifier les poissons par espèce avec le nombre de plats et poids
@@ -820,15 +923,9 @@ class Classification(models.Model):
         return self.status == 'draft'
 
     def get_allowed_next_statuses(self):
-        """Retourne les statuts suivants autorisés selon le statut actuel"""
-        status_transitions = {
-            'draft': ['validated', 'cancelled'],
-            'validated': ['in_tunnel', 'cancelled'],
-            'in_tunnel': ['completed', 'cancelled'],
-            'completed': [],  # Statut final
-            'cancelled': [],  # Statut final
-        }
-        return status_transitions.get(self.status, [])
+        """Retourne les statuts suivants autorisés selon le statut actuel (voir operations.workflows)"""
+        from core.workflow import get_workflow
+        return get_workflow(Classification).allowed_targets(self.status)
 
     def can_transition_to(self, new_status):
         """Vérifie si la transition vers le nouveau statut est autorisée"""
@@ -927,7 +1024,7 @@ class ClassificationItem(models.Model):
         return Decimal('0.00')
 
 
-class Packaging(models.Model):
+class Packaging(ThroughputSource, VersionedModel):
     """
     Modèle pour le cartonage après classification
     """
@@ -1097,3 +1194,280 @@ class PackagingItem(models.Model):
 
     def __str__(self):
         return f"{self.species.name} - {self.carton_count} cartons"
+
+
+class Invoice(models.Model):
+    """
+    Facture mensuelle des services d'un client (réceptions, classifications et
+    cartonages de la période), générée par le calcul de facturation
+    """
+    STATUS_CHOICES = [
+        ('draft', 'Brouillon'),
+        ('issued', 'Émise'),
+        ('cancelled', 'Annulée'),
+    ]
+
+    number = models.CharField(
+        max_length=30,
+        unique=True,
+        verbose_name='Numéro de facture'
+    )
+    client = models.ForeignKey(
+        'seafood.Client',
+        on_delete=models.PROTECT,
+        related_name='invoices',
+        verbose_name='Client'
+    )
+    period_start = models.DateField(verbose_name='Début de période')
+    period_end = models.DateField(verbose_name='Fin de période')
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default='draft',
+        verbose_name='Statut'
+    )
+    lines_count = models.PositiveIntegerField(default=0, verbose_name='Nombre de lignes')
+    lots_count = models.PositiveIntegerField(default=0, verbose_name='Nombre de lots')
+    total = models.DecimalField(
+        max_digits=15,
+        decimal_places=2,
+        default=Decimal('0.00'),
+        verbose_name='Total'
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Date de création'
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Date de modification'
+    )
+
+    class Meta:
+        db_table = 'operations_invoice'
+        verbose_name = 'Facture'
+        verbose_name_plural = 'Factures'
+        ordering = ['-period_start', 'number']
+        indexes = [
+            models.Index(fields=['period_start', 'period_end', 'status']),
+        ]
+        unique_together = [['client', 'period_start', 'period_end']]
+
+    def __str__(self):
+        return f"{self.number} - {self.client.name}"
+
+    @staticmethod
+    def build_number(period_start, client_id):
+        """Numéro de facture stable pour un client et une période (FAAAAMM-CCCCCC)"""
+        return f"F{period_start:%Y%m}-{client_id:06d}"
+
+
+class InvoiceLine(models.Model):
+    """
+    Ligne de facture: une prestation facturée sur un lot. La source (réception,
+    classification ou cartonage) est référencée par son type et son identifiant,
+    sans clé étrangère, pour que la facture survive à l'archivage des lots.
+    """
+    SOURCE_CHOICES = [
+        ('reception', 'Réception'),
+        ('classification', 'Classification'),
+        ('packaging', 'Cartonage'),
+    ]
+
+    UNIT_CHOICES = [
+        ('lot', 'Lot'),
+        ('kg', 'Kg'),
+        ('carton', 'Carton'),
+    ]
+
+    invoice = models.ForeignKey(
+        Invoice,
+        on_delete=models.CASCADE,
+        related_name='lines',
+        verbose_name='Facture'
+    )
+    source = models.CharField(
+        max_length=20,
+        choices=SOURCE_CHOICES,
+        verbose_name='Source'
+    )
+    source_id = models.PositiveBigIntegerField(verbose_name='Identifiant de la source')
+    lot_id = models.CharField(max_length=20, verbose_name='ID du LOT')
+    service_date = models.DateField(verbose_name='Date de la prestation')
+    description = models.CharField(max_length=255, verbose_name='Désignation')
+    quantity = models.DecimalField(
+        max_digits=14,
+        decimal_places=3,
+        verbose_name='Quantité'
+    )
+    unit = models.CharField(
+        max_length=10,
+        choices=UNIT_CHOICES,
+        verbose_name='Unité'
+    )
+    unit_price = models.DecimalField(
+        max_digits=14,
+        decimal_places=4,
+        verbose_name='Prix unitaire'
+    )
+    amount = models.DecimalField(
+        max_digits=15,
+        decimal_places=2,
+        verbose_name='Montant'
+    )
+
+    class Meta:
+        db_table = 'operations_invoiceline'
+        verbose_name = 'Ligne de facture'
+        verbose_name_plural = 'Lignes de facture'
+        ordering = ['invoice', 'service_date', 'lot_id', 'source', 'id']
+        indexes = [
+            models.Index(fields=['source', 'source_id']),
+            models.Index(fields=['lot_id']),
+        ]
+
+    def __str__(self):
+        return f"{self.invoice.number} - LOT {self.lot_id} - {self.description}"
+
+
+class ArchivedLot(models.Model):
+    """
+    Lot clôturé sorti des tables de travail: la réception et toute sa chaîne
+    (rapports, classifications, cartonages et leurs lignes) sont conservées en
+    un instantané JSON. Stocké dans la base ARCHIVE_DATABASE si elle est
+    configurée (voir core.db_router.ArchiveRouter).
+    """
+    archive_database = True
+
+    reception_id = models.PositiveBigIntegerField(unique=True, verbose_name='Identifiant de la réception')
+    lot_id = models.CharField(max_length=20, unique=True, verbose_name='ID du LOT')
+    client_id = models.PositiveBigIntegerField(db_index=True, verbose_name='Identifiant du client')
+    client_name = models.CharField(max_length=200, verbose_name='Client')
+    reception_date = models.DateTimeField(verbose_name='Date et heure de réception')
+    status = models.CharField(max_length=50, verbose_name='Statut')
+    closed_at = models.DateTimeField(verbose_name='Dernière modification')
+    archived_at = models.DateTimeField(auto_now_add=True, verbose_name="Date d'archivage")
+    snapshot = models.JSONField(encoder=DjangoJSONEncoder, verbose_name='Instantané')
+
+    class Meta:
+        db_table = 'operations_archivedlot'
+        verbose_name = 'Lot archivé'
+        verbose_name_plural = 'Lots archivés'
+        ordering = ['-reception_date']
+        indexes = [
+            models.Index(fields=['reception_date']),
+        ]
+
+    def __str__(self):
+        return f"LOT {self.lot_id} - {self.client_name} (archivé)"
+
+
+class ArchivedRecord(models.Model):
+    """
+    Index des enregistrements archivés: retrouve le lot archivé à partir de
+    l'identifiant d'origine d'une réception, d'un rapport, d'une classification
+    ou d'un cartonage.
+    """
+    archive_database = True
+
+    KIND_CHOICES = [
+        ('reception', 'Réception'),
+        ('report', 'Rapport de réception'),
+        ('classification', 'Classification'),
+        ('packaging', 'Cartonage'),
+    ]
+
+    lot = models.ForeignKey(
+        ArchivedLot,
+        on_delete=models.CASCADE,
+        related_name='records',
+        verbose_name='Lot archivé'
+    )
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, verbose_name='Type')
+    source_id = models.PositiveBigIntegerField(verbose_name="Identifiant d'origine")
+
+    class Meta:
+        db_table = 'operations_archivedrecord'
+        verbose_name = 'Enregistrement archivé'
+        verbose_name_plural = 'Enregistrements archivés'
+        unique_together = [['kind', 'source_id']]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} #{self.source_id} - LOT {self.lot.lot_id}"
+
+
+class ThroughputBucket(models.Model):
+    """
+    Débit d'une étape de traitement pendant une heure (voir operations.throughput),
+    maintenu par les signaux ci-dessous et les workflows
+    """
+    stage = models.CharField(max_length=20, choices=THROUGHPUT_STAGE_CHOICES, verbose_name='Étape')
+    hour = models.DateTimeField(verbose_name='Heure')
+    weight = models.DecimalField(max_digits=14, decimal_places=3, default=Decimal('0'), verbose_name='Poids (kg)')
+    cartons = models.DecimalField(max_digits=14, decimal_places=3, default=Decimal('0'), verbose_name='Cartons')
+    lots = models.PositiveIntegerField(default=0, verbose_name='Lots terminés')
+
+    class Meta:
+        db_table = 'operations_throughputbucket'
+        verbose_name = 'Débit horaire'
+        verbose_name_plural = 'Débits horaires'
+        ordering = ['hour', 'stage']
+        constraints = [
+            models.UniqueConstraint(fields=['stage', 'hour'], name='operations_throughputbucket_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['hour']),
+        ]
+
+    def __str__(self):
+        return f"{self.get_stage_display()} - {self.hour:%d/%m/%Y %H:%M} - {self.weight} kg"
+
+
+# ============================================
+# SIGNAUX: ÉTAPE DE TRAITEMENT DES LOTS
+# ============================================
+
+@receiver(post_save, sender=Reception)
+def refresh_stage_on_reception_save(sender, instance, **kwargs):
+    refresh_pipeline_stages([instance.pk])
+
+
+@receiver([post_save, post_delete], sender=Report)
+def refresh_stage_on_report_change(sender, instance, **kwargs):
+    refresh_pipeline_stages([instance.arrival_note_id])
+
+
+@receiver([post_save, post_delete], sender=Classification)
+def refresh_stage_on_classification_change(sender, instance, **kwargs):
+    refresh_pipeline_stages([instance.reception_id])
+
+
+@receiver([post_save, post_delete], sender=Packaging)
+def refresh_stage_on_packaging_change(sender, instance, **kwargs):
+    refresh_pipeline_stages(classification_ids=[instance.classification_id])
+
+
+
+# ============================================
+# SIGNAUX: DIMENSION ESPÈCES
+# ============================================
+
+@receiver([post_save, post_delete], sender=SpeciesMapping)
+def remap_report_items_on_mapping_change(sender, instance, **kwargs):
+    """Remappe les lignes de l'espèce quittée et de l'espèce occupée par la correspondance"""
+    from .species import apply_species_mapping
+
+    species = {code for code in (instance._species_loaded, instance.report_species) if code}
+    apply_species_mapping(ReportItem.objects.filter(species__in=species))
+    instance._species_loaded = instance.report_species
+
+
+# ============================================
+# SIGNAUX: DÉBIT HORAIRE
+# ============================================
+
+@receiver([post_save, post_delete], sender=Reception)
+@receiver([post_save, post_delete], sender=Classification)
+@receiver([post_save, post_delete], sender=Packaging)
+def refresh_throughput_on_document_change(sender, instance, **kwargs):
+    refresh_document(instance)
@@ -0,0 +1,148 @@
+"""
+Étape de traitement des lots (Reception.pipeline_stage).
+
+L'étape indique quelle saisie attend le lot et alimente les listes de travail
+des formulaires d'ajout (rapport, classification, cartonage) par une lecture de
+l'index (pipeline_stage, reception_date), sans anti-jointure:
+
+- awaiting_report: lot accepté, service au-delà de 1003, sans rapport;
+- awaiting_classification: lot accepté avec un rapport validé, sans classification;
+- awaiting_packaging: classification terminée non encore cartonnée;
+- idle: aucune saisie en attente.
+
+L'étape est recalculée en base (une requête d'annotation puis un UPDATE par
+étape modifiée) à chaque écriture d'une réception, d'un rapport, d'une
+classification ou d'un cartonage (signaux dans operations.models). La commande
+rebuild_pipeline_stages vérifie et reconstruit l'ensemble.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.apps import apps as global_apps
+from django.db.models import CharField, Case, Exists, F, OuterRef, Q, Value, When
+
+STAGE_IDLE = 'idle'
+STAGE_AWAITING_REPORT = 'awaiting_report'
+STAGE_AWAITING_CLASSIFICATION = 'awaiting_classification'
+STAGE_AWAITING_PACKAGING = 'awaiting_packaging'
+
+STAGE_CHOICES = [
+    (STAGE_IDLE, 'Aucune saisie en attente'),
+    (STAGE_AWAITING_REPORT, 'Rapport de réception à saisir'),
+    (STAGE_AWAITING_CLASSIFICATION, 'Classification à saisir'),
+    (STAGE_AWAITING_PACKAGING, 'Cartonage à saisir'),
+]
+
+# Services dont les lots passent par le rapport de réception (code > 1003)
+REPORT_SERVICE_CODE_ABOVE = '1003'
+
+_deferred = ContextVar('pipeline_deferred', default=None)
+
+
+def stage_expression(apps=global_apps):
+    """Expression SQL de l'étape d'une réception (utilisable avec les modèles historiques des migrations)"""
+    Report = apps.get_model('operations', 'Report')
+    Classification = apps.get_model('operations', 'Classification')
+    Packaging = apps.get_model('operations', 'Packaging')
+
+    reports = Report.objects.filter(arrival_note=OuterRef('pk'))
+    classifications = Classification.objects.filter(reception=OuterRef('pk'))
+    unpackaged = Classification.objects.filter(reception=OuterRef('pk'), status='completed').exclude(
+        Exists(Packaging.objects.filter(classification=OuterRef('pk')))
+    )
+    return Case(
+        When(Exists(unpackaged), then=Value(STAGE_AWAITING_PACKAGING)),
+        When(
+            Q(status='accepted') & Exists(reports.filter(status='validated')) & ~Exists(classifications),
+            then=Value(STAGE_AWAITING_CLASSIFICATION),
+        ),
+        When(
+            Q(status='accepted', service_type__code__gt=REPORT_SERVICE_CODE_ABOVE) & ~Exists(reports),
+            then=Value(STAGE_AWAITING_REPORT),
+        ),
+        default=Value(STAGE_IDLE),
+        output_field=CharField(),
+    )
+
+
+def stale_stages(queryset, apps=global_apps):
+    """Réceptions du queryset dont l'étape enregistrée diffère de l'étape calculée: [(pk, étape)]"""
+    return list(
+        queryset.annotate(computed_stage=stage_expression(apps))
+        .filter(~Q(pipeline_stage=F('computed_stage')))
+        .order_by()
+        .values_list('pk', 'computed_stage')
+    )
+
+
+def apply_stages(model, rows):
+    """Enregistre les étapes calculées: un UPDATE par étape"""
+    by_stage = {}
+    for pk, stage in rows:
+        by_stage.setdefault(stage, []).append(pk)
+    for stage, ids in by_stage.items():
+        model.objects.filter(pk__in=ids).update(pipeline_stage=stage)
+    return len(rows)
+
+
+def refresh_pipeline_stages(reception_ids=(), classification_ids=()):
+    """
+    Recalcule l'étape des réceptions données et de celles des classifications
+    données; retourne le nombre d'étapes modifiées
+    """
+    reception_ids = {pk for pk in reception_ids if pk is not None}
+    classification_ids = {pk for pk in classification_ids if pk is not None}
+    if not reception_ids and not classification_ids:
+        return 0
+    pending = _deferred.get()
+    if pending is not None:
+        pending[0].update(reception_ids)
+        pending[1].update(classification_ids)
+        return 0
+    Reception = global_apps.get_model('operations', 'Reception')
+    Classification = global_apps.get_model('operations', 'Classification')
+    lookup = Q(pk__in=reception_ids)
+    if classification_ids:
+        lookup |= Q(pk__in=Classification.objects.filter(pk__in=classification_ids).values('reception_id'))
+    return apply_stages(Reception, stale_stages(Reception.objects.filter(lookup)))
+
+
+@contextmanager
+def deferred_stage_refresh():
+    """
+    Regroupe les recalculs d'étape des écritures du bloc en un seul passage à
+    la sortie (imports, archivage, traitements par lots)
+    """
+    if _deferred.get() is not None:
+        yield
+        return
+    pending = (set(), set())
+    token = _deferred.set(pending)
+    try:
+        yield
+    finally:
+        _deferred.reset(token)
+    refresh_pipeline_stages(*pending)
+
+
+def rebuild_pipeline_stages(batch_size=5000, apply=True, apps=global_apps):
+    """
+    Vérifie (et corrige si apply) l'étape de toutes les réceptions, par tranches
+    d'identifiants. Retourne {étape: nombre de réceptions corrigées}.
+    """
+    Reception = apps.get_model('operations', 'Reception')
+    fixed = {}
+    last_pk = 0
+    while True:
+        ids = list(
+            Reception.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:batch_size]
+        )
+        if not ids:
+            break
+        last_pk = ids[-1]
+        rows = stale_stages(Reception.objects.filter(pk__gte=ids[0], pk__lte=last_pk), apps)
+        for pk, stage in rows:
+            fixed[stage] = fixed.get(stage, 0) + 1
+        if apply:
+            apply_stages(Reception, rows)
+    return fixed
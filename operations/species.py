@@ -0,0 +1,242 @@
+"""
+Dimension espèces commune aux trois étapes de traitement.
+
+La classification et le cartonage désignent les espèces par ServiceSubCategory;
+le rapport de réception par un code (ReportItem.SPECIES_CHOICES) ou, pour
+"Autre espèce", par un nom saisi librement. SpeciesMapping fait correspondre
+ces codes et noms à la dimension espèces, et ReportItem.mapped_species en garde
+le résultat:
+
+- apply_species_mapping(queryset) renseigne mapped_species par un seul UPDATE
+  (sous-requête corrélée sur SpeciesMapping), quel que soit le nombre de lignes;
+- map_report_species() crée les correspondances évidentes (nom identique à
+  celui d'une espèce) puis applique les correspondances par tranches de clés
+  (commande map_report_species);
+- species_reconciliation() compare, pour une période, les poids rapportés,
+  classés et les cartons emballés par espèce en une requête groupée.
+
+Le poids rejeté, le poids perdu et les espèces sans correspondance restent
+des lignes distinctes du rapprochement (par code ou nom du rapport). Les lots
+archivés ne sont plus dans les tables de travail et n'y figurent pas.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import connections, models, router
+from django.db.models import Case, F, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Lower, Trim
+
+from .billing import CLASSIFICATION_STATUSES, PACKAGING_STATUSES, _datetime_range
+from .models import ClassificationItem, PackagingItem, ReportItem, ServiceSubCategory, SpeciesMapping
+
+OTHER_SPECIES = 'autre'
+# Codes du rapport qui ne sont pas des espèces: jamais associés automatiquement
+NON_SPECIES = ('rejete', 'perdu')
+REPORT_STATUSES = ('validated',)
+BATCH_SIZE = 5000
+
+WEIGHT = Decimal('0.01')
+
+
+def normalize_custom_name(name):
+    """Nom personnalisé comparable (comme Lower(Trim()) en SQL): minuscules, sans espaces de début et de fin"""
+    return (name or '').strip().lower()
+
+
+def mapping_subquery():
+    """Espèce de la correspondance d'une ligne de rapport (OuterRef sur ReportItem)"""
+    return Subquery(
+        SpeciesMapping.objects.filter(report_species=OuterRef('species')).filter(
+            Q(report_species=OTHER_SPECIES, custom_name=Lower(Trim(OuterRef('custom_species_name'))))
+            | (~Q(report_species=OTHER_SPECIES) & Q(custom_name=''))
+        ).values('species')[:1]
+    )
+
+
+def apply_species_mapping(queryset):
+    """Renseigne mapped_species des lignes de rapport du queryset (un UPDATE); retourne le nombre de lignes"""
+    return queryset.order_by().update(mapped_species=mapping_subquery())
+
+
+def _report_key():
+    """Clé de correspondance d'une ligne de rapport: nom personnalisé pour "Autre espèce", sinon vide"""
+    return Case(
+        When(species=OTHER_SPECIES, then=Lower(Trim('custom_species_name'))),
+        default=Value(''),
+        output_field=models.CharField(),
+    )
+
+
+def create_missing_mappings():
+    """
+    Crée les correspondances des espèces de rapport sans correspondance dont le
+    code, le libellé ou le nom personnalisé est celui d'une seule espèce.
+    Retourne (nombre créé, [(code, nom personnalisé) non résolus]).
+    """
+    keys = set(
+        ReportItem.objects.filter(mapped_species__isnull=True).exclude(species__in=NON_SPECIES)
+        .annotate(key=_report_key()).order_by().values_list('species', 'key').distinct()
+    )
+    keys = {(code, normalize_custom_name(name)) for code, name in keys}
+    keys -= set(SpeciesMapping.objects.values_list('report_species', 'custom_name'))
+    if not keys:
+        return 0, []
+
+    by_name = defaultdict(set)
+    for pk, name in ServiceSubCategory.objects.values_list('pk', 'name'):
+        by_name[normalize_custom_name(name)].add(pk)
+    labels = dict(ReportItem.SPECIES_CHOICES)
+
+    mappings, unresolved = [], []
+    for code, name in sorted(keys):
+        candidates = [name] if code == OTHER_SPECIES else [code, labels.get(code, '')]
+        matches = set()
+        for candidate in candidates:
+            matches |= by_name.get(normalize_custom_name(candidate), set())
+        if len(matches) == 1 and (name or code != OTHER_SPECIES):
+            mappings.append(SpeciesMapping(report_species=code, custom_name=name, species_id=matches.pop()))
+        else:
+            unresolved.append((code, name))
+    # bulk_create n'émet pas post_save: les lignes sont associées par map_report_species()
+    SpeciesMapping.objects.bulk_create(mappings, ignore_conflicts=True)
+    return len(mappings), unresolved
+
+
+def map_report_species(batch_size=BATCH_SIZE, create=True):
+    """
+    Associe toutes les lignes de rapport à la dimension espèces, par tranches de
+    batch_size clés (un UPDATE par tranche). Retourne un dictionnaire
+    {'created', 'unresolved', 'mapped', 'unmapped'}.
+    """
+    created, unresolved = create_missing_mappings() if create else (0, [])
+    bounds = ReportItem.objects.aggregate(first=models.Min('pk'), last=models.Max('pk'))
+    if bounds['first'] is not None:
+        for start in range(bounds['first'], bounds['last'] + 1, batch_size):
+            apply_species_mapping(ReportItem.objects.filter(pk__gte=start, pk__lt=start + batch_size))
+    counts = ReportItem.objects.aggregate(
+        mapped=models.Count('pk', filter=Q(mapped_species__isnull=False)),
+        unmapped=models.Count('pk', filter=Q(mapped_species__isnull=True) & ~Q(species__in=NON_SPECIES)),
+    )
+    return {'created': created, 'unresolved': unresolved, **counts}
+
+
+class ReconciliationRow:
+    """Quantités d'une espèce (ou d'un code de rapport sans correspondance) aux trois étapes"""
+
+    def __init__(self, species_id, report_label, species_name, category_name, reported, classified, plates, cartons):
+        self.species_id = species_id
+        self.report_label = report_label
+        self.species_name = species_name
+        self.category_name = category_name
+        self.reported_weight = _weight(reported)
+        self.classified_weight = _weight(classified)
+        self.plate_count = int(plates or 0)
+        self.carton_count = int(cartons or 0)
+
+    @property
+    def label(self):
+        return self.species_name or self.report_label
+
+    @property
+    def is_mapped(self):
+        return self.species_id is not None
+
+    @property
+    def weight_gap(self):
+        """Poids classé moins poids rapporté"""
+        return self.classified_weight - self.reported_weight
+
+    @property
+    def weight_gap_percent(self):
+        if not self.reported_weight:
+            return None
+        return (self.weight_gap * 100 / self.reported_weight).quantize(WEIGHT)
+
+
+def _weight(value):
+    return Decimal(str(value or 0)).quantize(WEIGHT)
+
+
+def _zero_weight():
+    return Value(Decimal('0.00'), output_field=models.DecimalField(max_digits=12, decimal_places=2))
+
+
+def species_reconciliation(period_start, period_end):
+    """
+    Rapprochement par espèce des lots reçus sur la période (dates incluses):
+    poids des rapports validés, poids et plats classés, cartons emballés. Une
+    requête: UNION ALL des trois étapes, groupée par espèce.
+    Retourne une liste de ReconciliationRow.
+    """
+    start, end = _datetime_range(period_start, period_end)
+    labels = dict(ReportItem.SPECIES_CHOICES)
+
+    reported = ReportItem.objects.filter(
+        report__status__in=REPORT_STATUSES,
+        report__arrival_note__reception_date__gte=start,
+        report__arrival_note__reception_date__lt=end,
+    ).annotate(
+        dimension=F('mapped_species'),
+        report_label=Case(
+            When(mapped_species__isnull=False, then=Value('')),
+            When(species=OTHER_SPECIES, then=Lower(Trim('custom_species_name'))),
+            default=F('species'),
+            output_field=models.CharField(),
+        ),
+        reported=F('weight'),
+        classified=_zero_weight(),
+        plates=Value(0),
+        cartons=Value(0),
+    )
+    classified = ClassificationItem.objects.filter(
+        classification__status__in=CLASSIFICATION_STATUSES,
+        classification__reception__reception_date__gte=start,
+        classification__reception__reception_date__lt=end,
+    ).annotate(
+        dimension=F('species'),
+        report_label=Value('', output_field=models.CharField()),
+        reported=_zero_weight(),
+        classified=F('weight'),
+        plates=F('plate_count'),
+        cartons=Value(0),
+    )
+    packaged = PackagingItem.objects.filter(
+        packaging__status__in=PACKAGING_STATUSES,
+        packaging__classification__reception__reception_date__gte=start,
+        packaging__classification__reception__reception_date__lt=end,
+    ).annotate(
+        dimension=F('species'),
+        report_label=Value('', output_field=models.CharField()),
+        reported=_zero_weight(),
+        classified=_zero_weight(),
+        plates=Value(0),
+        cartons=F('carton_count'),
+    )
+    columns = ('dimension', 'report_label', 'reported', 'classified', 'plates', 'cartons')
+    branches = [queryset.order_by().values_list(*columns) for queryset in (reported, classified, packaged)]
+    union = branches[0].union(*branches[1:], all=True)
+
+    using = router.db_for_read(ReportItem)
+    connection = connections[using]
+    union_sql, params = union.query.get_compiler(using=using).as_sql()
+    species_table = connection.ops.quote_name(ServiceSubCategory._meta.db_table)
+    category_table = connection.ops.quote_name(ServiceSubCategory._meta.get_field('category').related_model._meta.db_table)
+    sql = (
+        f"SELECT t.dimension, t.report_label, s.name, c.name, "
+        f"SUM(t.reported), SUM(t.classified), SUM(t.plates), SUM(t.cartons) "
+        f"FROM ({union_sql}) t "
+        f"LEFT JOIN {species_table} s ON s.id = t.dimension "
+        f"LEFT JOIN {category_table} c ON c.id = s.category_id "
+        f"GROUP BY t.dimension, t.report_label, s.name, c.name"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+
+    result = [
+        ReconciliationRow(dimension, labels.get(label, label), species, category, *quantities)
+        for dimension, label, species, category, *quantities in rows
+    ]
+    # Espèces de la dimension par catégorie, puis rejets, pertes et espèces sans correspondance
+    result.sort(key=lambda row: (not row.is_mapped, row.category_name or '', row.label or ''))
+    return result
@@ -0,0 +1,25 @@
+"""
+Tâches en arrière-plan de l'application operations (voir seafood.jobs)
+"""
+from seafood.jobs import PRIORITY_LOW, JobError, task
+
+from .billing import BillingError, month_period, run_billing
+
+
+@task('operations.billing_run', label='Facturation mensuelle des clients', priority=PRIORITY_LOW, max_attempts=1,
+      launchable=True, permission='operations.add_invoice')
+def billing_run(job, month=None, client_ids=None):
+    try:
+        period_start, period_end = month_period(month)
+        return run_billing(period_start, period_end, client_ids=client_ids)
+    except BillingError as e:
+        raise JobError(str(e))
+
+
+# Supprime les lots archivés des tables de travail
+@task('operations.archive_lots', label='Archivage des lots clôturés', priority=PRIORITY_LOW, max_attempts=1,
+      launchable=True, permission='operations.delete_reception')
+def archive_lots(job, days=None, limit=None):
+    from .archive import archive_horizon, archive_lots as archive
+
+    return archive(before=archive_horizon(days), limit=limit)
@@ -1,3 +1,860 @@
+from decimal import Decimal
+
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from core.testing import (
+    QueryCountTestCase, add_classification_items, add_packaging_items, add_report_items, make_classification,
+    make_client, make_packaging, make_reception, make_report, make_service, make_servicecategory, make_subcategory,
+)
+
+
+class ReceptionQueryCountTest(QueryCountTestCase):
+    """Nombre de requêtes constant des notes d'arrivée"""
+
+    def seed(self, n):
+        for i in range(n):
+            make_reception(client=make_client(), service=make_service())
+
+    def test_arrivalnote_list(self):
+        self.assertConstantQueries(reverse('portal_admin:arrivalnote_list'), self.seed)
+
+    def test_arrivalnote_add(self):
+        self.assertConstantQueries(reverse('portal_admin:arrivalnote_add'), self.seed)
+
+    def test_arrivalnote_pages(self):
+        reception = make_reception(status='draft')
+        for name in ('arrivalnote_detail', 'arrivalnote_edit', 'arrivalnote_delete'):
+            with self.subTest(name):
+                self.assertConstantQueries(reverse(f'portal_admin:{name}', args=[reception.pk]), self.seed)
+
+
+class ServiceQueryCountTest(QueryCountTestCase):
+    """Nombre de requêtes constant des services et de leurs catégories"""
+
+    def seed_services(self, n):
+        for i in range(n):
+            make_service()
+
+    def test_service_list(self):
+        self.assertConstantQueries(reverse('portal_admin:service_list'), self.seed_services)
+
+    def test_service_add(self):
+        self.assertConstantQueries(reverse('portal_admin:service_add'), self.seed_services)
+
+    def test_service_pages(self):
+        service = make_service()
+        for name in ('service_detail', 'service_edit', 'service_delete'):
+            with self.subTest(name):
+                self.assertConstantQueries(reverse(f'portal_admin:{name}', args=[service.pk]), self.seed_services)
+
+    def test_servicecategory_list(self):
+        def seed(n):
+            for i in range(n):
+                category = make_servicecategory()
+                make_subcategory(category)
+                make_service(category)
+
+        self.assertConstantQueries(reverse('portal_admin:servicecategory_list'), seed)
+
+    def test_servicecategory_add(self):
+        self.assertConstantQueries(reverse('portal_admin:servicecategory_add'), self.seed_services)
+
+    def test_servicecategory_pages(self):
+        category = make_servicecategory()
+
+        def seed(n):
+            for i in range(n):
+                make_subcategory(category)
+                make_service(category)
+
+        for name in ('servicecategory_detail', 'servicecategory_edit', 'servicecategory_delete',
+                     'servicesubcategory_add'):
+            with self.subTest(name):
+                self.assertConstantQueries(reverse(f'portal_admin:{name}', args=[category.pk]), seed)
+
+    def test_servicesubcategory_pages(self):
+        subcategory = make_subcategory()
+        for name in ('servicesubcategory_detail', 'servicesubcategory_edit', 'servicesubcategory_delete'):
+            with self.subTest(name):
+                self.assertConstantQueries(
+                    reverse(f'portal_admin:{name}', args=[subcategory.pk]), self.seed_services
+                )
+
+
+class ReportQueryCountTest(QueryCountTestCase):
+    """Nombre de requêtes constant des rapports de réception"""
+
+    def seed(self, n):
+        for i in range(n):
+            make_report(items=2)
+            make_reception()
+
+    def test_reception_report_list(self):
+        self.assertConstantQueries(reverse('portal_admin:reception_report_list'), self.seed)
+
+    def test_reception_report_add(self):
+        self.assertConstantQueries(reverse('portal_admin:reception_report_add'), self.seed)
+
+    def test_reception_report_pages(self):
+        report = make_report(status='draft')
+
+        def seed(n):
+            add_report_items(report, n)
+
+        for name in ('reception_report_detail', 'reception_report_edit', 'reception_report_delete'):
+            with self.subTest(name):
+                self.assertConstantQueries(reverse(f'portal_admin:{name}', args=[report.pk]), seed)
+
+
+class ClassificationQueryCountTest(QueryCountTestCase):
+    """Nombre de requêtes constant des classifications"""
+
+    def seed(self, n):
+        for i in range(n):
+            make_classification(items=2)
+            make_report()
+
+    def test_classification_list(self):
+        self.assertConstantQueries(reverse('portal_admin:classification_list'), self.seed)
+
+    def test_classification_add(self):
+        self.assertConstantQueries(reverse('portal_admin:classification_add'), self.seed)
+
+    def test_classification_pages(self):
+        classification = make_classification(status='draft')
+
+        def seed(n):
+            add_classification_items(classification, n)
+
+        for name in ('classification_detail', 'classification_edit', 'classification_delete'):
+            with self.subTest(name):
+                self.assertConstantQueries(reverse(f'portal_admin:{name}', args=[classification.pk]), seed)
+
+
+class PackagingQueryCountTest(QueryCountTestCase):
+    """Nombre de requêtes constant des cartonages"""
+
+    def seed(self, n):
+        for i in range(n):
+            make_packaging(items=2)
+            make_classification(items=2)
+
+    def test_packaging_list(self):
+        self.assertConstantQueries(reverse('portal_admin:packaging_list'), self.seed)
+
+    def test_packaging_add(self):
+        self.assertConstantQueries(reverse('portal_admin:packaging_add'), self.seed)
+
+    def test_packaging_pages(self):
+        packaging = make_packaging(status='draft')
+
+        def seed(n):
+            add_packaging_items(packaging, n)
+
+        for name in ('packaging_detail', 'packaging_edit', 'packaging_delete'):
+            with self.subTest(name):
+                self.assertConstantQueries(reverse(f'portal_admin:{name}', args=[packaging.pk]), seed)
+
+    def test_classification_species_api(self):
+        from django.core.cache import cache
+
+        cache.clear()
+        classification = make_classification(items=2)
+        url = reverse('portal_admin:classification_species_api', args=[classification.pk])
+
+        with CaptureQueriesContext(connection) as first:
+            response = self.client.get(url)
+        self.assertEqual(
+            [entry['pk'] for entry in response.json()['species']],
+            list(classification.items.order_by('pk').values_list('species_id', flat=True)),
+        )
+        with CaptureQueriesContext(connection) as cached:
+            self.client.get(url)
+        self.assertEqual(len(cached), len(first) - 1)
+
+        add_classification_items(classification, 1)
+        self.assertEqual(len(self.client.get(url).json()['species']), 3)
+
+        response = self.client.get(reverse('portal_admin:classification_species_api', args=[classification.pk + 1000]))
+        self.assertEqual(response.status_code, 404)
+
+
+class BillingRunTest(TestCase):
+    """Facturation mensuelle ensembliste et ré-exécutable"""
+
+    def setUp(self):
+        from operations.billing import month_period
+
+        self.period = month_period(timezone.localdate().strftime('%Y-%m'))
+
+    def run_billing(self):
+        from operations.billing import run_billing
+
+        return run_billing(*self.period)
+
+    def test_lines_and_totals(self):
+        from operations.models import Invoice
+
+        packaging = make_packaging(items=1)
+        client = packaging.classification.reception.client
+        make_reception(status='draft', client=client)
+
+        summary = self.run_billing()
+
+        self.assertEqual(summary['invoices'], 1)
+        invoice = Invoice.objects.get(client=client)
+        self.assertEqual(invoice.number, Invoice.build_number(self.period[0], client.pk))
+        # Réception 500.00 + classification 25 kg x 10.00/20 kg + cartonage 3 x 10.00
+        self.assertEqual(invoice.total, Decimal('542.50'))
+        self.assertEqual(invoice.lines_count, 3)
+        self.assertEqual(invoice.lots_count, 1)
+        self.assertEqual(sorted(invoice.lines.values_list('source', flat=True)), ['classification', 'packaging', 'reception'])
+
+    def test_rerun_is_idempotent(self):
+        from operations.models import Invoice, InvoiceLine
+
+        make_packaging(items=2)
+        issued_client = make_reception().client
+        self.run_billing()
+        Invoice.objects.filter(client=issued_client).update(status='issued')
+        make_reception(client=issued_client)
+
+        summary = self.run_billing()
+
+        self.assertEqual(summary['replaced'], 1)
+        self.assertEqual(summary['skipped'], 1)
+        self.assertEqual(Invoice.objects.count(), 2)
+        self.assertEqual(Invoice.objects.get(client=issued_client).lines_count, 1)
+        self.assertEqual(InvoiceLine.objects.count(), 5)
+
+    def test_query_count_independent_of_clients(self):
+        for i in range(3):
+            make_packaging(items=2)
+        self.run_billing()
+        with CaptureQueriesContext(connection) as small:
+            self.run_billing()
+        for i in range(20):
+            make_packaging(items=2)
+        with CaptureQueriesContext(connection) as large:
+            summary = self.run_billing()
+
+        self.assertEqual(summary['invoices'], 23)
+        self.assertEqual(len(large), len(small))
+
+
+class InvoiceQueryCountTest(QueryCountTestCase):
+    """Nombre de requêtes constant des factures"""
+
+    def seed(self, n):
+        from operations.billing import month_period, run_billing
+
+        for i in range(n):
+            make_packaging(items=2)
+        run_billing(*month_period(timezone.localdate().strftime('%Y-%m')))
+
+    def test_invoice_list(self):
+        self.assertConstantQueries(reverse('portal_admin:invoice_list'), self.seed)
+
+    def test_invoice_detail(self):
+        from operations.models import Invoice, InvoiceLine
+
+        today = timezone.localdate()
+        invoice = Invoice.objects.create(
+            number='F-TEST', client=make_client(), period_start=today.replace(day=1), period_end=today
+        )
+
+        def seed(n):
+            InvoiceLine.objects.bulk_create([
+                InvoiceLine(
+                    invoice=invoice, source='reception', source_id=i, lot_id=str(i), service_date=today,
+                    description='Réception', quantity=1, unit='lot', unit_price=Decimal('500'), amount=Decimal('500')
+                )
+                for i in range(n)
+            ])
+
+        self.assertConstantQueries(reverse('portal_admin:invoice_detail', args=[invoice.pk]), seed)
+
+
+class ArchiveLotsTest(TestCase):
+    """Archivage des lots clôturés et consultation transparente"""
+
+    @classmethod
+    def setUpTestData(cls):
+        from core.testing import make_role, make_user
+
+        cls.user = make_user(role=make_role('Administrateur'))
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def make_closed_lot(self):
+        packaging = make_packaging(items=2)
+        reception = packaging.classification.reception
+        reception.status = 'completed'
+        reception.save()
+        return packaging
+
+    def archive(self):
+        from datetime import timedelta
+        from operations.archive import archive_lots
+
+        return archive_lots(before=timezone.now() + timedelta(days=1), batch_size=2)
+
+    def test_closed_lots_are_moved(self):
+        from operations.models import ArchivedLot, Classification, ClassificationItem, Packaging, Reception, Report
+
+        packagings = [self.make_closed_lot() for i in range(3)]
+        open_lot = make_packaging(status='draft')
+        open_lot.classification.reception.status = 'completed'
+        open_lot.classification.reception.save()
+        make_reception(status='accepted')
+
+        summary = self.archive()
+
+        self.assertEqual(summary['lots'], 3)
+        self.assertEqual(summary['batches'], 2)
+        self.assertEqual(Reception.objects.count(), 2)
+        self.assertEqual(Report.objects.count(), 1)
+        self.assertEqual(Classification.objects.count(), 1)
+        self.assertEqual(Packaging.objects.get().pk, open_lot.pk)
+        self.assertEqual(ClassificationItem.objects.count(), 1)
+
+        lot = ArchivedLot.objects.get(lot_id=packagings[0].classification.reception.lot_id)
+        self.assertEqual(len(lot.snapshot['classifications'][0]['packagings'][0]['items']), 2)
+        self.assertEqual(lot.records.count(), 4)
+        self.assertEqual(self.archive()['lots'], 0)
+
+    def test_detail_views_resolve_archived_records(self):
+        packaging = self.make_closed_lot()
+        classification = packaging.classification
+        reception = classification.reception
+        report = reception.reports.get()
+        self.archive()
+
+        for name, pk, kind in (
+            ('arrivalnote_detail', reception.pk, 'reception'),
+            ('reception_report_detail', report.pk, 'report'),
+            ('classification_detail', classification.pk, 'classification'),
+            ('packaging_detail', packaging.pk, 'packaging'),
+        ):
+            with self.subTest(name):
+                response = self.client.get(reverse(f'portal_admin:{name}', args=[pk]), follow=True)
+                self.assertEqual(response.status_code, 200)
+                self.assertContains(response, f'id="{kind}-{pk}"')
+                self.assertContains(response, f"LOT {reception.lot_id}")
+
+        response = self.client.get(reverse('portal_admin:packaging_detail', args=[packaging.pk + 1000]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_lot_ids_are_not_reused(self):
+        from operations.models import Reception
+
+        lot_id = self.make_closed_lot().classification.reception.lot_id
+        self.archive()
+
+        self.assertFalse(Reception.objects.exists())
+        self.assertGreater(make_reception().lot_id, lot_id)
+
+
+class PipelineStageTest(TestCase):
+    """Étape de traitement des lots maintenue par les écritures"""
+
+    def assertStage(self, reception, stage):
+        reception.refresh_from_db(fields=['pipeline_stage'])
+        self.assertEqual(reception.pipeline_stage, stage)
+
+    def test_stage_follows_write_paths(self):
+        reception = make_reception(status='draft')
+        self.assertStage(reception, 'idle')
+
+        reception.status = 'accepted'
+        reception.save()
+        self.assertStage(reception, 'awaiting_report')
+
+        report = make_report(reception=reception, status='draft')
+        self.assertStage(reception, 'idle')
+        report.status = 'validated'
+        report.save()
+        self.assertStage(reception, 'awaiting_classification')
+
+        classification = make_classification(reception=reception, status='draft')
+        self.assertStage(reception, 'idle')
+        classification.status = 'completed'
+        classification.save()
+        self.assertStage(reception, 'awaiting_packaging')
+
+        packaging = make_packaging(classification=classification)
+        self.assertStage(reception, 'idle')
+        packaging.delete()
+        self.assertStage(reception, 'awaiting_packaging')
+
+    def test_service_without_report_is_idle(self):
+        reception = make_reception(service=make_service(code='1002'))
+        self.assertStage(reception, 'idle')
+
+    def test_add_forms_list_waiting_lots(self):
+        from core.testing import make_role, make_user
+
+        self.client.force_login(make_user(role=make_role('Administrateur')))
+        waiting = make_reception()
+        reported = make_report()
+        classified = make_classification()
+        make_packaging()
+
+        for source, expected in (
+            ('receptions-awaiting-report', waiting.pk),
+            ('receptions-awaiting-classification', reported.arrival_note_id),
+        ):
+            response = self.client.get(reverse('portal_admin:autocomplete', args=[source]))
+            self.assertEqual([result['id'] for result in response.json()['results']], [expected])
+        response = self.client.get(reverse('portal_admin:packaging_add'))
+        self.assertEqual([c.pk for c in response.context['eligible_classifications']], [classified.pk])
+
+    def test_rebuild_fixes_stale_stages(self):
+        from io import StringIO
+
+        from django.core.management import CommandError, call_command
+        from operations.models import Reception
+
+        waiting = make_reception()
+        classified = make_classification()
+        Reception.objects.update(pipeline_stage='idle')
+
+        with self.assertRaises(CommandError):
+            call_command('rebuild_pipeline_stages', '--check', stdout=StringIO())
+        call_command('rebuild_pipeline_stages', '--batch', '1', stdout=StringIO())
+        call_command('rebuild_pipeline_stages', '--check', stdout=StringIO())
+
+        self.assertStage(waiting, 'awaiting_report')
+        self.assertStage(classified.reception, 'awaiting_packaging')
+
+
+class WorkflowTransitionTest(TestCase):
+    """Transitions de statut déclarées dans operations.workflows"""
+
+    def setUp(self):
+        from core.testing import make_role, make_user
+
+        self.client.force_login(make_user(role=make_role('Administrateur')))
+
+    def test_bulk_transition_skips_refused_lots(self):
+        from operations.models import Reception
+
+        drafts = [make_reception(status='draft') for i in range(3)]
+        completed = make_reception(status='completed')
+        ids = [reception.pk for reception in drafts] + [completed.pk]
+
+        # Requêtes indépendantes du nombre de lots: verrou, UPDATE, étapes, débit horaire et archives, libellés des refus
+        with self.assertNumQueries(17):
+            response = self.client.post(
+                reverse('portal_admin:workflow_bulk_transition', args=['operations.reception']),
+                {'ids': ids, 'status': 'accepted', 'next': reverse('portal_admin:arrivalnote_list')},
+            )
+        self.assertRedirects(response, reverse('portal_admin:arrivalnote_list'), fetch_redirect_response=False)
+        self.assertEqual(
+            dict(Reception.objects.filter(pk__in=ids).values_list('pk', 'status')),
+            {**{reception.pk: 'accepted' for reception in drafts}, completed.pk: 'completed'},
+        )
+        # L'étape de traitement suit le nouveau statut
+        self.assertEqual(
+            set(Reception.objects.filter(status='accepted').values_list('pipeline_stage', flat=True)), {'awaiting_report'}
+        )
+
+    def test_bulk_transition_rejects_unsafe_next(self):
+        reception = make_reception(status='draft')
+        response = self.client.post(
+            reverse('portal_admin:workflow_bulk_transition', args=['operations.reception']),
+            {'ids': [reception.pk], 'status': 'accepted', 'next': 'https://example.com/'},
+        )
+        self.assertRedirects(response, reverse('portal_admin:index'), fetch_redirect_response=False)
+
+    def test_classification_requirements(self):
+        from datetime import timedelta
+
+        classification = make_classification(status='in_tunnel')
+        url = reverse('portal_admin:classification_change_status', args=[classification.pk])
+
+        self.client.post(url, {'status': 'completed'})
+        self.client.post(url, {'status': 'completed', 'tunnel_out': (timezone.now() + timedelta(days=1)).strftime('%Y-%m-%dT%H:%M')})
+        classification.refresh_from_db()
+        self.assertEqual(classification.status, 'in_tunnel')
+
+        self.client.post(url, {'status': 'completed', 'tunnel_out': timezone.now().strftime('%Y-%m-%dT%H:%M')})
+        classification.refresh_from_db()
+        self.assertEqual(classification.status, 'completed')
+        self.assertIsNotNone(classification.tunnel_out)
+        self.assertEqual(classification.reception.pipeline_stage, 'awaiting_packaging')
+
+        # Un statut final ne change plus
+        self.client.post(url, {'status': 'cancelled'})
+        classification.refresh_from_db()
+        self.assertEqual(classification.status, 'completed')
+
+    def test_packaging_requires_all_species(self):
+        from core.workflow import get_workflow
+        from operations.models import Packaging
+
+        classification = make_classification(items=2)
+        complete = make_packaging(classification=classification, items=0, status='draft')
+        partial = make_packaging(classification=classification, items=0, status='draft')
+        species = list(classification.items.values_list('species_id', flat=True))
+        for packaging, packaged in ((complete, species), (partial, species[:1])):
+            packaging.items.bulk_create([
+                packaging.items.model(packaging=packaging, species_id=species_id, carton_count=1) for species_id in packaged
+            ])
+
+        result = get_workflow(Packaging).bulk_transition(
+            [complete.pk, partial.pk], 'completed', {'end_datetime': timezone.now().strftime('%Y-%m-%dT%H:%M')}
+        )
+        self.assertEqual(result.applied, [complete.pk])
+        self.assertIn("n'ont pas été emballées", result.rejected[partial.pk])
+        self.assertEqual(
+            dict(Packaging.objects.values_list('pk', 'status')), {complete.pk: 'completed', partial.pk: 'draft'}
+        )
+
+    def test_transition_invalidates_open_forms(self):
+        from core.versioning import ConcurrentEditError
+
+        classification = make_classification(status='draft')
+        opened = type(classification).objects.get(pk=classification.pk)
+        self.client.post(
+            reverse('portal_admin:classification_change_status', args=[classification.pk]),
+            {'status': 'validated', 'end_datetime': timezone.now().strftime('%Y-%m-%dT%H:%M')},
+        )
+        opened.pointer_full_name = 'Autre pointeur'
+        with self.assertRaises(ConcurrentEditError):
+            opened.save(update_fields=['pointer_full_name'])
+        classification.refresh_from_db()
+        self.assertEqual((classification.status, classification.version), ('validated', 2))
+
+
+class ConcurrentEditTest(TestCase):
+    """Modifications concurrentes des documents d'opérations"""
+
+    def setUp(self):
+        from core.testing import make_role, make_user
+
+        self.client.force_login(make_user(role=make_role('Administrateur')))
+
+    def test_stale_report_edit_is_refused(self):
+        import json
+
+        from operations.models import ReportItem
+
+        report = make_report(status='draft')
+        url = reverse('portal_admin:reception_report_edit', args=[report.pk])
+
+        def post(observation):
+            return self.client.post(url, {
+                'version': 1, 'general_observation': observation, 'status': 'draft',
+                'items_data': json.dumps([{'species': 'thon', 'weight': '12.50'}]),
+            })
+
+        self.assertRedirects(post('Première saisie'), reverse('portal_admin:reception_report_detail', args=[report.pk]))
+        self.assertRedirects(post('Saisie concurrente'), url)
+
+        report.refresh_from_db()
+        self.assertEqual((report.general_observation, report.version), ('Première saisie', 2))
+        self.assertEqual(ReportItem.objects.filter(report=report).count(), 1)
+
+
+class SpeciesReconciliationTest(TestCase):
+    """Dimension espèces des rapports et rapprochement par espèce"""
+
+    def test_mapping_backfill_and_signal(self):
+        from operations.models import ReportItem, SpeciesMapping
+        from operations.species import map_report_species
+
+        sardine = make_subcategory(name='Sardine')
+        poulpe = make_subcategory(name='Poulpe de roche')
+        report = make_report(items=0)
+        ReportItem.objects.bulk_create([
+            ReportItem(report=report, species='sardine', weight=Decimal('100.00')),
+            ReportItem(report=report, species='autre', custom_species_name='  Poulpe de ROCHE ', weight=Decimal('5.00')),
+            ReportItem(report=report, species='autre', custom_species_name='Seiche', weight=Decimal('2.00')),
+            ReportItem(report=report, species='perdu', weight=Decimal('1.00')),
+        ])
+
+        result = map_report_species(batch_size=2)
+        self.assertEqual((result['created'], result['unresolved'], result['unmapped']), (2, [('autre', 'seiche')], 1))
+        self.assertEqual(
+            dict(ReportItem.objects.values_list('weight', 'mapped_species')),
+            {Decimal('100.00'): sardine.pk, Decimal('5.00'): poulpe.pk, Decimal('2.00'): None, Decimal('1.00'): None},
+        )
+
+        # Une nouvelle correspondance est appliquée aux lignes existantes
+        seiche = make_subcategory(name='Seiche commune')
+        SpeciesMapping.objects.create(report_species='autre', custom_name=' SEICHE', species=seiche)
+        self.assertEqual(ReportItem.objects.get(weight=Decimal('2.00')).mapped_species_id, seiche.pk)
+
+        # Correspondance déplacée vers une autre espèce: les lignes de l'ancienne ne la gardent pas
+        mapping = SpeciesMapping.objects.get(report_species='sardine')
+        mapping.report_species = 'perdu'
+        mapping.save()
+        self.assertEqual(
+            dict(ReportItem.objects.filter(species__in=('sardine', 'perdu')).values_list('species', 'mapped_species')),
+            {'sardine': None, 'perdu': sardine.pk},
+        )
+
+    def test_reconciliation_is_one_grouped_query(self):
+        from operations.billing import month_period
+        from operations.models import ReportItem, SpeciesMapping
+        from operations.species import apply_species_mapping, species_reconciliation
+
+        category = make_servicecategory(name='Pélagiques')
+        sardine = make_subcategory(category, name='Sardine')
+        SpeciesMapping.objects.create(report_species='sardine', species=sardine)
+        period_start, period_end = month_period(timezone.localdate().strftime('%Y-%m'))
+
+        def seed(n):
+            for i in range(n):
+                classification = make_classification(items=0)
+                ReportItem.objects.bulk_create([
+                    ReportItem(report=classification.reception.reports.get(), species=species, weight=weight)
+                    for species, weight in (('sardine', Decimal('100.00')), ('rejete', Decimal('3.00')))
+                ])
+                classification.items.create(species=sardine, plate_count=4, weight=Decimal('96.50'))
+                make_packaging(classification=classification, items=0).items.create(species=sardine, carton_count=7)
+            apply_species_mapping(ReportItem.objects.all())
+
+        seed(3)
+        with self.assertNumQueries(1):
+            rows = species_reconciliation(period_start, period_end)
+        by_label = {row.label: row for row in rows}
+
+        # Espèces de la dimension d'abord, puis les codes hors dimension
+        self.assertEqual([row.label for row in rows], ['Sardine', 'Poisson rejeté'])
+        row = by_label['Sardine']
+        # make_report ajoute une ligne sardine de 10 kg par rapport
+        self.assertEqual(
+            (row.category_name, row.reported_weight, row.classified_weight, row.plate_count, row.carton_count),
+            ('Pélagiques', Decimal('330.00'), Decimal('289.50'), 12, 21),
+        )
+        self.assertEqual(row.weight_gap, Decimal('-40.50'))
+        self.assertEqual(by_label['Poisson rejeté'].reported_weight, Decimal('9.00'))
+
+        from core.testing import make_role, make_user
+
+        self.client.force_login(make_user(role=make_role('Administrateur')))
+        response = self.client.get(reverse('portal_admin:species_reconciliation'), {'period': period_start.strftime('%Y-%m')})
+        self.assertContains(response, 'Pélagiques')
+
+
+class ThroughputTest(TestCase):
+    """Débit horaire: mise à jour incrémentale, lecture agrégée et reconstruction"""
+
+    def setUp(self):
+        from datetime import timedelta
+
+        # Une heure pleine passée (les dates des transitions ne peuvent pas être dans le futur)
+        self.hour = (timezone.now() - timedelta(days=2)).replace(minute=0, second=0, microsecond=0)
+
+    def buckets(self, stage):
+        from operations.models import ThroughputBucket
+
+        return {
+            int((hour - self.hour).total_seconds() // 3600): (weight, lots)
+            for hour, weight, lots in ThroughputBucket.objects.filter(stage=stage).values_list('hour', 'weight', 'lots')
+        }
+
+    def test_write_paths_update_hours(self):
+        from datetime import timedelta
+
+        from core.workflow import get_workflow
+        from operations.models import Classification, Reception
+
+        reception = make_reception(reception_date=self.hour + timedelta(minutes=30), weight=Decimal('1000.00'))
+        self.assertEqual(self.buckets('reception'), {0: (Decimal('1000.000'), 1)})
+
+        # Une modification (administration) déplace le lot de l'heure quittée vers la nouvelle
+        reception = Reception.objects.get(pk=reception.pk)
+        reception.reception_date = self.hour + timedelta(hours=5)
+        reception.save()
+        self.assertEqual(self.buckets('reception'), {5: (Decimal('1000.000'), 1)})
+
+        classification = make_classification(
+            reception=reception, status='draft', start_datetime=self.hour + timedelta(minutes=30),
+        )
+        self.assertEqual(self.buckets('classification'), {})
+        get_workflow(Classification).transition(
+            classification, 'validated', {'end_datetime': self.hour + timedelta(hours=2, minutes=30)},
+        )
+        # 25 kg répartis sur deux heures: 1/4, 1/2, 1/4; le lot compte à l'heure de fin
+        self.assertEqual(self.buckets('classification'), {
+            0: (Decimal('6.250'), 0), 1: (Decimal('12.500'), 0), 2: (Decimal('6.250'), 1),
+        })
+
+        get_workflow(Classification).transition(classification, 'cancelled')
+        self.assertEqual(self.buckets('classification'), {})
+
+    def test_series_is_one_query_with_downsampling(self):
+        from datetime import timedelta
+
+        from operations.models import ThroughputBucket
+        from operations.throughput import throughput_series
+
+        ThroughputBucket.objects.bulk_create([
+            ThroughputBucket(stage=stage, hour=self.hour + timedelta(hours=i), weight=Decimal('10.000'), lots=1)
+            for i in range(24 * 14) for stage in ('reception', 'tunnel')
+        ])
+        start, end = self.hour, self.hour + timedelta(days=14)
+
+        with self.assertNumQueries(1):
+            hourly = throughput_series(start, end)
+        self.assertEqual(len(hourly['periods']), 24 * 14)
+        self.assertEqual(set(hourly['series']), {'reception', 'classification', 'tunnel', 'packaging'})
+
+        with self.assertNumQueries(1):
+            daily = throughput_series(start, end, bucket='day', stages=['tunnel'])
+        self.assertEqual(list(daily['series']), ['tunnel'])
+        self.assertEqual(sum(daily['series']['tunnel']['weight']), 10.0 * 24 * 14)
+        self.assertEqual(sum(daily['series']['tunnel']['hours']), 24 * 14)
+        self.assertLessEqual(len(daily['periods']), 15)
+
+        weekly = throughput_series(start, end, bucket='week')
+        self.assertEqual(sum(weekly['series']['reception']['lots']), 24 * 14)
+
+    def test_rebuild_and_archive_keep_history(self):
+        from datetime import timedelta
+        from io import StringIO
+
+        from django.core.management import call_command
+
+        from operations.archive import _delete_hot
+        from operations.models import ThroughputBucket
+
+        classification = make_classification(
+            start_datetime=self.hour, end_datetime=self.hour + timedelta(hours=1),
+            tunnel_in=self.hour + timedelta(hours=2), tunnel_out=self.hour + timedelta(hours=4),
+        )
+        make_packaging(
+            classification=classification,
+            start_datetime=self.hour + timedelta(hours=5), end_datetime=self.hour + timedelta(hours=6),
+        )
+        # Les lignes des fabriques sont créées par bulk_create, après les documents
+        call_command('rebuild_throughput', stdout=StringIO())
+        # Sortie à l'heure pile: le lot compte dans l'heure qui commence
+        self.assertEqual(self.buckets('tunnel'), {
+            2: (Decimal('12.500'), 0), 3: (Decimal('12.500'), 0), 4: (Decimal('0.000'), 1),
+        })
+        self.assertEqual(self.buckets('packaging'), {5: (Decimal('25.000'), 0), 6: (Decimal('0.000'), 1)})
+        self.assertEqual(ThroughputBucket.objects.get(stage='packaging', lots=0).cartons, Decimal('3.000'))
+
+        snapshot = list(ThroughputBucket.objects.values_list('stage', 'hour', 'weight', 'cartons', 'lots'))
+        _delete_hot([classification.reception_id])
+        self.assertEqual(list(ThroughputBucket.objects.values_list('stage', 'hour', 'weight', 'cartons', 'lots')), snapshot)
+
+    def test_archived_lots_survive_recompute(self):
+        from datetime import timedelta
+        from io import StringIO
+
+        from django.core.management import call_command
+
+        from operations.archive import _delete_hot, _write_archive, build_snapshots
+        from operations.models import ThroughputBucket
+
+        reception = make_reception(reception_date=self.hour, status='completed')
+        classification = make_classification(
+            reception=reception, start_datetime=self.hour, end_datetime=self.hour + timedelta(hours=1),
+            tunnel_in=self.hour + timedelta(hours=2), tunnel_out=self.hour + timedelta(hours=4),
+        )
+        make_packaging(
+            classification=classification,
+            start_datetime=self.hour + timedelta(hours=5), end_datetime=self.hour + timedelta(hours=6),
+        )
+        call_command('rebuild_throughput', stdout=StringIO())
+        rows = lambda: sorted(ThroughputBucket.objects.values_list('stage', 'hour', 'weight', 'cartons', 'lots'))
+        before = rows()
+
+        # Archivé puis écrit en base d'archive: compté une seule fois tant que le lot est encore en travail
+        _write_archive(build_snapshots([classification.reception_id]))
+        call_command('rebuild_throughput', stdout=StringIO())
+        self.assertEqual(rows(), before)
+        _delete_hot([classification.reception_id])
+
+        # Une écriture dans les mêmes heures, puis la reconstruction complète, gardent le lot archivé
+        other = make_classification(
+            reception=make_reception(reception_date=self.hour + timedelta(minutes=20)),
+            start_datetime=self.hour + timedelta(minutes=30), end_datetime=self.hour + timedelta(hours=1),
+        )
+        self.assertNotEqual(rows(), before)
+        other.delete()
+        other.reception.delete()
+        self.assertEqual(rows(), before)
+        call_command('rebuild_throughput', stdout=StringIO())
+        self.assertEqual(rows(), before)
+
+    def test_api(self):
+        from core.testing import make_role, make_user
+
+        self.client.force_login(make_user(role=make_role('Administrateur')))
+        response = self.client.get(reverse('portal_admin:throughput_api'), {'bucket': 'week'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['bucket'], 'week')
+        self.assertEqual(self.client.get(reverse('portal_admin:throughput_api'), {'bucket': 'month'}).status_code, 400)
+        self.assertContains(self.client.get(reverse('portal_admin:throughput_dashboard')), 'throughputWeightChart')
+
+
+class ConditionalPageTest(TestCase):
+    """GET conditionnels des listes et détails (ETag, 304)"""
+
+    def setUp(self):
+        from core.testing import make_role, make_user
+
+        self.client.force_login(make_user(role=make_role('Administrateur')))
+
+    def get(self, url, etag=None, **params):
+        headers = {'If-None-Match': etag} if etag else {}
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params, headers=headers)
+        return response, len(queries)
+
+    def test_detail_not_modified_until_changed(self):
+        classification = make_classification()
+        url = reverse('portal_admin:classification_detail', args=[classification.pk])
+
+        response, rendered = self.get(url)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        response, revalidated = self.get(url, etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        self.assertLess(revalidated, rendered)
+
+        # Une ligne du document modifiée change le validateur
+        item = classification.items.first()
+        item.weight += 1
+        item.save()
+        response, _ = self.get(url, etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_list_validator_follows_filters_and_related_rows(self):
+        reception = make_reception(status='draft')
+        url = reverse('portal_admin:arrivalnote_list')
+
+        etag = self.get(url)[0]['ETag']
+        self.assertEqual(self.get(url, etag)[0].status_code, 304)
+        self.assertEqual(self.get(url, etag, status='draft')[0].status_code, 200)
+
+        # Client d'une ligne renommé: la liste est rendue à nouveau
+        reception.client.name = 'Client renommé'
+        reception.client.save()
+        self.assertEqual(self.get(url, etag)[0].status_code, 200)
+
+    def test_missing_object_and_pending_messages(self):
+        self.assertFalse(self.get(reverse('portal_admin:arrivalnote_detail', args=[0]))[0].has_header('ETag'))
 
-# Create your tests here.
+        reception = make_reception(status='draft')
+        url = reverse('portal_admin:arrivalnote_detail', args=[reception.pk])
+        etag = self.get(url)[0]['ETag']
+        # Transition refusée: le message est affiché par la page suivante, qui n'est pas mise en cache
+        self.client.post(reverse('portal_admin:arrivalnote_change_status', args=[reception.pk]), {'status': 'inconnu'})
+        response = self.get(url, etag)[0]
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('ETag'))
+        self.assertEqual(self.get(url, etag)[0].status_code, 304)
@@ -0,0 +1,445 @@
+"""
+Débit horaire des étapes de traitement (table ThroughputBucket).
+
+Une ligne par étape et par heure (UTC) porte le poids traité, les cartons et
+le nombre de lots terminés dans l'heure:
+
+- reception: poids des lots acceptés ou terminés, à l'heure de réception;
+- classification: poids classé (classifications validées, en tunnel ou
+  terminées), réparti au prorata du temps entre le début et la fin;
+- tunnel: poids classé, réparti entre l'entrée et la sortie du tunnel;
+- packaging: cartons et poids classé du lot (cartonages terminés), répartis
+  entre le début et la fin.
+
+Un lot est compté à l'heure où l'étape se termine. Une durée supérieure à
+MAX_SPAN (saisie erronée) n'est pas répartie: tout est compté à l'heure de fin.
+
+Les heures concernées par une écriture sont recalculées depuis les tables de
+travail et les instantanés des lots archivés (ArchivedLot, voir
+operations.archive), puis supprimées et réinsérées: signaux
+post_save/post_delete des réceptions, classifications et cartonages
+(operations.models) et hook after des workflows pour les changements de
+statut. Un lot archivé compte donc toujours dans ses heures, y compris quand
+elles sont recalculées après l'archivage ou par la commande rebuild_throughput
+(l'archivage lui-même ne recalcule rien). Les modifications des lignes d'un
+document déjà compté (administration Django) sont reprises par la commande
+rebuild_throughput.
+
+throughput_series() lit une plage quelconque, par heure, jour ou semaine, en
+une requête groupée.
+"""
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from itertools import chain
+
+from django.apps import apps as global_apps
+from django.db import models, transaction
+from django.db.models import Count, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce, Trunc
+from django.utils import timezone
+
+STAGE_RECEPTION = 'reception'
+STAGE_CLASSIFICATION = 'classification'
+STAGE_TUNNEL = 'tunnel'
+STAGE_PACKAGING = 'packaging'
+
+STAGE_CHOICES = [
+    (STAGE_RECEPTION, 'Réception'),
+    (STAGE_CLASSIFICATION, 'Classification'),
+    (STAGE_TUNNEL, 'Tunnel'),
+    (STAGE_PACKAGING, 'Cartonage'),
+]
+
+BUCKETS = ('hour', 'day', 'week')
+
+HOUR = timedelta(hours=1)
+MAX_SPAN = timedelta(hours=72)
+# Deux plages d'heures séparées de moins de MERGE_GAP sont recalculées ensemble
+MERGE_GAP = timedelta(hours=24)
+QUANTITY = Decimal('0.001')
+
+_frozen = ContextVar('throughput_frozen', default=False)
+
+
+def floor_hour(value):
+    """Début de l'heure (UTC) d'une date et heure"""
+    if timezone.is_naive(value):
+        value = timezone.make_aware(value)
+    return value.astimezone(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+
+def spread(start, end):
+    """
+    Parts [(heure, fraction)] d'une activité entre start et end, au prorata du
+    temps passé dans chaque heure. Sans fin, ou de durée nulle ou supérieure à
+    MAX_SPAN: tout à l'heure de fin (de début à défaut).
+    """
+    if end is None:
+        return [(floor_hour(start), Decimal(1))]
+    if start is None or end <= start or end - start > MAX_SPAN:
+        return [(floor_hour(end), Decimal(1))]
+    total = Decimal((end - start).total_seconds())
+    parts = []
+    hour = floor_hour(start)
+    while hour < end:
+        overlap = min(end, hour + HOUR) - max(start, hour)
+        parts.append((hour, Decimal(overlap.total_seconds()) / total))
+        hour += HOUR
+    return parts
+
+
+def hours_of(start, end):
+    """Heures touchées par une activité (voir spread)"""
+    if start is None and end is None:
+        return set()
+    return {hour for hour, fraction in spread(start, end)}
+
+
+def _total(model, field, fk, outer='pk'):
+    """Sous-requête: somme de field des lignes model dont fk est OuterRef(outer)"""
+    return Coalesce(
+        Subquery(
+            model.objects.filter(**{fk: OuterRef(outer)}).order_by().values(fk)
+            .annotate(total=Sum(field)).values('total')[:1]
+        ),
+        Decimal(0),
+        output_field=models.DecimalField(max_digits=14, decimal_places=3),
+    )
+
+
+def _decimal(value):
+    return Decimal(str(value)) if value not in (None, '') else Decimal(0)
+
+
+def _items_total(items, field):
+    """Somme de field des lignes d'un instantané (valeurs décimales sérialisées en texte)"""
+    return sum((_decimal(item[field]) for item in items), Decimal(0))
+
+
+def _archived_receptions(snapshot):
+    reception = snapshot['reception']
+    yield reception, _decimal(reception['weight']), Decimal(0)
+
+
+def _archived_classifications(snapshot):
+    for classification in snapshot['classifications']:
+        yield classification, _items_total(classification['items'], 'weight'), Decimal(0)
+
+
+def _archived_packagings(snapshot):
+    for classification in snapshot['classifications']:
+        weight = _items_total(classification['items'], 'weight')
+        for packaging in classification['packagings']:
+            yield packaging, weight, _items_total(packaging['items'], 'carton_count')
+
+
+class Source:
+    """
+    Documents d'une étape: horodatages de début et de fin, statuts comptés,
+    quantités, et documents des instantanés de lots archivés (archived)
+    """
+
+    def __init__(self, stage, model, start, end, statuses, weight=None, cartons=None, archived=None):
+        self.stage = stage
+        self.model = model
+        self.start = start
+        self.end = end
+        self.statuses = statuses
+        self.weight = weight
+        self.cartons = cartons
+        self.archived = archived
+
+    def span(self, values):
+        """(début, fin) d'un document à partir de ses valeurs {champ: valeur}"""
+        return values.get(self.start), values.get(self.end) if self.end else None
+
+    def documents(self, window_start, window_end):
+        """(début, fin, poids, cartons) des documents comptés actifs pendant la plage"""
+        queryset = self.model.objects.filter(status__in=self.statuses)
+        if self.end is None:
+            queryset = queryset.filter(**{f'{self.start}__gte': window_start, f'{self.start}__lt': window_end})
+        else:
+            queryset = queryset.filter(
+                Q(**{f'{self.start}__lt': window_end}) | Q(**{f'{self.start}__isnull': True}),
+                **{f'{self.end}__isnull': False, f'{self.end}__gte': window_start},
+            )
+        queryset = queryset.annotate(
+            throughput_weight=self.weight() if callable(self.weight) else models.F(self.weight),
+            throughput_cartons=self.cartons() if self.cartons else models.Value(0),
+        )
+        columns = [self.start, self.end] if self.end else [self.start]
+        for row in queryset.order_by().values_list(*columns, 'throughput_weight', 'throughput_cartons'):
+            if self.end:
+                yield row
+            else:
+                yield row[0], None, row[1], row[2]
+
+    def archived_documents(self, window_start, window_end):
+        """
+        (début, fin, poids, cartons) des documents comptés des lots archivés
+        pouvant toucher la plage: lots reçus avant sa fin et modifiés pour la
+        dernière fois après son début (à MAX_SPAN près, les dates de fin ne
+        pouvant pas être dans le futur lors de la saisie). Un lot encore présent
+        dans les tables de travail (archivage en cours) n'est compté qu'une fois.
+        """
+        from .archive import load_snapshot
+
+        ArchivedLot = global_apps.get_model('operations', 'ArchivedLot')
+        Reception = global_apps.get_model('operations', 'Reception')
+        lots = list(
+            ArchivedLot.objects.filter(reception_date__lt=window_end, closed_at__gte=window_start - MAX_SPAN)
+            .order_by().only('reception_id', 'snapshot')
+        )
+        if not lots:
+            return
+        hot = set(Reception.objects.filter(pk__in=[lot.reception_id for lot in lots]).values_list('pk', flat=True))
+        for lot in lots:
+            if lot.reception_id in hot:
+                continue
+            for document, weight, cartons in self.archived(load_snapshot(lot)):
+                if document['status'] in self.statuses:
+                    start, end = self.span(document)
+                    if start is not None or end is not None:
+                        yield start, end, weight, cartons
+
+
+def sources():
+    """Sources des quatre étapes"""
+    from .billing import CLASSIFICATION_STATUSES, PACKAGING_STATUSES, RECEPTION_STATUSES
+
+    Reception = global_apps.get_model('operations', 'Reception')
+    Classification = global_apps.get_model('operations', 'Classification')
+    ClassificationItem = global_apps.get_model('operations', 'ClassificationItem')
+    Packaging = global_apps.get_model('operations', 'Packaging')
+    PackagingItem = global_apps.get_model('operations', 'PackagingItem')
+
+    def classified():
+        return _total(ClassificationItem, 'weight', 'classification')
+
+    def packaged_weight():
+        return _total(ClassificationItem, 'weight', 'classification', outer='classification')
+
+    return {
+        STAGE_RECEPTION: Source(STAGE_RECEPTION, Reception, 'reception_date', None, RECEPTION_STATUSES, 'weight',
+                                archived=_archived_receptions),
+        STAGE_CLASSIFICATION: Source(STAGE_CLASSIFICATION, Classification, 'start_datetime', 'end_datetime',
+                                     CLASSIFICATION_STATUSES, classified, archived=_archived_classifications),
+        STAGE_TUNNEL: Source(STAGE_TUNNEL, Classification, 'tunnel_in', 'tunnel_out',
+                             ('in_tunnel', 'completed'), classified, archived=_archived_classifications),
+        STAGE_PACKAGING: Source(STAGE_PACKAGING, Packaging, 'start_datetime', 'end_datetime', PACKAGING_STATUSES,
+                                packaged_weight, lambda: _total(PackagingItem, 'carton_count', 'packaging'),
+                                archived=_archived_packagings),
+    }
+
+
+def compute_buckets(source, window_start, window_end):
+    """Quantités {heure: [poids, cartons, lots]} de l'étape pour les heures de la plage (lots archivés compris)"""
+    buckets = defaultdict(lambda: [Decimal(0), Decimal(0), 0])
+    documents = chain(source.documents(window_start, window_end), source.archived_documents(window_start, window_end))
+    for start, end, weight, cartons in documents:
+        weight, cartons = Decimal(weight or 0), Decimal(cartons or 0)
+        for hour, fraction in spread(start, end):
+            if window_start <= hour < window_end:
+                buckets[hour][0] += weight * fraction
+                buckets[hour][1] += cartons * fraction
+        done = floor_hour(end or start)
+        if window_start <= done < window_end:
+            buckets[done][2] += 1
+    return buckets
+
+
+def _runs(hours):
+    """Plages [début, fin) couvrant les heures données, fusionnées à moins de MERGE_GAP"""
+    runs = []
+    for hour in sorted(hours):
+        if runs and hour - runs[-1][1] < MERGE_GAP:
+            runs[-1][1] = hour + HOUR
+        else:
+            runs.append([hour, hour + HOUR])
+    return runs
+
+
+def recompute(stage, window_start, window_end):
+    """Recalcule les heures [window_start, window_end) d'une étape; retourne le nombre d'heures non vides"""
+    ThroughputBucket = global_apps.get_model('operations', 'ThroughputBucket')
+    buckets = compute_buckets(sources()[stage], window_start, window_end)
+    rows = [
+        ThroughputBucket(
+            stage=stage, hour=hour, weight=weight.quantize(QUANTITY), cartons=cartons.quantize(QUANTITY), lots=lots,
+        )
+        for hour, (weight, cartons, lots) in sorted(buckets.items())
+        if weight or cartons or lots
+    ]
+    with transaction.atomic():
+        ThroughputBucket.objects.filter(stage=stage, hour__gte=window_start, hour__lt=window_end).delete()
+        ThroughputBucket.objects.bulk_create(rows)
+    return len(rows)
+
+
+def refresh_throughput(hours_by_stage):
+    """Recalcule les heures {étape: {heures}} (sans effet dans frozen_throughput)"""
+    if _frozen.get():
+        return
+    for stage, hours in hours_by_stage.items():
+        for window_start, window_end in _runs(hours):
+            recompute(stage, window_start, window_end)
+
+
+def document_hours(model, *values):
+    """Heures {étape: {heures}} touchées par les valeurs (anciennes, nouvelles) d'un document"""
+    hours = defaultdict(set)
+    for source in sources().values():
+        if source.model is not model:
+            continue
+        for document in values:
+            if document:
+                hours[source.stage] |= hours_of(*source.span(document))
+    return hours
+
+
+_tracked = {}
+
+
+def tracked_fields(model):
+    """Champs horodatages d'un modèle source"""
+    if model not in _tracked:
+        _tracked[model] = list(dict.fromkeys(
+            field for source in sources().values() if source.model is model
+            for field in (source.start, source.end) if field
+        ))
+    return _tracked[model]
+
+
+def loaded_values(instance):
+    """Horodatages du document tels que lus en base (voir ThroughputSource.from_db)"""
+    return getattr(instance, '_throughput_loaded', None)
+
+
+def current_values(instance):
+    return {field: getattr(instance, field) for field in tracked_fields(type(instance))}
+
+
+def refresh_document(instance):
+    """Recalcule les heures quittées et occupées par un document enregistré ou supprimé"""
+    current = current_values(instance)
+    refresh_throughput(document_hours(type(instance), loaded_values(instance), current))
+    instance._throughput_loaded = current
+
+
+def refresh_documents(model, pks):
+    """Recalcule les heures des documents pks (après un changement de statut groupé; une lecture)"""
+    fields = tracked_fields(model)
+    rows = [dict(zip(fields, row)) for row in model.objects.filter(pk__in=pks).order_by().values_list(*fields)]
+    refresh_throughput(document_hours(model, *rows))
+
+
+@contextmanager
+def frozen_throughput():
+    """Les écritures du bloc ne modifient pas la série (archivage: les lots archivés comptent toujours)"""
+    token = _frozen.set(True)
+    try:
+        yield
+    finally:
+        _frozen.reset(token)
+
+
+class ThroughputSource(models.Model):
+    """Modèle abstrait: garde les horodatages lus en base pour recalculer les heures quittées"""
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        loaded = dict(zip(field_names, values))
+        fields = tracked_fields(cls)
+        if all(field in loaded for field in fields):
+            instance._throughput_loaded = {field: loaded[field] for field in fields}
+        return instance
+
+
+def rebuild_throughput(since=None, until=None, days=31):
+    """
+    Reconstruit la série de since (par défaut la première activité) à until
+    (par défaut maintenant), par tranches de days jours. Retourne {étape: heures non vides}.
+    """
+    until = floor_hour(until or timezone.now()) + HOUR
+    if since is None:
+        ArchivedLot = global_apps.get_model('operations', 'ArchivedLot')
+        firsts = [
+            source.model.objects.aggregate(first=models.Min(source.start))['first']
+            for source in sources().values()
+        ]
+        firsts.append(ArchivedLot.objects.aggregate(first=models.Min('reception_date'))['first'])
+        firsts = [value for value in firsts if value is not None]
+        if not firsts:
+            return {stage: 0 for stage, label in STAGE_CHOICES}
+        since = min(firsts)
+    # Les activités commencées avant since peuvent finir dans la première heure
+    since = floor_hour(since)
+    step = timedelta(days=days)
+
+    counts = {stage: 0 for stage, label in STAGE_CHOICES}
+    for stage in counts:
+        window_start = since
+        while window_start < until:
+            window_end = min(window_start + step, until)
+            counts[stage] += recompute(stage, window_start, window_end)
+            window_start = window_end
+    return counts
+
+
+def _as_float(value):
+    return float(value or 0)
+
+
+def throughput_series(start, end, bucket='hour', stages=None):
+    """
+    Série de [start, end) par heure, jour ou semaine (fuseau courant), en une
+    requête. Retourne {'bucket', 'periods': [ISO], 'series': {étape: {'weight',
+    'cartons', 'lots', 'hours'}}} (listes alignées sur periods; hours est le
+    nombre d'heures actives, pour le débit kg/h).
+    """
+    if bucket not in BUCKETS:
+        raise ValueError(f"Période d'agrégation invalide: {bucket}")
+    ThroughputBucket = global_apps.get_model('operations', 'ThroughputBucket')
+    stages = [stage for stage, label in STAGE_CHOICES if stages is None or stage in stages]
+
+    queryset = ThroughputBucket.objects.filter(hour__gte=start, hour__lt=end, stage__in=stages)
+    if bucket == 'hour':
+        queryset = queryset.annotate(period=models.F('hour'))
+    else:
+        queryset = queryset.annotate(period=Trunc('hour', bucket, tzinfo=timezone.get_current_timezone()))
+    rows = queryset.order_by().values('stage', 'period').annotate(
+        total_weight=Sum('weight'), total_cartons=Sum('cartons'), total_lots=Sum('lots'), active=Count('pk'),
+    ).values_list('stage', 'period', 'total_weight', 'total_cartons', 'total_lots', 'active')
+
+    by_period = defaultdict(dict)
+    for stage, period, weight, cartons, lots, active in rows:
+        by_period[period][stage] = (weight, cartons, lots, active)
+    periods = sorted(by_period)
+
+    series = {}
+    for stage in stages:
+        values = [by_period[period].get(stage, (0, 0, 0, 0)) for period in periods]
+        series[stage] = {
+            'weight': [_as_float(value[0]) for value in values],
+            'cartons': [_as_float(value[1]) for value in values],
+            'lots': [int(value[2] or 0) for value in values],
+            'hours': [int(value[3]) for value in values],
+        }
+    return {
+        'bucket': bucket,
+        'periods': [timezone.localtime(_aware(period)).isoformat() for period in periods],
+        'series': series,
+    }
+
+
+def _aware(value):
+    if isinstance(value, datetime) and timezone.is_naive(value):
+        return timezone.make_aware(value, dt_timezone.utc)
+    return value
@@ -0,0 +1,103 @@
+"""
+Statuts des notes d'arrivée, rapports de réception, classifications,
+cartonages et factures (voir core.workflow).
+"""
+from collections import defaultdict
+
+from core.workflow import Requirement, Transition, Workflow, register
+
+from .models import Classification, ClassificationItem, Invoice, Packaging, PackagingItem, Reception, Report
+from .pipeline import refresh_pipeline_stages
+from .throughput import refresh_documents
+
+
+def _refresh_receptions(pks):
+    refresh_pipeline_stages(pks)
+    refresh_documents(Reception, pks)
+
+
+def _refresh_report_receptions(pks):
+    refresh_pipeline_stages(Report.objects.filter(pk__in=pks).values_list('arrival_note_id', flat=True))
+
+
+def _refresh_classification_receptions(pks):
+    refresh_pipeline_stages(Classification.objects.filter(pk__in=pks).values_list('reception_id', flat=True))
+    refresh_documents(Classification, pks)
+
+
+def _refresh_packaging_receptions(pks):
+    refresh_pipeline_stages(
+        classification_ids=Packaging.objects.filter(pk__in=pks).values_list('classification_id', flat=True)
+    )
+    refresh_documents(Packaging, pks)
+
+
+def all_species_packaged(packagings):
+    """Garde: toutes les espèces de la classification doivent être emballées (deux requêtes)"""
+    expected = defaultdict(dict)
+    rows = ClassificationItem.objects.filter(classification__packagings__in=packagings).values_list(
+        'classification__packagings', 'species_id', 'species__name'
+    )
+    for packaging_id, species_id, species_name in rows:
+        expected[packaging_id][species_id] = species_name
+    packaged = set(PackagingItem.objects.filter(packaging__in=packagings).values_list('packaging_id', 'species_id'))
+
+    refused = {}
+    for packaging_id, species in expected.items():
+        missing = [name for species_id, name in species.items() if (packaging_id, species_id) not in packaged]
+        if missing:
+            refused[packaging_id] = (
+                "Impossible de terminer le cartonage. Les espèces suivantes n'ont pas été emballées : "
+                + ', '.join(sorted(missing))
+            )
+    return refused
+
+
+# Un lot ne revient jamais en brouillon; un lot terminé ne change plus de statut
+register(Workflow(Reception, [
+    Transition(('draft', 'suspended', 'cancelled'), 'accepted'),
+    Transition(('draft', 'accepted', 'suspended', 'cancelled'), 'completed'),
+    Transition(('draft', 'accepted', 'cancelled'), 'suspended'),
+    Transition(('draft', 'accepted', 'suspended'), 'cancelled'),
+], after=_refresh_receptions, label_field='lot_id'))
+
+# Un rapport validé ne change plus de statut
+register(Workflow(Report, [
+    Transition('cancelled', 'draft'),
+    Transition(('draft', 'cancelled'), 'validated'),
+    Transition('draft', 'cancelled'),
+], after=_refresh_report_receptions))
+
+# Statuts séquentiels: brouillon -> validé -> en tunnel -> terminé (annulation possible avant la fin)
+register(Workflow(Classification, [
+    Transition('draft', 'validated', requires=[
+        Requirement('end_datetime', 'La date et heure de fin',
+                    'La date et heure de fin est requise pour valider la classification'),
+    ]),
+    Transition('validated', 'in_tunnel', requires=[
+        Requirement('reference_chambre', 'La référence de la chambre',
+                    'La référence de la chambre est requise pour mettre en tunnel'),
+        Requirement('tunnel_in', "La date et heure d'entrée",
+                    "La date et heure d'entrée est requise pour mettre en tunnel"),
+    ]),
+    Transition('in_tunnel', 'completed', requires=[
+        Requirement('tunnel_out', 'La date et heure de sortie',
+                    'La date et heure de sortie est requise pour terminer la classification'),
+    ]),
+    Transition(('draft', 'validated', 'in_tunnel'), 'cancelled'),
+], after=_refresh_classification_receptions))
+
+register(Workflow(Packaging, [
+    Transition('draft', 'completed', requires=[
+        Requirement('end_datetime', 'End date and time',
+                    'End date and time is required to complete the packaging',
+                    'End date and time cannot be in the future'),
+    ], guard=all_species_packaged),
+    Transition('draft', 'cancelled'),
+], after=_refresh_packaging_receptions))
+
+# Une facture émise n'est plus modifiée par la facturation; elle peut seulement être annulée
+register(Workflow(Invoice, [
+    Transition('draft', 'issued'),
+    Transition(('draft', 'issued'), 'cancelled'),
+], label_field='number'))
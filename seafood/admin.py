@@ -2,7 +2,7 @@ from django.contrib import admin
 from django.contrib.admin import AdminSite
 from django.urls import path
 from . import views
-from .models import Cashbox, BankAccount, PurchaseRequest, PurchaseRequestItem, PurchaseOrder, PurchaseOrderItem, CashboxTransaction, Prospect
+from .models import Cashbox, BankAccount, PurchaseRequest, PurchaseRequestItem, PurchaseOrder, PurchaseOrderItem, CashboxTransaction, Prospect, ExchangeRate, BackgroundJob
 
 # Custom Portal Admin Site
 class PortalAdminSite(AdminSite):
@@ -35,6 +35,8 @@ class PortalAdminSite(AdminSite):
             path('suppliers/<int:pk>/', views.supplier_detail, name='supplier_detail'),
             path('suppliers/<int:pk>/edit/', views.supplier_edit, name='supplier_edit'),
             path('suppliers/<int:pk>/delete/', views.supplier_delete, name='supplier_delete'),
+            path('suppliers/scorecard/', views.supplier_scorecard, name='supplier_scorecard'),
+            path('suppliers/scorecard/api/', views.supplier_scorecard_api, name='supplier_scorecard_api'),
 
             # Cashbox
             path('cashbox/', views.cashbox_list, name='cashbox_list'),
@@ -48,6 +50,7 @@ class PortalAdminSite(AdminSite):
             # Bank Account
             path('bankaccount/', views.bankaccount_list, name='bankaccount_list'),
             path('bankaccount/add/', views.bankaccount_add, name='bankaccount_add'),
+            path('bankaccount/consolidation/', views.bankaccount_consolidation, name='bankaccount_consolidation'),
             path('bankaccount/<int:pk>/', views.bankaccount_detail, name='bankaccount_detail'),
             path('bankaccount/<int:pk>/edit/', views.bankaccount_edit, name='bankaccount_edit'),
             path('bankaccount/<int:pk>/delete/', views.bankaccount_delete, name='bankaccount_delete'),
@@ -56,6 +59,7 @@ class PortalAdminSite(AdminSite):
             # Purchase Request
             path('purchaserequest/', views.purchaserequest_list, name='purchaserequest_list'),
             path('purchaserequest/add/', views.purchaserequest_add, name='purchaserequest_add'),
+            path('purchaserequest/batch-approve/', views.purchaserequest_batch_approve, name='purchaserequest_batch_approve'),
             path('purchaserequest/<int:pk>/', views.purchaserequest_detail, name='purchaserequest_detail'),
             path('purchaserequest/<int:pk>/edit/', views.purchaserequest_edit, name='purchaserequest_edit'),
             path('purchaserequest/<int:pk>/approve/', views.purchaserequest_approve, name='purchaserequest_approve'),
@@ -72,10 +76,18 @@ class PortalAdminSite(AdminSite):
             path('purchaseorder/<int:pk>/reject/', views.purchaseorder_reject, name='purchaseorder_reject'),
             path('purchaseorder/<int:pk>/pay/', views.purchaseorder_pay, name='purchaseorder_pay'),
             path('purchaseorder/<int:pk>/cancel/', views.purchaseorder_cancel, name='purchaseorder_cancel'),
+            path('purchaseorder/spend/', views.spend_analysis, name='spend_analysis'),
+            path('purchaseorder/spend/api/', views.spend_api, name='spend_api'),
 
             # Prospects
             path('prospects/', views.prospect_list, name='prospect_list'),
             path('prospects/add/', views.prospect_add, name='prospect_add'),
+            path('prospects/import/', views.prospect_import, name='prospect_import'),
+            path('prospects/import/jobs/<int:pk>/', views.prospect_import_status, name='prospect_import_status'),
+            path('prospects/import/<str:name>/', views.prospect_import_report, name='prospect_import_report'),
+            path('prospects/followups/', views.prospect_followups, name='prospect_followups'),
+            path('prospects/followups/api/', views.prospect_followups_api, name='prospect_followups_api'),
+            path('prospects/followups/send/', views.prospect_followups_send, name='prospect_followups_send'),
             path('prospects/<int:pk>/', views.prospect_detail, name='prospect_detail'),
             path('prospects/<int:pk>/edit/', views.prospect_edit, name='prospect_edit'),
             path('prospects/<int:pk>/delete/', views.prospect_delete, name='prospect_delete'),
@@ -135,6 +147,40 @@ class PortalAdminSite(AdminSite):
             path('packagings/<int:pk>/edit/', views.packaging_edit, name='packaging_edit'),
             path('packagings/<int:pk>/delete/', views.packaging_delete, name='packaging_delete'),
             path('packagings/<int:pk>/change-status/', views.packaging_change_status, name='packaging_change_status'),
+            path('classifications/<int:pk>/species/', views.classification_species_api, name='classification_species_api'),
+
+            # Invoices (Facturation)
+            path('invoices/', views.invoice_list, name='invoice_list'),
+            path('invoices/run/', views.billing_run, name='billing_run'),
+            path('invoices/<int:pk>/', views.invoice_detail, name='invoice_detail'),
+            path('invoices/<int:pk>/change-status/', views.invoice_change_status, name='invoice_change_status'),
+            path('reconciliation/species/', views.species_reconciliation, name='species_reconciliation'),
+            path('throughput/', views.throughput_dashboard, name='throughput_dashboard'),
+            path('throughput/api/', views.throughput_api, name='throughput_api'),
+
+            # Archived lots (Lots archivés)
+            path('lots-archives/', views.archived_lot_list, name='archived_lot_list'),
+            path('lots-archives/<int:pk>/', views.archived_lot_detail, name='archived_lot_detail'),
+
+            # Documents (PDF)
+            path('documents/<str:kind>/<int:pk>.pdf', views.document_pdf, name='document_pdf'),
+
+            # Duplicates (Doublons)
+            path('duplicates/<slug:kind>/', views.duplicate_list, name='duplicate_list'),
+            path('duplicates/<slug:kind>/scan/', views.duplicate_scan, name='duplicate_scan'),
+            path('duplicates/<slug:kind>/merge/', views.duplicate_merge, name='duplicate_merge'),
+
+            # Background Jobs
+            path('jobs/', views.job_list, name='job_list'),
+            path('jobs/enqueue/', views.job_enqueue, name='job_enqueue'),
+            path('jobs/<int:pk>/', views.job_detail, name='job_detail'),
+            path('jobs/<int:pk>/status/', views.job_status_api, name='job_status_api'),
+            path('jobs/<int:pk>/retry/', views.job_retry, name='job_retry'),
+            path('jobs/<int:pk>/cancel/', views.job_cancel, name='job_cancel'),
+
+            # Autocomplete
+            path('autocomplete/<slug:source>/', views.autocomplete, name='autocomplete'),
+            path('workflows/<str:model>/bulk-transition/', views.workflow_bulk_transition, name='workflow_bulk_transition'),
         ]
         return custom_urls + urls
 
@@ -336,6 +382,21 @@ class ProspectAdmin(admin.ModelAdmin):
         super().save_model(request, obj, form, change)
 
 
+class ExchangeRateAdmin(admin.ModelAdmin):
+    list_display = ['currency', 'rate_date', 'rate', 'source', 'updated_at']
+    list_filter = ['currency', 'rate_date']
+    search_fields = ['currency', 'source']
+    readonly_fields = ['created_at', 'updated_at']
+
+
+class BackgroundJobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'name', 'status', 'priority', 'attempts', 'run_at', 'finished_at', 'created_by']
+    list_filter = ['status', 'name', 'priority']
+    search_fields = ['name', 'locked_by', 'last_error']
+    readonly_fields = ['attempts', 'locked_by', 'locked_at', 'started_at', 'finished_at', 'result', 'last_error',
+                       'created_by', 'created_at', 'updated_at']
+
+
 # Register models on portal admin site
 portal_admin_site.register(Cashbox, CashboxAdmin)
 portal_admin_site.register(BankAccount, BankAccountAdmin)
@@ -345,3 +406,5 @@ portal_admin_site.register(PurchaseOrder, PurchaseOrderAdmin)
 portal_admin_site.register(PurchaseOrderItem, PurchaseOrderItemAdmin)
 portal_admin_site.register(CashboxTransaction, CashboxTransactionAdmin)
 portal_admin_site.register(Prospect, ProspectAdmin)
+portal_admin_site.register(ExchangeRate, ExchangeRateAdmin)
+portal_admin_site.register(BackgroundJob, BackgroundJobAdmin)
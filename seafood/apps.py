@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class SeafoodConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'seafood'
+
+    def ready(self):
+        # Sources d'autocomplete: connecte les signaux d'invalidation de leur cache
+        from . import autocomplete  # noqa: F401
@@ -0,0 +1,168 @@
+"""
+Recherche progressive (autocomplete) des listes de sélection des formulaires.
+
+Les formulaires ne rendent plus toutes les lignes candidates en <option>: le
+champ <select data-autocomplete="url"> est alimenté par l'API autocomplete
+(static/assets/js/autocomplete.js) au fil de la saisie. Chaque source déclare:
+
+- son queryset de candidats (clients actifs, lots en attente de rapport, ...);
+- ses colonnes de recherche, interrogées par préfixe (LIKE 'x%') sur des
+  colonnes indexées;
+- le libellé et les attributs data-* de ses options.
+
+Une page contient au plus PAGE_SIZE résultats. Les pages des données de
+référence sont mises en cache sous une version de la table (nombre de lignes et
+dernière modification, relue à chaque requête comme seafood.currency._rates_version):
+toute écriture, quel que soit le processus ou le worker qui la fait, change la
+clé même si le cache est propre à chaque processus. Les listes de travail, qui
+changent avec l'avancement des lots, ne sont pas mises en cache.
+"""
+import hashlib
+
+from django.core.cache import cache
+from django.db.models import Count, Max, Q
+
+from operations.models import Reception, Service
+from operations.pipeline import STAGE_AWAITING_CLASSIFICATION, STAGE_AWAITING_REPORT
+
+from .models import BankAccount, Cashbox, Client, Supplier
+
+PAGE_SIZE = 20
+CACHE_TIMEOUT = 10 * 60
+
+_sources = {}
+
+
+class AutocompleteSource:
+    """Source de résultats d'une liste de sélection"""
+
+    def __init__(self, name, model, permissions, search_fields, label, queryset=None, data=None,
+                 order_by=None, cached=True):
+        self.name = name
+        self.model = model
+        self.permissions = permissions
+        self.search_fields = search_fields
+        self.label = label
+        self.queryset = queryset or (lambda: model.objects.all())
+        self.data = data
+        self.order_by = order_by or search_fields[:1]
+        self.cached = cached
+
+    def has_permission(self, user):
+        return any(user.has_perm(permission) for permission in self.permissions)
+
+    def search(self, term):
+        """Au plus PAGE_SIZE + 1 candidats commençant par term (une requête)"""
+        queryset = self.queryset()
+        if term:
+            lookup = Q()
+            for field in self.search_fields:
+                lookup |= Q(**{f'{field}__istartswith': term})
+            queryset = queryset.filter(lookup)
+        return list(queryset.order_by(*self.order_by)[:PAGE_SIZE + 1])
+
+    def page(self, term):
+        """Page de résultats sérialisable en JSON: {'results': [...], 'more': bool}"""
+        term = term.strip()[:100]
+        cache_key = None
+        if self.cached:
+            cache_key = f"autocomplete:{self.name}:{self.generation()}:" + hashlib.md5(term.lower().encode()).hexdigest()
+            page = cache.get(cache_key)
+            if page is not None:
+                return page
+
+        rows = self.search(term)
+        page = {
+            'results': [
+                {'id': obj.pk, 'text': self.label(obj), 'data': self.data(obj) if self.data else {}}
+                for obj in rows[:PAGE_SIZE]
+            ],
+            'more': len(rows) > PAGE_SIZE,
+        }
+        if cache_key:
+            cache.set(cache_key, page, CACHE_TIMEOUT)
+        return page
+
+    def generation(self):
+        """Empreinte de la table (change dès qu'une ligne est ajoutée, modifiée ou supprimée)"""
+        stats = self.model.objects.aggregate(count=Count('pk'), last=Max('updated_at'))
+        return f"{stats['count']}:{stats['last'].timestamp() if stats['last'] else 0}"
+
+
+def register(source):
+    _sources[source.name] = source
+    return source
+
+
+def get_source(name):
+    return _sources.get(name)
+
+
+def _reception_data(reception):
+    return {
+        'client': reception.client.name,
+        'weight': reception.weight,
+        'service': reception.service_type.name,
+        'category-id': reception.service_type.category_id,
+    }
+
+
+register(AutocompleteSource(
+    'clients', Client,
+    permissions=('seafood.view_client', 'operations.add_reception', 'operations.change_reception'),
+    search_fields=('name', 'accounting_code'),
+    queryset=lambda: Client.objects.filter(status='active'),
+    label=lambda client: f"{client.name} ({client.accounting_code})",
+))
+register(AutocompleteSource(
+    'suppliers', Supplier,
+    permissions=(
+        'seafood.view_supplier', 'seafood.add_purchaseorder', 'seafood.change_purchaseorder',
+        'seafood.change_purchaserequest',
+    ),
+    search_fields=('name', 'accounting_code'),
+    queryset=lambda: Supplier.objects.filter(status='active'),
+    label=lambda supplier: f"{supplier.accounting_code} - {supplier.name}",
+))
+register(AutocompleteSource(
+    'services', Service,
+    permissions=('operations.view_service', 'operations.add_reception', 'operations.change_reception'),
+    search_fields=('code', 'name'),
+    queryset=lambda: Service.objects.filter(status='active'),
+    label=lambda service: f"{service.code} - {service.name}",
+))
+register(AutocompleteSource(
+    'bank-accounts', BankAccount,
+    permissions=('seafood.view_bankaccount', 'seafood.change_purchaseorder'),
+    search_fields=('bank_identifier', 'bank_name'),
+    queryset=lambda: BankAccount.objects.filter(status='active'),
+    label=lambda bank: f"{bank.bank_identifier} - {bank.bank_name}",
+))
+register(AutocompleteSource(
+    'cashboxes', Cashbox,
+    permissions=('seafood.view_cashbox', 'seafood.change_purchaseorder'),
+    search_fields=('folder_code', 'prefix'),
+    label=lambda cashbox: f"{cashbox.folder_code} - {cashbox.description}",
+))
+register(AutocompleteSource(
+    'receptions-awaiting-report', Reception,
+    permissions=('operations.add_report',),
+    search_fields=('lot_id', 'client__name'),
+    queryset=lambda: Reception.objects.filter(pipeline_stage=STAGE_AWAITING_REPORT).select_related('client', 'service_type'),
+    order_by=('-reception_date',),
+    label=lambda reception: f"LOT #{reception.lot_id} - {reception.weight} kg",
+    data=_reception_data,
+    cached=False,
+))
+register(AutocompleteSource(
+    'receptions-awaiting-classification', Reception,
+    permissions=('operations.add_classification',),
+    search_fields=('lot_id', 'client__name'),
+    queryset=lambda: Reception.objects.filter(
+        pipeline_stage=STAGE_AWAITING_CLASSIFICATION
+    ).select_related('client', 'service_type'),
+    order_by=('-reception_date',),
+    label=lambda reception: f"{reception.client.name} - LOT #{reception.lot_id}",
+    data=_reception_data,
+    cached=False,
+))
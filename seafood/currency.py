@@ -0,0 +1,177 @@
+import csv
+import hashlib
+import json
+from datetime import date
+from decimal import Decimal
+from functools import lru_cache
+
+from django.core.cache import cache
+from django.db.models import Count, Max, Sum
+from django.utils import timezone
+
+from .models import BankAccount, Cashbox, ExchangeRate
+
+BASE_CURRENCY = 'MRU'
+CENT = Decimal('0.01')
+CONSOLIDATION_CACHE_TIMEOUT = 60 * 60
+
+
+def _rates_version():
+    """Empreinte de la table des taux (change dès qu'un taux est ajouté ou modifié)"""
+    stats = ExchangeRate.objects.aggregate(count=Count('id'), last=Max('updated_at'))
+    return f"{stats['count']}:{stats['last'].timestamp() if stats['last'] else 0}"
+
+
+@lru_cache(maxsize=4096)
+def _cached_rate(currency, on_date, version):
+    rate = (
+        ExchangeRate.objects
+        .filter(currency=currency, rate_date__lte=on_date)
+        .order_by('-rate_date')
+        .values_list('rate', flat=True)
+        .first()
+    )
+    return rate
+
+
+def get_rate(currency, on_date=None, version=None):
+    """
+    Retourne le taux (en MRU) d'une devise à une date donnée, ou None si inconnu.
+    Le dernier taux connu à la date est utilisé. Les résultats sont mis en cache
+    (LRU) par (devise, date, version de la table des taux).
+    """
+    if currency == BASE_CURRENCY:
+        return Decimal('1')
+    if on_date is None:
+        on_date = timezone.localdate()
+    if version is None:
+        version = _rates_version()
+    return _cached_rate(currency, on_date, version)
+
+
+def load_rates_file(path):
+    """
+    Charge un fichier de taux (CSV: currency,date,rate ou JSON: liste d'objets)
+    et retourne le nombre de taux créés et mis à jour.
+    """
+    if str(path).lower().endswith('.json'):
+        with open(path, encoding='utf-8') as f:
+            rows = json.load(f)
+    else:
+        with open(path, encoding='utf-8', newline='') as f:
+            rows = list(csv.DictReader(f))
+
+    valid_currencies = {code for code, label in BankAccount.CURRENCY_CHOICES}
+    parsed = {}
+    for row in rows:
+        currency = (row.get('currency') or '').strip().upper()
+        if currency not in valid_currencies:
+            raise ValueError(f"Devise inconnue: {currency!r}")
+        rate_date = date.fromisoformat(str(row.get('date')).strip())
+        parsed[(currency, rate_date)] = Decimal(str(row.get('rate')).strip())
+
+    existing = {
+        (rate.currency, rate.rate_date): rate
+        for rate in ExchangeRate.objects.filter(
+            currency__in={currency for currency, rate_date in parsed},
+            rate_date__in={rate_date for currency, rate_date in parsed},
+        )
+    }
+
+    now = timezone.now()
+    to_create = []
+    to_update = []
+    for (currency, rate_date), value in parsed.items():
+        rate = existing.get((currency, rate_date))
+        if rate is None:
+            to_create.append(ExchangeRate(currency=currency, rate_date=rate_date, rate=value, source=str(path)))
+        elif rate.rate != value:
+            rate.rate = value
+            rate.source = str(path)
+            rate.updated_at = now
+            to_update.append(rate)
+
+    ExchangeRate.objects.bulk_create(to_create, batch_size=1000)
+    ExchangeRate.objects.bulk_update(to_update, ['rate', 'source', 'updated_at'], batch_size=1000)
+    return len(to_create), len(to_update)
+
+
+def _balances_version():
+    """Empreinte des soldes des comptes bancaires et des caisses"""
+    parts = []
+    for model in (BankAccount, Cashbox):
+        stats = model.objects.aggregate(count=Count('id'), last=Max('updated_at'), total=Sum('current_balance'))
+        parts.append(f"{stats['count']}:{stats['last'].timestamp() if stats['last'] else 0}:{stats['total']}")
+    return '|'.join(parts)
+
+
+def consolidate_balances(on_date=None):
+    """
+    Consolide les soldes de tous les comptes bancaires (hors comptes fermés) et
+    des caisses en MRU. Les soldes sont lus en une seule requête par table, les
+    taux une seule fois par devise, puis la conversion est faite en un passage.
+    Le résultat est mis en cache tant que les taux et les soldes ne changent pas.
+    """
+    if on_date is None:
+        on_date = timezone.localdate()
+
+    rates_version = _rates_version()
+    fingerprint = f"{on_date.isoformat()}|{rates_version}|{_balances_version()}"
+    cache_key = 'seafood:consolidation:' + hashlib.md5(fingerprint.encode()).hexdigest()
+    result = cache.get(cache_key)
+    if result is not None:
+        return result
+
+    accounts = list(
+        BankAccount.objects
+        .exclude(status='closed')
+        .order_by('currency', 'bank_identifier')
+        .values('pk', 'bank_identifier', 'bank_name', 'account_number', 'currency', 'current_balance')
+    )
+    cashboxes = list(
+        Cashbox.objects
+        .order_by('prefix')
+        .values('pk', 'prefix', 'folder_code', 'current_balance')
+    )
+
+    rates = {
+        currency: get_rate(currency, on_date, rates_version)
+        for currency in {account['currency'] for account in accounts}
+    }
+
+    by_currency = {}
+    for account in accounts:
+        rate = rates[account['currency']]
+        account['rate'] = rate
+        account['converted'] = (account['current_balance'] * rate).quantize(CENT) if rate is not None else None
+        group = by_currency.setdefault(account['currency'], {
+            'currency': account['currency'],
+            'rate': rate,
+            'count': 0,
+            'balance': Decimal('0'),
+            'converted': Decimal('0') if rate is not None else None,
+        })
+        group['count'] += 1
+        group['balance'] += account['current_balance']
+        if rate is not None:
+            group['converted'] += account['converted']
+
+    bank_total = sum(
+        (group['converted'] for group in by_currency.values() if group['converted'] is not None),
+        Decimal('0')
+    )
+    cashbox_total = sum((cashbox['current_balance'] for cashbox in cashboxes), Decimal('0'))
+
+    result = {
+        'date': on_date,
+        'base_currency': BASE_CURRENCY,
+        'accounts': accounts,
+        'cashboxes': cashboxes,
+        'currencies': sorted(by_currency.values(), key=lambda group: group['currency']),
+        'missing_rates': sorted(currency for currency, rate in rates.items() if rate is None),
+        'bank_total': bank_total,
+        'cashbox_total': cashbox_total,
+        'total': bank_total + cashbox_total,
+    }
+    cache.set(cache_key, result, CONSOLIDATION_CACHE_TIMEOUT)
+    return result
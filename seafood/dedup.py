@@ -0,0 +1,371 @@
+"""
+Détection et fusion des doublons de clients, fournisseurs et prospects.
+
+Les fiches sont saisies à la main: "SARL Pêcherie du Nord" et "pecherie nord
+sarl" désignent la même entreprise. Comparer toutes les paires est en O(n²);
+la détection passe donc par des clés de blocage enregistrées et indexées sur
+les lignes (voir DedupSource), calculées depuis le nom normalisé (minuscules,
+sans accents, formes juridiques et mots vides retirés, mots triés):
+
+- dedup_phonetic: squelette phonétique du nom ("mohamed", "mohammed" et
+  "muhamed" donnent "md");
+- dedup_prefix: n-gramme, les 4 premières lettres du mot le plus long.
+
+Seules les fiches d'un même bloc (même valeur de l'une des clés) sont
+comparées: similarité des noms normalisés, augmentée par les identifiants
+identiques (email, portable, NIF, registre de commerce). Un bloc de plus de
+MAX_BLOCK fiches (nom trop commun) est ignoré et compté. La vérification d'une
+nouvelle fiche (possible_duplicates) lit ses deux blocs par index: O(taille
+du bloc).
+
+La fusion (merge_records) garde une fiche, complète ses champs vides depuis
+les doublons, rattache en masse les lignes qui les référencent (réceptions,
+factures, bons de commande...) puis supprime les doublons. La recherche et la
+fusion sont exécutées en arrière-plan (tâches seafood.find_duplicates et
+seafood.merge_duplicates).
+"""
+import re
+from collections import defaultdict
+from difflib import SequenceMatcher
+
+from django.apps import apps as global_apps
+from django.db import IntegrityError, models, transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from .spend import canonical_designation
+
+MAX_BLOCK = 200
+KEY_BATCH = 2000
+BLOCK_BATCH = 500
+THRESHOLD = 0.85
+MAX_CANDIDATES = 500
+IDENTIFIER_BONUS = 0.1
+
+# Formes juridiques et mots vides ignorés pour le blocage et la comparaison
+STOPWORDS = {
+    'sarl', 'sarlu', 'suarl', 'sa', 'sas', 'sasu', 'eurl', 'gie', 'snc', 'ets', 'etablissement',
+    'etablissements', 'ste', 'societe', 'cie', 'compagnie', 'groupe', 'group', 'ltd', 'inc', 'co',
+    'et', 'de', 'du', 'des', 'la', 'le', 'les', 'l', 'd', 'and', 'the',
+}
+
+_phonetic_rules = [
+    (re.compile(r'ph'), 'f'), (re.compile(r'qu|ck|q|c(?=[aou])|k'), 'k'), (re.compile(r'c'), 's'),
+    (re.compile(r'z'), 's'), (re.compile(r'w'), 'v'), (re.compile(r'h'), ''),
+]
+_vowels = re.compile(r'(?<!^)[aeiouy]')
+_repeats = re.compile(r'(.)\1+')
+
+
+class MergeError(Exception):
+    """Fusion refusée (fiche introuvable ou lignes rattachées en conflit)"""
+
+
+def name_tokens(name):
+    """Mots significatifs triés d'un nom (tous les mots s'il n'y a que des mots vides)"""
+    tokens = canonical_designation(name).split()
+    return sorted(token for token in tokens if token not in STOPWORDS) or sorted(tokens)
+
+
+def phonetic(token):
+    """Squelette phonétique d'un mot: première lettre, consonnes rapprochées, sans voyelles ni répétitions"""
+    for pattern, replacement in _phonetic_rules:
+        token = pattern.sub(replacement, token)
+    return _repeats.sub(r'\1', _vowels.sub('', token))
+
+
+def blocking_keys(name):
+    """Clés de blocage (phonétique, n-gramme) d'un nom"""
+    tokens = name_tokens(name)
+    if not tokens:
+        return '', ''
+    longest = max(tokens, key=lambda token: (len(token), [-ord(char) for char in token]))
+    return ''.join(phonetic(token) for token in tokens)[:20], longest[:4]
+
+
+def normalize_phone(value):
+    digits = re.sub(r'\D', '', value or '')
+    return digits[-8:] if len(digits) >= 8 else ''
+
+
+def normalize_identifier(field, value):
+    if field in ('mobile', 'phone', 'contact_phone', 'office_number'):
+        return normalize_phone(value)
+    return ' '.join((value or '').lower().split())
+
+
+class DedupSource(models.Model):
+    """
+    Modèle abstrait: clés de blocage indexées, recalculées par save() depuis
+    les champs dedup_name_fields
+    """
+    dedup_name_fields = ('name',)
+    dedup_identifiers = ()
+
+    dedup_phonetic = models.CharField(max_length=20, blank=True, db_index=True, editable=False, verbose_name='Clé phonétique')
+    dedup_prefix = models.CharField(max_length=4, blank=True, db_index=True, editable=False, verbose_name='Clé n-gramme')
+
+    class Meta:
+        abstract = True
+
+    def dedup_name(self):
+        return ' '.join(str(getattr(self, field) or '') for field in self.dedup_name_fields)
+
+    def set_dedup_keys(self):
+        self.dedup_phonetic, self.dedup_prefix = blocking_keys(self.dedup_name())
+
+    def save(self, *args, **kwargs):
+        self.set_dedup_keys()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and set(update_fields) & set(self.dedup_name_fields):
+            kwargs['update_fields'] = set(update_fields) | {'dedup_phonetic', 'dedup_prefix'}
+        super().save(*args, **kwargs)
+
+
+class DedupSpec:
+    """Fiche dédoublonnée: modèle, libellé, champs comparés et lignes dérivées"""
+
+    def __init__(self, kind, model_name, label, display_fields, derived=(), after_merge=None):
+        self.kind = kind
+        self.model_name = model_name
+        self.label = label
+        self.display_fields = display_fields
+        # Lignes calculées supprimées avec les doublons (contraintes d'unicité) puis recalculées
+        self.derived = derived
+        self.after_merge = after_merge
+
+    @property
+    def model(self):
+        return global_apps.get_model('seafood', self.model_name)
+
+    @property
+    def permission(self):
+        return f'seafood.change_{self.model_name.lower()}'
+
+    @property
+    def merge_permission(self):
+        # La fusion supprime les doublons
+        return f'seafood.delete_{self.model_name.lower()}'
+
+
+def _refresh_supplier_rollups(keep, duplicate_ids, months):
+    from .supplier_stats import refresh_purchase_rollups
+
+    refresh_purchase_rollups({(keep.pk, month) for month in months})
+
+
+def _archived_client(keep, duplicate_ids, months):
+    # Lots archivés (base d'archive éventuellement distincte): simple identifiant, hors transaction
+    ArchivedLot = global_apps.get_model('operations', 'ArchivedLot')
+    ArchivedLot.objects.filter(client_id__in=duplicate_ids).update(client_id=keep.pk, client_name=keep.name)
+
+
+SPECS = {
+    'client': DedupSpec(
+        'client', 'Client', 'Clients', ('accounting_code', 'name', 'email', 'mobile', 'city'),
+        after_merge=_archived_client,
+    ),
+    'supplier': DedupSpec(
+        'supplier', 'Supplier', 'Fournisseurs', ('accounting_code', 'name', 'email', 'mobile', 'city'),
+        derived=('SupplierMonthlyStats', 'SpendCube'),
+        after_merge=_refresh_supplier_rollups,
+    ),
+    'prospect': DedupSpec('prospect', 'Prospect', 'Prospects', ('company_name', 'first_name', 'last_name', 'email', 'mobile')),
+}
+
+
+def get_spec(kind):
+    try:
+        return SPECS[kind]
+    except KeyError:
+        raise MergeError(f"Type de fiche inconnu: {kind}")
+
+
+def assign_dedup_keys(model, batch_size=KEY_BATCH):
+    """Calcule les clés des fiches qui n'en ont pas (lignes antérieures ou créées en masse)"""
+    updated, last = 0, 0
+    fields = ['pk', *model.dedup_name_fields]
+    queryset = model._base_manager.filter(dedup_phonetic='', dedup_prefix='')
+    while True:
+        rows = list(queryset.filter(pk__gt=last).order_by('pk').values_list(*fields)[:batch_size])
+        if not rows:
+            return updated
+        changed = []
+        for row in rows:
+            instance = model(pk=row[0], **dict(zip(model.dedup_name_fields, row[1:])))
+            instance.set_dedup_keys()
+            if instance.dedup_phonetic or instance.dedup_prefix:
+                changed.append(instance)
+        model._base_manager.bulk_update(changed, ['dedup_phonetic', 'dedup_prefix'])
+        updated += len(changed)
+        last = rows[-1][0]
+
+
+def _comparable(model, row):
+    tokens = name_tokens(' '.join(str(row[field] or '') for field in model.dedup_name_fields))
+    identifiers = {
+        field: normalize_identifier(field, row[field]) for field in model.dedup_identifiers
+    }
+    return ' '.join(tokens), {field: value for field, value in identifiers.items() if value}
+
+
+def _numbers(name):
+    return {token for token in name.split() if token.isdigit()}
+
+
+def score_pair(first, second):
+    """Score (0 à 1) et identifiants communs de deux fiches comparables (nom normalisé, identifiants)"""
+    name_a, identifiers_a = first
+    name_b, identifiers_b = second
+    score = SequenceMatcher(None, name_a, name_b).ratio() if name_a and name_b else 0
+    if _numbers(name_a) != _numbers(name_b):
+        # "Usine 2" et "Usine 3" sont deux fiches distinctes
+        score /= 2
+    shared = sorted(field for field, value in identifiers_a.items() if identifiers_b.get(field) == value)
+    return min(1.0, score + IDENTIFIER_BONUS * len(shared)), shared
+
+
+def _row_fields(model, spec):
+    return list(dict.fromkeys(['pk', *model.dedup_name_fields, *model.dedup_identifiers, *spec.display_fields]))
+
+
+def _candidate(spec, first, second, score, shared):
+    return {
+        'ids': [first['pk'], second['pk']],
+        'rows': [{field: first[field] for field in spec.display_fields}, {field: second[field] for field in spec.display_fields}],
+        'score': round(score, 3),
+        'shared': shared,
+    }
+
+
+def find_duplicates(kind, threshold=THRESHOLD, max_block=MAX_BLOCK, limit=MAX_CANDIDATES):
+    """
+    Paires de doublons probables, comparées bloc par bloc; retourne
+    {'candidates': [...] (score décroissant), 'blocks', 'comparisons', 'skipped_blocks'}
+    """
+    spec = get_spec(kind)
+    model = spec.model
+    assign_dedup_keys(model)
+    fields = _row_fields(model, spec)
+
+    pairs, blocks, comparisons, skipped = {}, 0, 0, 0
+    for key in ('dedup_phonetic', 'dedup_prefix'):
+        sizes = model._base_manager.exclude(**{key: ''}).order_by().values(key).annotate(size=Count('pk')).filter(size__gt=1)
+        values = []
+        for row in sizes.iterator():
+            if row['size'] > max_block:
+                skipped += 1
+            else:
+                values.append(row[key])
+        for start in range(0, len(values), BLOCK_BATCH):
+            groups = defaultdict(list)
+            rows = model._base_manager.filter(**{f'{key}__in': values[start:start + BLOCK_BATCH]}).order_by(key, 'pk')
+            for row in rows.values(key, *fields):
+                groups[row[key]].append((row, _comparable(model, row)))
+            for members in groups.values():
+                blocks += 1
+                for index, (first, first_values) in enumerate(members):
+                    for second, second_values in members[index + 1:]:
+                        pair = (first['pk'], second['pk'])
+                        if pair in pairs:
+                            continue
+                        comparisons += 1
+                        score, shared = score_pair(first_values, second_values)
+                        if score >= threshold:
+                            pairs[pair] = _candidate(spec, first, second, score, shared)
+
+    candidates = sorted(pairs.values(), key=lambda candidate: (-candidate['score'], candidate['ids']))
+    return {
+        'kind': kind, 'candidates': candidates[:limit], 'found': len(candidates),
+        'blocks': blocks, 'comparisons': comparisons, 'skipped_blocks': skipped,
+    }
+
+
+def possible_duplicates(instance, threshold=THRESHOLD, limit=5):
+    """Fiches existantes proches d'une fiche (ses deux blocs seulement): [(fiche, score)]"""
+    model = type(instance)
+    if not (instance.dedup_phonetic or instance.dedup_prefix):
+        instance.set_dedup_keys()
+    condition = Q()
+    for key in ('dedup_phonetic', 'dedup_prefix'):
+        if getattr(instance, key):
+            condition |= Q(**{key: getattr(instance, key)})
+    if not condition:
+        return []
+    values = {field: getattr(instance, field) for field in (*model.dedup_name_fields, *model.dedup_identifiers)}
+    reference = _comparable(model, values)
+    found = []
+    for other in model.objects.filter(condition).exclude(pk=instance.pk).order_by('pk')[:MAX_BLOCK]:
+        other_values = {field: getattr(other, field) for field in values}
+        score, shared = score_pair(reference, _comparable(model, other_values))
+        if score >= threshold:
+            found.append((other, round(score, 3)))
+    return sorted(found, key=lambda item: -item[1])[:limit]
+
+
+def _fill_blanks(keep, duplicates):
+    """Complète les champs vides de la fiche gardée depuis les doublons; retourne les champs modifiés"""
+    changed = []
+    for field in keep._meta.concrete_fields:
+        if field.primary_key or not field.editable or field.is_relation or isinstance(field, models.FileField):
+            continue
+        if getattr(keep, field.attname) not in (None, ''):
+            continue
+        for duplicate in duplicates:
+            value = getattr(duplicate, field.attname)
+            if value not in (None, ''):
+                setattr(keep, field.attname, value)
+                changed.append(field.name)
+                break
+    return changed
+
+
+def merge_records(kind, keep_id, duplicate_ids):
+    """
+    Fusionne les fiches duplicate_ids dans keep_id: champs vides complétés,
+    lignes liées rattachées en masse, doublons supprimés. Retourne
+    {relation: lignes rattachées}; lève MergeError sans rien modifier en cas de conflit.
+    """
+    spec = get_spec(kind)
+    model = spec.model
+    duplicate_ids = sorted({int(pk) for pk in duplicate_ids} - {int(keep_id)})
+    if not duplicate_ids:
+        raise MergeError("Aucun doublon à fusionner.")
+
+    moved, months = {}, set()
+    try:
+        with transaction.atomic():
+            locked = {obj.pk: obj for obj in model._base_manager.select_for_update().filter(pk__in=[keep_id, *duplicate_ids])}
+            keep = locked.get(int(keep_id))
+            duplicates = [locked[pk] for pk in duplicate_ids if pk in locked]
+            if keep is None or len(duplicates) != len(duplicate_ids):
+                raise MergeError("Fiche introuvable (déjà fusionnée ou supprimée).")
+
+            changed = _fill_blanks(keep, duplicates)
+            if changed:
+                keep.save(update_fields=changed)
+
+            now = timezone.now()
+            for relation in model._meta.related_objects:
+                related = relation.related_model
+                if not relation.one_to_many or related._meta.model_name in {name.lower() for name in spec.derived}:
+                    continue
+                field = relation.field
+                rows = related._base_manager.filter(**{f'{field.name}__in': duplicate_ids})
+                if related._meta.label == 'seafood.PurchaseOrder':
+                    months.update(month.replace(day=1) for month in rows.values_list('po_date', flat=True).distinct())
+                updates = {field.name: keep}
+                if any(f.name == 'updated_at' for f in related._meta.concrete_fields):
+                    # Les pages conditionnelles (core.conditional) voient le rattachement
+                    updates['updated_at'] = now
+                count = rows.update(**updates)
+                if count:
+                    moved[related._meta.label] = count
+
+            model._base_manager.filter(pk__in=duplicate_ids).delete()
+    except IntegrityError as e:
+        raise MergeError(f"Lignes rattachées en conflit: {e}")
+
+    if spec.after_merge:
+        spec.after_merge(keep, duplicate_ids, months)
+    return {'kept': keep.pk, 'merged': duplicate_ids, 'filled': changed, 'moved': moved}
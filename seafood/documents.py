@@ -0,0 +1,216 @@
+"""
+Rendu PDF des documents imprimés (notes d'arrivée, rapports de réception,
+fiches de classification et de cartonage, bons de commande) avec cache disque.
+
+Un PDF est identifié par (document, updated_at, version du gabarit). Les
+documents verrouillés (statut final: validé, terminé, payé...) sont rendus une
+seule fois et servis depuis le cache indéfiniment. Le rendu est fait par les
+workers (tâche seafood.render_document) et nécessite WeasyPrint, dépendance
+optionnelle.
+"""
+import hashlib
+import os
+import tempfile
+
+from django.apps import apps
+from django.conf import settings
+from django.db.models import Q
+from django.template.loader import render_to_string
+
+
+class DocumentRenderError(Exception):
+    """Le document ne peut pas être rendu en PDF"""
+
+
+class DocumentType:
+    """Type de document imprimable: modèle, gabarit et statuts verrouillés"""
+
+    def __init__(self, kind, model, template, permission, detail_view, locked_statuses, title,
+                 select_related=(), prefetch_related=()):
+        self.kind = kind
+        self.model_label = model
+        self.template = template
+        self.permission = permission
+        self.detail_view = detail_view
+        self.locked_statuses = locked_statuses
+        self.title = title
+        self.select_related = select_related
+        self.prefetch_related = prefetch_related
+
+    @property
+    def model(self):
+        return apps.get_model(self.model_label)
+
+    def get_object(self, pk):
+        return (
+            self.model.objects
+            .select_related(*self.select_related)
+            .prefetch_related(*self.prefetch_related)
+            .get(pk=pk)
+        )
+
+
+DOCUMENT_TYPES = {
+    doc.kind: doc for doc in [
+        DocumentType(
+            'reception', 'operations.Reception', 'documents/reception.html',
+            'operations.view_reception', 'portal_admin:arrivalnote_detail',
+            locked_statuses=('completed',),
+            title=lambda obj: f"Note d'arrivée LOT {obj.lot_id}",
+            select_related=('client', 'service_type__category', 'created_by'),
+        ),
+        DocumentType(
+            'report', 'operations.Report', 'documents/report.html',
+            'operations.view_report', 'portal_admin:reception_report_detail',
+            locked_statuses=('validated',),
+            title=lambda obj: f"Rapport de réception LOT {obj.arrival_note.lot_id}",
+            select_related=('arrival_note__client', 'arrival_note__service_type', 'created_by'),
+            prefetch_related=('items',),
+        ),
+        DocumentType(
+            'classification', 'operations.Classification', 'documents/classification.html',
+            'operations.view_classification', 'portal_admin:classification_detail',
+            locked_statuses=('completed',),
+            title=lambda obj: f"Fiche de classification LOT {obj.reception.lot_id}",
+            select_related=('reception__client', 'reception__service_type', 'created_by'),
+            prefetch_related=('items__species__category',),
+        ),
+        DocumentType(
+            'packaging', 'operations.Packaging', 'documents/packaging.html',
+            'operations.view_packaging', 'portal_admin:packaging_detail',
+            locked_statuses=('completed',),
+            title=lambda obj: f"Fiche de cartonage LOT {obj.classification.reception.lot_id}",
+            select_related=('classification__reception__client', 'created_by'),
+            prefetch_related=('items__species__category',),
+        ),
+        DocumentType(
+            'purchaseorder', 'seafood.PurchaseOrder', 'documents/purchaseorder.html',
+            'seafood.view_purchaseorder', 'portal_admin:purchaseorder_detail',
+            locked_statuses=('paid',),
+            title=lambda obj: f"Bon de commande {obj.po_number}",
+            select_related=('supplier', 'payment_cashbox', 'payment_bank', 'approved_by', 'created_by'),
+            prefetch_related=('items',),
+        ),
+    ]
+}
+
+
+def get_document_type(kind):
+    try:
+        return DOCUMENT_TYPES[kind]
+    except KeyError:
+        raise DocumentRenderError(f"Type de document inconnu: {kind}")
+
+
+class DocumentVersion:
+    """
+    Version d'un document à un instant donné, calculée sans charger le document:
+    clé de cache, ETag et date de dernière modification.
+    """
+
+    def __init__(self, doc_type, pk, status, updated_at):
+        self.doc_type = doc_type
+        self.pk = pk
+        self.status = status
+        self.updated_at = updated_at
+
+    @classmethod
+    def lookup(cls, kind, pk):
+        """Retourne la version courante du document, ou None s'il n'existe pas"""
+        doc_type = get_document_type(kind)
+        row = doc_type.model.objects.filter(pk=pk).values_list('status', 'updated_at').first()
+        if row is None:
+            return None
+        return cls(doc_type, pk, *row)
+
+    @property
+    def is_locked(self):
+        return self.status in self.doc_type.locked_statuses
+
+    @property
+    def filename(self):
+        if self.is_locked:
+            # Document final: rendu une seule fois, indépendamment des modifications du gabarit
+            return f"final-{self.status}.pdf"
+        stamp = int(self.updated_at.timestamp() * 1000000)
+        return f"{stamp}-v{settings.DOCUMENTS_TEMPLATE_VERSION}.pdf"
+
+    @property
+    def directory(self):
+        return os.path.join(settings.DOCUMENTS_CACHE_DIR, self.doc_type.kind, str(self.pk))
+
+    @property
+    def path(self):
+        return os.path.join(self.directory, self.filename)
+
+    @property
+    def etag(self):
+        key = f"{self.doc_type.kind}:{self.pk}:{self.filename}"
+        return '"%s"' % hashlib.md5(key.encode()).hexdigest()
+
+    def is_cached(self):
+        return os.path.isfile(self.path)
+
+
+def html_to_pdf(html, base_url=None):
+    """Convertit du HTML en PDF avec WeasyPrint (dépendance optionnelle)"""
+    try:
+        from weasyprint import HTML
+    except ImportError:
+        raise DocumentRenderError(
+            "Le rendu PDF nécessite WeasyPrint (pip install weasyprint)."
+        )
+    return HTML(string=html, base_url=base_url or settings.BASE_DIR).write_pdf()
+
+
+def render_document(kind, pk):
+    """
+    Rend le document en PDF et l'écrit dans le cache (écriture atomique), puis
+    supprime les rendus obsolètes du même document. Retourne le chemin du PDF.
+    """
+    doc_type = get_document_type(kind)
+    obj = doc_type.get_object(pk)
+    version = DocumentVersion(doc_type, obj.pk, obj.status, obj.updated_at)
+    if version.is_cached():
+        return version.path
+
+    html = render_to_string(doc_type.template, {
+        'document': obj,
+        'title': doc_type.title(obj),
+        'is_locked': version.is_locked,
+    })
+    pdf = html_to_pdf(html)
+
+    os.makedirs(version.directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=version.directory, suffix='.tmp')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(pdf)
+    os.replace(tmp_path, version.path)
+
+    for name in os.listdir(version.directory):
+        if name != version.filename and not name.startswith('final-') and not name.endswith('.tmp'):
+            try:
+                os.remove(os.path.join(version.directory, name))
+            except OSError:
+                pass
+    return version.path
+
+
+def request_render(version, user=None):
+    """
+    Met en file le rendu de la version du document, sauf si un rendu est déjà en
+    attente ou en cours, ou a échoué depuis la dernière modification du document
+    (la tâche échouée est alors retournée). Retourne la tâche.
+    """
+    from .jobs import enqueue
+    from .models import BackgroundJob
+
+    payload = {'kind': version.doc_type.kind, 'pk': version.pk}
+    job = (
+        BackgroundJob.objects
+        .filter(name='seafood.render_document', payload=payload)
+        .filter(Q(status__in=('queued', 'running')) | Q(status='failed', finished_at__gte=version.updated_at))
+        .order_by('-created_at')
+        .first()
+    )
+    return job or enqueue('seafood.render_document', payload, user=user)
@@ -0,0 +1,302 @@
+"""
+File de tâches en arrière-plan stockée en base, sans broker externe.
+
+Les tâches sont déclarées avec @task dans les modules tasks.py des applications,
+mises en file avec enqueue() (la vue retourne immédiatement) puis exécutées par
+les workers de la commande runworkers:
+
+    from seafood.jobs import task, enqueue
+
+    @task('seafood.exemple')
+    def exemple(job, valeur):
+        return {'valeur': valeur}
+
+    enqueue('seafood.exemple', {'valeur': 1}, user=request.user)
+
+Une tâche déclarée avec launchable=True et une permission peut aussi être
+lancée, sans paramètres, depuis le suivi des tâches par les utilisateurs qui
+ont cette permission (voir Task.can_launch).
+
+Un worker prend en charge une tâche par un UPDATE conditionnel sur le statut
+(SELECT ... FOR UPDATE SKIP LOCKED en amont lorsque la base le permet), ce qui
+garantit qu'une tâche n'est exécutée que par un seul worker. En cas d'erreur la
+tâche est replanifiée avec un délai exponentiel jusqu'à max_attempts.
+"""
+import inspect
+import logging
+import os
+import socket
+import threading
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import Count, F
+from django.utils import timezone
+from django.utils.module_loading import autodiscover_modules
+
+from .models import BackgroundJob
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_LOW = 0
+PRIORITY_NORMAL = 5
+PRIORITY_HIGH = 10
+
+
+class JobError(Exception):
+    """Erreur de la file de tâches (tâche inconnue, paramètres invalides...)"""
+
+
+class Task:
+    """Tâche déclarée: fonction appelée avec (job, **payload)"""
+
+    def __init__(self, name, func, label=None, max_attempts=3, priority=PRIORITY_NORMAL, launchable=False,
+                 permission=None):
+        self.name = name
+        self.func = func
+        self.label = label or name
+        self.max_attempts = max_attempts
+        self.priority = priority
+        self.launchable = launchable
+        self.permission = permission
+
+    def __call__(self, job, **payload):
+        return self.func(job, **payload)
+
+    @property
+    def needs_arguments(self):
+        """La fonction a des paramètres obligatoires en plus de job"""
+        parameters = list(inspect.signature(self.func).parameters.values())[1:]
+        return any(
+            parameter.default is parameter.empty
+            and parameter.kind not in (parameter.VAR_POSITIONAL, parameter.VAR_KEYWORD)
+            for parameter in parameters
+        )
+
+    def can_launch(self, user):
+        """Tâche lançable sans paramètres depuis le suivi des tâches par l'utilisateur"""
+        return bool(
+            self.launchable and self.permission and not self.needs_arguments and user.has_perm(self.permission)
+        )
+
+
+_tasks = {}
+_discovered = False
+
+
+def task(name, label=None, max_attempts=3, priority=PRIORITY_NORMAL, launchable=False, permission=None):
+    """
+    Décorateur déclarant une tâche exécutable en arrière-plan. launchable et
+    permission: tâche proposée dans le suivi des tâches aux détenteurs de la permission.
+    """
+    def decorator(func):
+        _tasks[name] = Task(
+            name, func, label=label, max_attempts=max_attempts, priority=priority, launchable=launchable,
+            permission=permission,
+        )
+        return func
+    return decorator
+
+
+def get_tasks():
+    """Retourne les tâches déclarées (importe les modules tasks.py des applications)"""
+    global _discovered
+    if not _discovered:
+        autodiscover_modules('tasks')
+        _discovered = True
+    return _tasks
+
+
+def get_task(name):
+    try:
+        return get_tasks()[name]
+    except KeyError:
+        raise JobError(f"Tâche inconnue: {name}")
+
+
+def launchable_tasks(user):
+    """Tâches que l'utilisateur peut lancer depuis le suivi des tâches, triées par libellé"""
+    return sorted((t for t in get_tasks().values() if t.can_launch(user)), key=lambda t: t.label)
+
+
+def enqueue(name, payload=None, user=None, priority=None, run_at=None, delay=None, max_attempts=None):
+    """
+    Met une tâche en file et retourne le BackgroundJob créé, sans l'exécuter.
+    delay (timedelta) ou run_at permettent de différer l'exécution.
+    """
+    registered = get_task(name)
+    now = timezone.now()
+    if run_at is None:
+        run_at = now + delay if delay else now
+    return BackgroundJob.objects.create(
+        name=name,
+        payload=payload or {},
+        priority=registered.priority if priority is None else priority,
+        max_attempts=registered.max_attempts if max_attempts is None else max_attempts,
+        run_at=run_at,
+        created_by=user if user is not None and user.is_authenticated else None,
+    )
+
+
+def worker_name(index=0):
+    """Identifiant d'un worker: machine, processus et numéro"""
+    return f"{socket.gethostname()}:{os.getpid()}:{index}"[:100]
+
+
+def _ready_jobs():
+    return (
+        BackgroundJob.objects
+        .filter(status='queued', run_at__lte=timezone.now())
+        .order_by('-priority', 'run_at', 'pk')
+    )
+
+
+def claim_jobs(worker, limit=1, names=None):
+    """
+    Prend en charge jusqu'à limit tâches prêtes pour le worker et les retourne.
+
+    Sur PostgreSQL (et toute base supportant SKIP LOCKED) les lignes candidates
+    sont verrouillées sans attendre les autres workers. Ailleurs (SQLite) chaque
+    candidate est réclamée par un UPDATE conditionnel sur le statut: seul le
+    worker dont l'UPDATE modifie la ligne l'obtient.
+    """
+    queryset = _ready_jobs()
+    if names:
+        queryset = queryset.filter(name__in=names)
+    now = timezone.now()
+    claim = {
+        'status': 'running',
+        'locked_by': worker,
+        'locked_at': now,
+        'started_at': now,
+        'finished_at': None,
+        'attempts': F('attempts') + 1,
+    }
+
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            ids = list(queryset.select_for_update(skip_locked=True).values_list('pk', flat=True)[:limit])
+            if ids:
+                BackgroundJob.objects.filter(pk__in=ids).update(**claim)
+    else:
+        ids = []
+        for pk in queryset.values_list('pk', flat=True)[:limit * 4]:
+            if BackgroundJob.objects.filter(pk=pk, status='queued').update(**claim):
+                ids.append(pk)
+                if len(ids) == limit:
+                    break
+
+    if not ids:
+        return []
+    return list(BackgroundJob.objects.filter(pk__in=ids).order_by('-priority', 'run_at', 'pk'))
+
+
+def retry_delay(attempts):
+    """Délai avant la tentative suivante: JOBS_RETRY_BACKOFF * 2^(tentatives - 1), plafonné"""
+    base = getattr(settings, 'JOBS_RETRY_BACKOFF', 30)
+    maximum = getattr(settings, 'JOBS_RETRY_MAX_DELAY', 3600)
+    return timedelta(seconds=min(base * 2 ** max(attempts - 1, 0), maximum))
+
+
+def run_job(job):
+    """Exécute une tâche prise en charge et enregistre son résultat ou son erreur"""
+    try:
+        result = get_task(job.name)(job, **job.payload)
+    except Exception as exc:
+        error = traceback.format_exc()
+        logger.exception("Échec de la tâche %s (tentative %s/%s)", job, job.attempts, job.max_attempts)
+        fields = {'locked_by': '', 'locked_at': None, 'finished_at': timezone.now(), 'last_error': error}
+        if job.attempts < job.max_attempts and not isinstance(exc, JobError):
+            fields.update(status='queued', run_at=timezone.now() + retry_delay(job.attempts))
+        else:
+            fields.update(status='failed')
+        BackgroundJob.objects.filter(pk=job.pk, status='running').update(**fields)
+        return False
+
+    BackgroundJob.objects.filter(pk=job.pk, status='running').update(
+        status='succeeded',
+        result=result,
+        last_error='',
+        locked_by='',
+        locked_at=None,
+        finished_at=timezone.now(),
+    )
+    return True
+
+
+def requeue_stale_jobs(timeout=None):
+    """
+    Remet en file les tâches restées 'en cours' au-delà du délai (worker arrêté
+    brutalement). Celles qui ont épuisé leurs tentatives passent en échec au lieu
+    d'être reprises indéfiniment. Retourne le nombre de tâches remises en file.
+    """
+    timeout = timeout or getattr(settings, 'JOBS_STALE_TIMEOUT', 3600)
+    now = timezone.now()
+    stale = BackgroundJob.objects.filter(status='running', locked_at__lt=now - timedelta(seconds=timeout))
+    failed = stale.filter(attempts__gte=F('max_attempts')).update(
+        status='failed', locked_by='', locked_at=None, finished_at=now,
+        last_error=f"Tâche bloquée depuis plus de {timeout} s, tentatives épuisées",
+    )
+    if failed:
+        logger.warning("%s tâche(s) bloquée(s) passée(s) en échec", failed)
+    return stale.update(status='queued', locked_by='', locked_at=None, run_at=now)
+
+
+def work(worker, stop_event=None, poll_interval=2, batch_size=1, names=None, once=False):
+    """
+    Boucle d'un worker: prend en charge des tâches et les exécute jusqu'à l'arrêt.
+    Avec once=True le worker s'arrête dès que la file est vide. Les tâches
+    bloquées sont reprises toutes les JOBS_STALE_SWEEP_INTERVAL secondes. Retourne
+    le nombre de tâches exécutées.
+    """
+    stop_event = stop_event or threading.Event()
+    sweep_interval = getattr(settings, 'JOBS_STALE_SWEEP_INTERVAL', 300)
+    next_sweep = time.monotonic() + sweep_interval
+    processed = 0
+    try:
+        while not stop_event.is_set():
+            close_old_connections()
+            if time.monotonic() >= next_sweep:
+                requeue_stale_jobs()
+                next_sweep = time.monotonic() + sweep_interval
+            jobs = claim_jobs(worker, limit=batch_size, names=names)
+            if not jobs:
+                if once:
+                    break
+                stop_event.wait(poll_interval)
+                continue
+            for job in jobs:
+                run_job(job)
+                processed += 1
+    finally:
+        connection.close()
+    return processed
+
+
+def retry_job(job):
+    """Remet en file une tâche échouée ou annulée"""
+    return BackgroundJob.objects.filter(pk=job.pk, status__in=('failed', 'cancelled')).update(
+        status='queued', attempts=0, run_at=timezone.now(), last_error='', finished_at=None
+    )
+
+
+def cancel_job(job):
+    """Annule une tâche encore en attente"""
+    return BackgroundJob.objects.filter(pk=job.pk, status='queued').update(
+        status='cancelled', finished_at=timezone.now()
+    )
+
+
+def queue_stats():
+    """Nombre de tâches par statut et nombre de tâches prêtes à être exécutées"""
+    counts = dict(BackgroundJob.objects.order_by().values_list('status').annotate(total=Count('id')))
+    return {
+        'by_status': [
+            {'status': code, 'label': label, 'count': counts.get(code, 0)}
+            for code, label in BackgroundJob.STATUS_CHOICES
+        ],
+        'ready': _ready_jobs().count(),
+    }
@@ -0,0 +1,87 @@
+from datetime import date, timedelta
+from itertools import groupby
+
+from django.conf import settings
+from django.core.mail import send_mass_mail
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core.db_router import replica_reads
+from seafood.models import Prospect
+
+
+class Command(BaseCommand):
+    help = "Construit les résumés quotidiens de relance des prospects, par commercial, en une seule requête"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help="Date de référence (AAAA-MM-JJ, par défaut aujourd'hui)")
+        parser.add_argument('--send', action='store_true', help="Envoie les résumés par email aux commerciaux")
+
+    def handle(self, *args, **options):
+        if options['date']:
+            try:
+                day = date.fromisoformat(options['date'])
+            except ValueError:
+                raise CommandError(f"Date invalide: {options['date']}")
+        else:
+            day = timezone.localdate()
+        end_of_week = day + timedelta(days=6 - day.weekday())
+
+        # Une seule requête: toutes les relances ouvertes jusqu'à la fin de la semaine,
+        # triées par commercial pour être regroupées en un passage
+        prospects = (
+            Prospect.objects.open()
+            .filter(created_by__isnull=False, next_followup__lte=end_of_week)
+            .select_related('created_by')
+            .order_by('created_by', 'next_followup', 'pk')
+            .only(
+                'first_name', 'last_name', 'company_name', 'next_followup', 'status',
+                'created_by__username', 'created_by__email', 'created_by__first_name', 'created_by__last_name'
+            )
+        )
+
+        messages = []
+        digests = 0
+        with replica_reads():
+            rows = list(prospects.iterator(chunk_size=2000))
+        for user, user_prospects in groupby(rows, key=lambda p: p.created_by):
+            buckets = {'overdue': [], 'today': [], 'week': []}
+            for prospect in user_prospects:
+                if prospect.next_followup < day:
+                    buckets['overdue'].append(prospect)
+                elif prospect.next_followup == day:
+                    buckets['today'].append(prospect)
+                else:
+                    buckets['week'].append(prospect)
+
+            digests += 1
+            body = self.format_digest(user, day, buckets)
+            self.stdout.write(
+                f"{user.username}: {len(buckets['overdue'])} en retard, "
+                f"{len(buckets['today'])} aujourd'hui, {len(buckets['week'])} cette semaine"
+            )
+            if options['send'] and user.email:
+                messages.append((
+                    f"Relances prospects du {day.strftime('%d/%m/%Y')}",
+                    body,
+                    settings.DEFAULT_FROM_EMAIL,
+                    [user.email],
+                ))
+
+        if messages:
+            send_mass_mail(messages, fail_silently=False)
+        self.stdout.write(self.style.SUCCESS(f"{digests} résumé(s) construit(s), {len(messages)} envoyé(s)"))
+
+    def format_digest(self, user, day, buckets):
+        """Texte du résumé de relance d'un commercial"""
+        labels = dict(Prospect.FOLLOWUP_BUCKETS)
+        lines = [f"Bonjour {user.get_full_name() or user.username},", ""]
+        for bucket in ('overdue', 'today', 'week'):
+            lines.append(f"{labels[bucket]} ({len(buckets[bucket])})")
+            for prospect in buckets[bucket]:
+                lines.append(
+                    f"  - {prospect.next_followup.strftime('%d/%m/%Y')} {prospect.full_name} "
+                    f"({prospect.company_name}) - {prospect.get_status_display()}"
+                )
+            lines.append("")
+        return "\n".join(lines)
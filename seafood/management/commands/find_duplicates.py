@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from seafood.dedup import MAX_BLOCK, SPECS, THRESHOLD, find_duplicates
+
+
+class Command(BaseCommand):
+    help = "Recherche les doublons probables de clients, fournisseurs ou prospects (comparaison par blocs)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(SPECS), help="Type de fiche")
+        parser.add_argument('--threshold', type=float, default=THRESHOLD, help="Score minimal (0 à 1)")
+        parser.add_argument('--max-block', type=int, default=MAX_BLOCK, help="Taille maximale d'un bloc comparé")
+
+    def handle(self, *args, **options):
+        if not 0 < options['threshold'] <= 1:
+            raise CommandError("--threshold doit être compris entre 0 et 1")
+        result = find_duplicates(options['kind'], threshold=options['threshold'], max_block=options['max_block'])
+        for candidate in result['candidates']:
+            first, second = candidate['ids']
+            shared = f" ({', '.join(candidate['shared'])})" if candidate['shared'] else ''
+            self.stdout.write(f"  {candidate['score']:.3f}  #{first} / #{second}{shared}")
+        self.stdout.write(
+            f"  Blocs: {result['blocks']}, comparaisons: {result['comparisons']}, "
+            f"blocs ignorés (trop grands): {result['skipped_blocks']}"
+        )
+        self.stdout.write(self.style.SUCCESS(f"{result['found']} doublon(s) probable(s)"))
@@ -0,0 +1,37 @@
+import glob
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from seafood.currency import load_rates_file
+
+
+class Command(BaseCommand):
+    help = "Charge les taux de change locaux (fichiers CSV ou JSON, sans accès réseau)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'paths',
+            nargs='*',
+            help="Fichiers de taux à charger (par défaut: tous les fichiers de EXCHANGE_RATES_DIR)"
+        )
+
+    def handle(self, *args, **options):
+        paths = options['paths']
+        if not paths:
+            directory = settings.EXCHANGE_RATES_DIR
+            paths = sorted(
+                glob.glob(os.path.join(directory, '*.csv')) + glob.glob(os.path.join(directory, '*.json'))
+            )
+            if not paths:
+                raise CommandError(f"Aucun fichier de taux trouvé dans {directory}")
+
+        for path in paths:
+            try:
+                created, updated = load_rates_file(path)
+            except (OSError, ValueError, KeyError) as e:
+                raise CommandError(f"{path}: {e}")
+            self.stdout.write(self.style.SUCCESS(
+                f"{path}: {created} taux créé(s), {updated} taux mis à jour"
+            ))
@@ -0,0 +1,43 @@
+import os
+from collections import defaultdict
+
+from django.contrib.staticfiles.finders import FileSystemFinder
+from django.core.management.base import BaseCommand
+
+from core.staticfiles import kept_paths
+
+
+class Command(BaseCommand):
+    help = (
+        "Liste les fichiers du thème non référencés par les gabarits, le code et les CSS/JS conservés, "
+        "que collectstatic ne copie pas (STATIC_PRUNE)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--list', action='store_true', help="Affiche chaque fichier écarté")
+
+    def handle(self, *args, **options):
+        files = {
+            path.replace(os.sep, '/'): storage.path(path)
+            for path, storage in FileSystemFinder().list(ignore_patterns=[])
+        }
+        kept = kept_paths(files)
+        pruned = sorted(set(files) - kept)
+
+        sizes = defaultdict(lambda: [0, 0])
+        for path in pruned:
+            parts = path.split('/')
+            group = '/'.join(parts[:2] if parts[0] == 'vendors' else parts[:3])
+            sizes[group][0] += 1
+            sizes[group][1] += os.path.getsize(files[path])
+            if options['list']:
+                self.stdout.write(f"  {path}")
+
+        for group, (count, size) in sorted(sizes.items(), key=lambda item: -item[1][1]):
+            self.stdout.write(f"  {group:<45} {count:>6} fichier(s) {size / 1024 / 1024:>9.2f} Mo")
+        kept_size = sum(os.path.getsize(files[path]) for path in kept)
+        pruned_size = sum(size for count, size in sizes.values())
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(kept)} fichier(s) conservé(s) ({kept_size / 1024 / 1024:.2f} Mo), "
+            f"{len(pruned)} écarté(s) ({pruned_size / 1024 / 1024:.2f} Mo)"
+        ))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from seafood.spend import BATCH_MONTHS, rebuild_spend_cube
+
+
+class Command(BaseCommand):
+    help = "Calcule les clés articles manquantes des lignes de bon de commande et reconstruit le cube des dépenses"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months', type=int, default=BATCH_MONTHS, help="Mois recalculés par tranche")
+
+    def handle(self, *args, **options):
+        if options['months'] < 1:
+            raise CommandError("--months doit être supérieur ou égal à 1")
+        result = rebuild_spend_cube(batch_months=options['months'])
+        self.stdout.write(f"  Lignes sans clé article: {result['keyed']}")
+        self.stdout.write(self.style.SUCCESS(f"Cube des dépenses reconstruit: {result['cells']} cellule(s)"))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from seafood.supplier_stats import BATCH_MONTHS, rebuild_supplier_stats
+
+
+class Command(BaseCommand):
+    help = "Reconstruit les statistiques mensuelles des fournisseurs depuis les bons de commande"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months', type=int, default=BATCH_MONTHS, help="Mois recalculés par tranche")
+
+    def handle(self, *args, **options):
+        if options['months'] < 1:
+            raise CommandError("--months doit être supérieur ou égal à 1")
+        count = rebuild_supplier_stats(batch_months=options['months'])
+        self.stdout.write(self.style.SUCCESS(f"Statistiques fournisseurs reconstruites: {count} mois fournisseur"))
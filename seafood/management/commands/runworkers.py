@@ -0,0 +1,96 @@
+import multiprocessing
+import signal
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from seafood.jobs import get_tasks, requeue_stale_jobs, work, worker_name
+
+
+def _process_worker(index, stop_event, options):
+    """Point d'entrée d'un worker en mode processus"""
+    import django
+
+    django.setup()
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    get_tasks()
+    work(worker_name(index), stop_event=stop_event, **options)
+
+
+class Command(BaseCommand):
+    help = "Exécute les tâches en arrière-plan de la file (pool de threads ou de processus)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=settings.JOBS_WORKERS,
+            help="Nombre de workers (par défaut JOBS_WORKERS)"
+        )
+        parser.add_argument(
+            '--mode', choices=['thread', 'process'], default='thread',
+            help="Workers en threads (tâches d'E/S) ou en processus (tâches de calcul)"
+        )
+        parser.add_argument(
+            '--poll', type=float, default=settings.JOBS_POLL_INTERVAL,
+            help="Intervalle en secondes entre deux consultations de la file vide"
+        )
+        parser.add_argument('--batch', type=int, default=1, help="Tâches prises en charge à la fois par worker")
+        parser.add_argument('--task', action='append', dest='names', help="Limiter aux tâches nommées (répétable)")
+        parser.add_argument('--once', action='store_true', help="S'arrêter dès que la file est vide")
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1:
+            raise CommandError("--workers doit être supérieur ou égal à 1")
+        tasks = get_tasks()
+        for name in options['names'] or []:
+            if name not in tasks:
+                raise CommandError(f"Tâche inconnue: {name}")
+
+        requeued = requeue_stale_jobs()
+        if requeued:
+            self.stdout.write(self.style.WARNING(f"{requeued} tâche(s) bloquée(s) remise(s) en file"))
+
+        work_options = {
+            'poll_interval': options['poll'],
+            'batch_size': options['batch'],
+            'names': options['names'],
+            'once': options['once'],
+        }
+        self.stdout.write(
+            f"Démarrage de {options['workers']} worker(s) ({options['mode']}), "
+            f"{len(tasks)} tâche(s) déclarée(s)"
+        )
+
+        if options['mode'] == 'process':
+            stop_event = multiprocessing.Event()
+            # Les connexions ne doivent pas être partagées avec les processus enfants
+            connections.close_all()
+            workers = [
+                multiprocessing.Process(target=_process_worker, args=(i, stop_event, work_options), daemon=True)
+                for i in range(options['workers'])
+            ]
+        else:
+            stop_event = threading.Event()
+            workers = [
+                threading.Thread(
+                    target=work, args=(worker_name(i),), kwargs={'stop_event': stop_event, **work_options},
+                    daemon=True
+                )
+                for i in range(options['workers'])
+            ]
+
+        def stop(signum, frame):
+            self.stdout.write("Arrêt demandé, fin des tâches en cours...")
+            stop_event.set()
+
+        signal.signal(signal.SIGINT, stop)
+        signal.signal(signal.SIGTERM, stop)
+
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            while worker.is_alive():
+                worker.join(timeout=1)
+
+        self.stdout.write(self.style.SUCCESS("Workers arrêtés"))
@@ -0,0 +1,135 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import NoReverseMatch, reverse
+from django.utils import timezone
+
+from core.warmup import STEPS, first_request_timings, warm_up
+
+
+class Command(BaseCommand):
+    help = (
+        "Préchauffe le processus (URL, imports des vues, gabarits, caches de référence); "
+        "--benchmark mesure la latence des premières requêtes avec et sans préchauffage"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--step', action='append', dest='steps', choices=[name for name, function in STEPS],
+                            help="Limiter aux étapes nommées (répétable)")
+        parser.add_argument('--strict', action='store_true', help="Échoue si une étape rapporte une erreur")
+        parser.add_argument('--benchmark', action='store_true',
+                            help="Mesure les premières requêtes de deux processus neufs, sans puis avec préchauffage")
+        parser.add_argument('--url', action='append', dest='urls',
+                            help="Route (nom ou chemin) mesurée, répétable (par défaut WARMUP_BENCHMARK_URLS)")
+        parser.add_argument('--user', help="Utilisateur connecté pour les requêtes mesurées (par défaut un superutilisateur)")
+        parser.add_argument('--output', default=settings.WARMUP_BENCHMARK_FILE,
+                            help="Fichier JSON Lines où ajouter le résultat du benchmark")
+        # Processus de mesure lancé par --benchmark
+        parser.add_argument('--probe', action='store_true', help=argparse.SUPPRESS)
+        parser.add_argument('--cold', action='store_true', help=argparse.SUPPRESS)
+
+    def handle(self, *args, **options):
+        if options['probe']:
+            return self.probe(options)
+        if options['benchmark']:
+            return self.benchmark(options)
+
+        results = warm_up(options['steps'])
+        errors = 0
+        for result in results:
+            self.stdout.write(f"  {result.name}: {result.count} élément(s) en {result.seconds * 1000:.0f} ms")
+            for error in result.errors:
+                self.stdout.write(self.style.WARNING(f"    {error}"))
+            errors += len(result.errors)
+        if errors and options['strict']:
+            raise CommandError(f"{errors} erreur(s) de préchauffage")
+        self.stdout.write(self.style.SUCCESS("Préchauffage terminé"))
+
+    def resolve_paths(self, urls):
+        paths = []
+        for url in urls or settings.WARMUP_BENCHMARK_URLS:
+            if url.startswith('/'):
+                paths.append(url)
+                continue
+            try:
+                paths.append(reverse(url))
+            except NoReverseMatch:
+                raise CommandError(f"Route inconnue: {url}")
+        return paths
+
+    def benchmark_user(self, username):
+        from django.contrib.auth import get_user_model
+
+        User = get_user_model()
+        if username:
+            user = User.objects.filter(username=username).first()
+            if user is None:
+                raise CommandError(f"Utilisateur inconnu: {username}")
+            return user
+        user = User.objects.filter(is_superuser=True, is_active=True).order_by('pk').first()
+        if user is None:
+            raise CommandError("Aucun superutilisateur actif: précisez --user")
+        return user
+
+    def probe(self, options):
+        """Processus neuf: préchauffe (sauf --cold) puis mesure la première requête de chaque chemin"""
+        user = self.benchmark_user(options['user'])
+        paths = self.resolve_paths(options['urls'])
+        started = time.perf_counter()
+        if not options['cold']:
+            warm_up()
+        warmup_seconds = time.perf_counter() - started
+        timings = first_request_timings(paths, user)
+        self.stdout.write(json.dumps({
+            'warmup_ms': round(warmup_seconds * 1000, 2),
+            'timings': {path: {'status': status, 'ms': ms} for path, (status, ms) in timings.items()},
+        }))
+
+    def run_probe(self, options, paths, cold):
+        command = [sys.executable, os.path.join(settings.BASE_DIR, 'manage.py'), 'warmup', '--probe']
+        if cold:
+            command.append('--cold')
+        user = self.benchmark_user(options['user'])
+        command += ['--user', user.get_username()]
+        # Chemins déjà résolus: le processus de mesure ne construit pas les URL avant la première requête
+        for path in paths:
+            command += ['--url', path]
+        completed = subprocess.run(command, capture_output=True, text=True, env=os.environ.copy())
+        if completed.returncode:
+            raise CommandError(f"Échec du processus de mesure:\n{completed.stderr}")
+        return json.loads(completed.stdout.strip().splitlines()[-1])
+
+    def benchmark(self, options):
+        paths = self.resolve_paths(options['urls'])
+        cold = self.run_probe(options, paths, cold=True)
+        warm = self.run_probe(options, paths, cold=False)
+        record = {
+            'date': timezone.now().isoformat(),
+            'warmup_ms': warm['warmup_ms'],
+            'cold': {path: cold['timings'][path]['ms'] for path in paths},
+            'warm': {path: warm['timings'][path]['ms'] for path in paths},
+        }
+        record['cold_total_ms'] = round(sum(record['cold'].values()), 2)
+        record['warm_total_ms'] = round(sum(record['warm'].values()), 2)
+
+        self.stdout.write(f"{'ROUTE':<40} {'À FROID (ms)':>14} {'PRÉCHAUFFÉ (ms)':>16}")
+        for path in paths:
+            self.stdout.write(f"{path:<40} {record['cold'][path]:>14.1f} {record['warm'][path]:>16.1f}")
+        self.stdout.write(f"{'TOTAL':<40} {record['cold_total_ms']:>14.1f} {record['warm_total_ms']:>16.1f}")
+        self.stdout.write(f"Préchauffage: {record['warmup_ms']:.0f} ms")
+        for path in paths:
+            statuses = {cold['timings'][path]['status'], warm['timings'][path]['status']}
+            if statuses != {200}:
+                self.stdout.write(self.style.WARNING(f"{path}: statut {', '.join(map(str, sorted(statuses)))}"))
+
+        if options['output']:
+            os.makedirs(os.path.dirname(options['output']) or '.', exist_ok=True)
+            with open(options['output'], 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record) + '\n')
+            self.stdout.write(self.style.SUCCESS(f"Résultat ajouté à {options['output']}"))
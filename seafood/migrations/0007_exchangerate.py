@@ -0,0 +1,31 @@
+# Generated by Django 5.2.7 on 2026-10-18 23:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('seafood', '0006_alter_bankaccount_currency_prospect'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExchangeRate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('currency', models.CharField(choices=[('USD', 'US dollar (USD)'), ('EUR', 'Euro (EUR)'), ('JPY', 'Japanese yen (JPY)'), ('GBP', 'Pound sterling (GBP)'), ('AED', 'United Arab Emirates dirham (AED)'), ('AFN', 'Afghan afghani (AFN)'), ('ALL', 'Albanian lek (ALL)'), ('AMD', 'Armenian dram (AMD)'), ('ANG', 'Netherlands Antillean guilder (ANG)'), ('AOA', 'Angolan kwanza (AOA)'), ('ARS', 'Argentine peso (ARS)'), ('AUD', 'Australian dollar (AUD)'), ('AWG', 'Aruban florin (AWG)'), ('AZN', 'Azerbaijani manat (AZN)'), ('BAM', 'Bosnia and Herzegovina convertible mark (BAM)'), ('BBD', 'Barbadian dollar (BBD)'), ('BDT', 'Bangladeshi taka (BDT)'), ('BGN', 'Bulgarian lev (BGN)'), ('BHD', 'Bahraini dinar (BHD)'), ('BIF', 'Burundian franc (BIF)'), ('BMD', 'Bermudian dollar (BMD)'), ('BND', 'Brunei dollar (BND)'), ('BOB', 'Bolivian boliviano (BOB)'), ('BRL', 'Brazilian real (BRL)'), ('BSD', 'Bahamian dollar (BSD)'), ('BTN', 'Bhutanese ngultrum (BTN)'), ('BWP', 'Botswana pula (BWP)'), ('BYN', 'Belarusian ruble (BYN)'), ('BZD', 'Belize dollar (BZD)'), ('CAD', 'Canadian dollar (CAD)'), ('CDF', 'Congolese franc (CDF)'), ('CHF', 'Swiss franc (CHF)'), ('CLP', 'Chilean peso (CLP)'), ('CNY', 'Chinese yuan (CNY)'), ('COP', 'Colombian peso (COP)'), ('CRC', 'Costa Rican colón (CRC)'), ('CUC', 'Cuban convertible peso (CUC)'), ('CUP', 'Cuban peso (CUP)'), ('CVE', 'Cape Verdean escudo (CVE)'), ('CZK', 'Czech koruna (CZK)'), ('DJF', 'Djiboutian franc (DJF)'), ('DKK', 'Danish krone (DKK)'), ('DOP', 'Dominican peso (DOP)'), ('DZD', 'Algerian dinar (DZD)'), ('EGP', 'Egyptian pound (EGP)'), ('ERN', 'Eritrean nakfa (ERN)'), ('ETB', 'Ethiopian birr (ETB)'), ('EUR', 'EURO (EUR)'), ('FJD', 'Fijian dollar (FJD)'), ('FKP', 'Falkland Islands pound (FKP)'), ('GBP', 'British pound (GBP)'), ('GEL', 'Georgian lari (GEL)'), ('GGP', 'Guernsey pound (GGP)'), ('GHS', 'Ghanaian cedi (GHS)'), ('GIP', 'Gibraltar pound (GIP)'), ('GMD', 'Gambian dalasi (GMD)'), ('GNF', 'Guinean franc (GNF)'), ('GTQ', 'Guatemalan quetzal (GTQ)'), ('GYD', 'Guyanese dollar (GYD)'), ('HKD', 'Hong Kong dollar (HKD)'), ('HNL', 'Honduran lempira (HNL)'), ('HRK', 'Croatian kuna (HRK)'), ('HTG', 'Haitian gourde (HTG)'), ('HUF', 'Hungarian forint (HUF)'), ('IDR', 'Indonesian rupiah (IDR)'), ('ILS', 'Israeli new shekel (ILS)'), ('IMP', 'Manx pound (IMP)'), ('INR', 'Indian rupee (INR)'), ('IQD', 'Iraqi dinar (IQD)'), ('IRR', 'Iranian rial (IRR)'), ('ISK', 'Icelandic króna (ISK)'), ('JEP', 'Jersey pound (JEP)'), ('JMD', 'Jamaican dollar (JMD)'), ('JOD', 'Jordanian dinar (JOD)'), ('JPY', 'Japanese yen (JPY)'), ('KES', 'Kenyan shilling (KES)'), ('KGS', 'Kyrgyzstani som (KGS)'), ('KHR', 'Cambodian riel (KHR)'), ('KID', 'Kiribati dollar (KID)'), ('KMF', 'Comorian franc (KMF)'), ('KPW', 'North Korean won (KPW)'), ('KRW', 'South Korean won (KRW)'), ('KWD', 'Kuwaiti dinar (KWD)'), ('KYD', 'Cayman Islands dollar (KYD)'), ('KZT', 'Kazakhstani tenge (KZT)'), ('LAK', 'Lao kip (LAK)'), ('LBP', 'Lebanese pound (LBP)'), ('LKR', 'Sri Lankan rupee (LKR)'), ('LRD', 'Liberian dollar (LRD)'), ('LSL', 'Lesotho loti (LSL)'), ('LYD', 'Libyan dinar (LYD)'), ('MAD', 'Moroccan dirham (MAD)'), ('MDL', 'Moldovan leu (MDL)'), ('MGA', 'Malagasy ariary (MGA)'), ('MKD', 'Macedonian denar (MKD)'), ('MMK', 'Burmese kyat (MMK)'), ('MNT', 'Mongolian tögrög (MNT)'), ('MOP', 'Macanese pataca (MOP)'), ('MRU', 'Mauritanian ouguiya (MRU)'), ('MUR', 'Mauritian rupee (MUR)'), ('MVR', 'Maldivian rufiyaa (MVR)'), ('MWK', 'Malawian kwacha (MWK)'), ('MXN', 'Mexican peso (MXN)'), ('MYR', 'Malaysian ringgit (MYR)'), ('MZN', 'Mozambican metical (MZN)'), ('NAD', 'Namibian dollar (NAD)'), ('NGN', 'Nigerian naira (NGN)'), ('NIO', 'Nicaraguan córdoba (NIO)'), ('NOK', 'Norwegian krone (NOK)'), ('NPR', 'Nepalese rupee (NPR)'), ('NZD', 'New Zealand dollar (NZD)'), ('OMR', 'Omani rial (OMR)'), ('PAB', 'Panamanian balboa (PAB)'), ('PEN', 'Peruvian sol (PEN)'), ('PGK', 'Papua New Guinean kina (PGK)'), ('PHP', 'Philippine peso (PHP)'), ('PKR', 'Pakistani rupee (PKR)'), ('PLN', 'Polish złoty (PLN)'), ('PRB', 'Transnistrian ruble (PRB)'), ('PYG', 'Paraguayan guaraní (PYG)'), ('QAR', 'Qatari riyal (QAR)'), ('RON', 'Romanian leu (RON)'), ('RSD', 'Serbian dinar (RSD)'), ('RUB', 'Russian ruble (RUB)'), ('RWF', 'Rwandan franc (RWF)'), ('SAR', 'Saudi riyal (SAR)'), ('SEK', 'Swedish krona (SEK)'), ('SGD', 'Singapore dollar (SGD)'), ('SHP', 'Saint Helena pound (SHP)'), ('SLL', 'Sierra Leonean leone (SLL)'), ('SLS', 'Somaliland shilling (SLS)'), ('SOS', 'Somali shilling (SOS)'), ('SRD', 'Surinamese dollar (SRD)'), ('SSP', 'South Sudanese pound (SSP)'), ('STN', 'São Tomé and Príncipe dobra (STN)'), ('SYP', 'Syrian pound (SYP)'), ('SZL', 'Swazi lilangeni (SZL)'), ('THB', 'Thai baht (THB)'), ('TJS', 'Tajikistani somoni (TJS)'), ('TMT', 'Turkmenistan manat (TMT)'), ('TND', 'Tunisian dinar (TND)'), ('TOP', 'Tongan paʻanga (TOP)'), ('TRY', 'Turkish lira (TRY)'), ('TTD', 'Trinidad and Tobago dollar (TTD)'), ('TVD', 'Tuvaluan dollar (TVD)'), ('TWD', 'New Taiwan dollar (TWD)'), ('TZS', 'Tanzanian shilling (TZS)'), ('UAH', 'Ukrainian hryvnia (UAH)'), ('UGX', 'Ugandan shilling (UGX)'), ('UYU', 'Uruguayan peso (UYU)'), ('UZS', 'Uzbekistani soʻm (UZS)'), ('VES', 'Venezuelan bolívar soberano (VES)'), ('VND', 'Vietnamese đồng (VND)'), ('VUV', 'Vanuatu vatu (VUV)'), ('WST', 'Samoan tālā (WST)'), ('XAF', 'Central African CFA franc (XAF)'), ('XCD', 'Eastern Caribbean dollar (XCD)'), ('XOF', 'West African CFA franc (XOF)'), ('XPF', 'CFP franc (XPF)'), ('ZAR', 'South African rand (ZAR)'), ('ZMW', 'Zambian kwacha (ZMW)'), ('ZWB', 'Zimbabwean bonds (ZWB)')], max_length=3, verbose_name='Devise')),
+                ('rate_date', models.DateField(verbose_name='Date du taux')),
+                ('rate', models.DecimalField(decimal_places=8, help_text="Valeur d'une unité de la devise en MRU", max_digits=18, verbose_name='Taux (en MRU)')),
+                ('source', models.CharField(blank=True, max_length=255, verbose_name='Fichier source')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Date de création')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Date de modification')),
+            ],
+            options={
+                'verbose_name': 'Taux de change',
+                'verbose_name_plural': 'Taux de change',
+                'ordering': ['currency', '-rate_date'],
+                'unique_together': {('currency', 'rate_date')},
+            },
+        ),
+    ]
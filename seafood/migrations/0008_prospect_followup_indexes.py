@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-18 23:34
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('seafood', '0007_exchangerate'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='prospect',
+            index=models.Index(fields=['status', 'next_followup'], name='seafood_pro_status_ec1b4a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='prospect',
+            index=models.Index(fields=['created_by', 'status', 'next_followup'], name='seafood_pro_created_4f8769_idx'),
+        ),
+    ]
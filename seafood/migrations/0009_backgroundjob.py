@@ -0,0 +1,44 @@
+# Generated by Django 5.2.7 on 2026-10-18 23:41
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('seafood', '0008_prospect_followup_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BackgroundJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, verbose_name='Tâche')),
+                ('payload', models.JSONField(blank=True, default=dict, verbose_name='Paramètres')),
+                ('status', models.CharField(choices=[('queued', 'En attente'), ('running', 'En cours'), ('succeeded', 'Terminée'), ('failed', 'Échouée'), ('cancelled', 'Annulée')], default='queued', max_length=20, verbose_name='Statut')),
+                ('priority', models.SmallIntegerField(choices=[(0, 'Basse'), (5, 'Normale'), (10, 'Haute')], default=5, verbose_name='Priorité')),
+                ('run_at', models.DateTimeField(verbose_name='Exécution prévue le')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='Tentatives')),
+                ('max_attempts', models.PositiveIntegerField(default=3, verbose_name='Tentatives maximum')),
+                ('locked_by', models.CharField(blank=True, max_length=100, verbose_name='Worker')),
+                ('locked_at', models.DateTimeField(blank=True, null=True, verbose_name='Prise en charge le')),
+                ('result', models.JSONField(blank=True, null=True, verbose_name='Résultat')),
+                ('last_error', models.TextField(blank=True, verbose_name='Dernière erreur')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='Démarrée le')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Terminée le')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Date de création')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Date de modification')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='background_jobs', to=settings.AUTH_USER_MODEL, verbose_name='Créée par')),
+            ],
+            options={
+                'verbose_name': 'Tâche en arrière-plan',
+                'verbose_name_plural': 'Tâches en arrière-plan',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', '-priority', 'run_at'], name='seafood_bac_status_80f0e9_idx'), models.Index(fields=['name', 'status'], name='seafood_bac_name_6cc94a_idx')],
+            },
+        ),
+    ]
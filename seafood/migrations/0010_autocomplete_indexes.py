@@ -0,0 +1,31 @@
+# Generated by Django 5.2.7 on 2026-10-19 10:05
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('seafood', '0009_backgroundjob'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bankaccount',
+            index=models.Index(fields=['status', 'bank_name'], name='seafood_ban_status_e5afe1_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cashbox',
+            index=models.Index(fields=['folder_code'], name='seafood_cas_folder__4c429c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='client',
+            index=models.Index(fields=['status', 'name'], name='seafood_cli_status_458b92_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='supplier',
+            index=models.Index(fields=['status', 'name'], name='seafood_sup_status_f83273_idx'),
+        ),
+    ]
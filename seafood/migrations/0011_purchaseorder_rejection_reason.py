@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 11:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('seafood', '0010_autocomplete_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='purchaseorder',
+            name='rejection_reason',
+            field=models.TextField(blank=True, help_text='Renseigné lorsque le bon de commande est rejeté', verbose_name='Motif de rejet'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.7 on 2026-10-19 12:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('seafood', '0012_document_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SupplierMonthlyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(verbose_name='Mois')),
+                ('order_count', models.PositiveIntegerField(default=0, verbose_name='Bons de commande')),
+                ('approved_count', models.PositiveIntegerField(default=0, verbose_name='Bons approuvés ou payés')),
+                ('paid_count', models.PositiveIntegerField(default=0, verbose_name='Bons payés')),
+                ('cancelled_count', models.PositiveIntegerField(default=0, verbose_name='Bons annulés')),
+                ('rejected_count', models.PositiveIntegerField(default=0, verbose_name='Bons rejetés')),
+                ('spend', models.DecimalField(decimal_places=2, default=0, max_digits=17, verbose_name='Dépense')),
+                ('approval_count', models.PositiveIntegerField(default=0, verbose_name='Approbations mesurées')),
+                ('approval_hours', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name="Délai d'approbation cumulé (heures)")),
+                ('payment_count', models.PositiveIntegerField(default=0, verbose_name='Paiements mesurés')),
+                ('payment_days', models.PositiveIntegerField(default=0, verbose_name='Délai de paiement cumulé (jours)')),
+                ('on_time_payment_count', models.PositiveIntegerField(default=0, verbose_name='Paiements dans les termes')),
+                ('supplier', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='monthly_stats', to='seafood.supplier', verbose_name='Fournisseur')),
+            ],
+            options={
+                'verbose_name': 'Statistiques mensuelles fournisseur',
+                'verbose_name_plural': 'Statistiques mensuelles fournisseurs',
+                'ordering': ['-month', 'supplier'],
+                'indexes': [models.Index(fields=['month'], name='seafood_sup_month_4167f2_idx')],
+                'constraints': [models.UniqueConstraint(fields=('supplier', 'month'), name='seafood_suppliermonthlystats_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,78 @@
+# Generated by Django 5.2.7 on 2026-10-19 13:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('seafood', '0013_suppliermonthlystats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=40, unique=True, verbose_name='Clé')),
+                ('name', models.CharField(max_length=200, verbose_name='Désignation')),
+                ('canonical_name', models.CharField(max_length=200, verbose_name='Forme canonique')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Date de création')),
+            ],
+            options={
+                'verbose_name': 'Article du catalogue',
+                'verbose_name_plural': 'Catalogue des articles',
+                'ordering': ['canonical_name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='SpendCube',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('unit', models.CharField(choices=[('pieces', 'Pièces'), ('bags', 'Sacs'), ('boxes', 'Boîtes'), ('foot', 'Pieds'), ('meter', 'Mètres'), ('pairs', 'Paires'), ('reams', 'Rames'), ('rolls', 'Rouleaux'), ('sets', 'Ensembles'), ('square_meters', 'Mètres carrés'), ('square_feet', 'Pieds carrés'), ('tons', 'Tonnes')], max_length=20, verbose_name='Unité')),
+                ('month', models.DateField(verbose_name='Mois')),
+                ('line_count', models.PositiveIntegerField(default=0, verbose_name='Lignes')),
+                ('quantity', models.DecimalField(decimal_places=3, default=0, max_digits=17, verbose_name='Quantité')),
+                ('subtotal', models.DecimalField(decimal_places=2, default=0, max_digits=17, verbose_name='Sous-total')),
+                ('tax_amount', models.DecimalField(decimal_places=2, default=0, max_digits=17, verbose_name='Montant taxe')),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=17, verbose_name='Total')),
+            ],
+            options={
+                'verbose_name': 'Cube des dépenses',
+                'verbose_name_plural': 'Cube des dépenses',
+                'ordering': ['-month', 'catalog_item'],
+            },
+        ),
+        migrations.AddField(
+            model_name='purchaseorderitem',
+            name='designation_key',
+            field=models.CharField(blank=True, editable=False, max_length=40, verbose_name='Clé article'),
+        ),
+        migrations.AddIndex(
+            model_name='purchaseorderitem',
+            index=models.Index(fields=['designation_key'], name='seafood_pur_designa_a46a7c_idx'),
+        ),
+        migrations.AddField(
+            model_name='spendcube',
+            name='catalog_item',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='spend_cells', to='seafood.catalogitem', verbose_name='Article'),
+        ),
+        migrations.AddField(
+            model_name='spendcube',
+            name='supplier',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='spend_cells', to='seafood.supplier', verbose_name='Fournisseur'),
+        ),
+        migrations.AddIndex(
+            model_name='spendcube',
+            index=models.Index(fields=['month'], name='seafood_spe_month_b2ec11_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='spendcube',
+            index=models.Index(fields=['supplier', 'month'], name='seafood_spe_supplie_e6e491_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='spendcube',
+            constraint=models.UniqueConstraint(fields=('catalog_item', 'unit', 'supplier', 'month'), name='seafood_spendcube_unique'),
+        ),
+    ]
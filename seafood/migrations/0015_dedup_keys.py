@@ -0,0 +1,43 @@
+# Generated by Django 5.2.7 on 2026-10-19 14:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('seafood', '0014_catalogitem_spendcube'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='client',
+            name='dedup_phonetic',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=20, verbose_name='Clé phonétique'),
+        ),
+        migrations.AddField(
+            model_name='client',
+            name='dedup_prefix',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=4, verbose_name='Clé n-gramme'),
+        ),
+        migrations.AddField(
+            model_name='prospect',
+            name='dedup_phonetic',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=20, verbose_name='Clé phonétique'),
+        ),
+        migrations.AddField(
+            model_name='prospect',
+            name='dedup_prefix',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=4, verbose_name='Clé n-gramme'),
+        ),
+        migrations.AddField(
+            model_name='supplier',
+            name='dedup_phonetic',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=20, verbose_name='Clé phonétique'),
+        ),
+        migrations.AddField(
+            model_name='supplier',
+            name='dedup_prefix',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=4, verbose_name='Clé n-gramme'),
+        ),
+    ]
@@ -1,10 +1,15 @@
 from django.db import models
 from django.conf import settings
 from django.core.validators import RegexValidator
-from django.db.models.signals import post_save, pre_save, pre_delete
+from django.db.models.signals import post_delete, post_save, pre_save, pre_delete
 from django.dispatch import receiver
 import os
 
+from core.versioning import VersionedModel
+
+from .dedup import DedupSource
+from .supplier_stats import SupplierStatsSource, refresh_order
+
 # Create your models here.
 
 class UserProfile(models.Model):
@@ -55,10 +60,12 @@ def client_logo_path(instance, filename):
     return f'clients/{filename}'
 
 
-class Client(models.Model):
+class Client(DedupSource, VersionedModel):
     """
     Modèle pour la gestion des clients
     """
+    dedup_identifiers = ('email', 'mobile', 'phone', 'tax_id', 'trade_register')
+
     CLIENT_TYPE_CHOICES = [
         ('individual', 'Particulier'),
         ('company', 'Entreprise'),
@@ -166,6 +173,7 @@ class Client(models.Model):
         indexes = [
             models.Index(fields=['accounting_code']),
             models.Index(fields=['status']),
+            models.Index(fields=['status', 'name']),
         ]
 
     def __str__(self):
@@ -194,10 +202,13 @@ class Client(models.Model):
 
 
 @receiver(pre_save, sender=Client)
-def delete_old_client_logo_on_update(sender, instance, **kwargs):
+def delete_old_client_logo_on_update(sender, instance, update_fields=None, **kwargs):
     """Supprime l'ancien logo lors de la modification"""
     if not instance.pk:
         return False
+    # Écriture ciblée sans le logo: pas de lecture de l'ancienne ligne
+    if update_fields is not None and 'logo' not in update_fields:
+        return False
 
     try:
         old_instance = Client.objects.get(pk=instance.pk)
@@ -225,10 +236,12 @@ def supplier_logo_path(instance, filename):
     return f'suppliers/{filename}'
 
 
-class Supplier(models.Model):
+class Supplier(DedupSource, models.Model):
     """
     Modèle pour la gestion des fournisseurs
     """
+    dedup_identifiers = ('email', 'mobile', 'contact_phone', 'tax_id', 'trade_register')
+
     CATEGORY_CHOICES = [
         ('logistics', 'Logistiques'),
         ('manufacturing', 'Fabrication'),
@@ -338,6 +351,7 @@ class Supplier(models.Model):
             models.Index(fields=['accounting_code']),
             models.Index(fields=['status']),
             models.Index(fields=['category']),
+            models.Index(fields=['status', 'name']),
         ]
 
     def __str__(self):
@@ -453,6 +467,7 @@ class Cashbox(models.Model):
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['status']),
+            models.Index(fields=['folder_code']),
         ]
 
     def __str__(self):
@@ -961,6 +976,7 @@ class BankAccount(models.Model):
         indexes = [
             models.Index(fields=['bank_identifier']),
             models.Index(fields=['status']),
+            models.Index(fields=['status', 'bank_name']),
         ]
 
     def __str__(self):
@@ -997,6 +1013,36 @@ def delete_bank_account_files_on_delete(sender, instance, **kwargs):
         os.remove(instance.contract.path)
 
 
+class ExchangeRate(models.Model):
+    """
+    Taux de change local (1 unité de devise = rate MRU), chargé depuis des fichiers
+    """
+    currency = models.CharField(
+        max_length=3,
+        choices=BankAccount.CURRENCY_CHOICES,
+        verbose_name='Devise'
+    )
+    rate_date = models.DateField(verbose_name='Date du taux')
+    rate = models.DecimalField(
+        max_digits=18,
+        decimal_places=8,
+        verbose_name='Taux (en MRU)',
+        help_text='Valeur d\'une unité de la devise en MRU'
+    )
+    source = models.CharField(max_length=255, blank=True, verbose_name='Fichier source')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Date de création')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Date de modification')
+
+    class Meta:
+        verbose_name = 'Taux de change'
+        verbose_name_plural = 'Taux de change'
+        ordering = ['currency', '-rate_date']
+        unique_together = [['currency', 'rate_date']]
+
+    def __str__(self):
+        return f"{self.currency} {self.rate_date} = {self.rate} MRU"
+
+
 class PurchaseRequest(models.Model):
     """
     Modèle pour les demandes d'achat (Purchase Request)
@@ -1181,7 +1227,7 @@ def purchase_order_file_path(instance, filename):
     return f'purchase_orders/po_{instance.po_number}/{filename}'
 
 
-class PurchaseOrder(models.Model):
+class PurchaseOrder(SupplierStatsSource, VersionedModel):
     """
     Modèle pour les bons de commande (Purchase Order)
     """
@@ -1298,6 +1344,11 @@ class PurchaseOrder(models.Model):
         null=True,
         verbose_name='Date d\'approbation'
     )
+    rejection_reason = models.TextField(
+        blank=True,
+        verbose_name='Motif de rejet',
+        help_text='Renseigné lorsque le bon de commande est rejeté'
+    )
 
     # Dates
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Date de création')
@@ -1360,13 +1411,17 @@ class PurchaseOrder(models.Model):
             self.tax_amount += item_tax
 
         self.total = self.subtotal + self.tax_amount
-        self.save()
+        self.save(update_fields=['subtotal', 'tax_amount', 'total'])
 
     @staticmethod
     def generate_po_number():
         """Génère un numéro PO unique au format #MMYYXXXXXX"""
+        return PurchaseOrder.generate_po_numbers(1)[0]
+
+    @staticmethod
+    def generate_po_numbers(count):
+        """Bloc de count numéros PO consécutifs à la suite du dernier numéro du mois (une lecture)"""
         from django.utils import timezone
-        from django.db.models import Max
 
         now = timezone.now()
         month = now.strftime('%m')  # Mois sur 2 chiffres
@@ -1387,7 +1442,7 @@ class PurchaseOrder(models.Model):
             new_number = 1
 
         # Format: #MMYYXXXXXX (ex: #1025000001)
-        return f"{prefix}{new_number:06d}"
+        return [f"{prefix}{number:06d}" for number in range(new_number, new_number + count)]
 
 
 class PurchaseOrderItem(models.Model):
@@ -1449,14 +1504,29 @@ class PurchaseOrderItem(models.Model):
     # Ordre d'affichage
     order = models.PositiveIntegerField(default=0, verbose_name='Ordre')
 
+    # Empreinte de la désignation canonique: article du catalogue (seafood.spend)
+    designation_key = models.CharField(max_length=40, blank=True, editable=False, verbose_name='Clé article')
+
     class Meta:
         verbose_name = 'Ligne de bon de commande'
         verbose_name_plural = 'Lignes de bons de commande'
         ordering = ['order', 'id']
+        indexes = [
+            models.Index(fields=['designation_key']),
+        ]
 
     def __str__(self):
         return f"{self.designation} - {self.quantity} {self.get_unit_display()}"
 
+    def save(self, *args, **kwargs):
+        from .spend import designation_key
+
+        self.designation_key = designation_key(self.designation)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'designation' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | {'designation_key'}
+        super().save(*args, **kwargs)
+
     @property
     def item_subtotal(self):
         """Calcule le sous-total de l'item"""
@@ -1480,10 +1550,165 @@ def delete_purchase_order_file_on_delete(sender, instance, **kwargs):
         os.remove(instance.file.path)
 
 
-class Prospect(models.Model):
+@receiver(post_save, sender=PurchaseOrder)
+def refresh_supplier_stats_on_save(sender, instance, **kwargs):
+    """Recalcule les statistiques mensuelles du fournisseur (mois quitté et mois occupé)"""
+    refresh_order(instance)
+
+
+@receiver(post_delete, sender=PurchaseOrder)
+def refresh_supplier_stats_on_delete(sender, instance, **kwargs):
+    refresh_order(instance, deleted=True)
+
+
+class SupplierMonthlyStats(models.Model):
+    """
+    Statistiques d'un fournisseur sur un mois (date PO), tenues à jour depuis
+    les bons de commande (voir seafood.supplier_stats)
+    """
+    supplier = models.ForeignKey(
+        Supplier,
+        on_delete=models.CASCADE,
+        related_name='monthly_stats',
+        verbose_name='Fournisseur'
+    )
+    month = models.DateField(verbose_name='Mois')
+    order_count = models.PositiveIntegerField(default=0, verbose_name='Bons de commande')
+    approved_count = models.PositiveIntegerField(default=0, verbose_name='Bons approuvés ou payés')
+    paid_count = models.PositiveIntegerField(default=0, verbose_name='Bons payés')
+    cancelled_count = models.PositiveIntegerField(default=0, verbose_name='Bons annulés')
+    rejected_count = models.PositiveIntegerField(default=0, verbose_name='Bons rejetés')
+    spend = models.DecimalField(max_digits=17, decimal_places=2, default=0, verbose_name='Dépense')
+    approval_count = models.PositiveIntegerField(default=0, verbose_name='Approbations mesurées')
+    approval_hours = models.DecimalField(
+        max_digits=14, decimal_places=2, default=0, verbose_name="Délai d'approbation cumulé (heures)"
+    )
+    payment_count = models.PositiveIntegerField(default=0, verbose_name='Paiements mesurés')
+    payment_days = models.PositiveIntegerField(default=0, verbose_name='Délai de paiement cumulé (jours)')
+    on_time_payment_count = models.PositiveIntegerField(default=0, verbose_name='Paiements dans les termes')
+
+    class Meta:
+        verbose_name = 'Statistiques mensuelles fournisseur'
+        verbose_name_plural = 'Statistiques mensuelles fournisseurs'
+        ordering = ['-month', 'supplier']
+        constraints = [
+            models.UniqueConstraint(fields=['supplier', 'month'], name='seafood_suppliermonthlystats_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['month']),
+        ]
+
+    def __str__(self):
+        return f"{self.supplier_id} - {self.month:%Y-%m}"
+
+
+class CatalogItem(models.Model):
+    """
+    Article du catalogue des achats: désignations des lignes de bon de commande
+    de même forme canonique (voir seafood.spend)
+    """
+    key = models.CharField(max_length=40, unique=True, verbose_name='Clé')
+    name = models.CharField(max_length=200, verbose_name='Désignation')
+    canonical_name = models.CharField(max_length=200, verbose_name='Forme canonique')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Date de création')
+
+    class Meta:
+        verbose_name = 'Article du catalogue'
+        verbose_name_plural = 'Catalogue des articles'
+        ordering = ['canonical_name']
+
+    def __str__(self):
+        return self.name
+
+
+class SpendCube(models.Model):
+    """
+    Dépenses d'un article, dans une unité, chez un fournisseur, sur un mois
+    (bons approuvés ou payés), tenues à jour depuis les bons de commande
+    """
+    catalog_item = models.ForeignKey(
+        CatalogItem,
+        on_delete=models.CASCADE,
+        related_name='spend_cells',
+        verbose_name='Article'
+    )
+    unit = models.CharField(max_length=20, choices=PurchaseOrderItem.UNIT_CHOICES, verbose_name='Unité')
+    supplier = models.ForeignKey(
+        Supplier,
+        on_delete=models.CASCADE,
+        related_name='spend_cells',
+        verbose_name='Fournisseur'
+    )
+    month = models.DateField(verbose_name='Mois')
+    line_count = models.PositiveIntegerField(default=0, verbose_name='Lignes')
+    quantity = models.DecimalField(max_digits=17, decimal_places=3, default=0, verbose_name='Quantité')
+    subtotal = models.DecimalField(max_digits=17, decimal_places=2, default=0, verbose_name='Sous-total')
+    tax_amount = models.DecimalField(max_digits=17, decimal_places=2, default=0, verbose_name='Montant taxe')
+    total = models.DecimalField(max_digits=17, decimal_places=2, default=0, verbose_name='Total')
+
+    class Meta:
+        verbose_name = 'Cube des dépenses'
+        verbose_name_plural = 'Cube des dépenses'
+        ordering = ['-month', 'catalog_item']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['catalog_item', 'unit', 'supplier', 'month'], name='seafood_spendcube_unique'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['month']),
+            models.Index(fields=['supplier', 'month']),
+        ]
+
+    def __str__(self):
+        return f"{self.catalog_item_id} - {self.unit} - {self.supplier_id} - {self.month:%Y-%m}"
+
+
+class ProspectQuerySet(models.QuerySet):
+    """
+    Requêtes de relance des prospects. Chaque file filtre sur (status, next_followup)
+    afin d'être servie par les index composites du modèle.
+    """
+
+    def open(self):
+        """Prospects encore actifs (ni convertis ni perdus)"""
+        return self.filter(status__in=Prospect.OPEN_STATUSES)
+
+    def for_user(self, user):
+        return self.filter(created_by=user)
+
+    def overdue(self, day):
+        """Relances en retard (avant la date donnée)"""
+        return self.open().filter(next_followup__lt=day)
+
+    def due_today(self, day):
+        """Relances prévues à la date donnée"""
+        return self.open().filter(next_followup=day)
+
+    def due_this_week(self, day):
+        """Relances prévues après la date donnée et jusqu'à la fin de la semaine"""
+        from datetime import timedelta
+        end_of_week = day + timedelta(days=6 - day.weekday())
+        return self.open().filter(next_followup__gt=day, next_followup__lte=end_of_week)
+
+    def followup_bucket(self, bucket, day):
+        """Retourne la file de relance demandée: 'overdue', 'today' ou 'week'"""
+        if bucket == 'overdue':
+            return self.overdue(day)
+        if bucket == 'today':
+            return self.due_today(day)
+        if bucket == 'week':
+            return self.due_this_week(day)
+        raise ValueError(f"File de relance inconnue: {bucket}")
+
+
+class Prospect(DedupSource, models.Model):
     """
     Modèle pour la gestion des prospects
     """
+    dedup_name_fields = ('company_name', 'first_name', 'last_name')
+    dedup_identifiers = ('email', 'mobile')
+
     # États du prospect
     STATUS_CHOICES = [
         ('new', 'Nouveau'),
@@ -1494,6 +1719,15 @@ class Prospect(models.Model):
         ('lost', 'Perdu'),
     ]
 
+    # États pour lesquels une relance reste à faire
+    OPEN_STATUSES = ['new', 'contacted', 'qualified', 'relaunched']
+
+    FOLLOWUP_BUCKETS = [
+        ('overdue', 'En retard'),
+        ('today', 'Aujourd\'hui'),
+        ('week', 'Cette semaine'),
+    ]
+
     # Sources d'acquisition
     SOURCE_CHOICES = [
         ('website', 'Site web'),
@@ -1609,6 +1843,8 @@ class Prospect(models.Model):
         verbose_name='Créé par'
     )
 
+    objects = ProspectQuerySet.as_manager()
+
     class Meta:
         verbose_name = 'Prospect'
         verbose_name_plural = 'Prospects'
@@ -1617,6 +1853,8 @@ class Prospect(models.Model):
             models.Index(fields=['status']),
             models.Index(fields=['email']),
             models.Index(fields=['next_followup']),
+            models.Index(fields=['status', 'next_followup']),
+            models.Index(fields=['created_by', 'status', 'next_followup']),
         ]
 
     def __str__(self):
@@ -1626,3 +1864,84 @@ class Prospect(models.Model):
     def full_name(self):
         """Retourne le nom complet du contact"""
         return f"{self.first_name} {self.last_name}"
+
+
+class BackgroundJob(models.Model):
+    """
+    Tâche en arrière-plan stockée en base: mise en file par les vues et exécutée
+    par les workers de la commande runworkers (voir seafood.jobs)
+    """
+    STATUS_CHOICES = [
+        ('queued', 'En attente'),
+        ('running', 'En cours'),
+        ('succeeded', 'Terminée'),
+        ('failed', 'Échouée'),
+        ('cancelled', 'Annulée'),
+    ]
+
+    PRIORITY_CHOICES = [
+        (0, 'Basse'),
+        (5, 'Normale'),
+        (10, 'Haute'),
+    ]
+
+    name = models.CharField(max_length=100, verbose_name='Tâche')
+    payload = models.JSONField(default=dict, blank=True, verbose_name='Paramètres')
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default='queued',
+        verbose_name='Statut'
+    )
+    priority = models.SmallIntegerField(
+        choices=PRIORITY_CHOICES,
+        default=5,
+        verbose_name='Priorité'
+    )
+    run_at = models.DateTimeField(verbose_name='Exécution prévue le')
+    attempts = models.PositiveIntegerField(default=0, verbose_name='Tentatives')
+    max_attempts = models.PositiveIntegerField(default=3, verbose_name='Tentatives maximum')
+    locked_by = models.CharField(max_length=100, blank=True, verbose_name='Worker')
+    locked_at = models.DateTimeField(null=True, blank=True, verbose_name='Prise en charge le')
+    result = models.JSONField(null=True, blank=True, verbose_name='Résultat')
+    last_error = models.TextField(blank=True, verbose_name='Dernière erreur')
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name='Démarrée le')
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name='Terminée le')
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='background_jobs',
+        verbose_name='Créée par'
+    )
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Date de création')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Date de modification')
+
+    class Meta:
+        verbose_name = 'Tâche en arrière-plan'
+        verbose_name_plural = 'Tâches en arrière-plan'
+        ordering = ['-created_at']
+        indexes = [
+            # File d'attente: prochaines tâches à prendre en charge
+            models.Index(fields=['status', '-priority', 'run_at']),
+            models.Index(fields=['name', 'status']),
+        ]
+
+    def __str__(self):
+        return f"#{self.pk} {self.name} ({self.get_status_display()})"
+
+    @property
+    def duration(self):
+        """Durée de la dernière exécution"""
+        if self.started_at and self.finished_at:
+            return self.finished_at - self.started_at
+        return None
+
+    @property
+    def can_be_retried(self):
+        return self.status in ('failed', 'cancelled')
+
+    @property
+    def can_be_cancelled(self):
+        return self.status == 'queued'
@@ -0,0 +1,365 @@
+"""
+Import en masse de prospects depuis un fichier CSV ou XLSX (listes de salons).
+
+La page d'import enregistre le fichier envoyé (save_upload) et met en file la
+tâche seafood.import_prospects: l'import tourne dans un worker (run_import),
+la page suit la tâche puis affiche le bilan. Le fichier envoyé est supprimé
+après l'import.
+
+Le fichier est lu ligne par ligne (csv.reader sur le flux, openpyxl en lecture
+seule pour XLSX): il n'est jamais chargé en entier. La première ligne donne les
+colonnes, reconnues par nom de champ ou libellé ("Prénom", "first_name",
+"Entreprise"...). Chaque ligne est validée par les champs du modèle (formats
+de l'email, du portable, des dates; choix acceptés par code ou libellé).
+
+Les doublons sont écartés sans requête par ligne: les emails et portables des
+prospects existants sont chargés une fois dans des ensembles (portable ramené
+à ses 8 derniers chiffres, comme seafood.dedup), complétés au fil du fichier.
+Les lignes valides sont insérées par bulk_create, par paquets de CHUNK_SIZE,
+dans une seule transaction (une erreur de base annule tout l'import), avec
+leurs clés de doublons (DedupSource).
+
+Les lignes écartées (invalides ou doublons) sont écrites au fil de l'eau dans
+un rapport CSV (IMPORT_REPORTS_DIR) téléchargeable depuis la page d'import:
+numéro de ligne, motif, puis les valeurs d'origine. Ces rapports contiennent
+des données personnelles: ceux de plus de IMPORT_REPORTS_MAX_AGE_DAYS jours
+(et les fichiers envoyés restés après un échec) sont supprimés à l'import
+suivant.
+"""
+import csv
+import io
+import os
+import re
+import time
+import uuid
+from datetime import date, datetime
+from itertools import chain
+
+from django.apps import apps as global_apps
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
+
+from .dedup import normalize_phone
+from .spend import canonical_designation
+
+CHUNK_SIZE = 1000
+REPORT_PREFIX = 'prospects-'
+REPORT_NAME_RE = re.compile(r'^prospects-[0-9a-f]{32}\.csv$')
+UPLOAD_PREFIX = 'upload-'
+UPLOAD_NAME_RE = re.compile(r'^upload-[0-9a-f]{32}\.(csv|txt|xlsx|xlsm)$')
+CSV_EXTENSIONS = ('.csv', '.txt')
+XLSX_EXTENSIONS = ('.xlsx', '.xlsm')
+
+IMPORT_FIELDS = (
+    'first_name', 'last_name', 'email', 'mobile', 'position', 'company_name', 'contact_source', 'status',
+    'acquisition_source', 'policy_maker', 'last_interaction', 'office_number', 'email_contact', 'website',
+    'zip_code', 'city', 'country', 'address', 'linkedin', 'twitter', 'facebook', 'instagram', 'trouble',
+    'remark', 'next_followup',
+)
+REQUIRED_COLUMNS = ('first_name', 'last_name', 'email', 'mobile', 'position', 'company_name')
+PHONE_FIELDS = ('mobile', 'office_number')
+
+# En-têtes usuels des fichiers de salons (forme canonique) en plus des noms et libellés des champs
+ALIASES = {
+    'e mail': 'email', 'mail': 'email', 'courriel': 'email', 'telephone': 'mobile', 'tel': 'mobile',
+    'gsm': 'mobile', 'portable': 'mobile', 'nom': 'last_name', 'prenom': 'first_name', 'poste': 'position',
+    'fonction': 'position', 'entreprise': 'company_name', 'societe': 'company_name', 'source': 'contact_source',
+}
+
+
+class ProspectImportError(Exception):
+    """Fichier illisible ou colonnes obligatoires absentes"""
+
+
+class ImportResult:
+    """Bilan d'un import: lignes lues, prospects créés, doublons et lignes invalides, rapport"""
+
+    def __init__(self):
+        self.rows = 0
+        self.created = 0
+        self.duplicates = 0
+        self.invalid = 0
+        self.report = None
+
+    def as_dict(self):
+        return {
+            'rows': self.rows, 'created': self.created, 'duplicates': self.duplicates,
+            'invalid': self.invalid, 'report': self.report,
+        }
+
+
+def _cell(value):
+    """Valeur d'une cellule en texte (XLSX: dates ISO, numéros saisis comme nombres sans ".0")"""
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        return value.date().isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value).strip()
+
+
+def _csv_rows(file):
+    text = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+    first = text.readline()
+    delimiter = max(';,\t', key=first.count)
+    yield from csv.reader(chain([first], text), delimiter=delimiter)
+
+
+def _xlsx_rows(file):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ProspectImportError("L'import XLSX nécessite openpyxl (pip install openpyxl).")
+    try:
+        workbook = load_workbook(file, read_only=True, data_only=True)
+    except Exception as e:
+        raise ProspectImportError(f"Fichier XLSX illisible: {e}")
+    try:
+        for row in workbook.active.iter_rows(values_only=True):
+            yield [_cell(value) for value in row]
+    finally:
+        workbook.close()
+
+
+def read_rows(file, filename):
+    """Lignes du fichier (listes de textes), en-tête compris, lues au fil de l'eau"""
+    if filename.lower().endswith(XLSX_EXTENSIONS):
+        return _xlsx_rows(file)
+    if filename.lower().endswith(CSV_EXTENSIONS):
+        return _csv_rows(file)
+    raise ProspectImportError("Format non pris en charge: fichier CSV ou XLSX attendu.")
+
+
+def header_map(header):
+    """Colonnes reconnues {index: champ}; lève ProspectImportError s'il manque une colonne obligatoire"""
+    Prospect = global_apps.get_model('seafood', 'Prospect')
+    names = dict(ALIASES)
+    for name in IMPORT_FIELDS:
+        field = Prospect._meta.get_field(name)
+        names[canonical_designation(name)] = name
+        names[canonical_designation(str(field.verbose_name))] = name
+    columns = {}
+    for index, title in enumerate(header):
+        name = names.get(canonical_designation(title))
+        if name and name not in columns.values():
+            columns[index] = name
+    missing = [
+        str(Prospect._meta.get_field(name).verbose_name) for name in REQUIRED_COLUMNS if name not in columns.values()
+    ]
+    if missing:
+        raise ProspectImportError(f"Colonne(s) obligatoire(s) absente(s): {', '.join(missing)}.")
+    return columns
+
+
+class RowCleaner:
+    """Validation d'une ligne par les champs du modèle (sans requête)"""
+
+    def __init__(self, columns):
+        Prospect = global_apps.get_model('seafood', 'Prospect')
+        self.columns = columns
+        self.fields = {name: Prospect._meta.get_field(name) for name in columns.values()}
+        self.choices = {}
+        for name, field in self.fields.items():
+            if field.choices:
+                mapping = {}
+                for code, label in field.choices:
+                    mapping[canonical_designation(code)] = code
+                    mapping[canonical_designation(str(label))] = code
+                self.choices[name] = mapping
+
+    def _value(self, name, field, raw):
+        if name in self.choices and raw:
+            return self.choices[name].get(canonical_designation(raw), raw)
+        if isinstance(field, models.DateField) and re.match(r'^\d{1,2}/\d{1,2}/\d{4}$', raw):
+            day, month, year = raw.split('/')
+            return f'{year}-{int(month):02d}-{int(day):02d}'
+        if isinstance(field, models.EmailField):
+            return raw.lower()
+        if name in PHONE_FIELDS:
+            return re.sub(r'[\s.()-]', '', raw)
+        return raw
+
+    def clean(self, row):
+        """Valeurs nettoyées {champ: valeur} et erreurs d'une ligne"""
+        data, errors = {}, []
+        for index, name in self.columns.items():
+            field = self.fields[name]
+            raw = row[index].strip() if index < len(row) and row[index] else ''
+            if not raw and field.has_default():
+                continue
+            value = self._value(name, field, raw)
+            if value == '' and field.null:
+                value = None
+            try:
+                data[name] = field.clean(value, None)
+            except ValidationError as e:
+                errors.append(f"{field.verbose_name}: {' '.join(e.messages)}")
+        return data, errors
+
+
+def existing_contacts():
+    """Emails (minuscules) et portables (8 derniers chiffres) des prospects existants (une lecture)"""
+    Prospect = global_apps.get_model('seafood', 'Prospect')
+    emails, mobiles = set(), set()
+    for email, mobile in Prospect._base_manager.order_by().values_list('email', 'mobile').iterator(chunk_size=5000):
+        if email:
+            emails.add(email.strip().lower())
+        phone = normalize_phone(mobile)
+        if phone:
+            mobiles.add(phone)
+    return emails, mobiles
+
+
+class ErrorReport:
+    """Rapport CSV des lignes écartées, ouvert à la première ligne écartée"""
+
+    def __init__(self, header):
+        self.header = header
+        self.name = None
+        self._file = None
+        self._writer = None
+
+    def add(self, line, reason, row):
+        if self._writer is None:
+            os.makedirs(settings.IMPORT_REPORTS_DIR, exist_ok=True)
+            self.name = f'{REPORT_PREFIX}{uuid.uuid4().hex}.csv'
+            self._file = open(report_path(self.name), 'w', encoding='utf-8-sig', newline='')
+            self._writer = csv.writer(self._file, delimiter=';')
+            self._writer.writerow(['Ligne', 'Motif', *self.header])
+        self._writer.writerow([line, reason, *row])
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+
+    def discard(self):
+        self.close()
+        if self.name:
+            os.remove(report_path(self.name))
+            self.name = None
+
+
+def report_path(name):
+    """Chemin d'un rapport d'import (nom contrôlé: pas de chemin arbitraire)"""
+    if not REPORT_NAME_RE.match(name or ''):
+        raise ProspectImportError("Rapport introuvable.")
+    return os.path.join(settings.IMPORT_REPORTS_DIR, name)
+
+
+def upload_path(name):
+    """Chemin d'un fichier envoyé en attente d'import (nom contrôlé)"""
+    if not UPLOAD_NAME_RE.match(name or ''):
+        raise ProspectImportError("Fichier envoyé introuvable.")
+    return os.path.join(settings.IMPORT_REPORTS_DIR, name)
+
+
+def save_upload(uploaded):
+    """Enregistre un fichier envoyé (UploadedFile) pour la tâche d'import; retourne son nom"""
+    extension = os.path.splitext(uploaded.name)[1].lower()
+    if extension not in CSV_EXTENSIONS + XLSX_EXTENSIONS:
+        raise ProspectImportError("Format non pris en charge: fichier CSV ou XLSX attendu.")
+    os.makedirs(settings.IMPORT_REPORTS_DIR, exist_ok=True)
+    name = f'{UPLOAD_PREFIX}{uuid.uuid4().hex}{extension}'
+    with open(upload_path(name), 'wb') as destination:
+        for chunk in uploaded.chunks():
+            destination.write(chunk)
+    return name
+
+
+def run_import(name, filename, user=None):
+    """Importe un fichier enregistré par save_upload (tâche seafood.import_prospects), puis le supprime"""
+    path = upload_path(name)
+    if not os.path.isfile(path):
+        raise ProspectImportError("Fichier envoyé introuvable.")
+    try:
+        with open(path, 'rb') as file:
+            result = import_prospects(file, filename, user=user)
+    except ProspectImportError:
+        os.remove(path)
+        raise
+    os.remove(path)
+    return result
+
+
+def purge_reports(max_age_days=None):
+    """
+    Supprime les rapports d'import et les fichiers envoyés plus anciens que
+    max_age_days jours; retourne le nombre de fichiers supprimés
+    """
+    max_age_days = settings.IMPORT_REPORTS_MAX_AGE_DAYS if max_age_days is None else max_age_days
+    if not os.path.isdir(settings.IMPORT_REPORTS_DIR):
+        return 0
+    limit = time.time() - max_age_days * 86400
+    deleted = 0
+    with os.scandir(settings.IMPORT_REPORTS_DIR) as entries:
+        for entry in entries:
+            known = REPORT_NAME_RE.match(entry.name) or UPLOAD_NAME_RE.match(entry.name)
+            if known and entry.is_file() and entry.stat().st_mtime < limit:
+                try:
+                    os.remove(entry.path)
+                except FileNotFoundError:
+                    continue
+                deleted += 1
+    return deleted
+
+
+def import_prospects(file, filename, user=None, chunk_size=CHUNK_SIZE):
+    """Importe les prospects d'un fichier CSV ou XLSX; retourne un ImportResult"""
+    Prospect = global_apps.get_model('seafood', 'Prospect')
+    purge_reports()
+    rows = read_rows(file, filename)
+    try:
+        header = next(rows)
+    except StopIteration:
+        raise ProspectImportError("Fichier vide.")
+    except UnicodeDecodeError:
+        raise ProspectImportError("Encodage non reconnu: enregistrez le fichier en CSV UTF-8.")
+    cleaner = RowCleaner(header_map(header))
+    emails, mobiles = existing_contacts()
+
+    result = ImportResult()
+    report = ErrorReport(header)
+    pending = []
+    try:
+        with transaction.atomic():
+            for line, row in enumerate(rows, start=2):
+                if not any(cell.strip() for cell in row if cell):
+                    continue
+                result.rows += 1
+                data, errors = cleaner.clean(row)
+                if errors:
+                    result.invalid += 1
+                    report.add(line, '; '.join(errors), row)
+                    continue
+                email, mobile = data['email'], normalize_phone(data['mobile'])
+                if email in emails or mobile in mobiles:
+                    result.duplicates += 1
+                    report.add(line, 'Doublon: email ou portable déjà connu', row)
+                    continue
+                emails.add(email)
+                if mobile:
+                    mobiles.add(mobile)
+
+                prospect = Prospect(created_by=user, **data)
+                prospect.set_dedup_keys()
+                pending.append(prospect)
+                if len(pending) >= chunk_size:
+                    Prospect.objects.bulk_create(pending)
+                    result.created += len(pending)
+                    pending = []
+            if pending:
+                Prospect.objects.bulk_create(pending)
+                result.created += len(pending)
+    except BaseException as e:
+        # Import annulé: pas de rapport partiel
+        report.discard()
+        if isinstance(e, UnicodeDecodeError):
+            raise ProspectImportError("Encodage non reconnu: enregistrez le fichier en CSV UTF-8.")
+        raise
+    report.close()
+    result.report = report.name
+    return result
@@ -0,0 +1,148 @@
+"""
+Approbation groupée des demandes d'achat.
+
+Les demandes en brouillon sélectionnées sont approuvées ensemble: chacune
+reçoit un fournisseur, chacun de ses articles un prix unitaire et un taux de
+taxe. Les articles des demandes d'un même fournisseur sont regroupés en un seul
+bon de commande (en attente), dont la note cite les demandes d'origine.
+
+Tout est écrit dans une transaction, par opérations groupées: changement de
+statut des demandes (Workflow.bulk_transition, lignes verrouillées), bloc de
+numéros PO consécutifs (PurchaseOrder.generate_po_numbers, nouvelle tentative
+si un numéro est pris entre-temps), bons de commande avec leurs totaux puis
+lignes en bulk_create. Une demande refusée (déjà approuvée, rejetée...) annule
+l'ensemble. bulk_create n'envoie pas les signaux: les statistiques des
+fournisseurs et le cube des dépenses sont recalculés explicitement.
+"""
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal, InvalidOperation
+
+from django.apps import apps as global_apps
+from django.db import IntegrityError, transaction
+
+from .spend import designation_key
+from .supplier_stats import month_of, refresh_purchase_rollups
+
+NUMBER_ATTEMPTS = 10
+REJECTED_SHOWN = 10
+CENT = Decimal('0.01')
+
+
+class BatchApprovalError(Exception):
+    """Approbation groupée refusée (saisie incomplète ou demande non approuvable)"""
+
+
+def parse_amount(value, label, maximum=None):
+    """Montant saisi (virgule acceptée); lève BatchApprovalError s'il est invalide"""
+    try:
+        amount = Decimal(str(value).strip().replace(',', '.'))
+    except (InvalidOperation, ValueError):
+        raise BatchApprovalError(f"{label}: montant invalide.")
+    if not amount.is_finite() or amount < 0 or (maximum is not None and amount > maximum):
+        raise BatchApprovalError(f"{label}: montant invalide.")
+    return amount
+
+
+def request_items(request_ids):
+    """Articles des demandes {pk demande: [articles]} (une requête)"""
+    PurchaseRequestItem = global_apps.get_model('seafood', 'PurchaseRequestItem')
+    items = defaultdict(list)
+    queryset = PurchaseRequestItem.objects.filter(purchase_request__in=request_ids).order_by('purchase_request', 'pk')
+    for item in queryset:
+        items[item.purchase_request_id].append(item)
+    return items
+
+
+def _create_orders(orders):
+    """bulk_create des bons de commande avec un bloc de numéros; retourne {numéro: pk}"""
+    PurchaseOrder = global_apps.get_model('seafood', 'PurchaseOrder')
+    for attempt in range(NUMBER_ATTEMPTS):
+        numbers = PurchaseOrder.generate_po_numbers(len(orders))
+        for order, number in zip(orders, numbers):
+            order.po_number = number
+        try:
+            with transaction.atomic():
+                PurchaseOrder.objects.bulk_create(orders)
+        except IntegrityError:
+            if attempt == NUMBER_ATTEMPTS - 1:
+                raise
+            continue
+        # MySQL ne retourne pas les clés des lignes insérées: relues par numéro
+        return dict(PurchaseOrder.objects.filter(po_number__in=numbers).values_list('po_number', 'pk'))
+
+
+def approve_requests(suppliers, prices, user=None, po_date=None):
+    """
+    Approuve les demandes {pk demande: pk fournisseur} et crée un bon de
+    commande par fournisseur. prices donne {pk article: (prix unitaire, taux
+    de taxe)} pour chaque article des demandes. Retourne les bons de commande
+    créés (triés par numéro); lève BatchApprovalError sans rien écrire si une
+    demande n'est pas approuvable ou si un prix manque.
+    """
+    from core.workflow import get_workflow
+
+    PurchaseOrder = global_apps.get_model('seafood', 'PurchaseOrder')
+    PurchaseOrderItem = global_apps.get_model('seafood', 'PurchaseOrderItem')
+    PurchaseRequest = global_apps.get_model('seafood', 'PurchaseRequest')
+
+    if not suppliers:
+        raise BatchApprovalError("Aucune demande d'achat sélectionnée.")
+    po_date = po_date or date.today()
+    workflow = get_workflow(PurchaseRequest)
+
+    with transaction.atomic():
+        result = workflow.bulk_transition(list(suppliers), 'approved', user=user)
+        if result.rejected:
+            rejected = list(result.rejected.items())[:REJECTED_SHOWN]
+            labels = workflow.labels([pk for pk, reason in rejected])
+            more = len(result.rejected) - len(rejected)
+            raise BatchApprovalError('; '.join(
+                [f"{labels.get(pk, pk)}: {reason}" for pk, reason in rejected] + ([f"et {more} autre(s)"] if more else [])
+            ))
+
+        numbers = dict(PurchaseRequest.objects.filter(pk__in=suppliers).values_list('pk', 'pr_number'))
+        items = request_items(list(suppliers))
+        groups = defaultdict(list)
+        for request_id, supplier_id in sorted(suppliers.items()):
+            if not items[request_id]:
+                raise BatchApprovalError(f"{numbers[request_id]}: aucun article.")
+            groups[int(supplier_id)].append(request_id)
+
+        orders, lines = [], {}
+        for supplier_id, request_ids in sorted(groups.items()):
+            order = PurchaseOrder(
+                po_date=po_date, supplier_id=supplier_id, status='pending', created_by=user,
+                note='Créé automatiquement depuis ' + ', '.join(f'PR-{numbers[pk]}' for pk in request_ids),
+            )
+            order.subtotal = order.tax_amount = Decimal('0.00')
+            order_lines = []
+            for request_id in request_ids:
+                for item in items[request_id]:
+                    if item.pk not in prices:
+                        raise BatchApprovalError(f"{numbers[request_id]}: prix manquant pour {item.designation}.")
+                    unit_price, tax_rate = prices[item.pk]
+                    subtotal = item.quantity * unit_price
+                    order.subtotal += subtotal
+                    order.tax_amount += subtotal * tax_rate / 100
+                    order_lines.append(PurchaseOrderItem(
+                        designation=item.designation, quantity=item.quantity, unit=item.unit,
+                        unit_price=unit_price, tax_rate=tax_rate, order=len(order_lines),
+                        designation_key=designation_key(item.designation),
+                    ))
+            order.subtotal = order.subtotal.quantize(CENT)
+            order.tax_amount = order.tax_amount.quantize(CENT)
+            order.total = order.subtotal + order.tax_amount
+            orders.append(order)
+            lines[id(order)] = order_lines
+
+        pks = _create_orders(orders)
+        for order in orders:
+            order.pk = pks[order.po_number]
+            order._state.adding = False
+            for line in lines[id(order)]:
+                line.purchase_order_id = order.pk
+        PurchaseOrderItem.objects.bulk_create([line for order in orders for line in lines[id(order)]])
+
+        refresh_purchase_rollups({(order.supplier_id, month_of(po_date)) for order in orders})
+    return sorted(orders, key=lambda order: order.po_number)
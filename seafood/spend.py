@@ -0,0 +1,232 @@
+"""
+Catalogue des articles achetés et cube des dépenses (tables CatalogItem et SpendCube).
+
+Les lignes de bon de commande ne portent qu'une désignation libre. Elle est
+ramenée à une forme canonique (minuscules, sans accents ni ponctuation,
+espaces réduits) dont l'empreinte SHA-1 est enregistrée sur la ligne
+(PurchaseOrderItem.designation_key, indexée): "Gants nitrile  L" et
+"gants-nitrile l" désignent le même article du catalogue.
+
+Le cube somme, par article, unité, fournisseur et mois (date PO), le nombre
+de lignes, les quantités et les montants des bons approuvés ou payés. Il est
+tenu à jour avec les statistiques mensuelles des fournisseurs: les couples
+(fournisseur, mois) touchés par un bon de commande sont recalculés par une
+requête groupée sur leurs lignes (voir seafood.supplier_stats), puis
+supprimés et réinsérés. spend_cube() répond aux questions de l'analyse
+(regroupement par une ou plusieurs dimensions, filtres pour descendre d'un
+niveau) sur le cube seul, sans relire les lignes. La commande
+rebuild_spend_cube calcule les empreintes manquantes et reconstruit le cube.
+"""
+import hashlib
+import re
+import unicodedata
+from decimal import Decimal
+
+from django.apps import apps as global_apps
+from django.db import models, transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Q, Sum
+from django.db.models.functions import TruncMonth
+
+from .supplier_stats import BATCH_MONTHS, SPEND_STATUSES, _keys_filter, month_of, next_month
+
+AMOUNT = Decimal('0.01')
+QUANTITY = Decimal('0.001')
+KEY_BATCH = 2000
+
+# Dimensions du cube: nom de l'API -> champ
+DIMENSIONS = {
+    'item': 'catalog_item',
+    'unit': 'unit',
+    'supplier': 'supplier',
+    'month': 'month',
+}
+
+_separators = re.compile(r'[^0-9a-z]+')
+
+
+def canonical_designation(designation):
+    """Forme canonique d'une désignation: minuscules, sans accents, mots séparés par une espace"""
+    text = unicodedata.normalize('NFKD', designation or '')
+    text = ''.join(char for char in text if not unicodedata.combining(char)).lower()
+    return _separators.sub(' ', text).strip()
+
+
+def designation_key(designation):
+    """Empreinte (40 caractères hexadécimaux) de la forme canonique d'une désignation"""
+    return hashlib.sha1(canonical_designation(designation).encode()).hexdigest()
+
+
+def assign_designation_keys(queryset=None, batch_size=KEY_BATCH):
+    """
+    Calcule l'empreinte des lignes qui n'en ont pas (lignes créées par
+    bulk_create ou antérieures au catalogue); retourne le nombre de lignes
+    """
+    PurchaseOrderItem = global_apps.get_model('seafood', 'PurchaseOrderItem')
+    queryset = (queryset if queryset is not None else PurchaseOrderItem.objects.all()).filter(designation_key='')
+    updated = 0
+    while True:
+        rows = list(queryset.order_by('pk').values_list('pk', 'designation')[:batch_size])
+        if not rows:
+            return updated
+        items = [PurchaseOrderItem(pk=pk, designation_key=designation_key(designation)) for pk, designation in rows]
+        PurchaseOrderItem.objects.bulk_update(items, ['designation_key'])
+        updated += len(items)
+
+
+def catalog_items(designations):
+    """Articles du catalogue {empreinte: id} des désignations {empreinte: désignation}, créés au besoin"""
+    CatalogItem = global_apps.get_model('seafood', 'CatalogItem')
+    if not designations:
+        return {}
+    existing = dict(CatalogItem.objects.filter(key__in=designations).values_list('key', 'pk'))
+    missing = [
+        CatalogItem(
+            key=key, name=' '.join(designation.split())[:200], canonical_name=canonical_designation(designation)[:200],
+        )
+        for key, designation in designations.items() if key not in existing
+    ]
+    if missing:
+        CatalogItem.objects.bulk_create(missing, ignore_conflicts=True)
+        existing.update(CatalogItem.objects.filter(key__in=[item.key for item in missing]).values_list('key', 'pk'))
+    return existing
+
+
+def _line_amounts():
+    subtotal = ExpressionWrapper(F('quantity') * F('unit_price'), output_field=DecimalField(max_digits=28, decimal_places=4))
+    tax = ExpressionWrapper(
+        F('quantity') * F('unit_price') * F('tax_rate') / 100, output_field=DecimalField(max_digits=28, decimal_places=6)
+    )
+    return subtotal, tax
+
+
+def compute_cells(condition):
+    """
+    Cellules du cube des bons de commande retenus par condition (sur
+    PurchaseOrder), en une requête groupée sur leurs lignes
+    """
+    PurchaseOrder = global_apps.get_model('seafood', 'PurchaseOrder')
+    PurchaseOrderItem = global_apps.get_model('seafood', 'PurchaseOrderItem')
+    SpendCube = global_apps.get_model('seafood', 'SpendCube')
+
+    orders = PurchaseOrder.objects.filter(condition, status__in=SPEND_STATUSES)
+    lines = PurchaseOrderItem.objects.filter(purchase_order__in=orders.values('pk'))
+    assign_designation_keys(lines)
+    subtotal, tax = _line_amounts()
+    rows = list(lines.annotate(month=TruncMonth('purchase_order__po_date')).order_by().values(
+        'designation_key', 'unit', 'purchase_order__supplier_id', 'month',
+    ).annotate(
+        designation=models.Min('designation'), lines=Count('pk'), total_quantity=Sum('quantity'),
+        total_subtotal=Sum(subtotal), total_tax=Sum(tax),
+    ))
+
+    keys = catalog_items({row['designation_key']: row['designation'] for row in rows})
+    cells = []
+    for row in rows:
+        amount = (row['total_subtotal'] or 0) + (row['total_tax'] or 0)
+        cells.append(SpendCube(
+            catalog_item_id=keys[row['designation_key']], unit=row['unit'],
+            supplier_id=row['purchase_order__supplier_id'], month=month_of(row['month']),
+            line_count=row['lines'], quantity=Decimal(row['total_quantity'] or 0).quantize(QUANTITY),
+            subtotal=Decimal(row['total_subtotal'] or 0).quantize(AMOUNT),
+            tax_amount=Decimal(row['total_tax'] or 0).quantize(AMOUNT), total=Decimal(amount).quantize(AMOUNT),
+        ))
+    return cells
+
+
+def refresh_spend_cube(keys):
+    """Recalcule les cellules des couples (fournisseur, mois); retourne le nombre de cellules écrites"""
+    SpendCube = global_apps.get_model('seafood', 'SpendCube')
+    keys = {(supplier_id, month) for supplier_id, month in keys if supplier_id and month}
+    if not keys:
+        return 0
+    cells = compute_cells(_keys_filter(keys))
+    with transaction.atomic():
+        SpendCube.objects.filter(
+            Q(*[Q(supplier_id=supplier_id, month=month) for supplier_id, month in keys], _connector=Q.OR)
+        ).delete()
+        SpendCube.objects.bulk_create(cells)
+    return len(cells)
+
+
+def rebuild_spend_cube(batch_months=BATCH_MONTHS):
+    """Empreintes manquantes puis reconstruction du cube par tranches de batch_months mois"""
+    PurchaseOrder = global_apps.get_model('seafood', 'PurchaseOrder')
+    SpendCube = global_apps.get_model('seafood', 'SpendCube')
+    keyed = assign_designation_keys()
+    bounds = PurchaseOrder.objects.aggregate(first=models.Min('po_date'), last=models.Max('po_date'))
+    SpendCube.objects.all().delete()
+    written = 0
+    if bounds['first'] is not None:
+        start, last = month_of(bounds['first']), month_of(bounds['last'])
+        while start <= last:
+            end = start
+            for i in range(batch_months):
+                end = next_month(end)
+            cells = compute_cells(Q(po_date__gte=start, po_date__lt=end))
+            SpendCube.objects.bulk_create(cells)
+            written += len(cells)
+            start = end
+    return {'keyed': keyed, 'cells': written}
+
+
+def _decimal(value, places=AMOUNT):
+    return Decimal(value or 0).quantize(places)
+
+
+def spend_cube(group_by, start_month=None, end_month=None, items=None, units=None, suppliers=None, limit=None):
+    """
+    Dépenses du cube regroupées par les dimensions group_by (parmi DIMENSIONS),
+    filtrées par période (mois inclus), articles, unités et fournisseurs; triées
+    par montant décroissant. Une requête. Retourne une liste de dictionnaires
+    (valeurs des dimensions, libellés, lines, quantity, subtotal, tax_amount, total).
+    """
+    SpendCube = global_apps.get_model('seafood', 'SpendCube')
+    unknown = [dimension for dimension in group_by if dimension not in DIMENSIONS]
+    if unknown or not group_by:
+        raise ValueError(f"Dimension inconnue: {', '.join(unknown) or '-'}")
+
+    queryset = SpendCube.objects.all()
+    if start_month:
+        queryset = queryset.filter(month__gte=month_of(start_month))
+    if end_month:
+        queryset = queryset.filter(month__lte=month_of(end_month))
+    if items:
+        queryset = queryset.filter(catalog_item__in=items)
+    if units:
+        queryset = queryset.filter(unit__in=units)
+    if suppliers:
+        queryset = queryset.filter(supplier__in=suppliers)
+
+    fields = []
+    for dimension in dict.fromkeys(group_by):
+        fields.append(DIMENSIONS[dimension])
+        if dimension == 'item':
+            fields.append('catalog_item__name')
+        elif dimension == 'supplier':
+            fields.append('supplier__name')
+    rows = queryset.order_by().values(*fields).annotate(
+        lines=Sum('line_count'), total_quantity=Sum('quantity'), total_subtotal=Sum('subtotal'),
+        total_tax=Sum('tax_amount'), total_amount=Sum('total'),
+    ).order_by('-total_amount', *fields)
+    if limit:
+        rows = rows[:limit]
+
+    units_labels = dict(global_apps.get_model('seafood', 'PurchaseOrderItem').UNIT_CHOICES)
+    result = []
+    for row in rows:
+        entry = {}
+        if 'catalog_item' in row:
+            entry.update(item=row['catalog_item'], item_name=row['catalog_item__name'])
+        if 'unit' in row:
+            entry.update(unit=row['unit'], unit_label=units_labels.get(row['unit'], row['unit']))
+        if 'supplier' in row:
+            entry.update(supplier=row['supplier'], supplier_name=row['supplier__name'])
+        if 'month' in row:
+            entry['month'] = month_of(row['month'])
+        entry.update(
+            lines=row['lines'] or 0, quantity=_decimal(row['total_quantity'], QUANTITY),
+            subtotal=_decimal(row['total_subtotal']), tax_amount=_decimal(row['total_tax']),
+            total=_decimal(row['total_amount']),
+        )
+        result.append(entry)
+    return result
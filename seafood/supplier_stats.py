@@ -0,0 +1,285 @@
+"""
+Statistiques mensuelles des fournisseurs (table SupplierMonthlyStats).
+
+Une ligne par fournisseur et par mois (mois de la date PO) résume ses bons de
+commande: nombre, dépense (bons approuvés ou payés), délais d'approbation
+(création -> approbation, en heures) et de paiement (date PO -> date de
+paiement, en jours, comparé aux termes de paiement du fournisseur), nombre de
+bons annulés et rejetés (annulation motivée). Les lignes portent des sommes et
+des nombres: les moyennes et les taux d'une période quelconque se calculent
+par une requête groupée sur la table, sans relire les bons de commande.
+
+Les mois concernés par une écriture sont recalculés depuis les bons de
+commande du fournisseur dans le mois (une lecture, puis suppression et
+réinsertion): signaux post_save/post_delete de PurchaseOrder (ancien et
+nouveau couple fournisseur/mois, voir SupplierStatsSource) et hook after du
+workflow pour les changements de statut groupés. Le cube des dépenses par
+article (seafood.spend) est recalculé en même temps, pour les mêmes couples.
+La commande rebuild_supplier_stats reconstruit toute la table.
+"""
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal
+
+from django.apps import apps as global_apps
+from django.db import models, transaction
+from django.db.models import Q, Sum
+
+# Bons de commande comptés dans la dépense
+SPEND_STATUSES = ('approved', 'paid')
+BATCH_MONTHS = 12
+CENT = Decimal('0.01')
+
+COUNTERS = (
+    'order_count', 'approved_count', 'paid_count', 'cancelled_count', 'rejected_count',
+    'approval_count', 'payment_count', 'on_time_payment_count', 'payment_days',
+)
+
+
+def month_of(value):
+    """Premier jour du mois d'une date (ou d'une date saisie 'AAAA-MM-JJ')"""
+    if value in (None, ''):
+        return None
+    if isinstance(value, str):
+        value = models.DateField().to_python(value)
+    return value.replace(day=1)
+
+
+def next_month(month):
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+class MonthStats:
+    """Sommes et nombres d'un fournisseur sur un mois, accumulés bon par bon"""
+
+    def __init__(self):
+        self.spend = Decimal('0')
+        self.approval_hours = Decimal('0')
+        for counter in COUNTERS:
+            setattr(self, counter, 0)
+
+    def add(self, status, rejected, total, po_date, created_at, approved_at, payment_date, payment_terms):
+        self.order_count += 1
+        if status in SPEND_STATUSES:
+            self.approved_count += 1
+            self.spend += total or 0
+        if status == 'paid':
+            self.paid_count += 1
+        if status == 'cancelled':
+            if rejected:
+                self.rejected_count += 1
+            else:
+                self.cancelled_count += 1
+        if approved_at and created_at and status in SPEND_STATUSES:
+            self.approval_count += 1
+            self.approval_hours += Decimal(max((approved_at - created_at).total_seconds(), 0)) / 3600
+        if payment_date and status == 'paid':
+            days = max((payment_date - po_date).days, 0)
+            self.payment_count += 1
+            self.payment_days += days
+            if days <= payment_terms:
+                self.on_time_payment_count += 1
+
+
+def compute_stats(queryset):
+    """Statistiques {(fournisseur, mois): MonthStats} des bons de commande du queryset (une lecture)"""
+    stats = defaultdict(MonthStats)
+    rows = queryset.order_by().values_list(
+        'supplier_id', 'po_date', 'status', 'rejection_reason', 'total', 'created_at', 'approved_at',
+        'payment_date', 'supplier__payment_terms',
+    )
+    for supplier_id, po_date, status, reason, total, created_at, approved_at, payment_date, terms in rows.iterator():
+        stats[(supplier_id, month_of(po_date))].add(
+            status, bool(reason), total, po_date, created_at, approved_at, payment_date, terms,
+        )
+    return stats
+
+
+def _rows(stats):
+    SupplierMonthlyStats = global_apps.get_model('seafood', 'SupplierMonthlyStats')
+    return [
+        SupplierMonthlyStats(
+            supplier_id=supplier_id, month=month, spend=values.spend,
+            approval_hours=values.approval_hours.quantize(CENT),
+            **{counter: getattr(values, counter) for counter in COUNTERS},
+        )
+        for (supplier_id, month), values in sorted(stats.items())
+    ]
+
+
+def _keys_filter(keys):
+    """Bons de commande des couples (fournisseur, mois): une condition par mois"""
+    by_month = defaultdict(set)
+    for supplier_id, month in keys:
+        by_month[month].add(supplier_id)
+    condition = Q()
+    for month, supplier_ids in by_month.items():
+        condition |= Q(supplier_id__in=supplier_ids, po_date__gte=month, po_date__lt=next_month(month))
+    return condition
+
+
+def refresh_supplier_stats(keys):
+    """Recalcule les couples (fournisseur, mois); retourne le nombre de lignes écrites"""
+    PurchaseOrder = global_apps.get_model('seafood', 'PurchaseOrder')
+    SupplierMonthlyStats = global_apps.get_model('seafood', 'SupplierMonthlyStats')
+    keys = {(supplier_id, month) for supplier_id, month in keys if supplier_id and month}
+    if not keys:
+        return 0
+    condition = _keys_filter(keys)
+    rows = _rows(compute_stats(PurchaseOrder.objects.filter(condition)))
+    with transaction.atomic():
+        SupplierMonthlyStats.objects.filter(
+            Q(*[Q(supplier_id=supplier_id, month=month) for supplier_id, month in keys], _connector=Q.OR)
+        ).delete()
+        SupplierMonthlyStats.objects.bulk_create(rows)
+    return len(rows)
+
+
+def refresh_purchase_rollups(keys):
+    """Recalcule les statistiques et le cube des dépenses (seafood.spend) des couples (fournisseur, mois)"""
+    from .spend import refresh_spend_cube
+
+    refresh_supplier_stats(keys)
+    refresh_spend_cube(keys)
+
+
+def order_key(values):
+    if not values:
+        return None
+    return values.get('supplier_id'), month_of(values.get('po_date'))
+
+
+def refresh_order(instance, deleted=False):
+    """Recalcule le mois quitté et le mois occupé par un bon de commande enregistré ou supprimé"""
+    current = {'supplier_id': instance.supplier_id, 'po_date': instance.po_date}
+    refresh_purchase_rollups({key for key in (order_key(instance._stats_loaded), order_key(current)) if key})
+    instance._stats_loaded = None if deleted else current
+
+
+def refresh_orders(pks):
+    """Recalcule les mois des bons de commande pks (après un changement de statut groupé)"""
+    PurchaseOrder = global_apps.get_model('seafood', 'PurchaseOrder')
+    rows = PurchaseOrder.objects.filter(pk__in=pks).order_by().values_list('supplier_id', 'po_date').distinct()
+    refresh_purchase_rollups({(supplier_id, month_of(po_date)) for supplier_id, po_date in rows})
+
+
+class SupplierStatsSource(models.Model):
+    """Modèle abstrait: garde le fournisseur et la date PO lus en base pour recalculer le mois quitté"""
+
+    _stats_loaded = None
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        loaded = dict(zip(field_names, values))
+        if 'supplier_id' in loaded and 'po_date' in loaded:
+            instance._stats_loaded = {'supplier_id': loaded['supplier_id'], 'po_date': loaded['po_date']}
+        return instance
+
+
+def rebuild_supplier_stats(batch_months=BATCH_MONTHS):
+    """Reconstruit toute la table, par tranches de batch_months mois; retourne le nombre de lignes"""
+    PurchaseOrder = global_apps.get_model('seafood', 'PurchaseOrder')
+    SupplierMonthlyStats = global_apps.get_model('seafood', 'SupplierMonthlyStats')
+    bounds = PurchaseOrder.objects.aggregate(first=models.Min('po_date'), last=models.Max('po_date'))
+    SupplierMonthlyStats.objects.all().delete()
+    if bounds['first'] is None:
+        return 0
+
+    written = 0
+    start, last = month_of(bounds['first']), month_of(bounds['last'])
+    while start <= last:
+        end = start
+        for i in range(batch_months):
+            end = next_month(end)
+        rows = _rows(compute_stats(PurchaseOrder.objects.filter(po_date__gte=start, po_date__lt=end)))
+        SupplierMonthlyStats.objects.bulk_create(rows)
+        written += len(rows)
+        start = end
+    return written
+
+
+class ScorecardRow:
+    """Indicateurs d'un fournisseur (ou d'un mois) sur une période"""
+
+    def __init__(self, values):
+        self.supplier_id = values.get('supplier_id')
+        self.supplier_name = values.get('supplier__name', '')
+        self.accounting_code = values.get('supplier__accounting_code', '')
+        self.month = values.get('month')
+        self.spend = Decimal(values['spend'] or 0).quantize(CENT)
+        self.approval_hours = Decimal(values['approval_hours'] or 0)
+        for counter in COUNTERS:
+            setattr(self, counter, values[counter] or 0)
+
+    @property
+    def average_order(self):
+        return (self.spend / self.approved_count).quantize(CENT) if self.approved_count else None
+
+    @property
+    def average_approval_hours(self):
+        return (self.approval_hours / self.approval_count).quantize(CENT) if self.approval_count else None
+
+    @property
+    def average_payment_days(self):
+        return (Decimal(self.payment_days) / self.payment_count).quantize(CENT) if self.payment_count else None
+
+    def _rate(self, count, total):
+        return (Decimal(count * 100) / total).quantize(CENT) if total else None
+
+    @property
+    def rejection_rate(self):
+        return self._rate(self.rejected_count, self.order_count)
+
+    @property
+    def cancel_rate(self):
+        return self._rate(self.cancelled_count, self.order_count)
+
+    @property
+    def on_time_payment_rate(self):
+        return self._rate(self.on_time_payment_count, self.payment_count)
+
+    def as_dict(self):
+        data = {
+            'spend': str(self.spend),
+            **{counter: getattr(self, counter) for counter in COUNTERS if counter != 'payment_days'},
+        }
+        for name in ('average_order', 'average_approval_hours', 'average_payment_days',
+                     'rejection_rate', 'cancel_rate', 'on_time_payment_rate'):
+            value = getattr(self, name)
+            data[name] = None if value is None else str(value)
+        if self.month is not None:
+            data['month'] = self.month.strftime('%Y-%m')
+        else:
+            data.update(supplier_id=self.supplier_id, supplier=self.supplier_name, accounting_code=self.accounting_code)
+        return data
+
+
+def _sums():
+    return {'spend': Sum('spend'), 'approval_hours': Sum('approval_hours'),
+            **{counter: Sum(counter) for counter in COUNTERS}}
+
+
+def supplier_scorecard(start_month, end_month, supplier_ids=None):
+    """
+    Indicateurs par fournisseur des mois [start_month, end_month] (inclus), en
+    une requête groupée sur la table; triés par dépense décroissante.
+    """
+    SupplierMonthlyStats = global_apps.get_model('seafood', 'SupplierMonthlyStats')
+    queryset = SupplierMonthlyStats.objects.filter(month__gte=month_of(start_month), month__lte=month_of(end_month))
+    if supplier_ids is not None:
+        queryset = queryset.filter(supplier_id__in=supplier_ids)
+    rows = queryset.order_by().values('supplier_id', 'supplier__name', 'supplier__accounting_code').annotate(**_sums())
+    return sorted((ScorecardRow(values) for values in rows), key=lambda row: (-row.spend, row.supplier_name))
+
+
+def supplier_months(supplier_id, start_month, end_month):
+    """Indicateurs mois par mois d'un fournisseur (mois sans bon de commande omis)"""
+    SupplierMonthlyStats = global_apps.get_model('seafood', 'SupplierMonthlyStats')
+    rows = SupplierMonthlyStats.objects.filter(
+        supplier_id=supplier_id, month__gte=month_of(start_month), month__lte=month_of(end_month),
+    ).order_by('month').values('month', 'spend', 'approval_hours', *COUNTERS)
+    return [ScorecardRow(values) for values in rows]
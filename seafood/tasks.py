@@ -0,0 +1,78 @@
+"""
+Tâches en arrière-plan de l'application seafood (voir seafood.jobs)
+"""
+from io import StringIO
+
+from django.core.management import call_command
+
+from .jobs import PRIORITY_HIGH, PRIORITY_LOW, JobError, task
+
+
+def _run_command(name, *args, **options):
+    """Exécute une commande de gestion et retourne sa sortie comme résultat de tâche"""
+    out = StringIO()
+    call_command(name, *args, stdout=out, **options)
+    return {'output': out.getvalue().strip()}
+
+
+@task('seafood.followup_digests', label='Résumés de relance des prospects', priority=PRIORITY_LOW, launchable=True,
+      permission='seafood.change_prospect')
+def followup_digests(job, date=None, send=False):
+    options = {'send': send}
+    if date:
+        options['date'] = date
+    return _run_command('build_followup_digests', **options)
+
+
+@task('seafood.load_exchange_rates', label='Chargement des taux de change', launchable=True,
+      permission='seafood.add_exchangerate')
+def load_exchange_rates(job, paths=None):
+    return _run_command('load_exchange_rates', *(paths or []))
+
+
+@task('seafood.render_document', label='Rendu PDF des documents', priority=PRIORITY_HIGH)
+def render_document(job, kind, pk):
+    from .documents import DocumentRenderError, render_document as render
+
+    try:
+        path = render(kind, pk)
+    except DocumentRenderError as e:
+        # Erreur de configuration: inutile de réessayer
+        raise JobError(str(e))
+    return {'path': path}
+
+
+@task('seafood.find_duplicates', label='Recherche des doublons', priority=PRIORITY_LOW)
+def find_duplicates(job, kind, threshold=None):
+    from .dedup import THRESHOLD, MergeError, find_duplicates as find
+
+    try:
+        return find(kind, threshold=threshold or THRESHOLD)
+    except MergeError as e:
+        raise JobError(str(e))
+
+
+@task('seafood.import_prospects', label='Import de prospects')
+def import_prospects(job, name, filename):
+    from .prospect_import import ProspectImportError, run_import
+
+    try:
+        return run_import(name, filename, user=job.created_by).as_dict()
+    except ProspectImportError as e:
+        # Fichier refusé (format, colonnes): inutile de réessayer
+        raise JobError(str(e))
+
+
+@task('seafood.merge_duplicates', label='Fusion des doublons')
+def merge_duplicates(job, kind, keep, duplicates):
+    from .dedup import SPECS, MergeError, merge_records
+
+    # Droit revérifié à l'exécution: il a pu être retiré depuis la mise en file
+    spec = SPECS.get(kind)
+    if spec is None or job.created_by is None or not job.created_by.has_perm(spec.merge_permission):
+        raise JobError("Fusion refusée: droit de suppression des fiches requis.")
+    try:
+        return merge_records(kind, keep, duplicates)
+    except MergeError as e:
+        # Conflit de données: inutile de réessayer
+        raise JobError(str(e))
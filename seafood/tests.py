@@ -1,3 +1,1260 @@
-from django.test import TestCase
+import json
+import os
+import shutil
+import tempfile
+from datetime import date, timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from django.conf import settings
+from django.db import connection
+from django.template.loader import render_to_string
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.html import escape
+
+from core.testing import (
+    QueryCountTestCase, add_purchaseorder_items, add_purchaserequest_items, make_bankaccount, make_cashbox,
+    make_cashbox_transaction, make_classification, make_client, make_packaging, make_prospect, make_purchaseorder,
+    make_purchaserequest, make_report, make_role, make_supplier, make_user,
+)
+from core import db_router
+from seafood import documents, jobs
+from seafood.models import BackgroundJob
+
+
+class PortalHomeQueryCountTest(QueryCountTestCase):
+    """Nombre de requêtes constant de l'accueil et du profil"""
+
+    def seed(self, n):
+        for i in range(n):
+            make_client()
+
+    def test_home(self):
+        self.assertConstantQueries(reverse('portal_admin:index'), self.seed)
+
+    def test_profile(self):
+        self.assertConstantQueries(reverse('portal_admin:profile'), self.seed)
+
+    def test_profile_password_change(self):
+        self.assertConstantQueries(reverse('portal_admin:profile_password_change'), self.seed)
+
+
+class ClientSupplierQueryCountTest(QueryCountTestCase):
+    """Nombre de requêtes constant des vues clients et fournisseurs"""
+
+    def seed_clients(self, n):
+        for i in range(n):
+            make_client()
+
+    def seed_suppliers(self, n):
+        for i in range(n):
+            make_supplier()
+
+    def test_client_list(self):
+        self.assertConstantQueries(reverse('portal_admin:client_list'), self.seed_clients)
+
+    def test_client_add(self):
+        self.assertConstantQueries(reverse('portal_admin:client_add'), self.seed_clients)
+
+    def test_client_pages(self):
+        client = make_client()
+        for name in ('client_detail', 'client_edit', 'client_delete'):
+            with self.subTest(name):
+                self.assertConstantQueries(reverse(f'portal_admin:{name}', args=[client.pk]), self.seed_clients)
+
+    def test_supplier_list(self):
+        self.assertConstantQueries(reverse('portal_admin:supplier_list'), self.seed_suppliers)
+
+    def test_supplier_add(self):
+        self.assertConstantQueries(reverse('portal_admin:supplier_add'), self.seed_suppliers)
+
+    def test_supplier_pages(self):
+        supplier = make_supplier()
+        for name in ('supplier_detail', 'supplier_edit', 'supplier_delete'):
+            with self.subTest(name):
+                self.assertConstantQueries(reverse(f'portal_admin:{name}', args=[supplier.pk]), self.seed_suppliers)
+
+
+class ConcurrentEditTest(QueryCountTestCase):
+    """Contrôle de concurrence optimiste des formulaires de modification (core.versioning)"""
+
+    def post_client(self, client, version, name):
+        return self.client.post(reverse('portal_admin:client_edit', args=[client.pk]), {
+            'version': version, 'name': name, 'client_type': client.client_type, 'status': 'active',
+        })
+
+    def test_stale_edit_is_refused(self):
+        from seafood.models import Client
+
+        client = make_client()
+        self.assertEqual(client.version, 1)
+
+        # Deux utilisateurs ouvrent la version 1; le premier enregistre
+        self.assertRedirects(self.post_client(client, 1, 'Premier'), reverse('portal_admin:client_list'))
+        response = self.post_client(client, 1, 'Second')
+        self.assertRedirects(response, reverse('portal_admin:client_edit', args=[client.pk]))
+
+        self.assertEqual(Client.objects.values_list('name', 'version').get(pk=client.pk), ('Premier', 2))
+
+    def test_update_is_a_single_conditional_write(self):
+        from core.versioning import ConcurrentEditError
+
+        client = make_client()
+        stale = type(client).objects.get(pk=client.pk)
+        client.name = 'Nouveau nom'
+        with CaptureQueriesContext(connection) as queries:
+            client.save(update_fields=['name'])
+        writes = [query['sql'] for query in queries if 'SAVEPOINT' not in query['sql']]
+        self.assertEqual(len(writes), 1)
+        self.assertTrue(writes[0].startswith('UPDATE'))
+        self.assertIn('"version" = 1', writes[0])
+
+        stale.name = 'Ancien nom'
+        with self.assertRaises(ConcurrentEditError):
+            stale.save(update_fields=['name'])
+        self.assertEqual(stale.version, 1)
+
+
+class CashboxBankAccountQueryCountTest(QueryCountTestCase):
+    """Nombre de requêtes constant des vues caisses et comptes bancaires"""
+
+    def seed_cashboxes(self, n):
+        for i in range(n):
+            make_cashbox_transaction(make_cashbox())
+
+    def seed_bankaccounts(self, n):
+        for i in range(n):
+            make_bankaccount()
+
+    def test_cashbox_list(self):
+        self.assertConstantQueries(reverse('portal_admin:cashbox_list'), self.seed_cashboxes)
+
+    def test_cashbox_add(self):
+        self.assertConstantQueries(reverse('portal_admin:cashbox_add'), self.seed_cashboxes)
+
+    def test_cashbox_detail(self):
+        cashbox = make_cashbox()
+
+        def seed(n):
+            for i in range(n):
+                make_cashbox_transaction(cashbox)
+
+        self.assertConstantQueries(reverse('portal_admin:cashbox_detail', args=[cashbox.pk]), seed)
+
+    def test_cashbox_pages(self):
+        cashbox = make_cashbox()
+        for name, arg in (('cashbox_edit', 'pk'), ('cashbox_delete', 'pk'), ('cashbox_fund', 'cashbox_pk')):
+            with self.subTest(name):
+                url = reverse(f'portal_admin:{name}', kwargs={arg: cashbox.pk})
+                self.assertConstantQueries(url, self.seed_bankaccounts)
+
+    def test_bankaccount_list(self):
+        self.assertConstantQueries(reverse('portal_admin:bankaccount_list'), self.seed_bankaccounts)
+
+    def test_bankaccount_add(self):
+        self.assertConstantQueries(reverse('portal_admin:bankaccount_add'), self.seed_bankaccounts)
+
+    def test_bankaccount_consolidation(self):
+        self.assertConstantQueries(reverse('portal_admin:bankaccount_consolidation'), self.seed_bankaccounts)
+
+    def test_bankaccount_pages(self):
+        bankaccount = make_bankaccount()
+        for name in ('bankaccount_detail', 'bankaccount_edit', 'bankaccount_delete'):
+            with self.subTest(name):
+                self.assertConstantQueries(
+                    reverse(f'portal_admin:{name}', args=[bankaccount.pk]), self.seed_bankaccounts
+                )
+
+
+class CurrencyTest(TestCase):
+    """Taux de change (chargement, dernier taux connu) et consolidation des soldes en MRU"""
+
+    def setUp(self):
+        from django.core.cache import cache
+
+        cache.clear()
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+
+    def rates_file(self, name, content):
+        path = os.path.join(self.tmp, name)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        return path
+
+    def test_load_rates_file_creates_then_updates(self):
+        from seafood.currency import load_rates_file
+        from seafood.models import ExchangeRate
+
+        path = self.rates_file('taux.csv', 'currency,date,rate\nusd,2026-01-05,39.50\nEUR,2026-01-05,43.10\n')
+        self.assertEqual(load_rates_file(path), (2, 0))
+        path = self.rates_file('taux.json', json.dumps([
+            {'currency': 'USD', 'date': '2026-01-05', 'rate': '39.75'},
+            {'currency': 'EUR', 'date': '2026-01-05', 'rate': '43.10'},
+            {'currency': 'USD', 'date': '2026-01-06', 'rate': '39.80'},
+        ]))
+        self.assertEqual(load_rates_file(path), (1, 1))
+        rate = ExchangeRate.objects.get(currency='USD', rate_date=date(2026, 1, 5))
+        self.assertEqual((rate.rate, rate.source), (Decimal('39.75'), path))
+
+    def test_load_rates_file_rejects_unknown_currency(self):
+        from seafood.currency import load_rates_file
+        from seafood.models import ExchangeRate
+
+        path = self.rates_file('taux.csv', 'currency,date,rate\nUSD,2026-01-05,39.50\nXYZ,2026-01-05,1\n')
+        with self.assertRaisesMessage(ValueError, 'Devise inconnue'):
+            load_rates_file(path)
+        self.assertFalse(ExchangeRate.objects.exists())
+
+    def test_get_rate_uses_latest_rate_on_or_before_date(self):
+        from seafood.currency import _rates_version, get_rate
+        from seafood.models import ExchangeRate
+
+        ExchangeRate.objects.create(currency='USD', rate_date=date(2026, 1, 5), rate=Decimal('39.50'))
+        ExchangeRate.objects.create(currency='USD', rate_date=date(2026, 1, 10), rate=Decimal('40.00'))
+        self.assertIsNone(get_rate('USD', date(2026, 1, 4)))
+        self.assertEqual(get_rate('USD', date(2026, 1, 9)), Decimal('39.50'))
+        self.assertEqual(get_rate('USD', date(2026, 1, 10)), Decimal('40.00'))
+        self.assertEqual(get_rate('MRU', date(2026, 1, 1)), Decimal('1'))
+
+        # Même version de la table: servi par le cache; un nouveau taux change la version
+        version = _rates_version()
+        with self.assertNumQueries(0):
+            self.assertEqual(get_rate('USD', date(2026, 1, 9), version), Decimal('39.50'))
+        ExchangeRate.objects.create(currency='USD', rate_date=date(2026, 1, 8), rate=Decimal('39.90'))
+        self.assertEqual(get_rate('USD', date(2026, 1, 9)), Decimal('39.90'))
+
+    def test_consolidation_converts_and_reports_missing_rates(self):
+        from seafood.currency import consolidate_balances
+        from seafood.models import ExchangeRate
+
+        day = date(2026, 1, 10)
+        ExchangeRate.objects.create(currency='USD', rate_date=date(2026, 1, 5), rate=Decimal('40.00'))
+        make_bankaccount(currency='USD', current_balance=Decimal('100.00'))
+        make_bankaccount(currency='MRU', current_balance=Decimal('500.00'))
+        make_bankaccount(currency='EUR', current_balance=Decimal('10.00'))
+        make_bankaccount(currency='USD', current_balance=Decimal('1000.00'), status='closed')
+        cashbox = make_cashbox(current_balance=Decimal('250.00'))
+
+        result = consolidate_balances(day)
+        self.assertEqual(result['missing_rates'], ['EUR'])
+        self.assertEqual(result['bank_total'], Decimal('4500.00'))
+        self.assertEqual(result['total'], Decimal('4750.00'))
+        usd = next(group for group in result['currencies'] if group['currency'] == 'USD')
+        self.assertEqual((usd['count'], usd['converted']), (1, Decimal('4000.00')))
+
+        # Résultat en cache tant que rien ne change; un solde modifié invalide le cache
+        with self.assertNumQueries(3):
+            consolidate_balances(day)
+        cashbox.current_balance = Decimal('300.00')
+        cashbox.save()
+        self.assertEqual(consolidate_balances(day)['total'], Decimal('4800.00'))
+
+
+class PurchaseQueryCountTest(QueryCountTestCase):
+    """Nombre de requêtes constant des demandes d'achat et bons de commande"""
+
+    def seed_requests(self, n):
+        for i in range(n):
+            make_purchaserequest(items=2)
+
+    def seed_orders(self, n):
+        for i in range(n):
+            make_purchaseorder(items=2)
+
+    def test_purchaserequest_list(self):
+        self.assertConstantQueries(reverse('portal_admin:purchaserequest_list'), self.seed_requests)
+
+    def test_purchaserequest_add(self):
+        self.assertConstantQueries(reverse('portal_admin:purchaserequest_add'), self.seed_requests)
+
+    def test_purchaserequest_pages(self):
+        purchase_request = make_purchaserequest()
+
+        def seed(n):
+            add_purchaserequest_items(purchase_request, n)
+            for i in range(n):
+                make_supplier()
+
+        for name in ('purchaserequest_detail', 'purchaserequest_edit', 'purchaserequest_approve',
+                     'purchaserequest_reject', 'purchaserequest_cancel'):
+            with self.subTest(name):
+                self.assertConstantQueries(reverse(f'portal_admin:{name}', args=[purchase_request.pk]), seed)
+
+    def test_purchaseorder_list(self):
+        self.assertConstantQueries(reverse('portal_admin:purchaseorder_list'), self.seed_orders)
+
+    def test_purchaseorder_add(self):
+        self.assertConstantQueries(reverse('portal_admin:purchaseorder_add'), self.seed_orders)
+
+    def test_purchaseorder_pages(self):
+        purchase_order = make_purchaseorder()
+
+        def seed(n):
+            add_purchaseorder_items(purchase_order, n)
+            for i in range(n):
+                make_cashbox()
+                make_bankaccount()
+
+        for name in ('purchaseorder_detail', 'purchaseorder_edit', 'purchaseorder_pending', 'purchaseorder_approve',
+                     'purchaseorder_reject', 'purchaseorder_pay', 'purchaseorder_cancel'):
+            with self.subTest(name):
+                self.assertConstantQueries(reverse(f'portal_admin:{name}', args=[purchase_order.pk]), seed)
+
+
+class PurchaseWorkflowTest(QueryCountTestCase):
+    """Statuts des demandes d'achat et bons de commande (seafood.workflows)"""
+
+    def test_purchaseorder_reject_keeps_reason(self):
+        purchase_order = make_purchaseorder(status='pending')
+        url = reverse('portal_admin:purchaseorder_reject', args=[purchase_order.pk])
+
+        self.client.post(url, {'rejection_reason': '  '})
+        purchase_order.refresh_from_db()
+        self.assertEqual(purchase_order.status, 'pending')
+
+        self.client.post(url, {'rejection_reason': 'Prix hors budget'})
+        purchase_order.refresh_from_db()
+        self.assertEqual((purchase_order.status, purchase_order.rejection_reason), ('cancelled', 'Prix hors budget'))
+
+    def test_purchaserequest_bulk_cancel(self):
+        from seafood.models import PurchaseRequest
+
+        drafts = [make_purchaserequest() for i in range(2)]
+        approved = make_purchaserequest(status='approved')
+        response = self.client.post(
+            reverse('portal_admin:workflow_bulk_transition', args=['seafood.purchaserequest']),
+            {'ids': [pr.pk for pr in drafts] + [approved.pk], 'status': 'cancelled'},
+        )
+        self.assertRedirects(response, reverse('portal_admin:index'), fetch_redirect_response=False)
+        self.assertEqual(
+            sorted(PurchaseRequest.objects.values_list('status', flat=True)), ['approved', 'cancelled', 'cancelled']
+        )
+
+    def test_purchaserequest_bulk_approve_is_refused(self):
+        from seafood.models import PurchaseOrder, PurchaseRequest
+
+        draft = make_purchaserequest()
+        self.client.post(
+            reverse('portal_admin:workflow_bulk_transition', args=['seafood.purchaserequest']),
+            {'ids': [draft.pk], 'status': 'approved'},
+        )
+        self.assertEqual(PurchaseRequest.objects.get(pk=draft.pk).status, 'draft')
+        self.assertFalse(PurchaseOrder.objects.exists())
+
+    def _batch_form(self, requests, suppliers, price='10.00'):
+        data = {'ids': [pr.pk for pr in requests]}
+        for pr, supplier in zip(requests, suppliers):
+            data[f'supplier_{pr.pk}'] = supplier.pk if supplier else ''
+            for item in pr.items.all():
+                data[f'unit_price_{item.pk}'] = price
+                data[f'tax_rate_{item.pk}'] = '10'
+        return data
+
+    def test_purchaserequest_batch_approve_consolidates_orders(self):
+        from decimal import Decimal
+
+        from seafood.models import PurchaseOrder, PurchaseOrderItem, PurchaseRequest, SupplierMonthlyStats
+
+        first, second = make_supplier(name='Fournisseur A'), make_supplier(name='Fournisseur B')
+        requests = [make_purchaserequest(items=2) for i in range(4)]
+        url = reverse('portal_admin:purchaserequest_batch_approve')
+        self.assertContains(self.client.get(url, {'ids': [pr.pk for pr in requests]}), requests[3].pr_number)
+
+        data = self._batch_form(requests, [first, second, first, None])
+        data['default_supplier'] = second.pk
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(url, data)
+        self.assertRedirects(response, reverse('portal_admin:purchaseorder_list'), fetch_redirect_response=False)
+        self.assertLess(len(queries), 40)
+
+        self.assertEqual(set(PurchaseRequest.objects.values_list('status', flat=True)), {'approved'})
+        orders = list(PurchaseOrder.objects.order_by('po_number'))
+        self.assertEqual([order.supplier for order in orders], [first, second])
+        self.assertEqual(int(orders[1].po_number[-6:]), int(orders[0].po_number[-6:]) + 1)
+        for order in orders:
+            # 2 demandes x 2 articles x 2 unités x 10.00, taxe 10%
+            self.assertEqual((order.status, order.subtotal, order.total), ('pending', Decimal('80.00'), Decimal('88.00')))
+            self.assertEqual(order.items.count(), 4)
+        self.assertIn(f'PR-{requests[2].pr_number}', orders[0].note)
+        self.assertFalse(PurchaseOrderItem.objects.filter(designation_key='').exists())
+        self.assertEqual(SupplierMonthlyStats.objects.filter(supplier__in=[first, second]).count(), 2)
+
+    def test_purchaserequest_batch_approve_rolls_back(self):
+        from seafood.models import PurchaseOrder, PurchaseRequest
+        from seafood.purchasing import BatchApprovalError, approve_requests
+
+        supplier = make_supplier()
+        requests = [make_purchaserequest() for i in range(2)]
+        url = reverse('portal_admin:purchaserequest_batch_approve')
+
+        # Prix manquant: rien n'est écrit, la grille est réaffichée
+        data = self._batch_form(requests, [supplier, supplier])
+        data[f'unit_price_{requests[1].items.get().pk}'] = ''
+        response = self.client.post(url, data)
+        self.assertContains(response, 'Approbation annulée')
+
+        # Demande déjà approuvée entre l'affichage et l'envoi
+        PurchaseRequest.objects.filter(pk=requests[1].pk).update(status='approved')
+        prices = {item.pk: (1, 0) for pr in requests for item in pr.items.all()}
+        with self.assertRaises(BatchApprovalError):
+            approve_requests({pr.pk: supplier.pk for pr in requests}, prices)
+        self.assertEqual(PurchaseRequest.objects.get(pk=requests[0].pk).status, 'draft')
+        self.assertFalse(PurchaseOrder.objects.exists())
+
+
+class ProspectQueryCountTest(QueryCountTestCase):
+    """Nombre de requêtes constant des vues prospects"""
+
+    def seed(self, n):
+        for i in range(n):
+            make_prospect(created_by=self.user)
+
+    def test_prospect_list(self):
+        self.assertConstantQueries(reverse('portal_admin:prospect_list'), self.seed)
+
+    def test_prospect_add(self):
+        self.assertConstantQueries(reverse('portal_admin:prospect_add'), self.seed)
+
+    def test_prospect_followups(self):
+        self.assertConstantQueries(reverse('portal_admin:prospect_followups'), self.seed)
+        self.assertConstantQueries(reverse('portal_admin:prospect_followups_api') + '?scope=all', self.seed)
+
+    def test_prospect_pages(self):
+        prospect = make_prospect()
+        for name in ('prospect_detail', 'prospect_edit', 'prospect_delete'):
+            with self.subTest(name):
+                self.assertConstantQueries(reverse(f'portal_admin:{name}', args=[prospect.pk]), self.seed)
+
+    def test_followups_send_once_a_day(self):
+        url = reverse('portal_admin:prospect_followups_send')
+        self.client.post(url)
+        self.client.post(url)
+        job = BackgroundJob.objects.get(name='seafood.followup_digests')
+        self.assertEqual(job.payload, {'send': True})
+
+        # Envoi terminé aujourd'hui: toujours refusé; terminé hier: accepté
+        BackgroundJob.objects.filter(pk=job.pk).update(status='succeeded', finished_at=timezone.now())
+        self.client.post(url)
+        self.assertEqual(BackgroundJob.objects.filter(name='seafood.followup_digests').count(), 1)
+        BackgroundJob.objects.filter(pk=job.pk).update(finished_at=timezone.now() - timedelta(days=1))
+        self.client.post(url)
+        self.assertEqual(BackgroundJob.objects.filter(name='seafood.followup_digests').count(), 2)
+
+    def test_followups_send_requires_change_permission(self):
+        from django.contrib.auth.models import Permission
+
+        role = make_role(permissions=Permission.objects.filter(codename='view_prospect'))
+        self.client.force_login(make_user(role=role))
+        response = self.client.post(reverse('portal_admin:prospect_followups_send'))
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(BackgroundJob.objects.exists())
+
+
+@jobs.task('tests.echo', launchable=True, permission='seafood.view_backgroundjob')
+def echo_task(job, value=None, fail=False):
+    if fail:
+        raise ValueError("échec demandé")
+    return {'value': value, 'attempt': job.attempts}
+
+
+@jobs.task('tests.needs_value', launchable=True, permission='seafood.view_backgroundjob')
+def needs_value_task(job, value):
+    return value
+
+
+class AutocompleteTest(QueryCountTestCase):
+    """Recherche progressive des listes de sélection"""
+
+    def setUp(self):
+        from django.core.cache import cache
+
+        super().setUp()
+        cache.clear()
+
+    def url(self, source, q=''):
+        return reverse('portal_admin:autocomplete', args=[source]) + (f'?q={q}' if q else '')
+
+    def test_sources_constant_queries(self):
+        from core.testing import make_reception, make_service
+        from seafood.autocomplete import PAGE_SIZE
+
+        seeds = {
+            'clients': lambda n: [make_client() for i in range(n)],
+            'suppliers': lambda n: [make_supplier() for i in range(n)],
+            'services': lambda n: [make_service() for i in range(n)],
+            'bank-accounts': lambda n: [make_bankaccount() for i in range(n)],
+            'cashboxes': lambda n: [make_cashbox() for i in range(n)],
+            'receptions-awaiting-report': lambda n: [make_reception() for i in range(n)],
+            'receptions-awaiting-classification': lambda n: [make_report() for i in range(n)],
+        }
+        for source, seed in seeds.items():
+            with self.subTest(source):
+                self.assertConstantQueries(self.url(source, 'zz'), seed)
+                self.assertEqual(len(self.client.get(self.url(source)).json()['results']), PAGE_SIZE)
+
+    def test_prefix_search_is_paged(self):
+        from seafood.autocomplete import PAGE_SIZE
+
+        for i in range(PAGE_SIZE + 1):
+            make_client(name=f"Pêcherie {i:02d}")
+        make_client(name="Armement du Nord")
+        make_client(name="Ancienne pêcherie", status='inactive')
+
+        page = self.client.get(self.url('clients', 'pêch')).json()
+        self.assertEqual(len(page['results']), PAGE_SIZE)
+        self.assertTrue(page['more'])
+        self.assertEqual(page['results'][0]['text'].split(' (')[0], "Pêcherie 00")
+        page = self.client.get(self.url('clients', 'arm')).json()
+        self.assertEqual([result['text'].split(' (')[0] for result in page['results']], ["Armement du Nord"])
+        self.assertFalse(page['more'])
+
+    def test_cached_pages_follow_writes_without_signals(self):
+        from seafood.models import Client
+
+        # Écriture faite par un autre processus: pas de signal, seule la table change
+        client = make_client(name="Armement du Nord")
+        self.assertEqual(len(self.client.get(self.url('clients', 'arm')).json()['results']), 1)
+        Client.objects.filter(pk=client.pk).update(name="Bateaux du Nord", updated_at=timezone.now())
+        self.assertEqual(self.client.get(self.url('clients', 'arm')).json()['results'], [])
+        self.assertEqual(len(self.client.get(self.url('clients', 'bat')).json()['results']), 1)
+        Client.objects.filter(pk=client.pk).delete()
+        self.assertEqual(self.client.get(self.url('clients', 'bat')).json()['results'], [])
+
+    def test_cached_pages_follow_writes(self):
+        make_supplier(name="Atlantique")
+        self.client.get(self.url('suppliers', 'atl'))
+        with CaptureQueriesContext(connection) as cached:
+            self.client.get(self.url('suppliers', 'atl'))
+        # Seule la version de la table est relue, pas la recherche
+        supplier_queries = [q['sql'] for q in cached.captured_queries if 'seafood_supplier' in q['sql']]
+        self.assertEqual(len(supplier_queries), 1)
+        self.assertIn('MAX(', supplier_queries[0])
+
+        make_supplier(name="Atlas")
+        self.assertEqual(len(self.client.get(self.url('suppliers', 'atl')).json()['results']), 2)
+
+    def test_reception_options_carry_form_data(self):
+        report = make_report()
+        result = self.client.get(self.url('receptions-awaiting-classification')).json()['results'][0]
+        reception = report.arrival_note
+        self.assertEqual(result['id'], reception.pk)
+        self.assertEqual(result['data']['category-id'], reception.service_type.category_id)
+
+    def test_permissions(self):
+        self.client.force_login(make_user(role=make_role(permissions=[])))
+        self.assertEqual(self.client.get(self.url('suppliers')).status_code, 403)
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(self.url('unknown')).status_code, 404)
+
+
+class BackgroundJobQueueTest(TestCase):
+    """File de tâches: prise en charge exclusive, priorités et nouvelles tentatives"""
+
+    def test_claim_is_exclusive_and_ordered_by_priority(self):
+        low = jobs.enqueue('tests.echo', {'value': 1}, priority=jobs.PRIORITY_LOW)
+        high = jobs.enqueue('tests.echo', {'value': 2}, priority=jobs.PRIORITY_HIGH)
+        jobs.enqueue('tests.echo', delay=timedelta(hours=1))
+
+        claimed = jobs.claim_jobs('worker-a', limit=5)
+        self.assertEqual([job.pk for job in claimed], [high.pk, low.pk])
+        self.assertEqual(jobs.claim_jobs('worker-b', limit=5), [])
+        self.assertTrue(all(job.status == 'running' and job.attempts == 1 for job in claimed))
+
+    def test_run_job_success(self):
+        job = jobs.enqueue('tests.echo', {'value': 'ok'})
+        [claimed] = jobs.claim_jobs('worker')
+        self.assertTrue(jobs.run_job(claimed))
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'succeeded')
+        self.assertEqual(job.result, {'value': 'ok', 'attempt': 1})
+
+    def test_failed_job_is_retried_with_backoff_then_failed(self):
+        job = jobs.enqueue('tests.echo', {'fail': True}, max_attempts=2)
+        with self.assertLogs('seafood.jobs', 'ERROR'):
+            jobs.run_job(jobs.claim_jobs('worker')[0])
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'queued')
+        self.assertGreater(job.run_at, timezone.now())
+        self.assertIn('échec demandé', job.last_error)
+
+        BackgroundJob.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        with self.assertLogs('seafood.jobs', 'ERROR'):
+            jobs.run_job(jobs.claim_jobs('worker')[0])
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+        self.assertEqual(job.attempts, 2)
+
+    def test_unknown_task_is_rejected(self):
+        with self.assertRaises(jobs.JobError):
+            jobs.enqueue('tests.unknown')
+
+    def test_stale_jobs_are_requeued(self):
+        job = jobs.enqueue('tests.echo')
+        jobs.claim_jobs('worker')
+        BackgroundJob.objects.filter(pk=job.pk).update(locked_at=timezone.now() - timedelta(hours=2))
+        self.assertEqual(jobs.requeue_stale_jobs(timeout=60), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'queued')
+
+    def test_stale_job_out_of_attempts_fails(self):
+        job = jobs.enqueue('tests.echo', max_attempts=1)
+        jobs.claim_jobs('worker')
+        BackgroundJob.objects.filter(pk=job.pk).update(locked_at=timezone.now() - timedelta(hours=2))
+        self.assertEqual(jobs.requeue_stale_jobs(timeout=60), 0)
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+        self.assertIsNotNone(job.finished_at)
+
+    @override_settings(JOBS_STALE_SWEEP_INTERVAL=0)
+    def test_worker_sweeps_stale_jobs(self):
+        job = jobs.enqueue('tests.echo', {'value': 'repris'})
+        jobs.claim_jobs('crashed')
+        BackgroundJob.objects.filter(pk=job.pk).update(locked_at=timezone.now() - timedelta(hours=2))
+        self.assertEqual(jobs.work('worker', once=True), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('succeeded', 2))
+
+    def test_worker_once_drains_queue(self):
+        for i in range(4):
+            jobs.enqueue('tests.echo', {'value': i})
+        self.assertEqual(jobs.work('worker', batch_size=3, once=True), 4)
+        self.assertEqual(BackgroundJob.objects.filter(status='succeeded').count(), 4)
+
+
+class BackgroundJobQueryCountTest(QueryCountTestCase):
+    """Nombre de requêtes constant du suivi des tâches"""
+
+    def seed(self, n):
+        for i in range(n):
+            jobs.enqueue('tests.echo', {'value': i}, user=self.user)
+
+    def test_job_list(self):
+        self.assertConstantQueries(reverse('portal_admin:job_list'), self.seed)
+
+    def test_job_detail(self):
+        job = jobs.enqueue('tests.echo')
+        self.assertConstantQueries(reverse('portal_admin:job_detail', args=[job.pk]), self.seed)
+
+    def test_enqueue_returns_immediately(self):
+        response = self.client.post(reverse('portal_admin:job_enqueue'), {'name': 'tests.echo'})
+        job = BackgroundJob.objects.get()
+        self.assertRedirects(response, reverse('portal_admin:job_detail', args=[job.pk]))
+        self.assertEqual(job.status, 'queued')
+        self.assertEqual(job.created_by, self.user)
+
+    def test_enqueue_refuses_tasks_not_launchable(self):
+        from django.contrib.auth.models import Permission
+
+        # Tâche interne et tâche à paramètres obligatoires, puis permission de la tâche absente
+        for name in ('seafood.render_document', 'tests.needs_value'):
+            self.client.post(reverse('portal_admin:job_enqueue'), {'name': name})
+        role = make_role(permissions=Permission.objects.filter(codename__in=['add_backgroundjob', 'view_backgroundjob']))
+        clerk = make_user(role=role)
+        self.client.force_login(clerk)
+        self.client.post(reverse('portal_admin:job_enqueue'), {'name': 'operations.billing_run'})
+        self.assertFalse(BackgroundJob.objects.exists())
+        self.assertEqual([t.name for t in jobs.launchable_tasks(clerk)], ['tests.echo'])
+
+
+class DocumentPdfTest(QueryCountTestCase):
+    """Cache disque des PDF: clé versionnée, file de rendu et en-têtes HTTP"""
+
+    def setUp(self):
+        super().setUp()
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_dir)
+        settings_override = override_settings(DOCUMENTS_CACHE_DIR=self.cache_dir, DOCUMENTS_RENDER_INLINE=False)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def write_cached(self, version):
+        os.makedirs(version.directory, exist_ok=True)
+        with open(version.path, 'wb') as f:
+            f.write(b'%PDF-1.7 test')
+
+    def test_templates_render(self):
+        packaging = make_packaging(items=2)
+        objects = {
+            'reception': packaging.classification.reception,
+            'report': make_report(items=2),
+            'classification': make_classification(items=2),
+            'packaging': packaging,
+            'purchaseorder': make_purchaseorder(items=2),
+        }
+        for kind, obj in objects.items():
+            with self.subTest(kind):
+                doc_type = documents.get_document_type(kind)
+                html = render_to_string(doc_type.template, {
+                    'document': doc_type.get_object(obj.pk), 'title': doc_type.title(obj), 'is_locked': False,
+                })
+                self.assertIn(escape(doc_type.title(obj)), html)
+
+    def test_draft_key_follows_updated_at_and_locked_key_is_final(self):
+        purchase_order = make_purchaseorder()
+        draft = documents.DocumentVersion.lookup('purchaseorder', purchase_order.pk)
+        self.assertFalse(draft.is_locked)
+
+        purchase_order.note = 'Modifié'
+        purchase_order.save()
+        edited = documents.DocumentVersion.lookup('purchaseorder', purchase_order.pk)
+        self.assertNotEqual(draft.filename, edited.filename)
+        self.assertNotEqual(draft.etag, edited.etag)
+
+        filename = edited.filename
+        with override_settings(DOCUMENTS_TEMPLATE_VERSION=2):
+            self.assertNotEqual(edited.filename, filename)
+
+        purchase_order.status = 'paid'
+        purchase_order.save()
+        paid = documents.DocumentVersion.lookup('purchaseorder', purchase_order.pk)
+        self.assertTrue(paid.is_locked)
+        with override_settings(DOCUMENTS_TEMPLATE_VERSION=2):
+            self.assertEqual(paid.filename, 'final-paid.pdf')
+
+    def test_cached_document_is_served_with_validators(self):
+        purchase_order = make_purchaseorder(status='paid')
+        version = documents.DocumentVersion.lookup('purchaseorder', purchase_order.pk)
+        self.write_cached(version)
+        url = reverse('portal_admin:document_pdf', args=['purchaseorder', purchase_order.pk])
+
+        # Seule la version (statut, date de modification) est lue, pas le document
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        document_queries = [q['sql'] for q in context.captured_queries if 'seafood_purchaseorder' in q['sql']]
+        self.assertEqual(len(document_queries), 1)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertEqual(b''.join(response.streaming_content), b'%PDF-1.7 test')
+        self.assertEqual(response['ETag'], version.etag)
+        self.assertIn('immutable', response['Cache-Control'])
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=version.etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_missing_document_is_queued_once(self):
+        report = make_report(status='draft')
+        url = reverse('portal_admin:document_pdf', args=['report', report.pk])
+        self.assertTemplateUsed(self.client.get(url), 'documents/document_rendering.html')
+        self.client.get(url)
+        job = BackgroundJob.objects.get(name='seafood.render_document')
+        self.assertEqual(job.payload, {'kind': 'report', 'pk': report.pk})
+
+    def test_permission_and_unknown_kind(self):
+        self.assertEqual(
+            self.client.get(reverse('portal_admin:document_pdf', args=['unknown', 1])).status_code, 404
+        )
+        self.client.force_login(make_user(role=make_role(permissions=[])))
+        report = make_report()
+        response = self.client.get(reverse('portal_admin:document_pdf', args=['report', report.pk]))
+        self.assertEqual(response.status_code, 403)
+
+
+@override_settings(REPLICA_DATABASE='default')
+class ReplicaRouterTest(QueryCountTestCase):
+    """
+    Routage des lectures vers la réplique; l'alias de la réplique pointe ici sur la
+    base de test, seule la décision de routage est vérifiée.
+    """
+
+    def setUp(self):
+        super().setUp()
+        db_router._health.clear()
+        # Hors middleware: les écritures des données de test ne doivent pas épingler
+        token = db_router._wrote_primary.set(False)
+        self.addCleanup(db_router._wrote_primary.reset, token)
+
+    def read_alias_view(self):
+        return db_router.replica_read(lambda request: db_router.current_read_alias())
+
+    def test_replica_reads_only_inside_marked_views(self):
+        self.assertIsNone(db_router.current_read_alias())
+        request = RequestFactory().get('/')
+        self.assertEqual(self.read_alias_view()(request), 'default')
+        self.assertIsNone(self.read_alias_view()(RequestFactory().post('/')))
+
+    def test_pinned_user_reads_primary(self):
+        request = RequestFactory().get('/')
+        request.COOKIES[db_router.settings.REPLICA_PIN_COOKIE] = '1'
+        self.assertIsNone(self.read_alias_view()(request))
+
+    def test_write_pins_the_browser(self):
+        response = self.client.post(reverse('portal_admin:prospect_followups_send'))
+        self.assertIn(db_router.settings.REPLICA_PIN_COOKIE, response.cookies)
+        response = self.client.get(reverse('portal_admin:job_list'))
+        self.assertNotIn(db_router.settings.REPLICA_PIN_COOKIE, response.cookies)
+
+    def test_reads_fall_back_to_primary_when_replica_lags(self):
+        db_router._health['default'] = (float('inf'), False)
+        with db_router.replica_reads():
+            self.assertIsNone(db_router.current_read_alias())
+
+    def test_no_replica_configured(self):
+        with override_settings(REPLICA_DATABASE='replica'), db_router.replica_reads():
+            self.assertIsNone(db_router.current_read_alias())
+            self.assertIsNone(db_router.ReplicaRouter().db_for_read(BackgroundJob))
+
+
+class WarmupTest(TestCase):
+    """Préchauffage des workers"""
+
+    def test_warm_up_steps(self):
+        from django.core.cache import cache
+        from django.template import engines
+
+        from core.warmup import template_names, warm_up
+
+        cache.clear()
+        make_client()
+        results = {result.name: result for result in warm_up()}
+        self.assertEqual(list(results), ['urls', 'imports', 'templates', 'contenttypes', 'reference'])
+        self.assertEqual({name: result.errors for name, result in results.items() if result.errors}, {})
+
+        engine = engines['django'].engine
+        self.assertEqual(results['templates'].count, len(template_names(engine)))
+        self.assertIn('layouts/base.html', template_names(engine))
+        # Imports différés des vues (operations.species n'est importé que dans le corps des vues)
+        import sys
+        self.assertIn('operations.species', sys.modules)
+
+        # Pages de référence en cache: l'autocomplete des clients ne lit plus la base
+        self.client.force_login(make_user(role=make_role('Administrateur')))
+        self.client.get(reverse('portal_admin:index'))
+        with self.assertNumQueries(4):  # session, utilisateur, permissions du rôle, version de la table
+            self.client.get(reverse('portal_admin:autocomplete', args=['clients']))
+
+    def test_first_request_timings(self):
+        from core.warmup import first_request_timings
+
+        user = make_user(role=make_role('Administrateur'))
+        timings = first_request_timings([reverse('portal_admin:index')], user)
+        status, ms = timings[reverse('portal_admin:index')]
+        self.assertEqual(status, 200)
+        self.assertGreater(ms, 0)
+
+
+class StaticFilesTest(TestCase):
+    """Fichiers statiques: élagage des fichiers du thème et service depuis STATIC_ROOT"""
+
+    def test_pruning_keeps_referenced_files(self):
+        from django.contrib.staticfiles.finders import FileSystemFinder
+
+        from core.staticfiles import kept_paths
+
+        files = {
+            path.replace(os.sep, '/'): storage.path(path)
+            for path, storage in FileSystemFinder().list(ignore_patterns=[])
+        }
+        kept = kept_paths(files)
+        # Cité par un gabarit: le dossier du vendor est conservé en entier
+        self.assertIn('vendors/echarts/echarts.min.js', kept)
+        self.assertTrue({path for path in files if path.startswith('vendors/choices/')} <= kept)
+        # Cité par url() dans theme.min.css
+        self.assertIn('assets/img/icons/star.svg', kept)
+        self.assertIn('assets/css/theme.min.css', kept)
+        self.assertNotIn('assets/data/world.js', kept)
+        self.assertFalse(any(path.startswith('vendors/leaflet/') for path in kept))
+
+    def test_template_static_paths_are_in_manifest(self):
+        from django.core.management import call_command
+
+        from core.staticfiles import STATIC_TAG_RE, CompressedManifestStaticFilesStorage
+
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        manifest_storage = {'BACKEND': 'core.staticfiles.CompressedManifestStaticFilesStorage'}
+        with override_settings(STATIC_ROOT=root, STORAGES={**settings.STORAGES, 'staticfiles': manifest_storage}):
+            call_command('collectstatic', interactive=False, verbosity=0)
+        manifest = CompressedManifestStaticFilesStorage(location=root).hashed_files
+
+        missing = set()
+        for directory in settings.TEMPLATES[0]['DIRS']:
+            for dirpath, dirs, files in os.walk(directory):
+                for filename in files:
+                    with open(os.path.join(dirpath, filename), encoding='utf-8', errors='ignore') as f:
+                        paths = STATIC_TAG_RE.findall(f.read())
+                    relative = os.path.relpath(os.path.join(dirpath, filename), directory)
+                    missing |= {f"{relative}: {path}" for path in paths if path not in manifest}
+        self.assertEqual(sorted(missing), [])
+
+    def test_middleware_serves_precompressed_immutable_files(self):
+        import gzip
+
+        from core.staticfiles import compress_file
+
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        os.makedirs(os.path.join(root, 'css'))
+        hashed = os.path.join(root, 'css', 'theme.0123456789ab.css')
+        with open(hashed, 'w') as f:
+            f.write('body { color: #000; }\n' * 200)
+        with open(os.path.join(root, 'robots.txt'), 'w') as f:
+            f.write('User-agent: *\n')
+        self.assertEqual(compress_file(hashed)[0], hashed + '.gz')
+
+        with override_settings(STATIC_ROOT=root):
+            response = self.client.get('/static/css/theme.0123456789ab.css', HTTP_ACCEPT_ENCODING='gzip, deflate')
+            self.assertEqual(response['Content-Encoding'], 'gzip')
+            self.assertIn('immutable', response['Cache-Control'])
+            self.assertEqual(gzip.decompress(b''.join(response.streaming_content)).count(b'body'), 200)
+
+            response = self.client.get('/static/css/theme.0123456789ab.css')
+            self.assertFalse(response.has_header('Content-Encoding'))
+
+            response = self.client.get('/static/robots.txt')
+            self.assertNotIn('immutable', response['Cache-Control'])
+            response = self.client.get('/static/robots.txt', HTTP_IF_NONE_MATCH=response['ETag'])
+            self.assertEqual(response.status_code, 304)
+
+            self.assertNotEqual(self.client.get('/static/../manage.py').status_code, 200)
+
+
+class SupplierStatsTest(QueryCountTestCase):
+    """Statistiques mensuelles des fournisseurs (seafood.supplier_stats)"""
+
+    def snapshot(self):
+        from seafood.models import SupplierMonthlyStats
+
+        return sorted(SupplierMonthlyStats.objects.values_list(
+            'supplier_id', 'month', 'order_count', 'approved_count', 'paid_count', 'cancelled_count',
+            'rejected_count', 'spend', 'approval_count', 'approval_hours', 'payment_count', 'payment_days',
+            'on_time_payment_count',
+        ))
+
+    def test_incremental_refresh_matches_rebuild(self):
+        from datetime import date
+        from decimal import Decimal
+        from io import StringIO
+
+        from django.core.management import call_command
+
+        from seafood.models import SupplierMonthlyStats
+
+        supplier = make_supplier(payment_terms=30)
+        paid = make_purchaseorder(supplier=supplier, po_date=date(2026, 3, 10))
+        paid.status, paid.total = 'paid', Decimal('1500.00')
+        paid.approved_at = paid.created_at + timedelta(hours=6)
+        paid.payment_date = date(2026, 4, 20)
+        paid.save()
+        pending = make_purchaseorder(supplier=supplier, po_date=date(2026, 3, 28), status='pending')
+        self.client.post(
+            reverse('portal_admin:purchaseorder_reject', args=[pending.pk]), {'rejection_reason': 'Prix hors budget'}
+        )
+
+        march = SupplierMonthlyStats.objects.get(supplier=supplier, month=date(2026, 3, 1))
+        self.assertEqual(
+            (march.order_count, march.paid_count, march.rejected_count, march.spend, march.approval_hours),
+            (2, 1, 1, Decimal('1500.00'), Decimal('6.00')),
+        )
+        self.assertEqual((march.payment_days, march.on_time_payment_count), (41, 0))
+
+        # Bon déplacé en avril: le mois quitté est recalculé
+        pending.refresh_from_db()
+        pending.po_date = date(2026, 4, 2)
+        pending.save()
+        self.assertEqual(
+            list(SupplierMonthlyStats.objects.filter(supplier=supplier).values_list('month', 'order_count')),
+            [(date(2026, 4, 1), 1), (date(2026, 3, 1), 1)],
+        )
+
+        incremental = self.snapshot()
+        call_command('rebuild_supplier_stats', months=1, stdout=StringIO())
+        self.assertEqual(self.snapshot(), incremental)
+
+        pending.delete()
+        self.assertFalse(SupplierMonthlyStats.objects.filter(month=date(2026, 4, 1)).exists())
+
+    def test_bulk_transition_and_scorecard(self):
+        from datetime import date
+
+        supplier = make_supplier(name='Pêcheries du Nord')
+        orders = [make_purchaseorder(supplier=supplier, po_date=date(2026, 5, day), status='pending') for day in (3, 4)]
+        self.client.post(
+            reverse('portal_admin:workflow_bulk_transition', args=['seafood.purchaseorder']),
+            {'ids': [order.pk for order in orders], 'status': 'approved'},
+        )
+
+        params = {'start': '2026-01', 'end': '2026-12'}
+        data = self.client.get(reverse('portal_admin:supplier_scorecard_api'), params).json()
+        row = data['suppliers'][0]
+        self.assertEqual((row['supplier'], row['order_count'], row['approved_count']), ('Pêcheries du Nord', 2, 2))
+        self.assertEqual(row['rejection_rate'], '0.00')
+
+        data = self.client.get(reverse('portal_admin:supplier_scorecard_api'), {**params, 'supplier': supplier.pk}).json()
+        self.assertEqual([month['month'] for month in data['months']], ['2026-05'])
+        self.assertEqual(self.client.get(reverse('portal_admin:supplier_scorecard_api'), {'start': '2026-13'}).status_code, 400)
+        self.assertContains(
+            self.client.get(reverse('portal_admin:supplier_scorecard'), {**params, 'supplier': supplier.pk}),
+            'Pêcheries du Nord',
+        )
+
+
+class SpendCubeTest(QueryCountTestCase):
+    """Catalogue des articles et cube des dépenses (seafood.spend)"""
+
+    def test_designations_share_catalog_key(self):
+        from seafood.spend import canonical_designation, designation_key
+
+        self.assertEqual(canonical_designation('  Gants-Nitrile  (taille L) '), 'gants nitrile taille l')
+        self.assertEqual(designation_key('Câble électrique 2,5mm'), designation_key('cable ELECTRIQUE 2 5mm'))
+        self.assertNotEqual(designation_key('Gants L'), designation_key('Gants M'))
+
+    def test_cube_follows_orders_and_drills_down(self):
+        from datetime import date
+        from decimal import Decimal
+        from io import StringIO
+
+        from django.core.management import call_command
+
+        from seafood.models import CatalogItem, PurchaseOrderItem, SpendCube
+
+        supplier = make_supplier(name='Quincaillerie du Port')
+        order = make_purchaseorder(supplier=supplier, po_date=date(2026, 6, 5), items=0, status='pending')
+        for designation, quantity in (('Gants nitrile L', '10'), ('gants-nitrile  l', '5'), ('Bottes', '2')):
+            PurchaseOrderItem.objects.create(
+                purchase_order=order, designation=designation, quantity=Decimal(quantity),
+                unit_price=Decimal('20.00'), tax_rate=Decimal('10.00'),
+            )
+        order.calculate_totals()
+        self.assertFalse(SpendCube.objects.exists())
+
+        self.client.post(
+            reverse('portal_admin:workflow_bulk_transition', args=['seafood.purchaseorder']),
+            {'ids': [order.pk], 'status': 'approved'},
+        )
+        gloves = CatalogItem.objects.get(name='Gants nitrile L')
+        cell = SpendCube.objects.get(catalog_item=gloves)
+        self.assertEqual((cell.line_count, cell.quantity, cell.total), (2, Decimal('15.000'), Decimal('330.00')))
+        self.assertEqual(CatalogItem.objects.count(), 2)
+
+        # Lignes créées par bulk_create (sans clé): reprises par la reconstruction
+        incremental = sorted(SpendCube.objects.values_list('catalog_item', 'unit', 'supplier', 'month', 'total'))
+        PurchaseOrderItem.objects.update(designation_key='')
+        call_command('rebuild_spend_cube', stdout=StringIO())
+        self.assertEqual(sorted(SpendCube.objects.values_list('catalog_item', 'unit', 'supplier', 'month', 'total')), incremental)
+
+        url = reverse('portal_admin:spend_api')
+        params = {'start': '2026-01', 'end': '2026-12'}
+        with CaptureQueriesContext(connection) as queries:
+            rows = self.client.get(url, {**params, 'group': 'item'}).json()['rows']
+        self.assertFalse([query for query in queries if 'purchaseorderitem' in query['sql']])
+        self.assertEqual([(row['item_name'], row['total']) for row in rows], [('Gants nitrile L', '330.00'), ('Bottes', '44.00')])
+
+        rows = self.client.get(url, {**params, 'group': 'supplier,month', 'item': gloves.pk}).json()['rows']
+        self.assertEqual([(row['supplier_name'], row['month']) for row in rows], [('Quincaillerie du Port', '2026-06')])
+        self.assertEqual(self.client.get(url, {'group': 'colour'}).status_code, 400)
+
+        response = self.client.get(reverse('portal_admin:spend_analysis'), {**params, 'item': gloves.pk, 'group': 'supplier'})
+        self.assertContains(response, 'Quincaillerie du Port')
+
+
+class DuplicateDetectionTest(QueryCountTestCase):
+    """Doublons de clients, fournisseurs et prospects (seafood.dedup)"""
+
+    def test_blocking_keys_and_scores(self):
+        from seafood.dedup import blocking_keys, phonetic
+
+        self.assertEqual(blocking_keys('SARL Pêcherie du Nord'), blocking_keys('pecherie  nord sarl'))
+        self.assertEqual({phonetic(name) for name in ('mohamed', 'mohammed', 'muhamed')}, {'md'})
+        self.assertNotEqual(blocking_keys('Usine Nord'), blocking_keys('Frigo Sud'))
+
+    def test_find_duplicates_compares_within_blocks(self):
+        from seafood.dedup import find_duplicates
+        from seafood.models import Client
+
+        first = make_client(name='SARL Pêcherie du Nord', email='contact@pecherie.mr')
+        second = make_client(name='Pecherie Nord', email='CONTACT@pecherie.mr')
+        make_client(name='Usine 2 Nouadhibou')
+        make_client(name='Usine 3 Nouadhibou')
+        for word in ('Atlantique', 'Baleine', 'Corail', 'Dauphin', 'Espadon', 'Flamant', 'Goéland', 'Homard'):
+            make_client(name=f'Armement {word}')
+        # Fiches créées en masse (sans clés): reprises par la recherche
+        Client.objects.filter(pk=second.pk).update(dedup_phonetic='', dedup_prefix='')
+
+        result = find_duplicates('client')
+        self.assertEqual([candidate['ids'] for candidate in result['candidates']], [[first.pk, second.pk]])
+        self.assertEqual(result['candidates'][0]['shared'], ['email'])
+        # 12 fiches: 66 paires sans blocage
+        self.assertLess(result['comparisons'], 30)
+
+        self.client.post(reverse('portal_admin:duplicate_scan', args=['client']))
+        for job in jobs.claim_jobs(jobs.worker_name(), names=['seafood.find_duplicates']):
+            self.assertTrue(jobs.run_job(job))
+        response = self.client.get(reverse('portal_admin:duplicate_list', args=['client']))
+        self.assertContains(response, f'Garder #{second.pk}')
+
+    def test_add_warns_about_possible_duplicate(self):
+        make_supplier(name='Quincaillerie du Port', category='other')
+        response = self.client.post(reverse('portal_admin:supplier_add'), {
+            'name': 'Quincaillerie Port SARL', 'category': 'other', 'payment_terms': 30,
+        }, follow=True)
+        self.assertContains(response, 'Doublon possible')
+
+    def test_merge_repoints_references(self):
+        from datetime import date
+
+        from core.testing import make_reception
+        from seafood.dedup import merge_records
+        from seafood.models import Client, PurchaseOrder, Supplier, SupplierMonthlyStats
+
+        keep, duplicate = make_client(name='Pêcherie du Nord'), make_client(name='Pecherie Nord', city='Nouadhibou')
+        reception = make_reception(client=duplicate)
+        result = merge_records('client', keep.pk, [duplicate.pk])
+        reception.refresh_from_db()
+        keep.refresh_from_db()
+        self.assertEqual((reception.client_id, keep.city), (keep.pk, 'Nouadhibou'))
+        self.assertEqual(result['moved'], {'operations.Reception': 1})
+        self.assertFalse(Client.objects.filter(pk=duplicate.pk).exists())
+
+        kept_supplier, other = make_supplier(name='Quincaillerie du Port'), make_supplier(name='Quincaillerie Port')
+        make_purchaseorder(supplier=other, po_date=date(2026, 5, 4), status='approved')
+        make_purchaseorder(supplier=kept_supplier, po_date=date(2026, 5, 9), status='approved')
+
+        url = reverse('portal_admin:duplicate_merge', args=['supplier'])
+        response = self.client.post(url, {'keep': kept_supplier.pk, 'duplicates': [kept_supplier.pk, other.pk]})
+        job = BackgroundJob.objects.get(name='seafood.merge_duplicates')
+        self.assertRedirects(response, reverse('portal_admin:job_detail', args=[job.pk]), fetch_redirect_response=False)
+        self.assertTrue(jobs.run_job(job))
+
+        self.assertEqual(set(PurchaseOrder.objects.values_list('supplier', flat=True)), {kept_supplier.pk})
+        self.assertFalse(Supplier.objects.filter(pk=other.pk).exists())
+        stats = SupplierMonthlyStats.objects.get()
+        self.assertEqual((stats.supplier_id, stats.order_count), (kept_supplier.pk, 2))
+
+    def test_merge_requires_delete_permission(self):
+        from django.contrib.auth.models import Permission
+
+        from seafood.models import Supplier
+
+        keep, duplicate = make_supplier(name='Quincaillerie du Port'), make_supplier(name='Quincaillerie Port')
+        url = reverse('portal_admin:duplicate_merge', args=['supplier'])
+        editor = make_user(role=make_role(permissions=Permission.objects.filter(codename='change_supplier')))
+        self.client.force_login(editor)
+        self.assertEqual(self.client.post(url, {'keep': keep.pk, 'duplicates': [duplicate.pk]}).status_code, 403)
+        self.assertFalse(BackgroundJob.objects.exists())
+
+        # Tâche mise en file hors de la vue: le droit est revérifié par le worker
+        job = jobs.enqueue(
+            'seafood.merge_duplicates', {'kind': 'supplier', 'keep': keep.pk, 'duplicates': [duplicate.pk]}, user=editor
+        )
+        jobs.claim_jobs('worker')
+        job.refresh_from_db()
+        self.assertFalse(jobs.run_job(job))
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+        self.assertTrue(Supplier.objects.filter(pk=duplicate.pk).exists())
+
+
+class ProspectImportTest(QueryCountTestCase):
+    """Import en masse des prospects (seafood.prospect_import)"""
+
+    def setUp(self):
+        super().setUp()
+        self.reports_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.reports_dir)
+        settings_override = override_settings(IMPORT_REPORTS_DIR=self.reports_dir)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def upload(self, lines, name='salon.csv'):
+        """Envoie le fichier: il est enregistré et la tâche d'import mise en file"""
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        content = '\n'.join(lines).encode('utf-8-sig')
+        url = reverse('portal_admin:prospect_import')
+        response = self.client.post(url, {'file': SimpleUploadedFile(name, content)})
+        job = BackgroundJob.objects.filter(name='seafood.import_prospects').latest('pk')
+        self.assertRedirects(response, f'{url}?job={job.pk}', fetch_redirect_response=False)
+        return job
+
+    def run_import(self):
+        [job] = jobs.claim_jobs('worker', names=['seafood.import_prospects'])
+        jobs.run_job(job)
+        return self.client.get(reverse('portal_admin:prospect_import'), {'job': job.pk})
+
+    def test_import_dedupes_and_reports_rejected_rows(self):
+        from seafood.models import Prospect
+
+        make_prospect(email='deja@example.com', mobile='+22299000001')
+        header = 'Prénom;Nom;E-mail;Portable;Poste;Entreprise;Source du contact;Prochaine relance programmée'
+        rows = [f'Awa;Diop;awa{i}@example.com;+222 22 00 {i:04d};Acheteuse;Pêcherie {i};Salon;15/11/2026' for i in range(25)]
+        rows += [
+            'Moussa;Sy;DEJA@example.com;+22233000000;Gérant;Frigo Sy;Salon;',        # email connu
+            'Fatou;Ba;fatou@example.com;22299000001;Gérante;Ba SARL;salon;',         # portable connu
+            'Ali;Kane;awa3@example.com;+22244000000;Directeur;Kane;trade_show;',      # doublon dans le fichier
+            'Sidi;Fall;pas-un-email;+22255000000;Directeur;Fall;Inconnue;',          # email et source invalides
+            ';;;;;;;',
+        ]
+        job = self.upload([header, *rows])
+        self.assertFalse(Prospect.objects.filter(email__startswith='awa').exists())
+        page = self.client.get(reverse('portal_admin:prospect_import'), {'job': job.pk})
+        self.assertContains(page, 'Import en cours')
+        status = self.client.get(reverse('portal_admin:prospect_import_status', args=[job.pk])).json()
+        self.assertEqual(status['status'], 'queued')
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.run_import()
+        self.assertContains(response, 'Télécharger le rapport')
+        result = response.context['result']
+        self.assertEqual(
+            (result['rows'], result['created'], result['duplicates'], result['invalid']), (29, 25, 3, 1)
+        )
+        self.assertLess(len(queries), 30)
+        # Le fichier envoyé est supprimé après l'import, seul le rapport reste
+        self.assertEqual(os.listdir(self.reports_dir), [result['report']])
+
+        prospect = Prospect.objects.get(email='awa7@example.com')
+        self.assertEqual((prospect.mobile, prospect.contact_source, prospect.status), ('+22222000007', 'trade_show', 'new'))
+        self.assertEqual(prospect.next_followup.isoformat(), '2026-11-15')
+        self.assertTrue(prospect.dedup_phonetic)
+
+        report = self.client.get(reverse('portal_admin:prospect_import_report', args=[result['report']]))
+        content = b''.join(report.streaming_content).decode('utf-8-sig')
+        self.assertEqual([line.split(';')[0] for line in content.splitlines()], ['Ligne', '27', '28', '29', '30'])
+        self.assertIn('Email', content.splitlines()[4])
+        self.assertEqual(
+            self.client.get(reverse('portal_admin:prospect_import_report', args=['settings.py'])).status_code, 404
+        )
+
+    def test_old_reports_are_purged(self):
+        import time
+        import uuid
+
+        from seafood.prospect_import import REPORT_PREFIX, purge_reports
+
+        paths = {}
+        for days in (8, 1):
+            paths[days] = os.path.join(self.reports_dir, f'{REPORT_PREFIX}{uuid.uuid4().hex}.csv')
+            with open(paths[days], 'w') as report:
+                report.write('Ligne;Motif\n')
+            mtime = time.time() - days * 86400
+            os.utime(paths[days], (mtime, mtime))
+        other = os.path.join(self.reports_dir, 'notes.txt')
+        open(other, 'w').close()
+        os.utime(other, (0, 0))
+
+        self.assertEqual(purge_reports(max_age_days=7), 1)
+        self.assertEqual(sorted(os.listdir(self.reports_dir)), sorted(['notes.txt', os.path.basename(paths[1])]))
+
+    def test_missing_columns_are_refused(self):
+        from seafood.models import Prospect
+
+        job = self.upload(['Nom,Email', 'Diop,awa@example.com'])
+        with self.assertLogs('seafood.jobs', 'ERROR'):
+            response = self.run_import()
+        self.assertContains(response, 'Colonne(s) obligatoire(s) absente(s)')
+        self.assertFalse(Prospect.objects.exists())
+        # Fichier refusé: pas de nouvelle tentative, fichier envoyé supprimé
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+        self.assertEqual(os.listdir(self.reports_dir), [])
+
+        # La tâche d'un autre utilisateur n'est pas visible
+        from django.contrib.auth.models import Permission
+
+        role = make_role(permissions=Permission.objects.filter(codename='add_prospect'))
+        self.client.force_login(make_user(role=role))
+        self.assertEqual(self.client.get(reverse('portal_admin:prospect_import'), {'job': job.pk}).status_code, 404)
+        status = self.client.get(reverse('portal_admin:prospect_import_status', args=[job.pk]))
+        self.assertEqual(status.status_code, 404)
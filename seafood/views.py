@@ -1,11 +1,13 @@
 from django.shortcuts import render, redirect, get_object_or_404
-from django.contrib.admin.views.decorators import staff_member_required
-from django.contrib.auth.decorators import permission_required
 from django.contrib.auth import authenticate, login, update_session_auth_hash
 from django.contrib.auth.forms import PasswordChangeForm
 from django.contrib import messages
-from .models import UserProfile, Client, Supplier, Cashbox, BankAccount, PurchaseRequest, PurchaseRequestItem, PurchaseOrder, PurchaseOrderItem, CashboxTransaction, Prospect
-from operations.models import Reception, FishCategory, Service, ServiceCategory, ServiceSubCategory, Report, ReportItem, Classification, ClassificationItem, Packaging, PackagingItem
+from authentication.permissions import route_permission
+from core.conditional import conditional_page, object_version, queryset_version
+from core.db_router import replica_read
+from .models import UserProfile, Client, Supplier, Cashbox, BankAccount, PurchaseRequest, PurchaseRequestItem, PurchaseOrder, PurchaseOrderItem, CashboxTransaction, Prospect, BackgroundJob, CatalogItem
+from operations.models import Reception, FishCategory, Service, ServiceCategory, ServiceSubCategory, Report, ReportItem, Classification, ClassificationItem, Packaging, PackagingItem, Invoice, ArchivedLot
+from operations.pipeline import STAGE_AWAITING_PACKAGING
 
 # Create your views here.
 
@@ -28,7 +30,7 @@ def portal_login(request):
 
     return render(request, 'seafood/auth/sign-in.html')
 
-@staff_member_required
+@route_permission()
 def home(request):
     """Page d'accueil du portail admin"""
     return render(request, 'seafood/home.html')
@@ -36,7 +38,7 @@ def home(request):
 
 # ============ PROFILE VIEWS ============
 
-@staff_member_required
+@route_permission()
 def profile_view(request):
     """Afficher et modifier le profil utilisateur"""
     import os
@@ -112,7 +114,7 @@ def profile_view(request):
     })
 
 
-@staff_member_required
+@route_permission()
 def password_change_view(request):
     """Changer le mot de passe"""
     if request.method == 'POST':
@@ -135,24 +137,31 @@ def password_change_view(request):
 
 # ============ CLIENT VIEWS ============
 
-@staff_member_required
-@permission_required('operations.view_client', raise_exception=True)
+@route_permission('seafood.view_client')
+@replica_read
 def client_list(request):
     """Liste des clients"""
     clients = Client.objects.all().order_by('-created_at')
     return render(request, 'seafood/clients/client_list.html', {'clients': clients})
 
 
-@staff_member_required
-@permission_required('operations.view_client', raise_exception=True)
+@route_permission('seafood.view_client')
 def client_detail(request, pk):
     """Détails d'un client"""
     client = get_object_or_404(Client, pk=pk)
     return render(request, 'seafood/clients/client_detail.html', {'client': client})
 
 
-@staff_member_required
-@permission_required('operations.add_client', raise_exception=True)
+def _warn_duplicates(request, obj):
+    """Signale les fiches proches d'une fiche ajoutée (ses blocs de doublons seulement)"""
+    from .dedup import possible_duplicates
+
+    found = possible_duplicates(obj)
+    if found:
+        messages.warning(request, 'Doublon possible : ' + '; '.join(f'{other} ({score:.0%})' for other, score in found))
+
+
+@route_permission('seafood.add_client')
 def client_add(request):
     """Formulaire d'ajout de client"""
     if request.method == 'POST':
@@ -203,6 +212,7 @@ def client_add(request):
                 client.logo.save(new_filename, ContentFile(file_content), save=True)
 
             messages.success(request, 'Client ajouté avec succès!')
+            _warn_duplicates(request, client)
             return redirect('portal_admin:client_list')
         except Exception as e:
             messages.error(request, f'Erreur lors de l\'ajout: {str(e)}')
@@ -213,10 +223,18 @@ def client_add(request):
     })
 
 
-@staff_member_required
-@permission_required('operations.change_client', raise_exception=True)
+# Champs saisis dans le formulaire client (écriture ciblée de client_edit)
+CLIENT_FORM_FIELDS = [
+    'name', 'client_type', 'website', 'responsible', 'mobile', 'phone', 'email', 'address', 'city',
+    'postal_code', 'country', 'trade_register', 'tax_id', 'status', 'observations',
+]
+
+
+@route_permission('seafood.change_client')
 def client_edit(request, pk):
     """Formulaire de modification de client"""
+    from core.versioning import ConcurrentEditError, apply_posted_version
+
     client = get_object_or_404(Client, pk=pk)
 
     if request.method == 'POST':
@@ -224,6 +242,7 @@ def client_edit(request, pk):
             import os
             from django.core.files.base import ContentFile
 
+            apply_posted_version(client, request.POST)
             client.name = request.POST.get('name')
             client.client_type = request.POST.get('client_type')
             client.website = request.POST.get('website', '')
@@ -253,9 +272,12 @@ def client_edit(request, pk):
                 # Sauvegarder avec le nouveau nom
                 client.logo.save(new_filename, ContentFile(file_content), save=False)
 
-            client.save()
+            client.save(update_fields=CLIENT_FORM_FIELDS + (['logo'] if 'logo' in request.FILES else []))
             messages.success(request, 'Client modifié avec succès!')
             return redirect('portal_admin:client_list')
+        except ConcurrentEditError as e:
+            messages.error(request, str(e))
+            return redirect('portal_admin:client_edit', pk=pk)
         except Exception as e:
             messages.error(request, f'Erreur lors de la modification: {str(e)}')
 
@@ -266,8 +288,7 @@ def client_edit(request, pk):
     })
 
 
-@staff_member_required
-@permission_required('operations.delete_client', raise_exception=True)
+@route_permission('seafood.delete_client')
 def client_delete(request, pk):
     """Suppression d'un client"""
     client = get_object_or_404(Client, pk=pk)
@@ -287,24 +308,89 @@ def client_delete(request, pk):
 
 # ============ SUPPLIER VIEWS ============
 
-@staff_member_required
-@permission_required('seafood.view_supplier', raise_exception=True)
+@route_permission('seafood.view_supplier')
+@replica_read
 def supplier_list(request):
     """Liste des fournisseurs"""
     suppliers = Supplier.objects.all().order_by('-created_at')
     return render(request, 'seafood/suppliers/supplier_list.html', {'suppliers': suppliers})
 
 
-@staff_member_required
-@permission_required('seafood.view_supplier', raise_exception=True)
+@route_permission('seafood.view_supplier')
 def supplier_detail(request, pk):
     """Détails d'un fournisseur"""
     supplier = get_object_or_404(Supplier, pk=pk)
     return render(request, 'seafood/suppliers/supplier_detail.html', {'supplier': supplier})
 
 
-@staff_member_required
-@permission_required('seafood.add_supplier', raise_exception=True)
+def _month_range(params):
+    """Mois [début, fin] demandés (AAAA-MM, inclus; par défaut les 12 derniers mois)"""
+    from datetime import datetime
+
+    from django.utils import timezone
+
+    today = timezone.localdate().replace(day=1)
+    try:
+        end = datetime.strptime(params['end'], '%Y-%m').date() if params.get('end') else today
+        if params.get('start'):
+            start = datetime.strptime(params['start'], '%Y-%m').date()
+        else:
+            start = end.replace(year=end.year - 1, month=end.month + 1) if end.month < 12 else end.replace(month=1)
+    except ValueError:
+        raise ValueError('Mois invalide (format attendu: AAAA-MM)')
+    if start > end:
+        raise ValueError('Le mois de début doit précéder le mois de fin')
+    return start, end
+
+
+@route_permission('seafood.view_suppliermonthlystats')
+@replica_read
+def supplier_scorecard(request):
+    """Tableau de bord des fournisseurs: dépense, délais, rejets et annulations sur une période"""
+    from .supplier_stats import supplier_months, supplier_scorecard as scorecard
+
+    try:
+        start, end = _month_range(request.GET)
+    except ValueError as e:
+        messages.error(request, str(e))
+        start, end = _month_range({})
+
+    selected = Supplier.objects.filter(pk=request.GET.get('supplier')).first() if request.GET.get('supplier', '').isdigit() else None
+    return render(request, 'seafood/suppliers/supplier_scorecard.html', {
+        'start': start,
+        'end': end,
+        'rows': scorecard(start, end),
+        'selected': selected,
+        'months': supplier_months(selected.pk, start, end) if selected else [],
+    })
+
+
+@route_permission('seafood.view_suppliermonthlystats')
+@replica_read
+def supplier_scorecard_api(request):
+    """JSON API: indicateurs par fournisseur (start, end: AAAA-MM inclus), et par mois si supplier est donné"""
+    from django.http import JsonResponse
+
+    from .supplier_stats import supplier_months, supplier_scorecard as scorecard
+
+    try:
+        start, end = _month_range(request.GET)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    supplier_id = request.GET.get('supplier')
+    if supplier_id and not supplier_id.isdigit():
+        return JsonResponse({'error': 'Fournisseur invalide'}, status=400)
+
+    data = {'start': start.strftime('%Y-%m'), 'end': end.strftime('%Y-%m')}
+    if supplier_id:
+        data['suppliers'] = [row.as_dict() for row in scorecard(start, end, supplier_ids=[int(supplier_id)])]
+        data['months'] = [row.as_dict() for row in supplier_months(int(supplier_id), start, end)]
+    else:
+        data['suppliers'] = [row.as_dict() for row in scorecard(start, end)]
+    return JsonResponse(data)
+
+
+@route_permission('seafood.add_supplier')
 def supplier_add(request):
     """Formulaire d'ajout de fournisseur"""
     if request.method == 'POST':
@@ -353,6 +439,7 @@ def supplier_add(request):
                 supplier.logo.save(new_filename, ContentFile(file_content), save=True)
 
             messages.success(request, 'Fournisseur ajouté avec succès!')
+            _warn_duplicates(request, supplier)
             return redirect('portal_admin:supplier_list')
         except Exception as e:
             messages.error(request, f'Erreur lors de l\'ajout: {str(e)}')
@@ -363,8 +450,7 @@ def supplier_add(request):
     })
 
 
-@staff_member_required
-@permission_required('seafood.change_supplier', raise_exception=True)
+@route_permission('seafood.change_supplier')
 def supplier_edit(request, pk):
     """Formulaire de modification de fournisseur"""
     supplier = get_object_or_404(Supplier, pk=pk)
@@ -414,8 +500,7 @@ def supplier_edit(request, pk):
     })
 
 
-@staff_member_required
-@permission_required('seafood.delete_supplier', raise_exception=True)
+@route_permission('seafood.delete_supplier')
 def supplier_delete(request, pk):
     """Suppression d'un fournisseur"""
     supplier = get_object_or_404(Supplier, pk=pk)
@@ -435,16 +520,15 @@ def supplier_delete(request, pk):
 
 # ============ CASHBOX VIEWS ============
 
-@staff_member_required
-@permission_required('seafood.view_cashbox', raise_exception=True)
+@route_permission('seafood.view_cashbox')
+@replica_read
 def cashbox_list(request):
     """Liste des caisses"""
     cashboxes = Cashbox.objects.all().order_by('-created_at')
     return render(request, 'seafood/cashbox/cashbox_list.html', {'cashboxes': cashboxes})
 
 
-@staff_member_required
-@permission_required('seafood.view_cashbox', raise_exception=True)
+@route_permission('seafood.view_cashbox')
 def cashbox_detail(request, pk):
     """Détails d'une caisse"""
     from decimal import Decimal
@@ -465,8 +549,7 @@ def cashbox_detail(request, pk):
     })
 
 
-@staff_member_required
-@permission_required('seafood.add_cashbox', raise_exception=True)
+@route_permission('seafood.add_cashbox')
 def cashbox_add(request):
     """Formulaire d'ajout de caisse"""
     if request.method == 'POST':
@@ -490,8 +573,7 @@ def cashbox_add(request):
     })
 
 
-@staff_member_required
-@permission_required('seafood.change_cashbox', raise_exception=True)
+@route_permission('seafood.change_cashbox')
 def cashbox_edit(request, pk):
     """Formulaire de modification de caisse"""
     cashbox = get_object_or_404(Cashbox, pk=pk)
@@ -515,8 +597,7 @@ def cashbox_edit(request, pk):
     })
 
 
-@staff_member_required
-@permission_required('seafood.delete_cashbox', raise_exception=True)
+@route_permission('seafood.delete_cashbox')
 def cashbox_delete(request, pk):
     """Suppression d'une caisse"""
     cashbox = get_object_or_404(Cashbox, pk=pk)
@@ -532,17 +613,12 @@ def cashbox_delete(request, pk):
     return render(request, 'seafood/cashbox/cashbox_confirm_delete.html', {'cashbox': cashbox})
 
 
-@staff_member_required
-@permission_required('seafood.change_cashbox', raise_exception=True)
+@route_permission('seafood.change_cashbox')
 def cashbox_change_status(request, pk, new_status):
     """Changer le statut d'une caisse"""
-    cashbox = get_object_or_404(Cashbox, pk=pk)
+    from core.workflow import TransitionError, get_workflow
 
-    # Vérifier que le statut est valide
-    valid_statuses = ['active', 'inactive', 'suspended']
-    if new_status not in valid_statuses:
-        messages.error(request, 'Statut invalide!')
-        return redirect('portal_admin:cashbox_detail', pk=pk)
+    cashbox = get_object_or_404(Cashbox, pk=pk)
 
     # Messages selon le statut
     status_messages = {
@@ -551,32 +627,57 @@ def cashbox_change_status(request, pk, new_status):
         'suspended': 'Caisse suspendue avec succès!'
     }
 
-    cashbox.status = new_status
-    cashbox.save()
+    try:
+        get_workflow(Cashbox).transition(cashbox, new_status, user=request.user)
+    except TransitionError as e:
+        messages.error(request, str(e))
+        return redirect('portal_admin:cashbox_detail', pk=pk)
     messages.success(request, status_messages.get(new_status, 'Statut modifié avec succès!'))
     return redirect('portal_admin:cashbox_detail', pk=pk)
 
 
 # ============ BANK ACCOUNT VIEWS ============
 
-@staff_member_required
-@permission_required('seafood.view_bankaccount', raise_exception=True)
+@route_permission('seafood.view_bankaccount')
+@replica_read
 def bankaccount_list(request):
     """Liste des comptes bancaires"""
     bankaccounts = BankAccount.objects.all().order_by('-created_at')
     return render(request, 'seafood/bankaccount/bankaccount_list.html', {'bankaccounts': bankaccounts})
 
 
-@staff_member_required
-@permission_required('seafood.view_bankaccount', raise_exception=True)
+@route_permission('seafood.view_bankaccount')
+@replica_read
+def bankaccount_consolidation(request):
+    """Consolidation des soldes (comptes bancaires et caisses) en MRU"""
+    from datetime import date
+    from .currency import consolidate_balances
+
+    on_date = None
+    if request.GET.get('date'):
+        try:
+            on_date = date.fromisoformat(request.GET['date'])
+        except ValueError:
+            messages.error(request, 'Date invalide!')
+
+    consolidation = consolidate_balances(on_date)
+    if consolidation['missing_rates']:
+        messages.warning(
+            request,
+            f"Taux de change manquant pour: {', '.join(consolidation['missing_rates'])}. "
+            "Ces comptes sont exclus du total consolidé."
+        )
+    return render(request, 'seafood/bankaccount/bankaccount_consolidation.html', {'consolidation': consolidation})
+
+
+@route_permission('seafood.view_bankaccount')
 def bankaccount_detail(request, pk):
     """Détails d'un compte bancaire"""
     bankaccount = get_object_or_404(BankAccount, pk=pk)
     return render(request, 'seafood/bankaccount/bankaccount_detail.html', {'bankaccount': bankaccount})
 
 
-@staff_member_required
-@permission_required('seafood.add_bankaccount', raise_exception=True)
+@route_permission('seafood.add_bankaccount')
 def bankaccount_add(request):
     """Formulaire d'ajout de compte bancaire"""
     if request.method == 'POST':
@@ -624,8 +725,7 @@ def bankaccount_add(request):
     })
 
 
-@staff_member_required
-@permission_required('seafood.change_bankaccount', raise_exception=True)
+@route_permission('seafood.change_bankaccount')
 def bankaccount_edit(request, pk):
     """Formulaire de modification de compte bancaire"""
     bankaccount = get_object_or_404(BankAccount, pk=pk)
@@ -671,8 +771,7 @@ def bankaccount_edit(request, pk):
     })
 
 
-@staff_member_required
-@permission_required('seafood.delete_bankaccount', raise_exception=True)
+@route_permission('seafood.delete_bankaccount')
 def bankaccount_delete(request, pk):
     """Suppression d'un compte bancaire"""
     bankaccount = get_object_or_404(BankAccount, pk=pk)
@@ -688,8 +787,7 @@ def bankaccount_delete(request, pk):
     return render(request, 'seafood/bankaccount/bankaccount_confirm_delete.html', {'bankaccount': bankaccount})
 
 
-@staff_member_required
-@permission_required('seafood.change_bankaccount', raise_exception=True)
+@route_permission('seafood.change_bankaccount')
 def bankaccount_change_status(request, pk, new_status):
     """Changer le statut d'un compte bancaire"""
     bankaccount = get_object_or_404(BankAccount, pk=pk)
@@ -716,24 +814,22 @@ def bankaccount_change_status(request, pk, new_status):
 
 # ============ PURCHASE REQUEST VIEWS ============
 
-@staff_member_required
-@permission_required('seafood.view_purchaserequest', raise_exception=True)
+@route_permission('seafood.view_purchaserequest')
+@replica_read
 def purchaserequest_list(request):
     """Liste des demandes d'achat"""
-    purchase_requests = PurchaseRequest.objects.all().order_by('-pr_date', '-created_at')
+    purchase_requests = PurchaseRequest.objects.prefetch_related('items').order_by('-pr_date', '-created_at')
     return render(request, 'seafood/purchaserequest/purchaserequest_list.html', {'purchase_requests': purchase_requests})
 
 
-@staff_member_required
-@permission_required('seafood.view_purchaserequest', raise_exception=True)
+@route_permission('seafood.view_purchaserequest')
 def purchaserequest_detail(request, pk):
     """Détails d'une demande d'achat"""
     purchase_request = get_object_or_404(PurchaseRequest, pk=pk)
     return render(request, 'seafood/purchaserequest/purchaserequest_detail.html', {'purchase_request': purchase_request})
 
 
-@staff_member_required
-@permission_required('seafood.add_purchaserequest', raise_exception=True)
+@route_permission('seafood.add_purchaserequest')
 def purchaserequest_add(request):
     """Formulaire d'ajout de demande d'achat"""
     if request.method == 'POST':
@@ -784,8 +880,7 @@ def purchaserequest_add(request):
     })
 
 
-@staff_member_required
-@permission_required('seafood.change_purchaserequest', raise_exception=True)
+@route_permission('seafood.change_purchaserequest')
 def purchaserequest_edit(request, pk):
     """Formulaire de modification de demande d'achat"""
     purchase_request = get_object_or_404(PurchaseRequest, pk=pk)
@@ -837,16 +932,20 @@ def purchaserequest_edit(request, pk):
     })
 
 
-@staff_member_required
-@permission_required('seafood.change_purchaserequest', raise_exception=True)
+@route_permission('seafood.change_purchaserequest')
 def purchaserequest_approve(request, pk):
     """Approuver une demande d'achat et créer le bon de commande"""
     from decimal import Decimal
     from datetime import date
+    from django.db import transaction
+    from core.workflow import get_workflow
 
     purchase_request = get_object_or_404(PurchaseRequest, pk=pk)
 
     if request.method == 'POST':
+        if not get_workflow(PurchaseRequest).can_transition(purchase_request, 'approved'):
+            messages.error(request, 'Seules les demandes d\'achat en brouillon peuvent être approuvées.')
+            return redirect('portal_admin:purchaserequest_detail', pk=pk)
         try:
             # Récupérer le fournisseur
             supplier_id = request.POST.get('supplier')
@@ -854,7 +953,7 @@ def purchaserequest_approve(request, pk):
                 messages.error(request, 'Veuillez sélectionner un fournisseur!')
                 return render(request, 'seafood/purchaserequest/purchaserequest_approve.html', {
                     'purchase_request': purchase_request,
-                    'suppliers': Supplier.objects.filter(status='active')
+                    'suppliers': Supplier.objects.none()
                 })
 
             # Récupérer tous les items de la PR
@@ -871,41 +970,41 @@ def purchaserequest_approve(request, pk):
                     messages.error(request, f'Veuillez renseigner le prix unitaire pour l\'article: {item.designation}')
                     return render(request, 'seafood/purchaserequest/purchaserequest_approve.html', {
                         'purchase_request': purchase_request,
-                        'suppliers': Supplier.objects.filter(status='active')
+                        'suppliers': Supplier.objects.none()
                     })
 
-            # Créer le PO (en attente)
-            purchase_order = PurchaseOrder(
-                po_date=date.today(),
-                supplier_id=supplier_id,
-                status='pending',  # Créé en statut "En attente"
-                note=f'Créé automatiquement depuis PR-{purchase_request.pr_number}',
-                created_by=request.user
-            )
-            purchase_order.save()
-
-            # Créer les items du PO
-            for index, item in enumerate(items):
-                unit_price = request.POST.get(f'unit_price_{item.pk}')
-                tax_rate = request.POST.get(f'tax_rate_{item.pk}', '0')
-
-                PurchaseOrderItem.objects.create(
-                    purchase_order=purchase_order,
-                    designation=item.designation,
-                    quantity=item.quantity,
-                    unit=item.unit,
-                    unit_price=Decimal(unit_price),
-                    tax_rate=Decimal(tax_rate),
-                    order=index
+            # Le bon de commande et l'approbation sont enregistrés ensemble
+            with transaction.atomic():
+                # Créer le PO (en attente)
+                purchase_order = PurchaseOrder(
+                    po_date=date.today(),
+                    supplier_id=supplier_id,
+                    status='pending',  # Créé en statut "En attente"
+                    note=f'Créé automatiquement depuis PR-{purchase_request.pr_number}',
+                    created_by=request.user
                 )
+                purchase_order.save()
 
-            # Calculer les totaux du PO
-            purchase_order.calculate_totals()
+                # Créer les items du PO
+                for index, item in enumerate(items):
+                    unit_price = request.POST.get(f'unit_price_{item.pk}')
+                    tax_rate = request.POST.get(f'tax_rate_{item.pk}', '0')
 
-            # Approuver la demande d'achat
-            purchase_request.status = 'approved'
-            purchase_request.rejection_reason = ''
-            purchase_request.save()
+                    PurchaseOrderItem.objects.create(
+                        purchase_order=purchase_order,
+                        designation=item.designation,
+                        quantity=item.quantity,
+                        unit=item.unit,
+                        unit_price=Decimal(unit_price),
+                        tax_rate=Decimal(tax_rate),
+                        order=index
+                    )
+
+                # Calculer les totaux du PO
+                purchase_order.calculate_totals()
+
+                # Approuver la demande d'achat
+                get_workflow(PurchaseRequest).transition(purchase_request, 'approved', user=request.user)
 
             messages.success(
                 request,
@@ -917,47 +1016,117 @@ def purchaserequest_approve(request, pk):
             messages.error(request, f'Erreur lors de l\'approbation: {str(e)}')
             return render(request, 'seafood/purchaserequest/purchaserequest_approve.html', {
                 'purchase_request': purchase_request,
-                'suppliers': Supplier.objects.filter(status='active')
+                'suppliers': Supplier.objects.none()
             })
 
-    # GET: Afficher le formulaire
-    suppliers = Supplier.objects.filter(status='active')
+    # GET: Afficher le formulaire (fournisseurs chargés par l'autocomplete)
+    suppliers = Supplier.objects.none()
     return render(request, 'seafood/purchaserequest/purchaserequest_approve.html', {
         'purchase_request': purchase_request,
         'suppliers': suppliers
     })
 
 
-@staff_member_required
-@permission_required('seafood.change_purchaserequest', raise_exception=True)
+@route_permission('seafood.change_purchaserequest')
+def purchaserequest_batch_approve(request):
+    """
+    Approbation groupée: demandes en brouillon sélectionnées (ids), un
+    fournisseur par demande et un prix par article dans une grille, un bon de
+    commande consolidé par fournisseur (voir seafood.purchasing)
+    """
+    from seafood.purchasing import BatchApprovalError, approve_requests, parse_amount, request_items
+
+    source = request.POST if request.method == 'POST' else request.GET
+    ids = list(dict.fromkeys(int(pk) for pk in source.getlist('ids') if pk.isdigit()))
+    purchase_requests = list(PurchaseRequest.objects.filter(pk__in=ids, status='draft').order_by('pr_date', 'pk'))
+    if not purchase_requests:
+        messages.error(request, 'Aucune demande d\'achat en brouillon sélectionnée!')
+        return redirect('portal_admin:purchaserequest_list')
+    items = request_items([pr.pk for pr in purchase_requests])
+    # Saisie reportée dans la grille si elle est renvoyée après une erreur
+    default_supplier = request.POST.get('default_supplier', '')
+    chosen = [request.POST.get(f'supplier_{pr.pk}', '') for pr in purchase_requests] + [default_supplier]
+    selected = Supplier.objects.in_bulk([pk for pk in chosen if pk.isdigit()])
+    for pr in purchase_requests:
+        supplier_id = request.POST.get(f'supplier_{pr.pk}', '')
+        pr.batch_supplier = selected.get(int(supplier_id)) if supplier_id.isdigit() else None
+        pr.batch_items = items[pr.pk]
+        for item in pr.batch_items:
+            item.batch_unit_price = request.POST.get(f'unit_price_{item.pk}', '')
+            item.batch_tax_rate = request.POST.get(f'tax_rate_{item.pk}', '0.00')
+
+    def render_grid():
+        return render(request, 'seafood/purchaserequest/purchaserequest_batch_approve.html', {
+            'purchase_requests': purchase_requests,
+            'skipped': len(ids) - len(purchase_requests),
+            'default_supplier': selected.get(int(default_supplier)) if default_supplier.isdigit() else None,
+        })
+
+    if request.method != 'POST':
+        return render_grid()
+
+    try:
+        suppliers, prices = {}, {}
+        for pr in purchase_requests:
+            supplier_id = request.POST.get(f'supplier_{pr.pk}') or default_supplier
+            if not supplier_id.isdigit():
+                raise BatchApprovalError(f'{pr.pr_number}: veuillez sélectionner un fournisseur.')
+            suppliers[pr.pk] = int(supplier_id)
+            for item in pr.batch_items:
+                unit_price = request.POST.get(f'unit_price_{item.pk}', '')
+                if not unit_price.strip():
+                    raise BatchApprovalError(f'{pr.pr_number}: veuillez renseigner le prix unitaire de {item.designation}.')
+                prices[item.pk] = (
+                    parse_amount(unit_price, item.designation),
+                    parse_amount(request.POST.get(f'tax_rate_{item.pk}') or '0', item.designation, maximum=100),
+                )
+        if set(suppliers.values()) - set(selected):
+            raise BatchApprovalError('Fournisseur introuvable.')
+        orders = approve_requests(suppliers, prices, user=request.user)
+    except BatchApprovalError as e:
+        messages.error(request, f'Approbation annulée: {e}')
+        return render_grid()
+
+    messages.success(
+        request,
+        f'{len(purchase_requests)} demande(s) d\'achat approuvée(s)! '
+        f'{len(orders)} bon(s) de commande créé(s): {", ".join(order.po_number for order in orders)}.'
+    )
+    return redirect('portal_admin:purchaseorder_list')
+
+
+@route_permission('seafood.change_purchaserequest')
 def purchaserequest_reject(request, pk):
     """Rejeter une demande d'achat"""
+    from core.workflow import TransitionError, get_workflow
+
     purchase_request = get_object_or_404(PurchaseRequest, pk=pk)
 
     if request.method == 'POST':
-        rejection_reason = request.POST.get('rejection_reason', '').strip()
-        if not rejection_reason:
-            messages.error(request, 'Le motif de rejet est obligatoire!')
+        try:
+            get_workflow(PurchaseRequest).transition(purchase_request, 'rejected', request.POST, user=request.user)
+        except TransitionError as e:
+            messages.error(request, str(e))
             return render(request, 'seafood/purchaserequest/purchaserequest_reject.html', {'purchase_request': purchase_request})
-
-        purchase_request.status = 'rejected'
-        purchase_request.rejection_reason = rejection_reason
-        purchase_request.save()
         messages.success(request, 'Demande d\'achat rejetée!')
         return redirect('portal_admin:purchaserequest_detail', pk=pk)
 
     return render(request, 'seafood/purchaserequest/purchaserequest_reject.html', {'purchase_request': purchase_request})
 
 
-@staff_member_required
-@permission_required('seafood.change_purchaserequest', raise_exception=True)
+@route_permission('seafood.change_purchaserequest')
 def purchaserequest_cancel(request, pk):
     """Annuler une demande d'achat"""
+    from core.workflow import TransitionError, get_workflow
+
     purchase_request = get_object_or_404(PurchaseRequest, pk=pk)
 
     if request.method == 'POST':
-        purchase_request.status = 'cancelled'
-        purchase_request.save()
+        try:
+            get_workflow(PurchaseRequest).transition(purchase_request, 'cancelled', user=request.user)
+        except TransitionError as e:
+            messages.error(request, str(e))
+            return redirect('portal_admin:purchaserequest_detail', pk=pk)
         messages.success(request, 'Demande d\'achat annulée!')
         return redirect('portal_admin:purchaserequest_detail', pk=pk)
 
@@ -966,24 +1135,22 @@ def purchaserequest_cancel(request, pk):
 
 # ============ PURCHASE ORDER VIEWS ============
 
-@staff_member_required
-@permission_required('seafood.view_purchaseorder', raise_exception=True)
+@route_permission('seafood.view_purchaseorder')
+@replica_read
 def purchaseorder_list(request):
     """Liste des bons de commande"""
-    purchase_orders = PurchaseOrder.objects.all().order_by('-po_date', '-created_at')
+    purchase_orders = PurchaseOrder.objects.select_related('supplier').order_by('-po_date', '-created_at')
     return render(request, 'seafood/purchaseorder/purchaseorder_list.html', {'purchase_orders': purchase_orders})
 
 
-@staff_member_required
-@permission_required('seafood.view_purchaseorder', raise_exception=True)
+@route_permission('seafood.view_purchaseorder')
 def purchaseorder_detail(request, pk):
     """Détails d'un bon de commande"""
     purchase_order = get_object_or_404(PurchaseOrder, pk=pk)
     return render(request, 'seafood/purchaseorder/purchaseorder_detail.html', {'purchase_order': purchase_order})
 
 
-@staff_member_required
-@permission_required('seafood.add_purchaseorder', raise_exception=True)
+@route_permission('seafood.add_purchaseorder')
 def purchaseorder_add(request):
     """Formulaire d'ajout de bon de commande"""
     if request.method == 'POST':
@@ -1033,17 +1200,19 @@ def purchaseorder_add(request):
         except Exception as e:
             messages.error(request, f'Erreur lors de l\'ajout: {str(e)}')
 
-    suppliers = Supplier.objects.filter(status='active')
+    # Fournisseurs chargés par l'autocomplete
+    suppliers = Supplier.objects.none()
     return render(request, 'seafood/purchaseorder/purchaseorder_form.html', {
         'suppliers': suppliers,
         'units': PurchaseOrderItem.UNIT_CHOICES
     })
 
 
-@staff_member_required
-@permission_required('seafood.change_purchaseorder', raise_exception=True)
+@route_permission('seafood.change_purchaseorder')
 def purchaseorder_edit(request, pk):
     """Formulaire de modification de bon de commande"""
+    from core.versioning import ConcurrentEditError, apply_posted_version
+
     purchase_order = get_object_or_404(PurchaseOrder, pk=pk)
 
     # Ne permettre la modification que si le statut est brouillon
@@ -1055,6 +1224,7 @@ def purchaseorder_edit(request, pk):
         try:
             from decimal import Decimal
 
+            apply_posted_version(purchase_order, request.POST)
             purchase_order.po_date = request.POST.get('po_date')
             purchase_order.payment_date = request.POST.get('payment_date') or None
             purchase_order.payment_bank_id = request.POST.get('payment_bank') or None
@@ -1067,7 +1237,9 @@ def purchaseorder_edit(request, pk):
                     purchase_order.file.delete(save=False)
                 purchase_order.file = request.FILES['file']
 
-            purchase_order.save()
+            purchase_order.save(update_fields=[
+                'po_date', 'payment_date', 'payment_bank', 'supplier', 'note', 'status', 'file',
+            ])
 
             # Supprimer les anciens items
             purchase_order.items.all().delete()
@@ -1096,10 +1268,14 @@ def purchaseorder_edit(request, pk):
 
             messages.success(request, 'Bon de commande modifié avec succès!')
             return redirect('portal_admin:purchaseorder_detail', pk=pk)
+        except ConcurrentEditError as e:
+            messages.error(request, str(e))
+            return redirect('portal_admin:purchaseorder_edit', pk=pk)
         except Exception as e:
             messages.error(request, f'Erreur lors de la modification: {str(e)}')
 
-    suppliers = Supplier.objects.filter(status='active')
+    # Seul le fournisseur actuel est rendu, les autres sont chargés par l'autocomplete
+    suppliers = Supplier.objects.filter(pk=purchase_order.supplier_id)
     bank_accounts = BankAccount.objects.filter(status='active')
     return render(request, 'seafood/purchaseorder/purchaseorder_form.html', {
         'purchase_order': purchase_order,
@@ -1110,62 +1286,64 @@ def purchaseorder_edit(request, pk):
     })
 
 
-@staff_member_required
-@permission_required('seafood.change_purchaseorder', raise_exception=True)
+@route_permission('seafood.change_purchaseorder')
 def purchaseorder_pending(request, pk):
     """Mettre un bon de commande en attente"""
+    from core.workflow import TransitionError, get_workflow
+
     purchase_order = get_object_or_404(PurchaseOrder, pk=pk)
 
     if request.method == 'POST':
-        purchase_order.status = 'pending'
-        purchase_order.save()
+        try:
+            get_workflow(PurchaseOrder).transition(purchase_order, 'pending', user=request.user)
+        except TransitionError as e:
+            messages.error(request, str(e))
+            return redirect('portal_admin:purchaseorder_detail', pk=pk)
         messages.success(request, 'Bon de commande mis en attente!')
         return redirect('portal_admin:purchaseorder_detail', pk=pk)
 
     return render(request, 'seafood/purchaseorder/purchaseorder_pending.html', {'purchase_order': purchase_order})
 
 
-@staff_member_required
-@permission_required('seafood.change_purchaseorder', raise_exception=True)
+@route_permission('seafood.change_purchaseorder')
 def purchaseorder_approve(request, pk):
     """Approuver un bon de commande"""
+    from core.workflow import TransitionError, get_workflow
+
     purchase_order = get_object_or_404(PurchaseOrder, pk=pk)
 
     if request.method == 'POST':
-        purchase_order.status = 'approved'
-        purchase_order.approved_by = request.user
-        from django.utils import timezone
-        purchase_order.approved_at = timezone.now()
-        purchase_order.save()
+        try:
+            get_workflow(PurchaseOrder).transition(purchase_order, 'approved', user=request.user)
+        except TransitionError as e:
+            messages.error(request, str(e))
+            return redirect('portal_admin:purchaseorder_detail', pk=pk)
         messages.success(request, 'Bon de commande approuvé!')
         return redirect('portal_admin:purchaseorder_detail', pk=pk)
 
     return render(request, 'seafood/purchaseorder/purchaseorder_approve.html', {'purchase_order': purchase_order})
 
 
-@staff_member_required
-@permission_required('seafood.change_purchaseorder', raise_exception=True)
+@route_permission('seafood.change_purchaseorder')
 def purchaseorder_reject(request, pk):
     """Rejeter un bon de commande"""
+    from core.workflow import TransitionError, get_workflow
+
     purchase_order = get_object_or_404(PurchaseOrder, pk=pk)
 
     if request.method == 'POST':
-        rejection_reason = request.POST.get('rejection_reason', '').strip()
-        if not rejection_reason:
-            messages.error(request, 'Le motif de rejet est obligatoire!')
+        try:
+            get_workflow(PurchaseOrder).transition(purchase_order, 'reject', request.POST, user=request.user)
+        except TransitionError as e:
+            messages.error(request, str(e))
             return render(request, 'seafood/purchaseorder/purchaseorder_reject.html', {'purchase_order': purchase_order})
-
-        purchase_order.status = 'cancelled'
-        purchase_order.rejection_reason = rejection_reason
-        purchase_order.save()
         messages.success(request, 'Bon de commande rejeté!')
         return redirect('portal_admin:purchaseorder_detail', pk=pk)
 
     return render(request, 'seafood/purchaseorder/purchaseorder_reject.html', {'purchase_order': purchase_order})
 
 
-@staff_member_required
-@permission_required('seafood.change_purchaseorder', raise_exception=True)
+@route_permission('seafood.change_purchaseorder')
 def purchaseorder_pay(request, pk):
     """Marquer un bon de commande comme payé"""
     from decimal import Decimal
@@ -1182,8 +1360,8 @@ def purchaseorder_pay(request, pk):
         # Validation
         if not payment_date:
             messages.error(request, 'La date de paiement est obligatoire!')
-            bank_accounts = BankAccount.objects.filter(status='active')
-            cashboxes = Cashbox.objects.all()
+            bank_accounts = BankAccount.objects.none()
+            cashboxes = Cashbox.objects.none()
             return render(request, 'seafood/purchaseorder/purchaseorder_pay.html', {
                 'purchase_order': purchase_order,
                 'bank_accounts': bank_accounts,
@@ -1192,8 +1370,8 @@ def purchaseorder_pay(request, pk):
 
         if not payment_method:
             messages.error(request, 'La méthode de paiement est obligatoire!')
-            bank_accounts = BankAccount.objects.filter(status='active')
-            cashboxes = Cashbox.objects.all()
+            bank_accounts = BankAccount.objects.none()
+            cashboxes = Cashbox.objects.none()
             return render(request, 'seafood/purchaseorder/purchaseorder_pay.html', {
                 'purchase_order': purchase_order,
                 'bank_accounts': bank_accounts,
@@ -1202,8 +1380,8 @@ def purchaseorder_pay(request, pk):
 
         if payment_method == 'cashbox' and not payment_cashbox_id:
             messages.error(request, 'Veuillez sélectionner une caisse!')
-            bank_accounts = BankAccount.objects.filter(status='active')
-            cashboxes = Cashbox.objects.all()
+            bank_accounts = BankAccount.objects.none()
+            cashboxes = Cashbox.objects.none()
             return render(request, 'seafood/purchaseorder/purchaseorder_pay.html', {
                 'purchase_order': purchase_order,
                 'bank_accounts': bank_accounts,
@@ -1212,8 +1390,8 @@ def purchaseorder_pay(request, pk):
 
         if payment_method == 'bank' and not payment_bank_id:
             messages.error(request, 'Veuillez sélectionner un compte bancaire!')
-            bank_accounts = BankAccount.objects.filter(status='active')
-            cashboxes = Cashbox.objects.all()
+            bank_accounts = BankAccount.objects.none()
+            cashboxes = Cashbox.objects.none()
             return render(request, 'seafood/purchaseorder/purchaseorder_pay.html', {
                 'purchase_order': purchase_order,
                 'bank_accounts': bank_accounts,
@@ -1225,8 +1403,8 @@ def purchaseorder_pay(request, pk):
             cashbox = get_object_or_404(Cashbox, pk=payment_cashbox_id)
             if cashbox.current_balance < purchase_order.total:
                 messages.error(request, f'Solde insuffisant dans la caisse! Solde disponible: {cashbox.current_balance} MRU, Montant requis: {purchase_order.total} MRU')
-                bank_accounts = BankAccount.objects.filter(status='active')
-                cashboxes = Cashbox.objects.all()
+                bank_accounts = BankAccount.objects.none()
+                cashboxes = Cashbox.objects.none()
                 return render(request, 'seafood/purchaseorder/purchaseorder_pay.html', {
                     'purchase_order': purchase_order,
                     'bank_accounts': bank_accounts,
@@ -1236,8 +1414,8 @@ def purchaseorder_pay(request, pk):
             bank_account = get_object_or_404(BankAccount, pk=payment_bank_id)
             if bank_account.current_balance < purchase_order.total:
                 messages.error(request, f'Solde insuffisant dans le compte bancaire! Solde disponible: {bank_account.current_balance} MRU, Montant requis: {purchase_order.total} MRU')
-                bank_accounts = BankAccount.objects.filter(status='active')
-                cashboxes = Cashbox.objects.all()
+                bank_accounts = BankAccount.objects.none()
+                cashboxes = Cashbox.objects.none()
                 return render(request, 'seafood/purchaseorder/purchaseorder_pay.html', {
                     'purchase_order': purchase_order,
                     'bank_accounts': bank_accounts,
@@ -1282,8 +1460,9 @@ def purchaseorder_pay(request, pk):
         messages.success(request, 'Bon de commande marqué comme payé!')
         return redirect('portal_admin:purchaseorder_detail', pk=pk)
 
-    bank_accounts = BankAccount.objects.filter(status='active')
-    cashboxes = Cashbox.objects.all()
+    # Comptes et caisses chargés par l'autocomplete
+    bank_accounts = BankAccount.objects.none()
+    cashboxes = Cashbox.objects.none()
     return render(request, 'seafood/purchaseorder/purchaseorder_pay.html', {
         'purchase_order': purchase_order,
         'bank_accounts': bank_accounts,
@@ -1291,25 +1470,128 @@ def purchaseorder_pay(request, pk):
     })
 
 
-@staff_member_required
-@permission_required('seafood.change_purchaseorder', raise_exception=True)
+@route_permission('seafood.change_purchaseorder')
 def purchaseorder_cancel(request, pk):
     """Annuler un bon de commande"""
+    from core.workflow import TransitionError, get_workflow
+
     purchase_order = get_object_or_404(PurchaseOrder, pk=pk)
 
     if request.method == 'POST':
-        purchase_order.status = 'cancelled'
-        purchase_order.save()
+        try:
+            get_workflow(PurchaseOrder).transition(purchase_order, 'cancelled', user=request.user)
+        except TransitionError as e:
+            messages.error(request, str(e))
+            return redirect('portal_admin:purchaseorder_detail', pk=pk)
         messages.success(request, 'Bon de commande annulé!')
         return redirect('portal_admin:purchaseorder_detail', pk=pk)
 
     return render(request, 'seafood/purchaseorder/purchaseorder_cancel.html', {'purchase_order': purchase_order})
 
 
+# ============ SPEND ANALYSIS (Analyse des dépenses) ============
+
+# Descente d'un niveau depuis une ligne de l'analyse des dépenses: filtre ajouté et regroupement suivant
+SPEND_DRILL_DOWN = {
+    'item': ('item', 'supplier'),
+    'supplier': ('supplier', 'month'),
+    'unit': ('unit', 'item'),
+    'month': (None, 'item'),
+}
+
+
+def _spend_query(params):
+    """Paramètres de spend_cube() lus dans la requête (ValueError si invalides)"""
+    from .spend import DIMENSIONS
+
+    start, end = _month_range(params)
+    group_by = [dimension for dimension in params.get('group', 'item').split(',') if dimension]
+    if not group_by or any(dimension not in DIMENSIONS for dimension in group_by):
+        raise ValueError('Regroupement invalide (item, unit, supplier, month)')
+    try:
+        items = [int(value) for value in params.getlist('item')]
+        suppliers = [int(value) for value in params.getlist('supplier')]
+        limit = min(int(params.get('limit') or 100), 1000)
+    except ValueError:
+        raise ValueError('Article, fournisseur ou limite invalide')
+    return {
+        'group_by': group_by, 'start_month': start, 'end_month': end, 'items': items,
+        'units': params.getlist('unit'), 'suppliers': suppliers, 'limit': limit,
+    }
+
+
+@route_permission('seafood.view_spendcube')
+@replica_read
+def spend_analysis(request):
+    """Dépenses par article, unité, fournisseur et mois, avec descente d'un niveau par ligne"""
+    from .spend import spend_cube
+
+    try:
+        query = _spend_query(request.GET)
+    except ValueError as e:
+        messages.error(request, str(e))
+        from django.http import QueryDict
+        query = _spend_query(QueryDict())
+
+    rows = spend_cube(**query)
+    dimension = query['group_by'][0]
+    filter_name, next_group = SPEND_DRILL_DOWN[dimension]
+    for row in rows:
+        params = request.GET.copy()
+        params['group'] = next_group
+        if filter_name:
+            params.appendlist(filter_name, row[filter_name])
+        else:
+            params['start'] = params['end'] = row['month'].strftime('%Y-%m')
+        row['drill_down'] = params.urlencode()
+
+    return render(request, 'seafood/purchaseorder/spend_analysis.html', {
+        'rows': rows,
+        'start': query['start_month'],
+        'end': query['end_month'],
+        'group_by': query['group_by'],
+        'filters': {
+            'items': CatalogItem.objects.filter(pk__in=query['items']),
+            'suppliers': Supplier.objects.filter(pk__in=query['suppliers']),
+            'units': [label for value, label in PurchaseOrderItem.UNIT_CHOICES if value in query['units']],
+            'unit_values': query['units'],
+        },
+    })
+
+
+@route_permission('seafood.view_spendcube')
+@replica_read
+def spend_api(request):
+    """
+    JSON API: dépenses du cube (group: item, unit, supplier, month, séparés par
+    des virgules; start, end: AAAA-MM; filtres item, unit, supplier répétables; limit)
+    """
+    from decimal import Decimal
+
+    from django.http import JsonResponse
+
+    from .spend import spend_cube
+
+    try:
+        query = _spend_query(request.GET)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    rows = []
+    for row in spend_cube(**query):
+        if 'month' in row:
+            row['month'] = row['month'].strftime('%Y-%m')
+        rows.append({key: str(value) if isinstance(value, Decimal) else value for key, value in row.items()})
+    return JsonResponse({
+        'group': query['group_by'],
+        'start': query['start_month'].strftime('%Y-%m'),
+        'end': query['end_month'].strftime('%Y-%m'),
+        'rows': rows,
+    })
+
 # ============ CASHBOX TRANSACTION VIEWS ============
 
-@staff_member_required
-@permission_required('seafood.add_cashboxtransaction', raise_exception=True)
+@route_permission('seafood.add_cashboxtransaction')
 def cashbox_fund(request, cashbox_pk):
     """Formulaire d'alimentation de caisse"""
     from decimal import Decimal
@@ -1361,8 +1643,8 @@ def cashbox_fund(request, cashbox_pk):
 
 # ============ PROSPECT VIEWS ============
 
-@staff_member_required
-@permission_required('seafood.view_prospect', raise_exception=True)
+@route_permission('seafood.view_prospect')
+@replica_read
 def prospect_list(request):
     """Liste des prospects"""
     prospects = Prospect.objects.all().order_by('-created_at')
@@ -1389,16 +1671,89 @@ def prospect_list(request):
     })
 
 
-@staff_member_required
-@permission_required('seafood.view_prospect', raise_exception=True)
+def get_followup_queue(request):
+    """
+    File de relance des prospects (portée 'mine' par défaut, 'all' pour tous les
+    commerciaux) pour la date du jour, répartie en retard / aujourd'hui / semaine.
+    """
+    from django.utils import timezone
+
+    today = timezone.localdate()
+    scope = request.GET.get('scope', 'mine')
+    prospects = Prospect.objects.all()
+    if scope != 'all':
+        scope = 'mine'
+        prospects = prospects.for_user(request.user)
+
+    limit = 200
+    queue = []
+    for bucket, label in Prospect.FOLLOWUP_BUCKETS:
+        bucket_prospects = prospects.followup_bucket(bucket, today).order_by('next_followup', 'pk').only(
+            'pk', 'first_name', 'last_name', 'company_name', 'email', 'mobile', 'status', 'next_followup', 'last_interaction'
+        )
+        items = list(bucket_prospects[:limit + 1])
+        queue.append({
+            'bucket': bucket,
+            'label': label,
+            'prospects': items[:limit],
+            'truncated': len(items) > limit,
+        })
+    return today, scope, queue
+
+
+@route_permission('seafood.view_prospect')
+@replica_read
+def prospect_followups(request):
+    """Liste de travail des relances de prospects"""
+    today, scope, queue = get_followup_queue(request)
+    return render(request, 'seafood/prospects/prospect_followups.html', {
+        'today': today,
+        'scope': scope,
+        'queue': queue,
+    })
+
+
+@route_permission('seafood.view_prospect')
+@replica_read
+def prospect_followups_api(request):
+    """API JSON des relances: en retard, aujourd'hui et cette semaine"""
+    from django.http import JsonResponse
+
+    today, scope, queue = get_followup_queue(request)
+    return JsonResponse({
+        'date': today.isoformat(),
+        'scope': scope,
+        'buckets': {
+            entry['bucket']: {
+                'count': len(entry['prospects']),
+                'truncated': entry['truncated'],
+                'prospects': [
+                    {
+                        'id': prospect.pk,
+                        'name': prospect.full_name,
+                        'company_name': prospect.company_name,
+                        'email': prospect.email,
+                        'mobile': prospect.mobile,
+                        'status': prospect.status,
+                        'next_followup': prospect.next_followup.isoformat(),
+                        'last_interaction': prospect.last_interaction.isoformat() if prospect.last_interaction else None,
+                    }
+                    for prospect in entry['prospects']
+                ],
+            }
+            for entry in queue
+        },
+    })
+
+
+@route_permission('seafood.view_prospect')
 def prospect_detail(request, pk):
     """Détails d'un prospect"""
     prospect = get_object_or_404(Prospect, pk=pk)
     return render(request, 'seafood/prospects/prospect_detail.html', {'prospect': prospect})
 
 
-@staff_member_required
-@permission_required('seafood.add_prospect', raise_exception=True)
+@route_permission('seafood.add_prospect')
 def prospect_add(request):
     """Formulaire d'ajout de prospect"""
     if request.method == 'POST':
@@ -1442,6 +1797,7 @@ def prospect_add(request):
             )
             prospect.save()
             messages.success(request, 'Prospect ajouté avec succès!')
+            _warn_duplicates(request, prospect)
             return redirect('portal_admin:prospect_detail', pk=prospect.pk)
         except Exception as e:
             messages.error(request, f'Erreur lors de l\'ajout: {str(e)}')
@@ -1452,8 +1808,83 @@ def prospect_add(request):
     })
 
 
-@staff_member_required
-@permission_required('seafood.change_prospect', raise_exception=True)
+def _import_job(request, pk):
+    """Tâche d'import de prospects de l'utilisateur (404 si elle n'existe pas ou appartient à un autre)"""
+    jobs = BackgroundJob.objects.filter(name='seafood.import_prospects')
+    if not request.user.has_perm('seafood.view_backgroundjob'):
+        jobs = jobs.filter(created_by=request.user)
+    return get_object_or_404(jobs, pk=pk)
+
+
+@route_permission('seafood.add_prospect')
+def prospect_import(request):
+    """
+    Import en masse de prospects depuis un fichier CSV ou XLSX (voir seafood.prospect_import):
+    le fichier est enregistré et importé par la tâche seafood.import_prospects, suivie par la page
+    """
+    from django.urls import reverse
+    from .jobs import enqueue
+    from .prospect_import import IMPORT_FIELDS, REQUIRED_COLUMNS, ProspectImportError, save_upload
+
+    if request.method == 'POST':
+        uploaded = request.FILES.get('file')
+        if not uploaded:
+            messages.error(request, 'Veuillez choisir un fichier CSV ou XLSX!')
+            return redirect('portal_admin:prospect_import')
+        try:
+            name = save_upload(uploaded)
+        except ProspectImportError as e:
+            messages.error(request, f'Import impossible: {e}')
+            return redirect('portal_admin:prospect_import')
+        job = enqueue('seafood.import_prospects', {'name': name, 'filename': uploaded.name}, user=request.user)
+        return redirect(reverse('portal_admin:prospect_import') + f'?job={job.pk}')
+
+    job = result = error = None
+    job_id = request.GET.get('job', '')
+    if job_id.isdigit():
+        job = _import_job(request, int(job_id))
+        if job.status == 'succeeded':
+            result = job.result
+        elif job.status == 'failed':
+            # Dernière ligne de la trace: message de l'erreur
+            error = job.last_error.strip().splitlines()[-1] if job.last_error else ''
+            error = error.split('JobError: ', 1)[1] if 'JobError: ' in error else "erreur lors de l'import."
+
+    fields = [Prospect._meta.get_field(name) for name in IMPORT_FIELDS]
+    return render(request, 'seafood/prospects/prospect_import.html', {
+        'job': job,
+        'result': result,
+        'error': error,
+        'columns': [(field.name, field.verbose_name, field.name in REQUIRED_COLUMNS) for field in fields],
+    })
+
+
+@route_permission('seafood.add_prospect')
+def prospect_import_status(request, pk):
+    """API JSON du statut d'une tâche d'import (suivi depuis la page d'import)"""
+    from django.http import JsonResponse
+
+    job = _import_job(request, pk)
+    return JsonResponse({'id': job.pk, 'status': job.status, 'status_display': job.get_status_display()})
+
+
+@route_permission('seafood.add_prospect')
+def prospect_import_report(request, name):
+    """Téléchargement du rapport des lignes écartées d'un import"""
+    import os
+    from django.http import FileResponse, Http404
+    from .prospect_import import ProspectImportError, report_path
+
+    try:
+        path = report_path(name)
+    except ProspectImportError:
+        raise Http404
+    if not os.path.isfile(path):
+        raise Http404
+    return FileResponse(open(path, 'rb'), content_type='text/csv', as_attachment=True, filename=name)
+
+
+@route_permission('seafood.change_prospect')
 def prospect_edit(request, pk):
     """Formulaire de modification de prospect"""
     prospect = get_object_or_404(Prospect, pk=pk)
@@ -1508,8 +1939,7 @@ def prospect_edit(request, pk):
     })
 
 
-@staff_member_required
-@permission_required('seafood.delete_prospect', raise_exception=True)
+@route_permission('seafood.delete_prospect')
 def prospect_delete(request, pk):
     """Suppression d'un prospect"""
     prospect = get_object_or_404(Prospect, pk=pk)
@@ -1525,8 +1955,7 @@ def prospect_delete(request, pk):
     return render(request, 'seafood/prospects/prospect_confirm_delete.html', {'prospect': prospect})
 
 
-@staff_member_required
-@permission_required('seafood.change_prospect', raise_exception=True)
+@route_permission('seafood.change_prospect')
 def prospect_change_status(request, pk, new_status):
     """Changer le statut d'un prospect"""
     prospect = get_object_or_404(Prospect, pk=pk)
@@ -1553,13 +1982,40 @@ def prospect_change_status(request, pk, new_status):
     return redirect('portal_admin:prospect_detail', pk=pk)
 
 
+@route_permission('seafood.change_prospect')
+def prospect_followups_send(request):
+    """
+    Met en file l'envoi des résumés de relance par email (exécuté par les workers).
+    Un seul envoi par jour: refusé si un envoi est déjà en file, en cours ou terminé aujourd'hui.
+    """
+    from django.db.models import Q
+    from django.utils import timezone
+    from .jobs import enqueue
+    from .models import BackgroundJob
+
+    if request.method != 'POST':
+        return redirect('portal_admin:prospect_followups')
+
+    sent = BackgroundJob.objects.filter(name='seafood.followup_digests', payload__send=True).filter(
+        Q(status__in=('queued', 'running')) | Q(status='succeeded', finished_at__date=timezone.localdate())
+    ).order_by('-pk').first()
+    if sent:
+        messages.warning(
+            request,
+            f"Les résumés de relance ont déjà été envoyés ou sont en cours d'envoi aujourd'hui (tâche #{sent.pk}).",
+        )
+        return redirect('portal_admin:prospect_followups')
+
+    job = enqueue('seafood.followup_digests', {'send': True}, user=request.user)
+    messages.success(request, f'Envoi des résumés de relance programmé (tâche #{job.pk}).')
+    return redirect('portal_admin:prospect_followups')
+
+
 # ============ ARRIVAL NOTE VIEWS (Notes d'Arrivée) ============
 
-@staff_member_required
-@permission_required('operations.view_reception', raise_exception=True)
-def arrivalnote_list(request):
-    """Liste des notes d'arrivée"""
-    receptions = Reception.objects.all().select_related('client', 'service_type__category', 'created_by').order_by('-created_at')
+def _filtered_receptions(request):
+    """Notes d'arrivée filtrées selon les paramètres de la liste"""
+    receptions = Reception.objects.all()
 
     # Filtrage par statut
     status_filter = request.GET.get('status')
@@ -1580,27 +2036,60 @@ def arrivalnote_list(request):
             Q(client__name__icontains=search) |
             Q(client__accounting_code__icontains=search)
         )
+    return receptions
+
+
+def _arrivalnote_list_version(request):
+    return '/'.join((
+        queryset_version(
+            _filtered_receptions(request), 'updated_at', 'client__updated_at', 'service_type__updated_at',
+            'service_type__category__updated_at', 'created_by__updated_at'
+        ),
+        queryset_version(Service.objects.filter(status='active'), 'updated_at'),
+    ))
 
+
+def _arrivalnote_detail_version(request, pk):
+    return object_version(
+        Reception.objects.filter(pk=pk), 'updated_at', 'client__updated_at', 'service_type__updated_at',
+        'service_type__category__updated_at', 'created_by__updated_at'
+    )
+
+
+@route_permission('operations.view_reception')
+@replica_read
+@conditional_page(_arrivalnote_list_version)
+def arrivalnote_list(request):
+    """Liste des notes d'arrivée"""
+    receptions = _filtered_receptions(request).select_related('client', 'service_type__category', 'created_by').order_by('-created_at')
+
+    from core.workflow import get_workflow
     return render(request, 'operations/reception/reception_list.html', {
         'receptions': receptions,
         'statuses': Reception.STATUS_CHOICES,
-        'services': Service.objects.filter(status='active').order_by('code')
+        'services': Service.objects.filter(status='active').order_by('code'),
+        'bulk_transitions': get_workflow(Reception).bulk_choices()
     })
 
 
-@staff_member_required
-@permission_required('operations.view_reception', raise_exception=True)
+@route_permission('operations.view_reception')
+@replica_read
+@conditional_page(_arrivalnote_detail_version)
 def arrivalnote_detail(request, pk):
     """Détails d'une note d'arrivée"""
-    reception = get_object_or_404(Reception.objects.select_related('client', 'service_type__category', 'created_by'), pk=pk)
+    reception = Reception.objects.select_related('client', 'service_type__category', 'created_by').filter(pk=pk).first()
+    if reception is None:
+        return archived_record_detail(request, 'reception', pk)
+
+    from core.workflow import get_workflow
     return render(request, 'operations/reception/reception_detail.html', {
         'reception': reception,
-        'status_choices': Reception.STATUS_CHOICES
+        'status_choices': Reception.STATUS_CHOICES,
+        'allowed_status_choices': get_workflow(Reception).allowed_choices(reception.status)
     })
 
 
-@staff_member_required
-@permission_required('operations.add_reception', raise_exception=True)
+@route_permission('operations.add_reception')
 def arrivalnote_add(request):
     """Formulaire d'ajout de note d'arrivée"""
     if request.method == 'POST':
@@ -1628,8 +2117,9 @@ def arrivalnote_add(request):
         except Exception as e:
             messages.error(request, f'Erreur lors de l\'ajout: {str(e)}')
 
-    clients = Client.objects.filter(status='active').order_by('name')
-    services = Service.objects.filter(status='active').order_by('code')
+    # Clients et services chargés par l'autocomplete
+    clients = Client.objects.none()
+    services = Service.objects.none()
 
     return render(request, 'operations/reception/reception_form.html', {
         'clients': clients,
@@ -1637,8 +2127,7 @@ def arrivalnote_add(request):
     })
 
 
-@staff_member_required
-@permission_required('operations.change_reception', raise_exception=True)
+@route_permission('operations.change_reception')
 def arrivalnote_edit(request, pk):
     """Formulaire de modification de note d'arrivée"""
     reception = get_object_or_404(Reception, pk=pk)
@@ -1668,8 +2157,9 @@ def arrivalnote_edit(request, pk):
         except Exception as e:
             messages.error(request, f'Erreur lors de la modification: {str(e)}')
 
-    clients = Client.objects.filter(status='active').order_by('name')
-    services = Service.objects.filter(status='active').order_by('code')
+    # Seuls le client et le service actuels sont rendus, les autres sont chargés par l'autocomplete
+    clients = Client.objects.filter(pk=reception.client_id)
+    services = Service.objects.filter(pk=reception.service_type_id)
 
     return render(request, 'operations/reception/reception_form.html', {
         'reception': reception,
@@ -1678,8 +2168,7 @@ def arrivalnote_edit(request, pk):
     })
 
 
-@staff_member_required
-@permission_required('operations.delete_reception', raise_exception=True)
+@route_permission('operations.delete_reception')
 def arrivalnote_delete(request, pk):
     """Suppression d'une note d'arrivée"""
     reception = get_object_or_404(Reception, pk=pk)
@@ -1701,45 +2190,22 @@ def arrivalnote_delete(request, pk):
     return render(request, 'operations/reception/reception_confirm_delete.html', {'reception': reception})
 
 
-@staff_member_required
-@permission_required('operations.change_reception', raise_exception=True)
+@route_permission('operations.change_reception')
 def arrivalnote_change_status(request, pk):
     """Changer le statut d'une note d'arrivée"""
-    reception = get_object_or_404(Reception, pk=pk)
+    from core.workflow import TransitionError, get_workflow
 
-    if request.method == 'POST':
-        new_status = request.POST.get('status')
+    obj = get_object_or_404(Reception, pk=pk)
 
-        # Vérifier que le nouveau statut est valide
-        valid_statuses = [choice[0] for choice in Reception.STATUS_CHOICES]
-        if new_status not in valid_statuses:
-            messages.error(request, 'Statut invalide!')
-            return redirect('portal_admin:arrivalnote_detail', pk=pk)
-
-        # Vérifier les règles de changement de statut
-        # Empêcher le retour au statut 'draft' une fois qu'on en est sorti
-        if new_status == 'draft' and reception.status != 'draft':
-            messages.error(request, 'Changement de statut non autorisé. Un lot ne peut pas retourner au statut Brouillon une fois qu\'il a été accepté.')
-            return redirect('portal_admin:arrivalnote_detail', pk=pk)
-
-        if reception.status == 'accepted' and new_status != reception.status:
-            # Une fois accepté, on peut seulement passer à 'completed', 'suspended' ou 'cancelled'
-            if new_status not in ['completed', 'suspended', 'cancelled']:
-                messages.error(request, 'Changement de statut non autorisé. Un lot accepté ne peut passer qu\'à terminé, suspendu ou annulé.')
-                return redirect('portal_admin:arrivalnote_detail', pk=pk)
-
-        if reception.status == 'completed':
-            messages.error(request, 'Un lot terminé ne peut plus changer de statut.')
+    if request.method == 'POST':
+        old_status = obj.get_status_display()
+        try:
+            get_workflow(Reception).transition(obj, request.POST.get('status'), request.POST, user=request.user)
+        except TransitionError as e:
+            messages.error(request, str(e))
             return redirect('portal_admin:arrivalnote_detail', pk=pk)
 
-        # Appliquer le changement
-        old_status = reception.get_status_display()
-        reception.status = new_status
-        reception.save()
-
-        new_status_display = reception.get_status_display()
-        messages.success(request, f'Statut changé de "{old_status}" à "{new_status_display}"')
-        return redirect('portal_admin:arrivalnote_detail', pk=pk)
+        messages.success(request, f'Statut changé de "{old_status}" à "{obj.get_status_display()}"')
 
     return redirect('portal_admin:arrivalnote_detail', pk=pk)
 
@@ -1748,8 +2214,8 @@ def arrivalnote_change_status(request, pk):
 # SERVICE VIEWS
 # ======================
 
-@staff_member_required
-@permission_required('operations.view_service', raise_exception=True)
+@route_permission('operations.view_service')
+@replica_read
 def service_list(request):
     """Liste des services"""
     services = Service.objects.all().select_related('created_by', 'category').order_by('code')
@@ -1781,8 +2247,7 @@ def service_list(request):
     })
 
 
-@staff_member_required
-@permission_required('operations.view_service', raise_exception=True)
+@route_permission('operations.view_service')
 def service_detail(request, pk):
     """Détails d'un service"""
     service = get_object_or_404(Service, pk=pk)
@@ -1792,8 +2257,7 @@ def service_detail(request, pk):
     })
 
 
-@staff_member_required
-@permission_required('operations.add_service', raise_exception=True)
+@route_permission('operations.add_service')
 def service_add(request):
     """Formulaire d'ajout de service"""
     if request.method == 'POST':
@@ -1839,8 +2303,7 @@ def service_add(request):
     })
 
 
-@staff_member_required
-@permission_required('operations.change_service', raise_exception=True)
+@route_permission('operations.change_service')
 def service_edit(request, pk):
     """Formulaire de modification de service"""
     service = get_object_or_404(Service, pk=pk)
@@ -1872,8 +2335,7 @@ def service_edit(request, pk):
     })
 
 
-@staff_member_required
-@permission_required('operations.delete_service', raise_exception=True)
+@route_permission('operations.delete_service')
 def service_delete(request, pk):
     """Suppression d'un service"""
     service = get_object_or_404(Service, pk=pk)
@@ -1891,8 +2353,7 @@ def service_delete(request, pk):
     return render(request, 'operations/services/service_confirm_delete.html', {'service': service})
 
 
-@staff_member_required
-@permission_required('operations.change_service', raise_exception=True)
+@route_permission('operations.change_service')
 def service_change_status(request, pk):
     """Changer le statut d'un service"""
     service = get_object_or_404(Service, pk=pk)
@@ -1922,8 +2383,8 @@ def service_change_status(request, pk):
 # SERVICE CATEGORY VIEWS
 # ======================
 
-@staff_member_required
-@permission_required('operations.view_servicecategory', raise_exception=True)
+@route_permission('operations.view_servicecategory')
+@replica_read
 def servicecategory_list(request):
     """Liste des catégories de services"""
     categories = ServiceCategory.objects.all().select_related('created_by').order_by('name')
@@ -1948,8 +2409,7 @@ def servicecategory_list(request):
     })
 
 
-@staff_member_required
-@permission_required('operations.view_servicecategory', raise_exception=True)
+@route_permission('operations.view_servicecategory')
 def servicecategory_detail(request, pk):
     """Détails d'une catégorie de service"""
     category = get_object_or_404(ServiceCategory, pk=pk)
@@ -1959,8 +2419,7 @@ def servicecategory_detail(request, pk):
     })
 
 
-@staff_member_required
-@permission_required('operations.add_servicecategory', raise_exception=True)
+@route_permission('operations.add_servicecategory')
 def servicecategory_add(request):
     """Formulaire d'ajout de catégorie de service"""
     if request.method == 'POST':
@@ -2004,8 +2463,7 @@ def servicecategory_add(request):
     })
 
 
-@staff_member_required
-@permission_required('operations.change_servicecategory', raise_exception=True)
+@route_permission('operations.change_servicecategory')
 def servicecategory_edit(request, pk):
     """Formulaire de modification de catégorie de service"""
     category = get_object_or_404(ServiceCategory, pk=pk)
@@ -2043,8 +2501,7 @@ def servicecategory_edit(request, pk):
     })
 
 
-@staff_member_required
-@permission_required('operations.delete_servicecategory', raise_exception=True)
+@route_permission('operations.delete_servicecategory')
 def servicecategory_delete(request, pk):
     """Suppression d'une catégorie de service"""
     category = get_object_or_404(ServiceCategory, pk=pk)
@@ -2061,8 +2518,7 @@ def servicecategory_delete(request, pk):
     return render(request, 'operations/service_categories/servicecategory_confirm_delete.html', {'category': category})
 
 
-@staff_member_required
-@permission_required('operations.change_servicecategory', raise_exception=True)
+@route_permission('operations.change_servicecategory')
 def servicecategory_change_status(request, pk):
     """Changer le statut d'une catégorie de service"""
     category = get_object_or_404(ServiceCategory, pk=pk)
@@ -2090,8 +2546,7 @@ def servicecategory_change_status(request, pk):
 
 # ============ SOUS-CATÉGORIES DE SERVICES ============
 
-@staff_member_required
-@permission_required('operations.add_servicesubcategory', raise_exception=True)
+@route_permission('operations.add_servicesubcategory')
 def servicesubcategory_add(request, category_pk):
     """Formulaire d'ajout de sous-catégorie de service"""
     category = get_object_or_404(ServiceCategory, pk=category_pk)
@@ -2123,8 +2578,7 @@ def servicesubcategory_add(request, category_pk):
     })
 
 
-@staff_member_required
-@permission_required('operations.view_servicesubcategory', raise_exception=True)
+@route_permission('operations.view_servicesubcategory')
 def servicesubcategory_detail(request, pk):
     """Détails d'une sous-catégorie de service"""
     subcategory = get_object_or_404(ServiceSubCategory, pk=pk)
@@ -2134,8 +2588,7 @@ def servicesubcategory_detail(request, pk):
     })
 
 
-@staff_member_required
-@permission_required('operations.change_servicesubcategory', raise_exception=True)
+@route_permission('operations.change_servicesubcategory')
 def servicesubcategory_edit(request, pk):
     """Formulaire de modification de sous-catégorie de service"""
     subcategory = get_object_or_404(ServiceSubCategory, pk=pk)
@@ -2164,8 +2617,7 @@ def servicesubcategory_edit(request, pk):
     })
 
 
-@staff_member_required
-@permission_required('operations.delete_servicesubcategory', raise_exception=True)
+@route_permission('operations.delete_servicesubcategory')
 def servicesubcategory_delete(request, pk):
     """Suppression d'une sous-catégorie de service"""
     subcategory = get_object_or_404(ServiceSubCategory, pk=pk)
@@ -2185,8 +2637,7 @@ def servicesubcategory_delete(request, pk):
     })
 
 
-@staff_member_required
-@permission_required('operations.change_servicesubcategory', raise_exception=True)
+@route_permission('operations.change_servicesubcategory')
 def servicesubcategory_change_status(request, pk):
     """Changer le statut d'une sous-catégorie de service"""
     subcategory = get_object_or_404(ServiceSubCategory, pk=pk)
@@ -2214,8 +2665,8 @@ def servicesubcategory_change_status(request, pk):
 
 # ============ RAPPORTS DE RÉCEPTION ============
 
-@staff_member_required
-@permission_required('operations.view_report', raise_exception=True)
+@route_permission('operations.view_report')
+@replica_read
 def reception_report_list(request):
     """Liste des rapports de réception"""
     reports = Report.objects.all().select_related(
@@ -2230,33 +2681,33 @@ def reception_report_list(request):
     })
 
 
-@staff_member_required
-@permission_required('operations.view_report', raise_exception=True)
+@route_permission('operations.view_report')
 def reception_report_detail(request, pk):
     """Détails d'un rapport de réception"""
-    report = get_object_or_404(
-        Report.objects.select_related(
-            'arrival_note',
-            'arrival_note__client',
-            'arrival_note__service_type',
-            'created_by'
-        ).prefetch_related('items'),
-        pk=pk
-    )
+    report = Report.objects.select_related(
+        'arrival_note',
+        'arrival_note__client',
+        'arrival_note__service_type',
+        'created_by'
+    ).prefetch_related('items').filter(pk=pk).first()
+    if report is None:
+        return archived_record_detail(request, 'report', pk)
 
+    from core.workflow import get_workflow
     return render(request, 'operations/reception_reports/report_detail.html', {
         'report': report,
-        'status_choices': Report.STATUS_CHOICES
+        'status_choices': Report.STATUS_CHOICES,
+        'allowed_status_choices': get_workflow(Report).allowed_choices(report.status)
     })
 
 
-@staff_member_required
-@permission_required('operations.add_report', raise_exception=True)
+@route_permission('operations.add_report')
 def reception_report_add(request):
     """Formulaire d'ajout de rapport de réception"""
     if request.method == 'POST':
         try:
             import json
+            from operations.species import apply_species_mapping
 
             # Créer le rapport de réception
             reception_id = request.POST.get('arrival_note')
@@ -2284,20 +2735,18 @@ def reception_report_add(request):
                         comment=item.get('comment', '')
                     )
 
+            # Espèces rattachées à la dimension espèces (un UPDATE pour toutes les lignes)
+            apply_species_mapping(report.items.all())
+
             messages.success(request, f'Rapport de réception pour le LOT {reception.lot_id} créé avec succès!')
             return redirect('portal_admin:reception_report_detail', pk=report.pk)
 
         except Exception as e:
             messages.error(request, f'Erreur lors de la création: {str(e)}')
 
-    # Récupérer les lots éligibles (service_type.code > '1003')
-    # Exclure les lots qui ont déjà un rapport de réception
-    # Seuls les lots acceptés peuvent avoir un rapport
-    eligible_receptions = Reception.objects.filter(
-        service_type__code__gt='1003',
-        reports__isnull=True,
-        status='accepted'
-    ).select_related('client', 'service_type').order_by('-reception_date')
+    # Lots en attente de rapport (acceptés, service_type.code > '1003', sans rapport):
+    # chargés par l'autocomplete receptions-awaiting-report
+    eligible_receptions = Reception.objects.none()
 
     return render(request, 'operations/reception_reports/report_form.html', {
         'eligible_receptions': eligible_receptions,
@@ -2306,10 +2755,11 @@ def reception_report_add(request):
     })
 
 
-@staff_member_required
-@permission_required('operations.change_report', raise_exception=True)
+@route_permission('operations.change_report')
 def reception_report_edit(request, pk):
     """Formulaire de modification de rapport de réception"""
+    from core.versioning import ConcurrentEditError, apply_posted_version
+
     report = get_object_or_404(
         Report.objects.select_related('arrival_note', 'arrival_note__client').prefetch_related('items'),
         pk=pk
@@ -2323,11 +2773,13 @@ def reception_report_edit(request, pk):
     if request.method == 'POST':
         try:
             import json
+            from operations.species import apply_species_mapping
 
             # Mettre à jour le rapport
+            apply_posted_version(report, request.POST)
             report.general_observation = request.POST.get('general_observation', '')
             report.status = request.POST.get('status', 'draft')
-            report.save()
+            report.save(update_fields=['general_observation', 'status'])
 
             # Supprimer les anciens items
             report.items.all().delete()
@@ -2346,16 +2798,22 @@ def reception_report_edit(request, pk):
                         comment=item.get('comment', '')
                     )
 
+            # Espèces rattachées à la dimension espèces (un UPDATE pour toutes les lignes)
+            apply_species_mapping(report.items.all())
+
             messages.success(request, 'Rapport de réception modifié avec succès!')
             return redirect('portal_admin:reception_report_detail', pk=report.pk)
 
+        except ConcurrentEditError as e:
+            messages.error(request, str(e))
+            return redirect('portal_admin:reception_report_edit', pk=pk)
         except Exception as e:
             messages.error(request, f'Erreur lors de la modification: {str(e)}')
 
-    # Récupérer les lots éligibles
+    # Le lot ne peut pas être changé: seul celui du rapport est rendu
     eligible_receptions = Reception.objects.filter(
-        service_type__code__gt='1003'
-    ).select_related('client', 'service_type').order_by('-reception_date')
+        pk=report.arrival_note_id
+    ).select_related('client', 'service_type')
 
     return render(request, 'operations/reception_reports/report_form.html', {
         'report': report,
@@ -2365,8 +2823,7 @@ def reception_report_edit(request, pk):
     })
 
 
-@staff_member_required
-@permission_required('operations.delete_report', raise_exception=True)
+@route_permission('operations.delete_report')
 def reception_report_delete(request, pk):
     """Suppression d'un rapport de réception"""
     report = get_object_or_404(
@@ -2393,35 +2850,22 @@ def reception_report_delete(request, pk):
     })
 
 
-@staff_member_required
-@permission_required('operations.change_report', raise_exception=True)
+@route_permission('operations.change_report')
 def reception_report_change_status(request, pk):
     """Changer le statut d'un rapport de réception"""
-    report = get_object_or_404(Report, pk=pk)
+    from core.workflow import TransitionError, get_workflow
 
-    if request.method == 'POST':
-        new_status = request.POST.get('status')
+    obj = get_object_or_404(Report, pk=pk)
 
-        # Vérifier que le nouveau statut est valide
-        valid_statuses = [choice[0] for choice in Report.STATUS_CHOICES]
-        if new_status not in valid_statuses:
-            messages.error(request, 'Statut invalide!')
-            return redirect('portal_admin:reception_report_detail', pk=pk)
-
-        # Vérifier les règles de changement de statut
-        if report.status == 'validated':
-            # Une fois validé, on ne peut plus changer le statut
-            messages.error(request, 'Un rapport validé ne peut plus être modifié.')
+    if request.method == 'POST':
+        old_status = obj.get_status_display()
+        try:
+            get_workflow(Report).transition(obj, request.POST.get('status'), request.POST, user=request.user)
+        except TransitionError as e:
+            messages.error(request, str(e))
             return redirect('portal_admin:reception_report_detail', pk=pk)
 
-        # Appliquer le changement
-        old_status = report.get_status_display()
-        report.status = new_status
-        report.save()
-
-        new_status_display = report.get_status_display()
-        messages.success(request, f'Statut du rapport changé de "{old_status}" à "{new_status_display}"')
-        return redirect('portal_admin:reception_report_detail', pk=pk)
+        messages.success(request, f'Statut du rapport changé de "{old_status}" à "{obj.get_status_display()}"')
 
     return redirect('portal_admin:reception_report_detail', pk=pk)
 
@@ -2430,8 +2874,26 @@ def reception_report_change_status(request, pk):
 # CLASSIFICATION VIEWS
 # ============================================================
 
-@staff_member_required
-@permission_required('operations.view_classification', raise_exception=True)
+# Dates de modification des lignes affichées par la liste et le détail des classifications
+CLASSIFICATION_VERSION_PATHS = (
+    'updated_at', 'reception__updated_at', 'reception__client__updated_at',
+    'reception__service_type__updated_at', 'reception__service_type__category__updated_at',
+    'created_by__updated_at', 'items__pk', 'items__updated_at', 'items__species__updated_at',
+    'items__species__category__updated_at',
+)
+
+
+def _classification_list_version(request):
+    return queryset_version(Classification.objects.all(), *CLASSIFICATION_VERSION_PATHS)
+
+
+def _classification_detail_version(request, pk):
+    return object_version(Classification.objects.filter(pk=pk), *CLASSIFICATION_VERSION_PATHS)
+
+
+@route_permission('operations.view_classification')
+@replica_read
+@conditional_page(_classification_list_version)
 def classification_list(request):
     """Liste des classifications"""
     classifications = Classification.objects.all().select_related(
@@ -2446,23 +2908,23 @@ def classification_list(request):
     })
 
 
-@staff_member_required
-@permission_required('operations.view_classification', raise_exception=True)
+@route_permission('operations.view_classification')
+@replica_read
+@conditional_page(_classification_detail_version)
 def classification_detail(request, pk):
     """Détails d'une classification"""
-    classification = get_object_or_404(
-        Classification.objects.select_related(
-            'reception',
-            'reception__client',
-            'reception__service_type',
-            'created_by'
-        ).prefetch_related('items__species'),
-        pk=pk
-    )
+    classification = Classification.objects.select_related(
+        'reception',
+        'reception__client',
+        'reception__service_type',
+        'created_by'
+    ).prefetch_related('items__species__category').filter(pk=pk).first()
+    if classification is None:
+        return archived_record_detail(request, 'classification', pk)
 
     # Obtenir les statuts suivants autorisés
-    allowed_statuses = classification.get_allowed_next_statuses()
-    allowed_status_choices = [(code, label) for code, label in Classification.STATUS_CHOICES if code in allowed_statuses]
+    from core.workflow import get_workflow
+    allowed_status_choices = get_workflow(Classification).allowed_choices(classification.status)
 
     return render(request, 'operations/classifications/classification_detail.html', {
         'classification': classification,
@@ -2471,8 +2933,7 @@ def classification_detail(request, pk):
     })
 
 
-@staff_member_required
-@permission_required('operations.add_classification', raise_exception=True)
+@route_permission('operations.add_classification')
 def classification_add(request):
     """Formulaire d'ajout de classification"""
     if request.method == 'POST':
@@ -2535,12 +2996,9 @@ def classification_add(request):
         except Exception as e:
             messages.error(request, f'Erreur lors de la création: {str(e)}')
 
-    # Récupérer les réceptions éligibles (qui ont un rapport validé et pas encore de classification)
-    eligible_receptions = Reception.objects.filter(
-        reports__status='validated',
-        status='accepted',
-        classifications__isnull=True  # Exclure les lots déjà classifiés
-    ).select_related('client', 'service_type', 'service_type__category').order_by('-reception_date').distinct()
+    # Réceptions en attente de classification (rapport validé, pas encore de classification):
+    # chargées par l'autocomplete receptions-awaiting-classification
+    eligible_receptions = Reception.objects.none()
 
     # Récupérer les sous-catégories actives
     species = ServiceSubCategory.objects.filter(
@@ -2554,10 +3012,11 @@ def classification_add(request):
     })
 
 
-@staff_member_required
-@permission_required('operations.change_classification', raise_exception=True)
+@route_permission('operations.change_classification')
 def classification_edit(request, pk):
     """Formulaire de modification de classification"""
+    from core.versioning import ConcurrentEditError, apply_posted_version
+
     classification = get_object_or_404(
         Classification.objects.select_related('reception', 'reception__client').prefetch_related('items__species'),
         pk=pk
@@ -2574,6 +3033,7 @@ def classification_edit(request, pk):
             from datetime import datetime
 
             # Mettre à jour la classification
+            apply_posted_version(classification, request.POST)
             classification.pointer_full_name = request.POST.get('pointer_full_name')
             classification.reference_chambre = request.POST.get('reference_chambre')
             classification.status = request.POST.get('status', 'draft')
@@ -2582,7 +3042,7 @@ def classification_edit(request, pk):
             start_datetime_str = request.POST.get('start_datetime')
             classification.start_datetime = datetime.strptime(start_datetime_str, '%Y-%m-%dT%H:%M')
 
-            classification.save()
+            classification.save(update_fields=['pointer_full_name', 'reference_chambre', 'status', 'start_datetime'])
 
             # Supprimer les anciens items
             classification.items.all().delete()
@@ -2614,13 +3074,16 @@ def classification_edit(request, pk):
             messages.success(request, 'Classification modifiée avec succès!')
             return redirect('portal_admin:classification_detail', pk=classification.pk)
 
+        except ConcurrentEditError as e:
+            messages.error(request, str(e))
+            return redirect('portal_admin:classification_edit', pk=pk)
         except Exception as e:
             messages.error(request, f'Erreur lors de la modification: {str(e)}')
 
-    # Récupérer les réceptions éligibles (qui ont un rapport validé)
+    # Le lot ne peut pas être changé: seul celui de la classification est rendu
     eligible_receptions = Reception.objects.filter(
-        reports__status='validated'
-    ).select_related('client', 'service_type', 'service_type__category').order_by('-reception_date').distinct()
+        pk=classification.reception_id
+    ).select_related('client', 'service_type', 'service_type__category')
 
     # Récupérer les sous-catégories actives
     species = ServiceSubCategory.objects.filter(
@@ -2635,8 +3098,7 @@ def classification_edit(request, pk):
     })
 
 
-@staff_member_required
-@permission_required('operations.delete_classification', raise_exception=True)
+@route_permission('operations.delete_classification')
 def classification_delete(request, pk):
     """Suppression d'une classification"""
     classification = get_object_or_404(Classification, pk=pk)
@@ -2661,103 +3123,22 @@ def classification_delete(request, pk):
     })
 
 
-@staff_member_required
-@permission_required('operations.change_classification', raise_exception=True)
+@route_permission('operations.change_classification')
 def classification_change_status(request, pk):
-    """Changer le statut d'une classification"""
-    if request.method == 'POST':
-        from datetime import datetime
-
-        classification = get_object_or_404(Classification, pk=pk)
-        new_status = request.POST.get('status')
+    """Changer le statut d'une classification (champs requis selon le statut: voir operations.workflows)"""
+    from core.workflow import TransitionError, get_workflow
 
-        # Valider le nouveau statut
-        valid_statuses = [choice[0] for choice in Classification.STATUS_CHOICES]
-        if new_status not in valid_statuses:
-            messages.error(request, 'Statut invalide')
-            return redirect('portal_admin:classification_detail', pk=pk)
+    obj = get_object_or_404(Classification, pk=pk)
 
-        # Vérifier que la transition est autorisée (statuts séquentiels)
-        if not classification.can_transition_to(new_status):
-            messages.error(request, f'Transition non autorisée. Vous devez suivre l\'ordre séquentiel des statuts.')
+    if request.method == 'POST':
+        old_status = obj.get_status_display()
+        try:
+            get_workflow(Classification).transition(obj, request.POST.get('status'), request.POST, user=request.user)
+        except TransitionError as e:
+            messages.error(request, str(e))
             return redirect('portal_admin:classification_detail', pk=pk)
 
-        old_status = classification.get_status_display()
-
-        # Si on passe à "validé", on doit avoir end_datetime
-        if new_status == 'validated':
-            end_datetime_str = request.POST.get('end_datetime')
-            if not end_datetime_str:
-                messages.error(request, 'La date et heure de fin est requise pour valider la classification')
-                return redirect('portal_admin:classification_detail', pk=pk)
-
-            try:
-                end_datetime = datetime.strptime(end_datetime_str, '%Y-%m-%dT%H:%M')
-
-                # Vérifier que end_datetime n'est pas dans le futur
-                if end_datetime > datetime.now():
-                    messages.error(request, 'La date et heure de fin ne peut pas être dans le futur')
-                    return redirect('portal_admin:classification_detail', pk=pk)
-
-                classification.end_datetime = end_datetime
-            except ValueError:
-                messages.error(request, 'Format de date invalide')
-                return redirect('portal_admin:classification_detail', pk=pk)
-
-        # Si on passe à "in_tunnel", on doit avoir reference_chambre et tunnel_in
-        if new_status == 'in_tunnel':
-            reference_chambre = request.POST.get('reference_chambre')
-            tunnel_in_str = request.POST.get('tunnel_in')
-
-            if not reference_chambre:
-                messages.error(request, 'La référence de la chambre est requise pour mettre en tunnel')
-                return redirect('portal_admin:classification_detail', pk=pk)
-
-            if not tunnel_in_str:
-                messages.error(request, 'La date et heure d\'entrée est requise pour mettre en tunnel')
-                return redirect('portal_admin:classification_detail', pk=pk)
-
-            try:
-                tunnel_in = datetime.strptime(tunnel_in_str, '%Y-%m-%dT%H:%M')
-
-                # Vérifier que tunnel_in n'est pas dans le futur
-                if tunnel_in > datetime.now():
-                    messages.error(request, 'La date et heure d\'entrée ne peut pas être dans le futur')
-                    return redirect('portal_admin:classification_detail', pk=pk)
-
-                classification.reference_chambre = reference_chambre
-                classification.tunnel_in = tunnel_in
-            except ValueError:
-                messages.error(request, 'Format de date invalide')
-                return redirect('portal_admin:classification_detail', pk=pk)
-
-        # Si on passe à "terminé", on doit avoir tunnel_out
-        if new_status == 'completed':
-            tunnel_out_str = request.POST.get('tunnel_out')
-
-            if not tunnel_out_str:
-                messages.error(request, 'La date et heure de sortie est requise pour terminer la classification')
-                return redirect('portal_admin:classification_detail', pk=pk)
-
-            try:
-                tunnel_out = datetime.strptime(tunnel_out_str, '%Y-%m-%dT%H:%M')
-
-                # Vérifier que tunnel_out n'est pas dans le futur
-                if tunnel_out > datetime.now():
-                    messages.error(request, 'La date et heure de sortie ne peut pas être dans le futur')
-                    return redirect('portal_admin:classification_detail', pk=pk)
-
-                classification.tunnel_out = tunnel_out
-            except ValueError:
-                messages.error(request, 'Format de date invalide')
-                return redirect('portal_admin:classification_detail', pk=pk)
-
-        classification.status = new_status
-        classification.save()
-
-        new_status_display = classification.get_status_display()
-        messages.success(request, f'Statut de la classification changé de "{old_status}" à "{new_status_display}"')
-        return redirect('portal_admin:classification_detail', pk=pk)
+        messages.success(request, f'Statut de la classification changé de "{old_status}" à "{obj.get_status_display()}"')
 
     return redirect('portal_admin:classification_detail', pk=pk)
 
@@ -2766,8 +3147,8 @@ def classification_change_status(request, pk):
 
 # ============ PACKAGING ============
 
-@staff_member_required
-@permission_required('operations.view_packaging', raise_exception=True)
+@route_permission('operations.view_packaging')
+@replica_read
 def packaging_list(request):
     """List of packagings"""
     packagings = Packaging.objects.all().select_related(
@@ -2783,25 +3164,22 @@ def packaging_list(request):
     })
 
 
-@staff_member_required
-@permission_required('operations.view_packaging', raise_exception=True)
+@route_permission('operations.view_packaging')
 def packaging_detail(request, pk):
     """Details of a packaging"""
-    packaging = get_object_or_404(
-        Packaging.objects.select_related(
-            'classification',
-            'classification__reception',
-            'classification__reception__client',
-            'classification__reception__service_type',
-            'created_by'
-        ).prefetch_related('items__species__category'),
-        pk=pk
-    )
+    packaging = Packaging.objects.select_related(
+        'classification',
+        'classification__reception',
+        'classification__reception__client',
+        'classification__reception__service_type',
+        'created_by'
+    ).prefetch_related('items__species__category').filter(pk=pk).first()
+    if packaging is None:
+        return archived_record_detail(request, 'packaging', pk)
 
     # Get allowed status choices based on current status
-    allowed_status_choices = []
-    if packaging.status == 'draft':
-        allowed_status_choices = [('completed', 'Completed'), ('cancelled', 'Cancelled')]
+    from core.workflow import get_workflow
+    allowed_status_choices = get_workflow(Packaging).allowed_choices(packaging.status)
 
     return render(request, 'operations/packaging/packaging_detail.html', {
         'packaging': packaging,
@@ -2810,8 +3188,47 @@ def packaging_detail(request, pk):
     })
 
 
-@staff_member_required
-@permission_required('operations.add_packaging', raise_exception=True)
+def _classification_species(classification_id):
+    """
+    Species of a classification for the packaging form, cached until the
+    classification or its items change. None if the classification does not exist.
+    """
+    from django.core.cache import cache
+    from django.db.models import Count, Max
+
+    version = Classification.objects.filter(pk=classification_id).aggregate(
+        updated=Max('updated_at'), item_count=Count('items'), last_item=Max('items__id')
+    )
+    if version['updated'] is None:
+        return None
+    cache_key = (
+        f"operations:classification-species:{classification_id}:"
+        f"{version['updated'].timestamp()}:{version['item_count']}:{version['last_item']}"
+    )
+    species = cache.get(cache_key)
+    if species is None:
+        species = [
+            {'pk': pk, 'category_name': category_name, 'name': name}
+            for pk, category_name, name in ClassificationItem.objects.filter(
+                classification_id=classification_id
+            ).order_by('pk').values_list('species_id', 'species__category__name', 'species__name')
+        ]
+        cache.set(cache_key, species, 60 * 60)
+    return species
+
+
+@route_permission('operations.view_packaging')
+def classification_species_api(request, pk):
+    """JSON API: species of one classification, loaded by the packaging form when a lot is selected"""
+    from django.http import Http404, JsonResponse
+
+    species = _classification_species(pk)
+    if species is None:
+        raise Http404
+    return JsonResponse({'classification': pk, 'species': species})
+
+
+@route_permission('operations.add_packaging')
 def packaging_add(request):
     """Form to add packaging"""
     if request.method == 'POST':
@@ -2871,42 +3288,29 @@ def packaging_add(request):
         except Exception as e:
             messages.error(request, f'Error during creation: {str(e)}')
 
-    # Get eligible classifications (completed and not yet packaged)
+    # Get eligible classifications (completed and not yet packaged), restricted to lots awaiting packaging
     eligible_classifications = Classification.objects.filter(
+        reception__pipeline_stage=STAGE_AWAITING_PACKAGING,
         status='completed',
         packagings__isnull=True  # Exclude already packaged lots
     ).select_related(
         'reception__client',
         'reception__service_type',
         'reception__service_type__category'
-    ).prefetch_related(
-        'items__species__category'
     ).order_by('-start_datetime')
 
-    # Build species mapping by classification
-    import json
-    classification_species = {}
-    for classification in eligible_classifications:
-        species_data = []
-        for item in classification.items.all():
-            species_data.append({
-                'pk': item.species.pk,
-                'category_name': item.species.category.name,
-                'name': item.species.name
-            })
-        classification_species[classification.pk] = species_data
-
+    # Species of the selected classification are loaded on demand (classification_species_api)
     return render(request, 'operations/packaging/packaging_form.html', {
         'eligible_classifications': eligible_classifications,
-        'classification_species_json': json.dumps(classification_species),
         'status_choices': Packaging.STATUS_CHOICES
     })
 
 
-@staff_member_required
-@permission_required('operations.change_packaging', raise_exception=True)
+@route_permission('operations.change_packaging')
 def packaging_edit(request, pk):
     """Form to edit packaging"""
+    from core.versioning import ConcurrentEditError, apply_posted_version
+
     packaging = get_object_or_404(
         Packaging.objects.select_related('classification', 'classification__reception__client').prefetch_related('items__species'),
         pk=pk
@@ -2923,10 +3327,11 @@ def packaging_edit(request, pk):
             from datetime import datetime
 
             # Update packaging
+            apply_posted_version(packaging, request.POST)
             start_datetime_str = request.POST.get('start_datetime')
             packaging.start_datetime = datetime.strptime(start_datetime_str, '%Y-%m-%dT%H:%M')
             packaging.status = request.POST.get('status', 'draft')
-            packaging.save()
+            packaging.save(update_fields=['start_datetime', 'status'])
 
             # Delete old items
             packaging.items.all().delete()
@@ -2957,32 +3362,20 @@ def packaging_edit(request, pk):
             messages.success(request, 'Packaging updated successfully!')
             return redirect('portal_admin:packaging_detail', pk=packaging.pk)
 
+        except ConcurrentEditError as e:
+            messages.error(request, str(e))
+            return redirect('portal_admin:packaging_edit', pk=pk)
         except Exception as e:
             messages.error(request, f'Error during update: {str(e)}')
 
-    # Get eligible classifications
+    # The classification cannot be changed on edit: only the packaging's own is listed
     eligible_classifications = Classification.objects.filter(
-        status='completed'
+        pk=packaging.classification_id
     ).select_related(
         'reception__client',
         'reception__service_type',
         'reception__service_type__category'
-    ).prefetch_related(
-        'items__species__category'
-    ).order_by('-start_datetime')
-
-    # Build species mapping by classification
-    import json
-    classification_species = {}
-    for classification in eligible_classifications:
-        species_data = []
-        for item in classification.items.all():
-            species_data.append({
-                'pk': item.species.pk,
-                'category_name': item.species.category.name,
-                'name': item.species.name
-            })
-        classification_species[classification.pk] = species_data
+    )
 
     # For edit mode, get species from the packaging's classification
     species_list = []
@@ -2994,17 +3387,20 @@ def packaging_edit(request, pk):
     return render(request, 'operations/packaging/packaging_form.html', {
         'packaging': packaging,
         'eligible_classifications': eligible_classifications,
-        'classification_species_json': json.dumps(classification_species),
         'species_list': species_list,
         'status_choices': Packaging.STATUS_CHOICES
     })
 
 
-@staff_member_required
-@permission_required('operations.delete_packaging', raise_exception=True)
+@route_permission('operations.delete_packaging')
 def packaging_delete(request, pk):
     """Delete a packaging"""
-    packaging = get_object_or_404(Packaging, pk=pk)
+    packaging = get_object_or_404(
+        Packaging.objects.select_related('classification__reception__client').prefetch_related(
+            'items__species__category'
+        ),
+        pk=pk
+    )
 
     # Check if packaging can be deleted
     if not packaging.can_be_deleted:
@@ -3022,67 +3418,583 @@ def packaging_delete(request, pk):
     })
 
 
-@staff_member_required
-@permission_required('operations.change_packaging', raise_exception=True)
+@route_permission('operations.change_packaging')
 def packaging_change_status(request, pk):
-    """Change packaging status"""
-    if request.method == 'POST':
-        from datetime import datetime
+    """Change packaging status (required fields and checks: see operations.workflows)"""
+    from core.workflow import TransitionError, get_workflow
 
-        packaging = get_object_or_404(Packaging, pk=pk)
-        new_status = request.POST.get('status')
+    obj = get_object_or_404(Packaging, pk=pk)
 
-        # Validate new status
-        valid_statuses = [choice[0] for choice in Packaging.STATUS_CHOICES]
-        if new_status not in valid_statuses:
-            messages.error(request, 'Invalid status')
+    if request.method == 'POST':
+        old_status = obj.get_status_display()
+        try:
+            get_workflow(Packaging).transition(obj, request.POST.get('status'), request.POST, user=request.user)
+        except TransitionError as e:
+            messages.error(request, str(e))
             return redirect('portal_admin:packaging_detail', pk=pk)
 
-        old_status = packaging.get_status_display()
+        messages.success(request, f'Packaging status changed from "{old_status}" to "{obj.get_status_display()}"')
+
+    return redirect('portal_admin:packaging_detail', pk=pk)
+
+
+# ============ INVOICE VIEWS (Facturation) ============
+
+@route_permission('operations.view_invoice')
+@replica_read
+def invoice_list(request):
+    """Liste des factures mensuelles des clients"""
+    from django.core.paginator import Paginator
+    from django.db.models import Count, Sum
+
+    invoices = Invoice.objects.select_related('client')
+
+    period_filter = request.GET.get('period')
+    if period_filter:
+        from operations.billing import BillingError, month_period
+
+        try:
+            period_start, period_end = month_period(period_filter)
+            invoices = invoices.filter(period_start=period_start, period_end=period_end)
+        except BillingError as e:
+            messages.error(request, str(e))
+            period_filter = None
+
+    status_filter = request.GET.get('status')
+    if status_filter:
+        invoices = invoices.filter(status=status_filter)
+
+    client_filter = request.GET.get('client')
+    if client_filter:
+        invoices = invoices.filter(client__name__icontains=client_filter)
+
+    totals = invoices.order_by().aggregate(count=Count('id'), total=Sum('total'))
+    paginator = Paginator(invoices.order_by('-period_start', 'number'), 50)
+
+    return render(request, 'operations/invoices/invoice_list.html', {
+        'invoices': paginator.get_page(request.GET.get('page')),
+        'totals': totals,
+        'statuses': Invoice.STATUS_CHOICES,
+        'period_filter': period_filter,
+        'status_filter': status_filter,
+        'client_filter': client_filter,
+    })
+
+
+@route_permission('operations.view_invoice')
+def invoice_detail(request, pk):
+    """Détails d'une facture et de ses lignes"""
+    invoice = get_object_or_404(Invoice.objects.select_related('client'), pk=pk)
+    return render(request, 'operations/invoices/invoice_detail.html', {
+        'invoice': invoice,
+        'lines': invoice.lines.all(),
+    })
+
+
+@route_permission('operations.add_invoice')
+def billing_run(request):
+    """Met en file la facturation d'un mois (tâche operations.billing_run)"""
+    from operations.billing import BillingError, month_period
+    from .jobs import enqueue
+
+    if request.method != 'POST':
+        return redirect('portal_admin:invoice_list')
+
+    month = request.POST.get('month') or None
+    try:
+        month_period(month)
+    except BillingError as e:
+        messages.error(request, str(e))
+        return redirect('portal_admin:invoice_list')
+
+    job = enqueue('operations.billing_run', {'month': month}, user=request.user)
+    messages.success(request, f'Facturation mise en file (tâche #{job.pk}).')
+    return redirect('portal_admin:job_detail', pk=job.pk)
+
+
+@route_permission('operations.change_invoice')
+def invoice_change_status(request, pk):
+    """Émet ou annule une facture brouillon; une facture émise peut être annulée"""
+    from core.workflow import TransitionError, get_workflow
+
+    invoice = get_object_or_404(Invoice, pk=pk)
+    if request.method == 'POST':
+        try:
+            get_workflow(Invoice).transition(invoice, request.POST.get('status'), user=request.user)
+            messages.success(request, f'Facture {invoice.number} mise à jour.')
+        except TransitionError as e:
+            messages.error(request, str(e))
+    return redirect('portal_admin:invoice_detail', pk=pk)
+
+
+# ============ SPECIES RECONCILIATION (Rapprochement par espèce) ============
+
+@route_permission('operations.view_classification')
+@replica_read
+def species_reconciliation(request):
+    """Rapprochement mensuel rapport / classification / cartonage par espèce"""
+    from operations.billing import BillingError, month_period
+    from operations.species import species_reconciliation as reconcile
+
+    period = request.GET.get('period') or None
+    try:
+        period_start, period_end = month_period(period)
+    except BillingError as e:
+        messages.error(request, str(e))
+        period_start, period_end = month_period()
+
+    rows = reconcile(period_start, period_end)
+    totals = {
+        'reported_weight': sum(row.reported_weight for row in rows),
+        'classified_weight': sum(row.classified_weight for row in rows),
+        'plate_count': sum(row.plate_count for row in rows),
+        'carton_count': sum(row.carton_count for row in rows),
+    }
+    totals['weight_gap'] = totals['classified_weight'] - totals['reported_weight']
+
+    return render(request, 'operations/reconciliation/species_reconciliation.html', {
+        'rows': rows,
+        'totals': totals,
+        'period': period_start.strftime('%Y-%m'),
+        'period_start': period_start,
+        'period_end': period_end,
+    })
+
+
+# ============ THROUGHPUT (Débit horaire) ============
+
+def _throughput_range(params):
+    """Plage [début, fin) et agrégation demandées (par défaut les 365 derniers jours, par jour)"""
+    from datetime import datetime, timedelta
+
+    from django.utils import timezone
+
+    from operations.throughput import BUCKETS
 
-        # If changing to "completed", we must have end_datetime
-        if new_status == 'completed':
-            end_datetime_str = request.POST.get('end_datetime')
-            if not end_datetime_str:
-                messages.error(request, 'End date and time is required to complete the packaging')
-                return redirect('portal_admin:packaging_detail', pk=pk)
+    bucket = params.get('bucket') or 'day'
+    if bucket not in BUCKETS:
+        raise ValueError("Période d'agrégation invalide")
+    today = timezone.localdate()
+    try:
+        end = datetime.strptime(params['end'], '%Y-%m-%d').date() if params.get('end') else today
+        start = datetime.strptime(params['start'], '%Y-%m-%d').date() if params.get('start') else end - timedelta(days=364)
+    except ValueError:
+        raise ValueError('Date invalide (format attendu: AAAA-MM-JJ)')
+    if start > end:
+        raise ValueError('La date de début doit précéder la date de fin')
+    return start, end, bucket
+
+
+@route_permission('operations.view_throughputbucket')
+@replica_read
+def throughput_dashboard(request):
+    """Débit par étape (réception, classification, tunnel, cartonage), graphique chargé par throughput_api"""
+    from operations.throughput import STAGE_CHOICES
+
+    try:
+        start, end, bucket = _throughput_range(request.GET)
+    except ValueError as e:
+        messages.error(request, str(e))
+        start, end, bucket = _throughput_range({})
+
+    return render(request, 'operations/throughput/throughput_dashboard.html', {
+        'start': start,
+        'end': end,
+        'bucket': bucket,
+        'stages': STAGE_CHOICES,
+    })
 
+
+@route_permission('operations.view_throughputbucket')
+@replica_read
+def throughput_api(request):
+    """JSON API: série du débit sur une plage (start, end: AAAA-MM-JJ inclus; bucket: hour, day ou week)"""
+    from datetime import datetime, time, timedelta
+
+    from django.http import JsonResponse
+    from django.utils import timezone
+
+    from operations.throughput import throughput_series
+
+    try:
+        start, end, bucket = _throughput_range(request.GET)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    stages = request.GET.getlist('stage') or None
+    series = throughput_series(
+        timezone.make_aware(datetime.combine(start, time.min)),
+        timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min)),
+        bucket=bucket,
+        stages=stages,
+    )
+    return JsonResponse(series)
+
+
+# ============ ARCHIVED LOT VIEWS (Lots archivés) ============
+
+@route_permission('operations.view_archivedlot')
+@replica_read
+def archived_lot_list(request):
+    """Recherche dans les lots archivés"""
+    from django.core.paginator import Paginator
+    from django.db.models import Q
+
+    lots = ArchivedLot.objects.defer('snapshot')
+
+    search = request.GET.get('search', '').strip()
+    if search:
+        lots = lots.filter(Q(lot_id__istartswith=search) | Q(client_name__icontains=search))
+
+    paginator = Paginator(lots.order_by('-reception_date', '-pk'), 50)
+    return render(request, 'operations/archive/archived_lot_list.html', {
+        'lots': paginator.get_page(request.GET.get('page')),
+        'search': search,
+    })
+
+
+@route_permission('operations.view_archivedlot')
+def archived_lot_detail(request, pk):
+    """Chaîne complète d'un lot archivé (lecture seule)"""
+    from operations.archive import load_snapshot
+
+    lot = get_object_or_404(ArchivedLot, pk=pk)
+    return render(request, 'operations/archive/archived_lot_detail.html', {
+        'lot': lot,
+        'snapshot': load_snapshot(lot),
+    })
+
+
+def archived_record_detail(request, kind, pk):
+    """
+    Repli des vues de détail: l'enregistrement n'est plus dans les tables de
+    travail, on redirige vers le lot archivé qui le contient (404 sinon)
+    """
+    from django.http import Http404
+    from django.urls import reverse
+    from operations.archive import find_archived_lot
+
+    lot = find_archived_lot(kind, pk)
+    if lot is None:
+        raise Http404
+    return redirect(reverse('portal_admin:archived_lot_detail', args=[lot.pk]) + f'#{kind}-{pk}')
+
+
+# ============ DOCUMENT VIEWS (PDF) ============
+
+@route_permission()
+def document_pdf(request, kind, pk):
+    """
+    PDF d'un document (note d'arrivée, rapport, classification, cartonage, bon de
+    commande) servi depuis le cache disque; s'il n'est pas encore rendu, le rendu
+    est mis en file et une page d'attente est affichée.
+    """
+    from django.conf import settings
+    from django.core.exceptions import PermissionDenied
+    from django.http import FileResponse, Http404
+    from django.urls import reverse
+    from django.utils.cache import get_conditional_response, patch_cache_control
+    from django.utils.http import http_date
+    from .documents import DocumentRenderError, DocumentVersion, get_document_type, render_document, request_render
+
+    try:
+        doc_type = get_document_type(kind)
+    except DocumentRenderError:
+        raise Http404
+    if not request.user.has_perm(doc_type.permission):
+        raise PermissionDenied
+
+    version = DocumentVersion.lookup(kind, pk)
+    if version is None:
+        raise Http404
+
+    last_modified = int(version.updated_at.timestamp())
+    response = get_conditional_response(request, etag=version.etag, last_modified=last_modified)
+
+    if response is None and not version.is_cached():
+        if settings.DOCUMENTS_RENDER_INLINE:
             try:
-                end_datetime = datetime.strptime(end_datetime_str, '%Y-%m-%dT%H:%M')
-
-                # Check that end_datetime is not in the future
-                if end_datetime > datetime.now():
-                    messages.error(request, 'End date and time cannot be in the future')
-                    return redirect('portal_admin:packaging_detail', pk=pk)
-
-                packaging.end_datetime = end_datetime
-            except ValueError:
-                messages.error(request, 'Invalid date format')
-                return redirect('portal_admin:packaging_detail', pk=pk)
-
-            # Vérifier que toutes les espèces de la classification ont été emballées
-            classification_species = set(packaging.classification.items.values_list('species_id', flat=True))
-            packaged_species = set(packaging.items.values_list('species_id', flat=True))
-
-            unpackaged_species = classification_species - packaged_species
-            if unpackaged_species:
-                # Récupérer les noms des espèces non emballées
-                from operations.models import ServiceSubCategory
-                unpackaged_species_names = ServiceSubCategory.objects.filter(
-                    id__in=unpackaged_species
-                ).values_list('name', flat=True)
-                species_list = ', '.join(unpackaged_species_names)
-                messages.error(
-                    request,
-                    f'Impossible de terminer le cartonage. Les espèces suivantes n\'ont pas été emballées : {species_list}'
-                )
-                return redirect('portal_admin:packaging_detail', pk=pk)
+                render_document(kind, pk)
+            except DocumentRenderError as e:
+                messages.error(request, str(e))
+                return redirect(doc_type.detail_view, pk=pk)
+        else:
+            job = request_render(version, user=request.user)
+            if job.status == 'failed':
+                messages.error(request, f'Le rendu du document a échoué (tâche #{job.pk}).')
+                return redirect(doc_type.detail_view, pk=pk)
+            return render(request, 'documents/document_rendering.html', {
+                'job': job,
+                'detail_url': reverse(doc_type.detail_view, args=[pk]),
+            })
+
+    if response is None:
+        response = FileResponse(
+            open(version.path, 'rb'), content_type='application/pdf', filename=f"{kind}-{pk}.pdf"
+        )
+    response['ETag'] = version.etag
+    response['Last-Modified'] = http_date(last_modified)
+    if version.is_locked:
+        # Document final: ne changera plus
+        patch_cache_control(response, private=True, max_age=365 * 24 * 3600, immutable=True)
+    else:
+        patch_cache_control(response, private=True, no_cache=True)
+    return response
 
-        packaging.status = new_status
-        packaging.save()
 
-        new_status_display = packaging.get_status_display()
-        messages.success(request, f'Packaging status changed from "{old_status}" to "{new_status_display}"')
-        return redirect('portal_admin:packaging_detail', pk=pk)
+# ============ BACKGROUND JOB VIEWS (Tâches en arrière-plan) ============
 
-    return redirect('portal_admin:packaging_detail', pk=pk)
+@route_permission('seafood.view_backgroundjob')
+def job_list(request):
+    """Suivi des tâches en arrière-plan"""
+    from django.core.paginator import Paginator
+    from .jobs import launchable_tasks, queue_stats
+
+    jobs = BackgroundJob.objects.select_related('created_by').defer('payload', 'result', 'last_error')
+
+    status_filter = request.GET.get('status')
+    if status_filter:
+        jobs = jobs.filter(status=status_filter)
+
+    name_filter = request.GET.get('name')
+    if name_filter:
+        jobs = jobs.filter(name=name_filter)
+
+    paginator = Paginator(jobs.order_by('-created_at', '-pk'), 50)
+    jobs_page = paginator.get_page(request.GET.get('page'))
+
+    return render(request, 'seafood/jobs/job_list.html', {
+        'jobs': jobs_page,
+        'stats': queue_stats(),
+        'tasks': launchable_tasks(request.user),
+        'statuses': BackgroundJob.STATUS_CHOICES,
+        'status_filter': status_filter,
+        'name_filter': name_filter,
+    })
+
+
+@route_permission('seafood.view_backgroundjob')
+def job_detail(request, pk):
+    """Détails d'une tâche en arrière-plan"""
+    job = get_object_or_404(BackgroundJob.objects.select_related('created_by'), pk=pk)
+    return render(request, 'seafood/jobs/job_detail.html', {'job': job})
+
+
+@route_permission('seafood.view_backgroundjob')
+def job_status_api(request, pk):
+    """API JSON du statut d'une tâche (suivi depuis les pages qui l'ont mise en file)"""
+    from django.http import JsonResponse
+
+    job = get_object_or_404(
+        BackgroundJob.objects.only('name', 'status', 'attempts', 'max_attempts', 'run_at', 'finished_at', 'result'),
+        pk=pk
+    )
+    return JsonResponse({
+        'id': job.pk,
+        'name': job.name,
+        'status': job.status,
+        'status_display': job.get_status_display(),
+        'attempts': job.attempts,
+        'max_attempts': job.max_attempts,
+        'run_at': job.run_at.isoformat(),
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+        'result': job.result if job.status == 'succeeded' else None,
+    })
+
+
+@route_permission('seafood.add_backgroundjob')
+def job_enqueue(request):
+    """Met en file une tâche lançable (voir Task.can_launch), sans paramètres"""
+    from .jobs import JobError, enqueue, get_task
+
+    if request.method != 'POST':
+        return redirect('portal_admin:job_list')
+
+    try:
+        task = get_task(request.POST.get('name', ''))
+        if not task.can_launch(request.user):
+            raise JobError(f"La tâche {task.label} ne peut pas être lancée depuis le suivi des tâches.")
+        job = enqueue(task.name, user=request.user)
+    except JobError as e:
+        messages.error(request, str(e))
+        return redirect('portal_admin:job_list')
+
+    messages.success(request, f'Tâche #{job.pk} mise en file.')
+    return redirect('portal_admin:job_detail', pk=job.pk)
+
+
+@route_permission('seafood.change_backgroundjob')
+def job_retry(request, pk):
+    """Remet en file une tâche échouée ou annulée"""
+    from .jobs import retry_job
+
+    job = get_object_or_404(BackgroundJob, pk=pk)
+    if request.method == 'POST':
+        if retry_job(job):
+            messages.success(request, f'Tâche #{job.pk} remise en file.')
+        else:
+            messages.error(request, 'Seules les tâches échouées ou annulées peuvent être relancées.')
+    return redirect('portal_admin:job_detail', pk=pk)
+
+
+@route_permission('seafood.change_backgroundjob')
+def job_cancel(request, pk):
+    """Annule une tâche en attente"""
+    from .jobs import cancel_job
+
+    job = get_object_or_404(BackgroundJob, pk=pk)
+    if request.method == 'POST':
+        if cancel_job(job):
+            messages.success(request, f'Tâche #{job.pk} annulée.')
+        else:
+            messages.error(request, 'Seules les tâches en attente peuvent être annulées.')
+    return redirect('portal_admin:job_detail', pk=pk)
+
+
+# ============ AUTOCOMPLETE VIEWS (Recherche progressive) ============
+
+@route_permission()
+@replica_read
+def autocomplete(request, source):
+    """API JSON de recherche progressive d'une liste de sélection (?q=début du libellé)"""
+    from django.core.exceptions import PermissionDenied
+    from django.http import Http404, JsonResponse
+    from .autocomplete import get_source
+
+    autocomplete_source = get_source(source)
+    if autocomplete_source is None:
+        raise Http404
+    if not autocomplete_source.has_permission(request.user):
+        raise PermissionDenied
+    return JsonResponse(autocomplete_source.page(request.GET.get('q', '')))
+
+
+# Nombre de refus détaillés dans le message d'une action groupée
+BULK_REJECTED_SHOWN = 10
+
+
+@route_permission()
+def workflow_bulk_transition(request, model):
+    """
+    Changement de statut groupé (POST ids, status = nom de la transition, next).
+    Les objets dont le statut ou les champs ne permettent pas la transition sont
+    laissés inchangés et listés dans le message.
+    """
+    from django.core.exceptions import PermissionDenied
+    from django.http import Http404
+    from django.urls import reverse
+    from django.utils.http import url_has_allowed_host_and_scheme
+    from core.workflow import get_workflow
+
+    workflow = get_workflow(model)
+    if workflow is None:
+        raise Http404
+    if not request.user.has_perm(workflow.permission):
+        raise PermissionDenied
+
+    next_url = request.POST.get('next') or request.GET.get('next')
+    if not url_has_allowed_host_and_scheme(next_url, allowed_hosts={request.get_host()}, require_https=request.is_secure()):
+        next_url = reverse('portal_admin:index')
+    if request.method != 'POST':
+        return redirect(next_url)
+
+    ids = [pk for pk in request.POST.getlist('ids') if pk.isdigit()]
+    name = request.POST.get('status', '')
+    if not ids:
+        messages.error(request, 'Aucun élément sélectionné!')
+        return redirect(next_url)
+    if name not in dict(workflow.transition_choices()):
+        messages.error(request, 'Statut invalide!')
+        return redirect(next_url)
+    if name not in dict(workflow.bulk_choices()):
+        messages.error(request, "Ce changement de statut ne peut pas être appliqué par une action groupée.")
+        return redirect(next_url)
+
+    result = workflow.bulk_transition(ids, name, request.POST, user=request.user)
+    if result.applied:
+        target = workflow.status_label(result.values[result.applied[0]][workflow.field])
+        messages.success(request, f'{len(result.applied)} élément(s) passé(s) au statut "{target}".')
+    if result.rejected:
+        labels = workflow.labels(list(result.rejected)[:BULK_REJECTED_SHOWN])
+        details = '; '.join(
+            f'{labels.get(pk, pk)} : {reason}' for pk, reason in list(result.rejected.items())[:BULK_REJECTED_SHOWN]
+        )
+        more = len(result.rejected) - BULK_REJECTED_SHOWN
+        if more > 0:
+            details += f' (et {more} autre(s))'
+        messages.warning(request, f'{len(result.rejected)} élément(s) non modifié(s) — {details}')
+    return redirect(next_url)
+
+
+def _dedup_spec(request, kind):
+    """Fiche dédoublonnée de la route (404 si inconnue, 403 sans droit de modification)"""
+    from django.core.exceptions import PermissionDenied
+    from django.http import Http404
+    from .dedup import SPECS
+
+    spec = SPECS.get(kind)
+    if spec is None:
+        raise Http404
+    if not request.user.has_perm(spec.permission):
+        raise PermissionDenied
+    return spec
+
+
+@route_permission()
+def duplicate_list(request, kind):
+    """Doublons probables trouvés par la dernière recherche (tâche seafood.find_duplicates)"""
+    from .dedup import SPECS
+
+    spec = _dedup_spec(request, kind)
+    jobs = BackgroundJob.objects.filter(name='seafood.find_duplicates', payload__kind=kind).order_by('-created_at')
+    last_job = jobs.only('status', 'created_at', 'finished_at').first()
+    scan = jobs.filter(status='succeeded').only('result', 'finished_at').first()
+    return render(request, 'seafood/duplicates/duplicate_list.html', {
+        'spec': spec,
+        'columns': [spec.model._meta.get_field(field).verbose_name for field in spec.display_fields],
+        'kinds': [(name, other.label) for name, other in SPECS.items()],
+        'last_job': last_job,
+        'scan': scan,
+        'result': scan.result if scan else None,
+        'can_merge': request.user.has_perm(spec.merge_permission),
+    })
+
+
+@route_permission()
+def duplicate_scan(request, kind):
+    """Met en file la recherche des doublons d'un type de fiche"""
+    from .jobs import enqueue
+
+    _dedup_spec(request, kind)
+    if request.method == 'POST':
+        job = enqueue('seafood.find_duplicates', {'kind': kind}, user=request.user)
+        messages.success(request, f'Recherche des doublons mise en file (tâche #{job.pk}).')
+    return redirect('portal_admin:duplicate_list', kind=kind)
+
+
+@route_permission()
+def duplicate_merge(request, kind):
+    """Met en file la fusion de doublons dans la fiche gardée (POST keep, duplicates)"""
+    from django.core.exceptions import PermissionDenied
+    from .jobs import enqueue
+
+    spec = _dedup_spec(request, kind)
+    if not request.user.has_perm(spec.merge_permission):
+        raise PermissionDenied
+    if request.method != 'POST':
+        return redirect('portal_admin:duplicate_list', kind=kind)
+
+    keep = request.POST.get('keep', '')
+    duplicates = [pk for pk in request.POST.getlist('duplicates') if pk.isdigit() and pk != keep]
+    if not keep.isdigit() or not duplicates:
+        messages.error(request, 'Sélectionnez la fiche à garder et au moins un doublon!')
+        return redirect('portal_admin:duplicate_list', kind=kind)
+    if spec.model.objects.filter(pk__in=[keep, *duplicates]).count() != len(duplicates) + 1:
+        messages.error(request, 'Fiche introuvable (déjà fusionnée ou supprimée).')
+        return redirect('portal_admin:duplicate_list', kind=kind)
+
+    job = enqueue(
+        'seafood.merge_duplicates', {'kind': kind, 'keep': int(keep), 'duplicates': [int(pk) for pk in duplicates]},
+        user=request.user,
+    )
+    messages.success(request, f'Fusion mise en file (tâche #{job.pk}).')
+    return redirect('portal_admin:job_detail', pk=job.pk)
@@ -0,0 +1,41 @@
+"""
+Statuts des caisses, demandes d'achat et bons de commande (voir core.workflow).
+
+Le paiement d'un bon de commande (approuvé -> payé) reste traité par la vue
+purchaseorder_pay: il dépend du solde de la caisse ou du compte débité. Les
+changements de statut des bons de commande recalculent les statistiques
+mensuelles des fournisseurs (seafood.supplier_stats).
+"""
+from core.workflow import Requirement, Transition, Workflow, register
+
+from .models import Cashbox, PurchaseOrder, PurchaseRequest
+from .supplier_stats import refresh_orders
+
+
+def _approval(user, now):
+    return {'approved_by_id': user.pk if user else None, 'approved_at': now}
+
+
+REJECTION_REASON = Requirement('rejection_reason', 'Le motif de rejet', 'Le motif de rejet est obligatoire!')
+
+register(Workflow(Cashbox, [
+    Transition(('inactive', 'suspended'), 'active'),
+    Transition(('active', 'suspended'), 'inactive'),
+    Transition(('active', 'inactive'), 'suspended'),
+], label_field='folder_code'))
+
+# L'approbation crée le bon de commande: uniquement par purchaserequest_approve
+# ou seafood.purchasing.approve_requests, jamais par le changement groupé générique
+register(Workflow(PurchaseRequest, [
+    Transition('draft', 'approved', assign=lambda user, now: {'rejection_reason': ''}, bulk=False),
+    Transition('draft', 'rejected', requires=[REJECTION_REASON]),
+    Transition('draft', 'cancelled'),
+], label_field='pr_number'))
+
+# Un rejet est une annulation motivée
+register(Workflow(PurchaseOrder, [
+    Transition('draft', 'pending'),
+    Transition(('draft', 'pending'), 'approved', assign=_approval),
+    Transition(('draft', 'pending'), 'cancelled', name='reject', requires=[REJECTION_REASON]),
+    Transition(('draft', 'pending'), 'cancelled'),
+], after=refresh_orders, label_field='po_number'))
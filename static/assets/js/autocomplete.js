@@ -0,0 +1,87 @@
+/*
+ * Recherche progressive des listes de sélection.
+ *
+ * <select data-autocomplete="/portal/autocomplete/clients/"> reçoit un champ de
+ * recherche: les options sont chargées depuis l'API (au plus 20 par page) au fil
+ * de la saisie, avec leurs attributs data-*. Le <select> reste le champ du
+ * formulaire: les scripts des pages lisent sa valeur et ses options comme avant.
+ */
+(function () {
+  'use strict';
+
+  function debounce(fn, delay) {
+    let timer = null;
+    return function () {
+      const args = arguments;
+      clearTimeout(timer);
+      timer = setTimeout(function () { fn.apply(null, args); }, delay);
+    };
+  }
+
+  function enhance(select) {
+    const url = select.dataset.autocomplete;
+    const search = document.createElement('input');
+    search.type = 'search';
+    search.className = 'form-control form-control-sm mb-1';
+    search.placeholder = select.dataset.autocompletePlaceholder || 'Rechercher...';
+    search.autocomplete = 'off';
+    search.disabled = select.disabled;
+    select.parentNode.insertBefore(search, select);
+
+    let controller = null;
+    let loaded = null;
+
+    function render(page) {
+      const current = select.value;
+      Array.from(select.options).forEach(function (option) {
+        if (option.dataset.autocompleteResult !== undefined || option.dataset.autocompleteMore !== undefined) {
+          if (!(option.value && option.value === current)) option.remove();
+        }
+      });
+      page.results.forEach(function (result) {
+        if (String(result.id) === current) return;
+        const option = new Option(result.text, result.id);
+        option.dataset.autocompleteResult = '';
+        Object.keys(result.data || {}).forEach(function (key) {
+          option.setAttribute('data-' + key, result.data[key]);
+        });
+        select.add(option);
+      });
+      if (page.more) {
+        const more = new Option('Affinez la recherche pour voir plus de résultats...', '');
+        more.disabled = true;
+        more.dataset.autocompleteMore = '';
+        select.add(more);
+      }
+    }
+
+    function load(term) {
+      if (loaded === term) return;
+      loaded = term;
+      if (controller) controller.abort();
+      controller = new AbortController();
+      fetch(url + '?q=' + encodeURIComponent(term), {
+        headers: {'Accept': 'application/json'},
+        credentials: 'same-origin',
+        signal: controller.signal
+      })
+        .then(function (response) { return response.ok ? response.json() : {results: [], more: false}; })
+        .then(render)
+        .catch(function (error) { if (error.name !== 'AbortError') loaded = null; });
+    }
+
+    // Les options existantes (valeur déjà choisie) sont marquées pour être remplacées au besoin
+    Array.from(select.options).forEach(function (option) {
+      if (option.value) option.dataset.autocompleteResult = '';
+    });
+
+    search.addEventListener('input', debounce(function () { load(search.value.trim()); }, 250));
+    search.addEventListener('focus', function () { load(search.value.trim()); });
+    select.addEventListener('focus', function () { load(search.value.trim()); });
+    select.addEventListener('mousedown', function () { load(search.value.trim()); });
+  }
+
+  document.addEventListener('DOMContentLoaded', function () {
+    document.querySelectorAll('select[data-autocomplete]').forEach(enhance);
+  });
+})();